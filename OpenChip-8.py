@@ -1,35 +1,58 @@
+import sys
 import pygame
 import zipfile
 import os
-import requests
+try:
+    import requests
+except ImportError:
+    requests = None  # Only download_bios() needs it
+from chip8core import Chip8Core, FrameClock
 
-class Chip8:
-    def __init__(self):
-        # Initialize Chip-8 state...
-        pass
+KEYMAP = {
+    pygame.K_1: 0x1, pygame.K_2: 0x2, pygame.K_3: 0x3, pygame.K_4: 0xC,
+    pygame.K_q: 0x4, pygame.K_w: 0x5, pygame.K_e: 0x6, pygame.K_r: 0xD,
+    pygame.K_a: 0x7, pygame.K_s: 0x8, pygame.K_d: 0x9, pygame.K_f: 0xE,
+    pygame.K_z: 0xA, pygame.K_x: 0x0, pygame.K_c: 0xB, pygame.K_v: 0xF,
+}
 
-    def load_rom(self, rom_path):
-        # Load a ROM file into memory...
-        with open(rom_path, 'rb') as f:
-            self.rom_data = f.read()
+class Chip8(Chip8Core):
+    def __init__(self):
+        # Registers, memory, display and timers live in the shared core (chip8core.py)
+        super().__init__()
 
-    def run(self):
-        # Emulate the Chip-8...
-        pass
+    def run(self, keys=None):
+        # Emulate one 60 Hz frame with the keys held during it...
+        self.run_frame(keys)
 
 class GUI:
     def __init__(self, chip8):
         pygame.init()
         self.screen = pygame.display.set_mode((640, 320))
         self.chip8 = chip8
+        self.keys = [0] * 16
+        self.running = True
 
     def draw(self):
         # Draw the Chip-8's screen state to the window...
-        pass
+        scale_x = self.screen.get_width() // self.chip8.width
+        scale_y = self.screen.get_height() // self.chip8.height
+        self.screen.fill((0, 0, 0))
+        width = self.chip8.width
+        for y, row in enumerate(self.chip8.display):
+            for x in range(width):
+                if row >> (width - 1 - x) & 1:
+                    self.screen.fill((255, 255, 255), (x * scale_x, y * scale_y, scale_x, scale_y))
+        pygame.display.flip()
 
     def handle_events(self):
-        # Handle user input...
-        pass
+        # Handle user input; the core only sees it at the start of the next frame
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.running = False
+            elif event.type in (pygame.KEYDOWN, pygame.KEYUP) and event.key in KEYMAP:
+                self.keys[KEYMAP[event.key]] = 1 if event.type == pygame.KEYDOWN else 0
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                self.running = False
 
 def inspect_zip_for_modules(zip_path):
     # Inspect a zipfile for modules (could be adapted for ROMs)...
@@ -51,20 +74,24 @@ def main():
     chip8 = Chip8()
     gui = GUI(chip8)
 
-    # Load a ROM...
-    roms = inspect_zip_for_modules('roms.zip')
-    if roms:
-        chip8.load_rom(roms[0])
-
-    # Download and load a BIOS...
-    download_bios('http://example.com/bios.ch8', 'bios.ch8')
-    chip8.load_bios('bios.ch8')
+    # Load a ROM: from the command line, else the first one in roms.zip...
+    if len(sys.argv) > 1:
+        chip8.load_rom(sys.argv[1])
+    elif os.path.exists('roms.zip'):
+        roms = inspect_zip_for_modules('roms.zip')
+        if roms:
+            with zipfile.ZipFile('roms.zip', "r") as zfile:
+                chip8.load(zfile.read(roms[0]))
 
-    # Run the emulator...
-    while True:
-        chip8.run()
+    # Run the emulator: every frame that is due, then one redraw
+    clock = FrameClock()
+    while gui.running:
+        for _ in range(clock.due()):
+            chip8.run(gui.keys)
         gui.draw()
         gui.handle_events()
+        pygame.time.wait(clock.delay_ms())
+    pygame.quit()
 
 if __name__ == '__main__':
     main()
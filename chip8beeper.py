@@ -0,0 +1,72 @@
+"""
+CHIP-8 beeper for the Tk frontends (qwen3emu-chip1.0a.py).
+
+CHIP-8 has one sound: a fixed tone for as long as the sound timer is nonzero.
+The tone is synthesized once as a short square-wave buffer holding a whole
+number of periods, and played on a looping pygame.mixer channel. update() is
+called once per emulator loop with the timer's state and only touches the
+mixer when it changes (silent -> beeping starts the loop, beeping -> silent
+stops it), so a held tone costs nothing per frame.
+
+pygame is optional; without it (or without an audio device) the beeper is
+silent.
+"""
+
+from array import array
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+BEEP_FREQUENCY = 440
+BEEP_VOLUME = 0.25
+# Long enough that the loop point is far apart, short enough to build instantly
+BEEP_BUFFER_SECONDS = 0.1
+
+
+def square_wave(rate, frequency, channels=1, volume=BEEP_VOLUME, seconds=BEEP_BUFFER_SECONDS):
+    """Signed 16-bit samples (interleaved for `channels`) of a square wave that
+    loops seamlessly: the buffer ends on a period boundary."""
+    period = max(2, round(rate / frequency))
+    high = int(32767 * volume)
+    one_period = [high] * (period // 2) + [-high] * (period - period // 2)
+    periods = max(1, round(rate * seconds / period))
+    samples = array("h")
+    for sample in one_period * periods:
+        samples.extend([sample] * channels)
+    return samples
+
+
+class Beeper:
+    def __init__(self, frequency=BEEP_FREQUENCY):
+        self.sound = None
+        self.channel = None
+        self.beeping = False
+        if pygame is None:
+            return
+        try:
+            if not pygame.mixer.get_init():
+                pygame.mixer.init(frequency=44100, size=-16, channels=1, buffer=512)
+            rate, size, channels = pygame.mixer.get_init()
+        except pygame.error as e:
+            print(f"No audio device, sound disabled: {e}")
+            return
+        if size != -16:
+            print(f"Unsupported mixer format {size}, sound disabled")
+            return
+        self.sound = pygame.mixer.Sound(buffer=square_wave(rate, frequency, channels).tobytes())
+
+    def update(self, active):
+        """Start or stop the tone if `active` (sound timer > 0) changed since the last call."""
+        if active == self.beeping or self.sound is None:
+            return
+        self.beeping = active
+        if active:
+            self.channel = self.sound.play(loops=-1)
+        elif self.channel is not None:
+            self.channel.stop()
+            self.channel = None
+
+    def stop(self):
+        self.update(False)
@@ -0,0 +1,60 @@
+"""
+Incremental Tk canvas renderer for the CHIP-8 frontends (qwen3emu-chip1.0a.py
+and emuchipv8-.py).
+
+The display is a grid of rectangles created once (64x32, or 128x64 once a core
+switches to that size), all hidden. Each update only visits the rows the core
+marked dirty (Chip8Core.dirty_rows, filled by DXYN and CLS), XORs each packed
+row with what is on screen and shows or hides just the cells that flipped.
+Deleting and re-creating a rectangle per lit pixel every frame made Tk slower
+the longer it ran; here the item count never changes.
+"""
+
+
+class CanvasRenderer:
+    def __init__(self, canvas, core, pixel_width, pixel_height, color="white"):
+        self.canvas = canvas
+        self.core = core
+        self.pixel_width = pixel_width
+        self.pixel_height = pixel_height
+        self.color = color
+        self.size = None
+        self.items = []
+        self.shown = []
+
+    def build(self):
+        """Create the hidden rectangle grid for the core's current display size."""
+        canvas = self.canvas
+        canvas.delete("pixel")
+        width, height = self.core.width, self.core.height
+        pw, ph = self.pixel_width, self.pixel_height
+        self.items = [[canvas.create_rectangle(x * pw, y * ph, (x + 1) * pw, (y + 1) * ph,
+                                               fill=self.color, outline="", state="hidden", tags="pixel")
+                       for x in range(width)] for y in range(height)]
+        self.shown = [0] * height
+        self.size = (width, height)
+        self.core.dirty_rows.update(range(height))
+
+    def update(self):
+        core = self.core
+        if (core.width, core.height) != self.size:
+            self.build()
+        dirty = core.dirty_rows
+        if not dirty:
+            return
+        itemconfigure = self.canvas.itemconfigure
+        display = core.display
+        last = core.width - 1
+        for y in dirty:
+            row = display[y]
+            changed = row ^ self.shown[y]
+            if not changed:
+                continue
+            items = self.items[y]
+            # Visit only the set bits of the XOR: the pixels that flipped
+            while changed:
+                bit = changed & -changed
+                changed ^= bit
+                itemconfigure(items[last - (bit.bit_length() - 1)], state="normal" if row & bit else "hidden")
+            self.shown[y] = row
+        dirty.clear()
@@ -0,0 +1,452 @@
+"""
+Headless CHIP-8 core shared by the CHIP-8 frontends (qwen3emu-chip1.0a.py,
+emuchipv8-.py and OpenChip-8.py).
+
+The core runs in frames: run_frame() latches the frontend's key state once,
+executes instructions_per_frame instructions and then ticks the delay and sound
+timers once, so the timers count at exactly 60 Hz of emulated time whatever
+the CPU rate is set to. Frontends call it from their own loop, using a
+FrameClock to run as many frames as wall-clock time says are due.
+
+The display is one int per row, `width` bits wide, with the leftmost pixel in
+the most significant bit: DXYN XORs a whole shifted sprite row into it and
+detects a collision with a single AND, and rows it leaves unchanged never
+reach dirty_rows (the rows a renderer has to look at).
+
+Quirks follow the common CHIP-48 behaviour the frontends already had: 8XY6/8XYE
+shift VX in place, FX55/FX65 leave I unchanged and sprites wrap around the
+screen edges. Unknown opcodes are skipped.
+"""
+
+import random
+import struct
+import time
+
+MEMORY_SIZE = 4096
+PROGRAM_START = 0x200
+FONT_START = 0x50
+SCREEN_WIDTH = 64
+SCREEN_HEIGHT = 32
+
+STACK_DEPTH = 16
+
+TIMER_HZ = 60
+# 600 instructions per second, in the 500-1000 Hz range most ROMs were written for
+DEFAULT_INSTRUCTIONS_PER_FRAME = 10
+
+FONTSET = (
+    0xF0, 0x90, 0x90, 0x90, 0xF0,  # 0
+    0x20, 0x60, 0x20, 0x20, 0x70,  # 1
+    0xF0, 0x10, 0xF0, 0x80, 0xF0,  # 2
+    0xF0, 0x10, 0xF0, 0x10, 0xF0,  # 3
+    0x90, 0x90, 0xF0, 0x10, 0x10,  # 4
+    0xF0, 0x80, 0xF0, 0x10, 0xF0,  # 5
+    0xF0, 0x80, 0xF0, 0x90, 0xF0,  # 6
+    0xF0, 0x10, 0x20, 0x40, 0x40,  # 7
+    0xF0, 0x90, 0xF0, 0x90, 0xF0,  # 8
+    0xF0, 0x90, 0xF0, 0x10, 0xF0,  # 9
+    0xF0, 0x90, 0xF0, 0x90, 0x90,  # A
+    0xE0, 0x90, 0xE0, 0x90, 0xE0,  # B
+    0xF0, 0x80, 0x80, 0x80, 0xF0,  # C
+    0xE0, 0x90, 0x90, 0x90, 0xE0,  # D
+    0xF0, 0x80, 0xF0, 0x80, 0xF0,  # E
+    0xF0, 0x80, 0xF0, 0x80, 0x80,  # F
+)
+
+# Save state layout: header (magic, version, display size, pc, I, timers, stack
+# depth, V0-VF, the 16 stack slots), then memory, then the display rows packed
+# big-endian, width // 8 bytes each. About 4.3 KB for a 64x32 display.
+STATE_MAGIC = b"C8ST"
+STATE_VERSION = 1
+STATE_HEADER = struct.Struct("<4sBBBHHBBB16s%dH" % STACK_DEPTH)
+
+
+class FrameClock:
+    """Counts the 60 Hz frames that wall-clock time says are due, so a frontend
+    driven by an inexact timer (Tk's after(), a pygame tick) still runs the core
+    at 60 frames per second. After a stall it catches up at most max_frames."""
+
+    def __init__(self, hz=TIMER_HZ, max_frames=4):
+        self.period = 1.0 / hz
+        self.max_frames = max_frames
+        self.reset()
+
+    def reset(self):
+        self.next_frame = time.perf_counter()
+
+    def due(self):
+        now = time.perf_counter()
+        if now < self.next_frame:
+            return 0
+        frames = int((now - self.next_frame) / self.period) + 1
+        if frames > self.max_frames:
+            # Too far behind: drop the backlog rather than fast-forwarding through it
+            frames = self.max_frames
+            self.next_frame = now + self.period
+        else:
+            self.next_frame += frames * self.period
+        return frames
+
+    def delay_ms(self):
+        """Milliseconds until the next frame is due (for scheduling the next tick)."""
+        return max(1, int((self.next_frame - time.perf_counter()) * 1000))
+
+
+class Chip8Core:
+    def __init__(self, instructions_per_frame=DEFAULT_INSTRUCTIONS_PER_FRAME):
+        self.instructions_per_frame = instructions_per_frame
+        self.width = SCREEN_WIDTH
+        self.height = SCREEN_HEIGHT
+        self.memory = bytearray(MEMORY_SIZE)
+        self.reset()
+
+    def reset(self):
+        """Power-on state; memory above the font is left as it is (the loaded ROM)."""
+        self.memory[FONT_START:FONT_START + len(FONTSET)] = bytes(FONTSET)
+        self.V = [0] * 16
+        self.I = 0
+        self.pc = PROGRAM_START
+        self.stack = []
+        self.delay_timer = 0
+        self.sound_timer = 0
+        self.display = [0] * self.height
+        # Display rows changed since a renderer last cleared this set
+        self.dirty_rows = set(range(self.height))
+        self.keys = [0] * 16
+        self.frames = 0
+        # Decoded instruction per address, filled in as code runs (see step())
+        self.decoded = [None] * MEMORY_SIZE
+
+    def load(self, data):
+        """Load a ROM image at 0x200 and reset."""
+        if len(data) > MEMORY_SIZE - PROGRAM_START:
+            raise ValueError("ROM is %d bytes, at most %d fit" % (len(data), MEMORY_SIZE - PROGRAM_START))
+        self.memory[:] = bytes(MEMORY_SIZE)
+        self.memory[PROGRAM_START:PROGRAM_START + len(data)] = data
+        self.reset()
+
+    def load_rom(self, path):
+        with open(path, "rb") as f:
+            self.load(f.read())
+
+    # --- Save states ---
+
+    def snapshot(self):
+        """The whole machine state as STATE_HEADER + memory + display (held keys are not saved)."""
+        stack = self.stack + [0] * (STACK_DEPTH - len(self.stack))
+        header = STATE_HEADER.pack(STATE_MAGIC, STATE_VERSION, self.width, self.height,
+                                   self.pc, self.I, self.delay_timer, self.sound_timer,
+                                   len(self.stack), bytes(self.V), *stack)
+        row_bytes = self.width // 8
+        return b"".join([header, bytes(self.memory)] + [row.to_bytes(row_bytes, "big") for row in self.display])
+
+    def restore(self, data):
+        """Load a snapshot(); raises ValueError if `data` is not a valid state."""
+        if len(data) < STATE_HEADER.size:
+            raise ValueError("Not a CHIP-8 save state")
+        fields = STATE_HEADER.unpack_from(data)
+        magic, version, width, height, pc, I, delay, sound, depth, V = fields[:10]
+        if magic != STATE_MAGIC or version != STATE_VERSION:
+            raise ValueError("Not a version %d CHIP-8 save state" % STATE_VERSION)
+        row_bytes = width // 8
+        if len(data) != STATE_HEADER.size + MEMORY_SIZE + height * row_bytes or depth > STACK_DEPTH:
+            raise ValueError("CHIP-8 save state is truncated or corrupt")
+        offset = STATE_HEADER.size
+        self.memory[:] = data[offset:offset + MEMORY_SIZE]
+        offset += MEMORY_SIZE
+        self.display = [int.from_bytes(data[offset + y * row_bytes:offset + (y + 1) * row_bytes], "big")
+                        for y in range(height)]
+        self.width, self.height = width, height
+        self.pc, self.I = pc & 0xFFF, I & 0xFFF
+        self.delay_timer, self.sound_timer = delay, sound
+        self.V = list(V)
+        self.stack = list(fields[10:10 + depth])
+        self.dirty_rows.update(range(height))
+        self.decoded = [None] * MEMORY_SIZE
+
+    # --- Scheduling ---
+
+    def run_frame(self, keys=None):
+        """One 60 Hz frame: latch `keys` (16 ints, if given), run the frame's
+        instructions, then tick the timers."""
+        if keys is not None:
+            self.keys[:] = keys
+        # step(), inlined
+        decoded = self.decoded
+        decode = self.decode
+        for _ in range(self.instructions_per_frame):
+            pc = self.pc
+            handler, args = decoded[pc] or decode(pc)
+            self.pc = (pc + 2) & 0xFFF
+            handler(*args)
+        self.tick_timers()
+        self.frames += 1
+
+    def tick_timers(self):
+        if self.delay_timer > 0:
+            self.delay_timer -= 1
+        if self.sound_timer > 0:
+            self.sound_timer -= 1
+
+    # --- Interpreter ---
+    #
+    # Each instruction is decoded once, the first time it runs, into a
+    # (handler, args) pair kept in self.decoded[address]; after that running it
+    # is a list lookup and a call. Writes to memory (FX33, FX55, loading a ROM or
+    # a state) drop the entries they overlap, so self-modifying code is re-decoded.
+
+    def step(self):
+        """Execute one instruction (timers are left to tick_timers())."""
+        pc = self.pc
+        handler, args = self.decoded[pc] or self.decode(pc)
+        self.pc = (pc + 2) & 0xFFF
+        handler(*args)
+
+    def decode(self, addr):
+        memory = self.memory
+        opcode = (memory[addr] << 8) | memory[(addr + 1) & 0xFFF]
+        x = (opcode & 0x0F00) >> 8
+        y = (opcode & 0x00F0) >> 4
+        n = opcode & 0x000F
+        nn = opcode & 0x00FF
+        nnn = opcode & 0x0FFF
+        kind = opcode >> 12
+        entry = (self.op_nop, ())
+        if kind == 0x0:
+            if opcode == 0x00E0:
+                entry = (self.op_cls, ())
+            elif opcode == 0x00EE:
+                entry = (self.op_ret, ())
+        elif kind == 0x1:
+            entry = (self.op_jp, (nnn,))
+        elif kind == 0x2:
+            entry = (self.op_call, (nnn,))
+        elif kind == 0x3:
+            entry = (self.op_se_byte, (x, nn))
+        elif kind == 0x4:
+            entry = (self.op_sne_byte, (x, nn))
+        elif kind == 0x5:
+            if n == 0:
+                entry = (self.op_se_reg, (x, y))
+        elif kind == 0x6:
+            entry = (self.op_ld_byte, (x, nn))
+        elif kind == 0x7:
+            entry = (self.op_add_byte, (x, nn))
+        elif kind == 0x8:
+            handler = self.ALU_OPS.get(n)
+            if handler is not None:
+                entry = (getattr(self, handler), (x, y))
+        elif kind == 0x9:
+            if n == 0:
+                entry = (self.op_sne_reg, (x, y))
+        elif kind == 0xA:
+            entry = (self.op_ld_i, (nnn,))
+        elif kind == 0xB:
+            entry = (self.op_jp_v0, (nnn,))
+        elif kind == 0xC:
+            entry = (self.op_rnd, (x, nn))
+        elif kind == 0xD:
+            entry = (self.op_drw, (x, y, n))
+        elif kind == 0xE:
+            if nn == 0x9E:
+                entry = (self.op_skp, (x,))
+            elif nn == 0xA1:
+                entry = (self.op_sknp, (x,))
+        else:
+            handler = self.MISC_OPS.get(nn)
+            if handler is not None:
+                entry = (getattr(self, handler), (x,))
+        self.decoded[addr] = entry
+        return entry
+
+    def invalidate(self, addr, count):
+        """Forget decoded instructions overlapping memory[addr:addr + count]."""
+        decoded = self.decoded
+        for a in range(addr - 1, addr + count):
+            decoded[a & 0xFFF] = None
+
+    ALU_OPS = {0x0: "op_ld_reg", 0x1: "op_or", 0x2: "op_and", 0x3: "op_xor", 0x4: "op_add_reg",
+               0x5: "op_sub", 0x6: "op_shr", 0x7: "op_subn", 0xE: "op_shl"}
+    MISC_OPS = {0x07: "op_ld_dt", 0x0A: "op_ld_key", 0x15: "op_set_dt", 0x18: "op_set_st",
+                0x1E: "op_add_i", 0x29: "op_ld_font", 0x33: "op_bcd", 0x55: "op_store", 0x65: "op_load"}
+
+    def op_nop(self):
+        pass
+
+    def op_cls(self):  # 00E0
+        self.display = [0] * self.height
+        self.dirty_rows.update(range(self.height))
+
+    def op_ret(self):  # 00EE
+        self.pc = self.stack.pop()
+
+    def op_jp(self, nnn):  # 1NNN
+        self.pc = nnn
+
+    def op_call(self, nnn):  # 2NNN
+        if len(self.stack) == STACK_DEPTH:
+            # The stack has 16 levels; deeper calls lose the oldest return address
+            del self.stack[0]
+        self.stack.append(self.pc)
+        self.pc = nnn
+
+    def op_se_byte(self, x, nn):  # 3XNN
+        if self.V[x] == nn:
+            self.pc = (self.pc + 2) & 0xFFF
+
+    def op_sne_byte(self, x, nn):  # 4XNN
+        if self.V[x] != nn:
+            self.pc = (self.pc + 2) & 0xFFF
+
+    def op_se_reg(self, x, y):  # 5XY0
+        if self.V[x] == self.V[y]:
+            self.pc = (self.pc + 2) & 0xFFF
+
+    def op_ld_byte(self, x, nn):  # 6XNN
+        self.V[x] = nn
+
+    def op_add_byte(self, x, nn):  # 7XNN
+        V = self.V
+        V[x] = (V[x] + nn) & 0xFF
+
+    def op_ld_reg(self, x, y):  # 8XY0
+        self.V[x] = self.V[y]
+
+    def op_or(self, x, y):  # 8XY1
+        self.V[x] |= self.V[y]
+
+    def op_and(self, x, y):  # 8XY2
+        self.V[x] &= self.V[y]
+
+    def op_xor(self, x, y):  # 8XY3
+        self.V[x] ^= self.V[y]
+
+    def op_add_reg(self, x, y):  # 8XY4
+        V = self.V
+        result = V[x] + V[y]
+        V[x] = result & 0xFF
+        V[0xF] = 1 if result > 0xFF else 0
+
+    def op_sub(self, x, y):  # 8XY5
+        V = self.V
+        flag = 1 if V[x] >= V[y] else 0
+        V[x] = (V[x] - V[y]) & 0xFF
+        V[0xF] = flag
+
+    def op_shr(self, x, y):  # 8XY6 (shifts VX in place)
+        V = self.V
+        flag = V[x] & 1
+        V[x] >>= 1
+        V[0xF] = flag
+
+    def op_subn(self, x, y):  # 8XY7
+        V = self.V
+        flag = 1 if V[y] >= V[x] else 0
+        V[x] = (V[y] - V[x]) & 0xFF
+        V[0xF] = flag
+
+    def op_shl(self, x, y):  # 8XYE (shifts VX in place)
+        V = self.V
+        flag = V[x] >> 7
+        V[x] = (V[x] << 1) & 0xFF
+        V[0xF] = flag
+
+    def op_sne_reg(self, x, y):  # 9XY0
+        if self.V[x] != self.V[y]:
+            self.pc = (self.pc + 2) & 0xFFF
+
+    def op_ld_i(self, nnn):  # ANNN
+        self.I = nnn
+
+    def op_jp_v0(self, nnn):  # BNNN
+        self.pc = (nnn + self.V[0]) & 0xFFF
+
+    def op_rnd(self, x, nn):  # CXNN
+        self.V[x] = random.randint(0, 255) & nn
+
+    def op_drw(self, x, y, n):  # DXYN
+        self.draw_sprite(self.V[x], self.V[y], n)
+
+    def op_skp(self, x):  # EX9E
+        if self.keys[self.V[x] & 0xF]:
+            self.pc = (self.pc + 2) & 0xFFF
+
+    def op_sknp(self, x):  # EXA1
+        if not self.keys[self.V[x] & 0xF]:
+            self.pc = (self.pc + 2) & 0xFFF
+
+    def op_ld_dt(self, x):  # FX07
+        self.V[x] = self.delay_timer
+
+    def op_ld_key(self, x):  # FX0A: wait (re-run this instruction) until a key is down
+        for key, down in enumerate(self.keys):
+            if down:
+                self.V[x] = key
+                return
+        self.pc = (self.pc - 2) & 0xFFF
+
+    def op_set_dt(self, x):  # FX15
+        self.delay_timer = self.V[x]
+
+    def op_set_st(self, x):  # FX18
+        self.sound_timer = self.V[x]
+
+    def op_add_i(self, x):  # FX1E
+        self.I = (self.I + self.V[x]) & 0xFFF
+
+    def op_ld_font(self, x):  # FX29
+        self.I = FONT_START + (self.V[x] & 0xF) * 5
+
+    def op_bcd(self, x):  # FX33
+        value = self.V[x]
+        memory = self.memory
+        I = self.I
+        memory[I] = value // 100
+        memory[(I + 1) & 0xFFF] = (value // 10) % 10
+        memory[(I + 2) & 0xFFF] = value % 10
+        self.invalidate(I, 3)
+
+    def op_store(self, x):  # FX55
+        memory = self.memory
+        V = self.V
+        I = self.I
+        for i in range(x + 1):
+            memory[(I + i) & 0xFFF] = V[i]
+        self.invalidate(I, x + 1)
+
+    def op_load(self, x):  # FX65
+        memory = self.memory
+        V = self.V
+        I = self.I
+        for i in range(x + 1):
+            V[i] = memory[(I + i) & 0xFFF]
+
+    def draw_sprite(self, vx, vy, rows):
+        """XOR an 8-pixel-wide sprite from memory[I] onto the display; VF is set on collision."""
+        memory = self.memory
+        display = self.display
+        dirty = self.dirty_rows
+        width, height = self.width, self.height
+        mask = (1 << width) - 1
+        # Sprite bits line up with columns 0-7 shifted here; rotating right by
+        # vx moves them to vx..vx+7, wrapping past the right edge
+        left = width - 8
+        shift = vx % width
+        collision = 0
+        for row in range(rows):
+            sprite_byte = memory[(self.I + row) & 0xFFF]
+            if not sprite_byte:
+                continue
+            bits = sprite_byte << left
+            bits = ((bits >> shift) | (bits << (width - shift))) & mask
+            y = (vy + row) % height
+            line = display[y]
+            if line & bits:
+                collision = 1
+            display[y] = line ^ bits
+            dirty.add(y)
+        self.V[0xF] = collision
+
+    def pixel(self, x, y):
+        """1 if the pixel at (x, y) is lit."""
+        return (self.display[y] >> (self.width - 1 - x)) & 1
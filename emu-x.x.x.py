@@ -3,9 +3,22 @@
 # Translated directly (and naively) from the provided C++ example.
 
 import sys
-import pygame
 import struct
 import time
+from array import array
+try:
+    import pygame
+except ImportError:
+    pygame = None  # Only the windowed frontend in main() needs pygame
+try:
+    import numpy as np
+except ImportError:
+    np = None  # main() then copies the frame through the surface buffer instead
+from nesmappers import create_mapper, mapper_number
+from nesrewind import RewindBuffer
+from nesblocks import BlockCache, BlockTranslator
+from nesprofile import Profiler, profiled_bus, vector_symbols
+from nesmovie import Movie, reverse_bits
 
 SCREEN_WIDTH  = 256
 SCREEN_HEIGHT = 240
@@ -14,14 +27,169 @@ MASTER_CYCLES_PER_FRAME = 29781
 CPU_FREQ                = 1789773
 PPU_FREQ                = 5369318
 
+# PPU frame timing, in PPU dots (3 per CPU cycle). A frame here starts at the
+# first visible scanline, so MASTER_CYCLES_PER_FRAME = ceil(262 * 341 / 3).
+DOTS_PER_SCANLINE  = 341
+SCANLINES_PER_FRAME = 262
+VBLANK_SCANLINE    = 241
+PRERENDER_SCANLINE = 261
+NEVER = 1 << 62  # timestamp of an event that is not scheduled
+
+# Stored in input movies; bump when a change makes old movies play back differently
+EMULATOR_VERSION = "emu-x 1"
+
+# Save state layout: header (CPU registers, PPU latches, controller shift register,
+# position in the frame), then RAM, nametables, OAM, palette RAM, APU_STATE and the mapper state.
+SNAPSHOT_MAGIC   = b"NESX"
+SNAPSHOT_VERSION = 4
+SNAPSHOT_HEADER  = struct.Struct("<4sB5BH4BHH4BHHB")
+
+# APU (NTSC). The frame sequencer steps at these CPU cycles into its sequence:
+# (cycle, clocks envelopes/linear counter, clocks length counters/sweeps), then
+# the sequence restarts after FRAME_PERIODS cycles. 4-step mode raises the
+# frame IRQ on its last step.
+SAMPLE_RATE = 44100
+FRAME_STEPS = (
+    ((7457, True, False), (14913, True, True), (22371, True, False), (29829, True, True)),
+    ((7457, True, False), (14913, True, True), (22371, True, False), (29829, False, False),
+     (37281, True, True)),
+)
+FRAME_PERIODS = (29830, 37282)
+LENGTH_TABLE = (10, 254, 20, 2, 40, 4, 80, 6, 160, 8, 60, 10, 14, 12, 26, 14,
+                12, 16, 24, 18, 48, 20, 96, 22, 192, 24, 72, 26, 16, 28, 32, 30)
+DUTY_SEQUENCES = ((0, 1, 0, 0, 0, 0, 0, 0), (0, 1, 1, 0, 0, 0, 0, 0),
+                  (0, 1, 1, 1, 1, 0, 0, 0), (1, 0, 0, 1, 1, 1, 1, 1))
+TRIANGLE_SEQUENCE = tuple(range(15, -1, -1)) + tuple(range(16))
+NOISE_PERIODS = (4, 8, 16, 32, 64, 96, 128, 160, 202, 254, 380, 508, 762, 1016, 2034, 4068)
+DMC_RATES = (428, 380, 340, 320, 286, 254, 226, 214, 190, 160, 142, 128, 106, 84, 72, 54)
+
+def noiseSequence(tap):
+    """Output bits of the noise shift register, over one period, from power-on."""
+    bits = []
+    reg = 1
+    while True:
+        bits.append(1 - (reg & 1))
+        reg = (reg >> 1) | (((reg ^ (reg >> tap)) & 1) << 14)
+        if reg == 1:
+            return bits
+
+NOISE_LONG_BITS  = noiseSequence(1)   # 32767 steps
+NOISE_SHORT_BITS = noiseSequence(6)   # 93 steps
+# Noise positions wrap at the LCM of both periods (their GCD is 31), so switching mode keeps its place
+NOISE_SEQUENCE_LCM = len(NOISE_LONG_BITS) * len(NOISE_SHORT_BITS) // 31
+
+if np is not None:
+    DUTY_WAVES    = np.array(DUTY_SEQUENCES, dtype=np.float64)
+    TRIANGLE_WAVE = np.array(TRIANGLE_SEQUENCE, dtype=np.float64)
+    NOISE_LONG    = np.array(NOISE_LONG_BITS, dtype=np.float64)
+    NOISE_SHORT   = np.array(NOISE_SHORT_BITS, dtype=np.float64)
+
+# APU save state: frame sequencer, then each channel (and its envelope), then the
+# next sequencer step and DMC clock as offsets from the current CPU cycle
+APU_STATE = struct.Struct("<B???B" + "BHB?B?B?Bd??B?BB" * 2 + "?BHBB?d" + "BBBd??B?BB"
+                          + "??HBHHHHBB??" + "ii")
+
+# Opcodes CPU.step() implements: (name, mode, base cycles). Anything else is a
+# 2-cycle, 1-byte NOP. Taken branches add 1 cycle (2 to another page).
+OPCODES = {
+    0xA9: ("lda", "imm", 2), 0xA5: ("lda", "zp", 3), 0xB5: ("lda", "zpx", 4), 0xAD: ("lda", "abs", 4),
+    0xBD: ("lda", "abx", 4), 0xB9: ("lda", "aby", 4), 0xA1: ("lda", "izx", 6), 0xB1: ("lda", "izy", 5),
+    0xA2: ("ldx", "imm", 2), 0xA6: ("ldx", "zp", 3), 0xB6: ("ldx", "zpy", 4), 0xAE: ("ldx", "abs", 4),
+    0xBE: ("ldx", "aby", 4),
+    0xA0: ("ldy", "imm", 2), 0xA4: ("ldy", "zp", 3), 0xB4: ("ldy", "zpx", 4), 0xAC: ("ldy", "abs", 4),
+    0xBC: ("ldy", "abx", 4),
+    0x85: ("sta", "zp", 3), 0x95: ("sta", "zpx", 4), 0x8D: ("sta", "abs", 4), 0x9D: ("sta", "abx", 5),
+    0x99: ("sta", "aby", 5), 0x81: ("sta", "izx", 6), 0x91: ("sta", "izy", 6),
+    0x86: ("stx", "zp", 3), 0x96: ("stx", "zpy", 4), 0x8E: ("stx", "abs", 4),
+    0x84: ("sty", "zp", 3), 0x94: ("sty", "zpx", 4), 0x8C: ("sty", "abs", 4),
+    0xAA: ("tax", "imp", 2), 0xA8: ("tay", "imp", 2), 0xBA: ("tsx", "imp", 2), 0x8A: ("txa", "imp", 2),
+    0x98: ("tya", "imp", 2), 0x9A: ("txs", "imp", 2),
+    0xE8: ("inx", "imp", 2), 0xC8: ("iny", "imp", 2), 0xCA: ("dex", "imp", 2), 0x88: ("dey", "imp", 2),
+    0x69: ("adc", "imm", 2), 0x65: ("adc", "zp", 3), 0x75: ("adc", "zpx", 4), 0x6D: ("adc", "abs", 4),
+    0x7D: ("adc", "abx", 4), 0x79: ("adc", "aby", 4), 0x61: ("adc", "izx", 6), 0x71: ("adc", "izy", 5),
+    0xE9: ("sbc", "imm", 2), 0xE5: ("sbc", "zp", 3), 0xF5: ("sbc", "zpx", 4), 0xED: ("sbc", "abs", 4),
+    0xFD: ("sbc", "abx", 4), 0xF9: ("sbc", "aby", 4), 0xE1: ("sbc", "izx", 6), 0xF1: ("sbc", "izy", 5),
+    0xC9: ("cmp", "imm", 2), 0xC5: ("cmp", "zp", 3), 0xD5: ("cmp", "zpx", 4), 0xCD: ("cmp", "abs", 4),
+    0xDD: ("cmp", "abx", 4), 0xD9: ("cmp", "aby", 4), 0xC1: ("cmp", "izx", 6), 0xD1: ("cmp", "izy", 5),
+    0xE0: ("cpx", "imm", 2), 0xE4: ("cpx", "zp", 3), 0xEC: ("cpx", "abs", 4),
+    0xC0: ("cpy", "imm", 2), 0xC4: ("cpy", "zp", 3), 0xCC: ("cpy", "abs", 4),
+    0x29: ("and", "imm", 2), 0x09: ("ora", "imm", 2), 0x49: ("eor", "imm", 2),
+    0x0A: ("asl", "acc", 2), 0x4A: ("lsr", "acc", 2), 0x2A: ("rol", "acc", 2), 0x6A: ("ror", "acc", 2),
+    0x4C: ("jmp", "abs", 3), 0x6C: ("jmp", "ind", 5), 0x20: ("jsr", "abs", 6), 0x60: ("rts", "imp", 6),
+    0xD0: ("bne", "rel", 2), 0xF0: ("beq", "rel", 2), 0x90: ("bcc", "rel", 2), 0xB0: ("bcs", "rel", 2),
+    0x10: ("bpl", "rel", 2), 0x30: ("bmi", "rel", 2), 0x50: ("bvc", "rel", 2), 0x70: ("bvs", "rel", 2),
+    0x24: ("bit", "zp", 3), 0x2C: ("bit", "abs", 4),
+    0x00: ("brk", "imp", 7), 0x40: ("rti", "imp", 6),
+}
+STEP_CYCLES = [OPCODES[op][2] if op in OPCODES else 2 for op in range(256)]
+
+# The 64 NES colors as ARGB (same palette as emunesv0.py)
+NES_PALETTE = [0xFF000000 | c for c in (
+    0x585858, 0x00237C, 0x0D1099, 0x300092, 0x4F006C, 0x600035, 0x5C0500, 0x461800,
+    0x272D00, 0x093E00, 0x004500, 0x004106, 0x003545, 0x000000, 0x000000, 0x000000,
+    0xA1A1A1, 0x0B53D7, 0x3337FE, 0x6621F7, 0x9515BE, 0xAC166E, 0xA62721, 0x864300,
+    0x596200, 0x2D7A00, 0x0C8500, 0x007F2A, 0x006D85, 0x000000, 0x000000, 0x000000,
+    0xFFFFFF, 0x51A5FE, 0x8084FE, 0xBC6AFE, 0xF15BFE, 0xFE5EC4, 0xFE7269, 0xE19321,
+    0xADB600, 0x79D300, 0x51DF21, 0x3AD974, 0x39C3DF, 0x424242, 0x000000, 0x000000,
+    0xFFFFFF, 0xB5D9FE, 0xCACAFE, 0xE3BEFE, 0xF9B8FE, 0xFEBAE7, 0xFEC3BC, 0xF4D199,
+    0xDEE086, 0xC6EC87, 0xB2F29D, 0xA7F0C3, 0xA8E7F0, 0xACACAC, 0x000000, 0x000000)]
+
+def vibeColor(argb):
+    """Vibe Mode swirl: R, G, B become G, B, R."""
+    return (argb & 0xFF000000) | ((argb & 0xFFFF) << 8) | ((argb >> 16) & 0xFF)
+
+VIBE_PALETTE = [vibeColor(c) for c in NES_PALETTE]
+
+# Decoded pattern rows, keyed by (low plane << 8) | high plane and shared by every
+# tile and CHR bank. Each entry holds, per 2-bit palette number, the row's 8 pixels
+# as bytes of palette RAM indices (0 where transparent): background, sprite, and
+# sprite flipped horizontally.
+ROW_CACHE = {}
+
+def decodeRow(low, high):
+    key = (low << 8) | high
+    entry = ROW_CACHE.get(key)
+    if entry is None:
+        pixels = [((low >> bit) & 1) | (((high >> bit) & 1) << 1) for bit in range(7, -1, -1)]
+        bg = tuple(bytes((pal << 2) | p if p else 0 for p in pixels) for pal in range(4))
+        sprite = tuple(bytes(0x10 | (pal << 2) | p if p else 0 for p in pixels) for pal in range(4))
+        flipped = tuple(row[::-1] for row in sprite)
+        entry = ROW_CACHE[key] = (bg, sprite, flipped)
+    return entry
+
 def makeWord(low, high):
     return (low & 0xFF) | ((high & 0xFF) << 8)
 
+class StepTranslator(BlockTranslator):
+    """Block translator that reproduces CPU.step(): RTI restores P as pulled
+    and BRK pushes P|0x10 without setting B in P."""
+    def __init__(self):
+        BlockTranslator.__init__(self, OPCODES, cycle_attr="blockCycles")
+
+    def stops_before(self, name, mode, operand):
+        # PPU/APU register accesses run in step(), where CPU.cycles is exact
+        if mode == "ind" or (mode == "abs" and name not in ("jmp", "jsr")):
+            return 0x2000 <= operand < 0x4020
+        return False
+
+    def op_rti(self, mode, operand, next_pc):
+        return ["sp = (sp + 1) & 0xFF", "p = ram[0x100 | sp]",
+                "sp = (sp + 1) & 0xFF", "t = ram[0x100 | sp]",
+                "sp = (sp + 1) & 0xFF", "pc = (ram[0x100 | sp] << 8) | t"]
+
+    def op_brk(self, mode, operand, next_pc):
+        ret = (next_pc + 1) & 0xFFFF
+        return ["ram[0x100 | sp] = 0x%02X" % (ret >> 8), "sp = (sp - 1) & 0xFF",
+                "ram[0x100 | sp] = 0x%02X" % (ret & 0xFF), "sp = (sp - 1) & 0xFF",
+                "ram[0x100 | sp] = p | 0x10", "sp = (sp - 1) & 0xFF",
+                "p |= 0x04", "pc = read(0xFFFE) | (read(0xFFFF) << 8)"]
+
 class Cartridge:
     def __init__(self):
-        self.prgROM = []
-        self.chrROM = []
+        self.prgROM = b""
+        self.chrROM = b""
         self.hasCHRRAM = False
+        self.mapper = None
 
     def load(self, path):
         try:
@@ -37,15 +205,21 @@ class Cartridge:
                 trainerPresent = (header[6] & 0x04) != 0
                 if trainerPresent:
                     rom.seek(512, 1)
-                self.prgROM = list(rom.read(prgSize))
-                if chrSize > 0:
-                    self.chrROM = list(rom.read(chrSize))
-                else:
-                    self.chrROM = [0]*8192
-                    self.hasCHRRAM = True
+                self.prgROM = rom.read(prgSize)
+                self.chrROM = rom.read(chrSize)
+                self.hasCHRRAM = chrSize == 0
                 if len(self.prgROM) < prgSize:
                     print("Error reading PRG ROM data.")
                     return False
+                if header[6] & 0x08:
+                    mirroring = '4'
+                else:
+                    mirroring = 'V' if header[6] & 0x01 else 'H'
+                # Bank switching (and CHR RAM for carts without CHR ROM) lives in the mapper
+                self.mapper = create_mapper(mapper_number(header), self.prgROM, self.chrROM, mirroring)
+        except ValueError as e:
+            print(e)
+            return False
         except:
             print("Could not open ROM file.")
             return False
@@ -53,8 +227,24 @@ class Cartridge:
 
 class PPU:
     def __init__(self):
-        self.framebuffer = [0]*(SCREEN_WIDTH*SCREEN_HEIGHT)
+        # ARGB pixels in one persistent 32-bit buffer, which main() blits without copying per pixel
+        self.framebuffer = array('I', [0]) * (SCREEN_WIDTH*SCREEN_HEIGHT)
+        # Scanlines are drawn as NES color numbers (0-63) and turned into ARGB once
+        # per frame by presentFrame()
+        self.pixels      = bytearray(SCREEN_WIDTH*SCREEN_HEIGHT)
         self.nametable   = [0]*2048
+        # Palette RAM, and the bytes.translate() table from palette RAM index to NES color
+        self.palette     = [0]*32
+        self.colorMap    = bytes(256)
+        self.nesColors   = NES_PALETTE
+        if np is not None:
+            self.framebufferView = np.frombuffer(self.framebuffer, dtype=np.uint32)
+            self.pixelsView      = np.frombuffer(self.pixels, dtype=np.uint8)
+            self.nesColorsArray  = np.array(NES_PALETTE, dtype=np.uint32)
+        # 1KB CHR bank -> its 512 decoded pattern rows (see decodeRow), and
+        # 4 banks (one pattern table) -> their rows joined, indexed tile*8 + row
+        self.tileCache   = {}
+        self.tableCache  = {}
         self.OAM         = [0]*256
         self.PPUCTRL     = 0
         self.PPUMASK     = 0
@@ -68,14 +258,33 @@ class PPU:
         self.vramAddr    = 0
         self.tempAddr    = 0
         self.fineX       = 0
-        self.chrROM      = None
+        self.mapper      = None
+        # The PPU runs lazily: runUntil() catches it up to a CPU cycle count
+        # whenever the CPU touches the bus or an NMI/IRQ may be due.
+        self.scanline     = 0
+        self.frameStart   = 0
+        self.lineEnd      = self.scanlineEnd(0)
+        self.sprite0Cycle = NEVER
+        self.nmiPending   = False
+        # Set when nextEvent() may have moved, so NES.runCPU() stops and re-plans
+        self.reschedule   = False
 
     def writeRegister(self, addr, val):
         reg = addr & 7
         if reg == 0:  # 0x2000
+            # Enabling NMI during vblank fires it straight away
+            if val & 0x80 and not (self.PPUCTRL & 0x80) and (self.PPUSTATUS & 0x80):
+                self.nmiPending = True
+            # Nametable select goes into the scroll address (t: ....BA.. ........)
+            self.tempAddr = (self.tempAddr & 0xF3FF) | ((val & 0x03) << 10)
             self.PPUCTRL = val
+            self.reschedule = True
         elif reg == 1:  # 0x2001
+            grayscaleChanged = (self.PPUMASK ^ val) & 0x01
             self.PPUMASK = val
+            self.reschedule = True
+            if grayscaleChanged:
+                self.updateColors()
         elif reg == 2:  # 0x2002
             pass
         elif reg == 3:  # 0x2003
@@ -124,98 +333,729 @@ class PPU:
                 self.vramAddr = (self.vramAddr + 1) & 0xFFFF
         return data
 
+    def nametableIndex(self, addr):
+        mirroring = self.mapper.mirroring
+        if mirroring == 'H':
+            return ((addr >> 1) & 0x0400) | (addr & 0x03FF)
+        elif mirroring == '0':
+            return addr & 0x03FF
+        elif mirroring == '1':
+            return 0x0400 | (addr & 0x03FF)
+        return addr & 0x07FF
+
     def writeVRAM(self, addr, val):
         addr &= 0x3FFF
         if addr < 0x2000:
-            if addr < len(self.chrROM):
-                self.chrROM[addr] = val
+            self.mapper.write_chr(addr, val)
         elif addr < 0x3F00:
-            self.nametable[addr & 0x07FF] = val
+            self.nametable[self.nametableIndex(addr)] = val
         else:
-            pass
+            self.palette[self.paletteIndex(addr)] = val & 0x3F
+            self.updateColors()
 
     def readVRAM(self, addr):
         addr &= 0x3FFF
         if addr < 0x2000:
-            if addr < len(self.chrROM):
-                return self.chrROM[addr]
-            return 0
+            return self.mapper.read_chr(addr)
         elif addr < 0x3F00:
-            return self.nametable[addr & 0x07FF]
+            return self.nametable[self.nametableIndex(addr)]
         else:
-            return 0
-
-    def renderBackground(self):
-        baseNT = 0x2000
-        for row in range(30):
-            for col in range(32):
-                ntAddr = baseNT + row*32 + col
-                tileIndex = self.nametable[ntAddr & 0x07FF]
-                patternAddr = ((self.PPUCTRL & 0x10) and 0x1000 or 0x0000) + (tileIndex*16)
-                for fy in range(8):
-                    lowByte  = self.readVRAM(patternAddr + fy)
-                    highByte = self.readVRAM(patternAddr + fy + 8)
-                    for fx in range(8):
-                        bit = 7 - fx
-                        paletteIndex = ((lowByte >> bit) & 1) | (((highByte >> bit) & 1) << 1)
-                        color = 0xFF606060
-                        if paletteIndex == 1:
-                            color = 0xFFFF0000
-                        elif paletteIndex == 2:
-                            color = 0xFF00FF00
-                        elif paletteIndex == 3:
-                            color = 0xFF0000FF
-                        sx = col*8 + fx
-                        sy = row*8 + fy
-                        if sx < SCREEN_WIDTH and sy < SCREEN_HEIGHT:
-                            self.framebuffer[sy*SCREEN_WIDTH + sx] = color
-
-    def renderSprites(self):
-        for i in range(64):
-            y    = self.OAM[i*4 + 0]
-            tile = self.OAM[i*4 + 1]
-            attr = self.OAM[i*4 + 2]
-            x    = self.OAM[i*4 + 3]
-            flipH = (attr & 0x40) != 0
-            flipV = (attr & 0x80) != 0
-            patternAddr = ((self.PPUCTRL & 0x08) and 0x1000 or 0x0000) + (tile*16)
-            for row in range(8):
-                actualRow = (7 - row) if flipV else row
-                lowByte  = self.readVRAM(patternAddr + actualRow)
-                highByte = self.readVRAM(patternAddr + actualRow + 8)
-                for col in range(8):
-                    bit = col if flipH else (7 - col)
-                    paletteIndex = ((lowByte >> bit) & 1) | (((highByte >> bit) & 1) << 1)
-                    if paletteIndex == 0:
-                        continue
-                    color = 0xFFFFFFFF
-                    if paletteIndex == 1:
-                        color = 0xFFFFFF00
-                    elif paletteIndex == 2:
-                        color = 0xFFFF00FF
-                    elif paletteIndex == 3:
-                        color = 0xFF00FFFF
-                    px = x + col
-                    py = y + row
-                    if 0 <= px < SCREEN_WIDTH and 0 <= py < SCREEN_HEIGHT:
-                        self.framebuffer[py*SCREEN_WIDTH + px] = color
+            return self.palette[self.paletteIndex(addr)]
+
+    def paletteIndex(self, addr):
+        # $3F10/$3F14/$3F18/$3F1C mirror the background entries below them
+        index = addr & 0x1F
+        return index & 0x0F if index & 0x13 == 0x10 else index
+
+    def updateColors(self):
+        """Rebuild the palette RAM index -> NES color table the renderer draws with."""
+        mask = 0x30 if self.PPUMASK & 0x01 else 0x3F  # grayscale keeps only the column
+        self.colorMap = bytes([self.palette[self.paletteIndex(i)] & mask for i in range(32)]) + bytes(224)
+
+    def setVibe(self, enabled):
+        # Vibe Mode swaps the color table rather than touching every pixel
+        self.nesColors = VIBE_PALETTE if enabled else NES_PALETTE
+        if np is not None:
+            self.nesColorsArray = np.array(self.nesColors, dtype=np.uint32)
+        self.presentFrame()
+
+    def presentFrame(self):
+        """Convert the frame's NES color numbers into the ARGB framebuffer."""
+        if np is not None:
+            np.take(self.nesColorsArray, self.pixelsView, out=self.framebufferView)
+        else:
+            self.framebuffer[:] = array('I', map(self.nesColors.__getitem__, self.pixels))
+
+    def checkCHR(self):
+        # CHR-RAM writes: drop the stale decodes, they are rebuilt on next use
+        mapper = self.mapper
+        for bank in mapper.chr_dirty:
+            self.tileCache.pop(bank, None)
+        mapper.chr_dirty.clear()
+        self.tableCache.clear()
+
+    def patternRows(self, window):
+        """Decoded rows of the CHR bank in 1KB pattern window 0-7, indexed tile*8 + row."""
+        if self.mapper.chr_dirty:
+            self.checkCHR()
+        bank = self.mapper.chr_banks[window]
+        rows = self.tileCache.get(bank)
+        if rows is None:
+            chr = self.mapper.chr
+            start = bank * 0x400
+            rows = self.tileCache[bank] = [decodeRow(chr[addr], chr[addr + 8])
+                                           for tile in range(start, start + 0x400, 16)
+                                           for addr in range(tile, tile + 8)]
+        return rows
+
+    def patternTable(self, window):
+        """Decoded rows of the 256 tiles of the pattern table at window 0 or 4."""
+        if self.mapper.chr_dirty:
+            self.checkCHR()
+        banks = tuple(self.mapper.chr_banks[window:window + 4])
+        table = self.tableCache.get(banks)
+        if table is None:
+            table = self.tableCache[banks] = sum((self.patternRows(window + i) for i in range(4)), [])
+        return table
+
+    def backgroundLine(self):
+        """Palette RAM indices (a bytearray) of the 256 background pixels at the
+        current vramAddr (coarse X/Y, nametable, fine Y) and fineX."""
+        v = self.vramAddr
+        fineY = (v >> 12) & 7
+        coarseY = (v >> 5) & 31
+        coarseX = v & 31
+        nt = (v >> 10) & 3
+        # The 33 tiles fetched for a line come from this nametable and the one to its right
+        left = self.nametableIndex(0x2000 | (nt << 10)) & 0x0C00
+        right = self.nametableIndex(0x2000 | ((nt ^ 1) << 10)) & 0x0C00
+        nametable = self.nametable
+        row = coarseY << 5
+        tiles = nametable[left + row:left + row + 32] + nametable[right + row:right + row + 32]
+        row = 0x3C0 | ((coarseY >> 2) << 3)
+        attrs = nametable[left + row:left + row + 8] + nametable[right + row:right + row + 8]
+        shift = (coarseY & 2) << 1
+        table = self.patternTable((self.PPUCTRL & 0x10) >> 2)
+        fetched = b"".join([table[(tiles[i] << 3) | fineY][0][(attrs[i >> 2] >> (shift | (i & 2))) & 3]
+                            for i in range(coarseX, coarseX + 33)])
+        line = bytearray(fetched[self.fineX:self.fineX + SCREEN_WIDTH])
+        if not self.PPUMASK & 0x02:
+            line[0:8] = bytes(8)
+        return line
+
+    def spriteHeight(self):
+        return 16 if self.PPUCTRL & 0x20 else 8
+
+    def spriteRow(self, index, row, height):
+        """Palette RAM indices of row `row` of OAM sprite `index` (0 = transparent)."""
+        oam = self.OAM
+        tile = oam[index*4 + 1]
+        attr = oam[index*4 + 2]
+        if attr & 0x80:
+            row = height - 1 - row
+        if height == 16:
+            # 8x16 sprites take the pattern table from bit 0 of the tile number
+            window = (tile & 1) << 2
+            tile = (tile & 0xFE) | (row >> 3)
+            row &= 7
+        else:
+            window = (self.PPUCTRL & 0x08) >> 1
+        entry = self.patternRows(window + (tile >> 6))[((tile & 63) << 3) | row]
+        return entry[2 if attr & 0x40 else 1][attr & 3]
+
+    def evaluateSprites(self, line):
+        """OAM indices of the (at most 8) sprites on scanline `line`, in priority order.
+        Sets the sprite overflow flag when more than 8 are in range."""
+        top = line - self.spriteHeight()
+        found = [i for i, y in enumerate(self.OAM[0::4]) if top <= y < line]
+        if len(found) > 8:
+            self.PPUSTATUS |= 0x20
+            del found[8:]
+        return found
+
+    def renderScanline(self, sy):
+        """Draw visible scanline `sy` into the framebuffer from the current registers."""
+        mask = self.PPUMASK
+        if mask & 0x08:
+            line = self.backgroundLine()
+        else:
+            line = bytearray(SCREEN_WIDTH)
+        if mask & 0x10:
+            sprites = self.evaluateSprites(sy)
+            if sprites:
+                height = self.spriteHeight()
+                oam = self.OAM
+                # The lowest OAM index with an opaque pixel owns it, even when it is
+                # behind the background and a later sprite is not
+                owned = [False]*SCREEN_WIDTH
+                minX = 0 if mask & 0x04 else 8
+                for i in sprites:
+                    x = oam[i*4 + 3]
+                    behind = oam[i*4 + 2] & 0x20
+                    pixels = self.spriteRow(i, sy - oam[i*4] - 1, height)
+                    for col in range(8):
+                        px = x + col
+                        value = pixels[col]
+                        if not value or px >= SCREEN_WIDTH or px < minX or owned[px]:
+                            continue
+                        owned[px] = True
+                        if not (behind and line[px]):
+                            line[px] = value
+        offset = sy * SCREEN_WIDTH
+        self.pixels[offset:offset + SCREEN_WIDTH] = line.translate(self.colorMap)
 
     def render(self):
-        if self.PPUMASK & 0x08:
-            self.renderBackground()
+        """Redraw the whole frame from the current registers (used after a rewind)."""
+        v, status = self.vramAddr, self.PPUSTATUS
+        if self.PPUMASK & 0x18:
+            self.vramAddr = self.tempAddr
+        for sy in range(SCREEN_HEIGHT):
+            self.renderScanline(sy)
+            self.nextLine()
+        self.vramAddr, self.PPUSTATUS = v, status
+        self.presentFrame()
+
+    def nextLine(self):
+        """Advance vramAddr to the next scanline, as the PPU does at the end of each
+        visible line while rendering: fine Y / coarse Y increment, then the horizontal
+        scroll bits are reloaded from tempAddr."""
+        if not self.PPUMASK & 0x18:
+            return
+        v = self.vramAddr
+        if v & 0x7000 != 0x7000:
+            v += 0x1000
         else:
-            for i in range(SCREEN_WIDTH*SCREEN_HEIGHT):
-                self.framebuffer[i] = 0xFF000000
-        if self.PPUMASK & 0x10:
-            self.renderSprites()
+            v &= 0x0FFF
+            y = (v >> 5) & 31
+            if y == 29:
+                y = 0
+                v ^= 0x0800
+            elif y == 31:
+                y = 0
+            else:
+                y += 1
+            v = (v & 0x7C1F) | (y << 5)
+        self.vramAddr = (v & 0x7BE0) | (self.tempAddr & 0x041F)
+
+    # --- Timing ---
+    def scanlineEnd(self, line):
+        """CPU cycle at which scanline `line` of the current frame ends."""
+        return self.frameStart + ((line + 1) * DOTS_PER_SCANLINE + 2) // 3
+
+    def nextEvent(self):
+        """Latest CPU cycle the CPU may run to before the PPU must catch up:
+        every scanline for IRQ mappers, otherwise the start of vblank if it raises an NMI."""
+        if self.mapper.has_irq and self.PPUMASK & 0x18:
+            return self.lineEnd
+        if self.PPUCTRL & 0x80 and self.scanline < VBLANK_SCANLINE:
+            return self.scanlineEnd(VBLANK_SCANLINE - 1)
+        return NEVER
+
+    def runUntil(self, cycle):
+        """Catch up to CPU cycle `cycle`, finishing every scanline that has ended."""
+        while True:
+            if self.sprite0Cycle <= cycle and self.sprite0Cycle < self.lineEnd:
+                self.PPUSTATUS |= 0x40
+                self.sprite0Cycle = NEVER
+            if cycle < self.lineEnd:
+                return
+            self.finishScanline()
+
+    def finishScanline(self):
+        line = self.scanline
+        if line < SCREEN_HEIGHT:
+            # Drawn with the registers as they are now, so mid-frame writes show up
+            self.renderScanline(line)
+            self.nextLine()
+            if line == SCREEN_HEIGHT - 1:
+                self.presentFrame()
+        elif line == PRERENDER_SCANLINE and self.PPUMASK & 0x18:
+            # End of pre-render: the whole scroll position is reloaded for the new frame
+            self.vramAddr = self.tempAddr
+        if self.PPUMASK & 0x18 and (line < SCREEN_HEIGHT or line == PRERENDER_SCANLINE):
+            self.mapper.clock_scanline()
+        line += 1
+        if line == VBLANK_SCANLINE:
+            self.PPUSTATUS |= 0x80
+            if self.PPUCTRL & 0x80:
+                self.nmiPending = True
+        elif line == PRERENDER_SCANLINE:
+            self.PPUSTATUS &= 0x1F  # clear vblank, sprite 0 hit and overflow
+        elif line == SCANLINES_PER_FRAME:
+            line = 0
+            self.frameStart = self.lineEnd
+        self.scanline = line
+        self.lineEnd = self.scanlineEnd(line)
+        if line < SCREEN_HEIGHT:
+            self.sprite0Cycle = self.sprite0Hit(line)
+
+    def sprite0Hit(self, line):
+        """CPU cycle at which sprite 0 first covers an opaque background pixel on
+        scanline `line` (drawn with the registers as they are now), or NEVER."""
+        if (self.PPUMASK & 0x18) != 0x18 or self.PPUSTATUS & 0x40:
+            return NEVER
+        y, tile, attr, x = self.OAM[0:4]
+        height = self.spriteHeight()
+        row = line - y - 1
+        if not 0 <= row < height:
+            return NEVER
+        pixels = self.spriteRow(0, row, height)
+        background = self.backgroundLine()
+        minX = 0 if (self.PPUMASK & 0x06) == 0x06 else 8
+        for col in range(8):
+            sx = x + col
+            if sx >= SCREEN_WIDTH - 1:
+                break
+            if sx >= minX and pixels[col] and background[sx]:
+                return self.frameStart + (line * DOTS_PER_SCANLINE + sx + 3) // 3
+        return NEVER
+
+class Envelope:
+    """Volume envelope shared by the pulse and noise channels (clocked every quarter frame)."""
+    FIELDS = ("loop", "constant", "period", "start", "divider", "decay")
+
+    def __init__(self):
+        self.loop = self.constant = self.start = False
+        self.period = self.divider = self.decay = 0
+
+    def write(self, val):
+        self.loop     = bool(val & 0x20)
+        self.constant = bool(val & 0x10)
+        self.period   = val & 0x0F
+
+    def clock(self):
+        if self.start:
+            self.start   = False
+            self.decay   = 15
+            self.divider = self.period
+        elif self.divider == 0:
+            self.divider = self.period
+            if self.decay:
+                self.decay -= 1
+            elif self.loop:
+                self.decay = 15
+        else:
+            self.divider -= 1
+
+    def volume(self):
+        return self.period if self.constant else self.decay
+
+class Pulse:
+    FIELDS = ("duty", "timer", "length", "sweepEnabled", "sweepPeriod", "sweepNegate",
+              "sweepShift", "sweepReload", "sweepDivider", "phase")
+
+    def __init__(self, onesComplement):
+        # Pulse 1 negates the sweep change with one's complement, pulse 2 with two's
+        self.onesComplement = onesComplement
+        self.envelope = Envelope()
+        self.duty = self.timer = self.length = 0
+        self.sweepEnabled = self.sweepNegate = self.sweepReload = False
+        self.sweepPeriod = self.sweepShift = self.sweepDivider = 0
+        self.phase = 0.0
+
+    def write(self, reg, val, enabled):
+        if reg == 0:
+            self.duty = val >> 6
+            self.envelope.write(val)
+        elif reg == 1:
+            self.sweepEnabled = bool(val & 0x80)
+            self.sweepPeriod  = (val >> 4) & 7
+            self.sweepNegate  = bool(val & 0x08)
+            self.sweepShift   = val & 7
+            self.sweepReload  = True
+        elif reg == 2:
+            self.timer = (self.timer & 0x700) | val
+        else:
+            self.timer = (self.timer & 0xFF) | ((val & 7) << 8)
+            if enabled:
+                self.length = LENGTH_TABLE[val >> 3]
+            self.envelope.start = True
+            self.phase = 0.0
+
+    def sweepTarget(self):
+        change = self.timer >> self.sweepShift
+        if self.sweepNegate:
+            return self.timer - change - (1 if self.onesComplement else 0)
+        return self.timer + change
+
+    def muted(self):
+        return self.timer < 8 or self.sweepTarget() > 0x7FF
+
+    def clockHalf(self):
+        if self.length and not self.envelope.loop:
+            self.length -= 1
+        if self.sweepDivider == 0 and self.sweepEnabled and self.sweepShift and not self.muted():
+            self.timer = max(0, self.sweepTarget())
+        if self.sweepDivider == 0 or self.sweepReload:
+            self.sweepDivider = self.sweepPeriod
+            self.sweepReload  = False
+        else:
+            self.sweepDivider -= 1
+
+    def segment(self, cycles):
+        """(step period, duty, volume, phase at start) for the next `cycles` CPU cycles."""
+        period = (self.timer + 1) * 2
+        volume = 0 if not self.length or self.muted() else self.envelope.volume()
+        row = (period, self.duty, volume, self.phase)
+        self.phase = (self.phase + cycles / period) % 8
+        return row
+
+class Triangle:
+    FIELDS = ("control", "linearReload", "timer", "length", "linear", "reloadFlag", "phase")
+
+    def __init__(self):
+        self.control = self.reloadFlag = False
+        self.linearReload = self.timer = self.length = self.linear = 0
+        self.phase = 0.0
+
+    def write(self, reg, val, enabled):
+        if reg == 0:
+            self.control      = bool(val & 0x80)
+            self.linearReload = val & 0x7F
+        elif reg == 2:
+            self.timer = (self.timer & 0x700) | val
+        elif reg == 3:
+            self.timer = (self.timer & 0xFF) | ((val & 7) << 8)
+            if enabled:
+                self.length = LENGTH_TABLE[val >> 3]
+            self.reloadFlag = True
+
+    def clockQuarter(self):
+        if self.reloadFlag:
+            self.linear = self.linearReload
+        elif self.linear:
+            self.linear -= 1
+        if not self.control:
+            self.reloadFlag = False
+
+    def clockHalf(self):
+        if self.length and not self.control:
+            self.length -= 1
+
+    def segment(self, cycles):
+        """(step period, phase at start); period 0 holds the current step. The
+        triangle never goes quiet, it stops where it is, and ultrasonic
+        periods (timer < 2) are held too rather than aliased."""
+        if self.length and self.linear and self.timer >= 2:
+            period = self.timer + 1
+            row = (period, self.phase)
+            self.phase = (self.phase + cycles / period) % 32
+            return row
+        return (0, self.phase)
+
+class Noise:
+    FIELDS = ("mode", "periodIndex", "length", "position")
+
+    def __init__(self):
+        self.envelope = Envelope()
+        self.mode = self.periodIndex = self.length = 0
+        self.position = 0.0
+
+    def write(self, reg, val, enabled):
+        if reg == 0:
+            self.envelope.write(val)
+        elif reg == 2:
+            self.mode        = val >> 7
+            self.periodIndex = val & 0x0F
+        elif reg == 3:
+            if enabled:
+                self.length = LENGTH_TABLE[val >> 3]
+            self.envelope.start = True
+
+    def clockHalf(self):
+        if self.length and not self.envelope.loop:
+            self.length -= 1
+
+    def segment(self, cycles):
+        """(step period, mode, volume, shift register position at start)."""
+        period = NOISE_PERIODS[self.periodIndex]
+        volume = self.envelope.volume() if self.length else 0
+        row = (period, self.mode, volume, self.position)
+        self.position = (self.position + cycles / period) % NOISE_SEQUENCE_LCM
+        return row
+
+class DMC:
+    FIELDS = ("irqEnabled", "loop", "rate", "level", "sampleAddr", "sampleLength",
+              "address", "remaining", "shift", "bits", "silent", "irq")
+
+    def __init__(self):
+        self.irqEnabled = self.loop = self.irq = False
+        self.silent = True
+        self.rate = DMC_RATES[0]
+        self.level = 0
+        self.sampleAddr = 0xC000
+        self.sampleLength = 1
+        self.address = 0xC000
+        self.remaining = self.shift = 0
+        self.bits = 8
+        # CPU cycle of the next output clock, and where the level changed this frame
+        self.next = 0
+        self.changes = []
+
+    def write(self, reg, val, cycle):
+        if reg == 0:
+            self.irqEnabled = bool(val & 0x80)
+            self.loop       = bool(val & 0x40)
+            self.rate       = DMC_RATES[val & 0x0F]
+            if not self.irqEnabled:
+                self.irq = False
+        elif reg == 1:
+            self.level = val & 0x7F
+            self.changes.append((cycle, self.level))
+        elif reg == 2:
+            self.sampleAddr = 0xC000 | (val << 6)
+        else:
+            self.sampleLength = (val << 4) | 1
+
+    def restart(self):
+        self.address = self.sampleAddr
+        self.remaining = self.sampleLength
+
+    def runUntil(self, cycle, read):
+        """Play the delta-modulated bits due before `cycle`, fetching sample bytes with `read`."""
+        if self.silent and not self.remaining:
+            # Nothing to play: keep the output clock in phase without visiting every tick
+            if self.next < cycle:
+                self.next += -((self.next - cycle) // self.rate) * self.rate
+            return
+        while self.next < cycle:
+            if self.bits == 8:
+                if self.remaining:
+                    self.shift = read(self.address)
+                    self.address = 0x8000 | ((self.address + 1) & 0x7FFF)
+                    self.remaining -= 1
+                    self.silent = False
+                    if not self.remaining:
+                        if self.loop:
+                            self.restart()
+                        elif self.irqEnabled:
+                            self.irq = True
+                else:
+                    self.silent = True
+            if not self.silent:
+                if self.shift & 1:
+                    if self.level <= 125:
+                        self.level += 2
+                        self.changes.append((self.next, self.level))
+                elif self.level >= 2:
+                    self.level -= 2
+                    self.changes.append((self.next, self.level))
+                self.shift >>= 1
+            self.bits -= 1
+            if self.bits == 0:
+                self.bits = 8
+            self.next += self.rate
 
 class APU:
+    """2A03 sound. The channels' control logic runs at event rate: every register
+    write and frame sequencer step is applied at its CPU cycle, and closes a segment
+    over which every channel's period, volume and duty are constant. endFrame()
+    turns the frame's segments into samples with NumPy, so no Python code runs per
+    sample or per APU cycle."""
+    FIELDS = ("enabledMask", "fiveStep", "irqInhibit", "frameIrq", "step")
+
+    def __init__(self, sampleRate=SAMPLE_RATE):
+        self.sampleRate = sampleRate
+        # Bus read the DMC fetches its samples with (set by NES.loadROM)
+        self.read = None
+        self.dcLevel = 0.0
+        # Samples of the last frame as a NumPy int16 array (None without NumPy)
+        self.samples = None
+        self.reset(0)
+
+    def reset(self, cycle):
+        """Power-on state, silent, with the APU clock at CPU cycle `cycle`."""
+        self.cycle = cycle
+        self.pulse1   = Pulse(True)
+        self.pulse2   = Pulse(False)
+        self.triangle = Triangle()
+        self.noise    = Noise()
+        self.dmc      = DMC()
+        self.dmc.next = cycle
+        self.enabledMask = 0
+        # Frame sequencer: next step within the sequence, and the CPU cycle it runs at
+        self.fiveStep = False
+        self.irqInhibit = False
+        self.frameIrq = False
+        self.step = 0
+        self.nextStep = cycle + FRAME_STEPS[0][0][0]
+        # Segments since the last endFrame(), and the cycle the open one started at
+        self.segments = []
+        self.segmentStart = cycle
+        self.dmcStart = 0
+        self.nextSample = float(cycle)
+
+    @property
+    def irqPending(self):
+        return self.frameIrq or self.dmc.irq
+
+    def nextEvent(self):
+        """CPU cycle of the next frame IRQ, if one can be raised."""
+        if self.fiveStep or self.irqInhibit or self.frameIrq:
+            return NEVER
+        steps = FRAME_STEPS[0]
+        return self.nextStep + steps[3][0] - steps[self.step][0]
+
     def writeRegister(self, addr, val):
-        pass
+        self.closeSegment(self.cycle)
+        if addr < 0x4008:
+            channel = self.pulse1 if addr < 0x4004 else self.pulse2
+            channel.write(addr & 3, val, self.enabledMask & (1 if addr < 0x4004 else 2))
+        elif addr < 0x400C:
+            self.triangle.write(addr & 3, val, self.enabledMask & 4)
+        elif addr < 0x4010:
+            self.noise.write(addr & 3, val, self.enabledMask & 8)
+        elif addr < 0x4014:
+            self.dmc.write(addr & 3, val, self.cycle)
+        elif addr == 0x4015:
+            self.enabledMask = val & 0x1F
+            for bit, channel in ((1, self.pulse1), (2, self.pulse2), (4, self.triangle), (8, self.noise)):
+                if not val & bit:
+                    channel.length = 0
+            dmc = self.dmc
+            dmc.irq = False
+            if not val & 0x10:
+                dmc.remaining = 0
+            elif not dmc.remaining:
+                dmc.restart()
+        elif addr == 0x4017:
+            self.fiveStep   = bool(val & 0x80)
+            self.irqInhibit = bool(val & 0x40)
+            if self.irqInhibit:
+                self.frameIrq = False
+            self.step = 0
+            self.nextStep = self.cycle + FRAME_STEPS[self.fiveStep][0][0]
+            if self.fiveStep:
+                self.clockQuarter()
+                self.clockHalf()
+
     def readRegister(self, addr):
-        return 0
-    def step(self):
-        pass
+        if addr != 0x4015:
+            return 0
+        data = ((self.pulse1.length > 0) | (self.pulse2.length > 0) << 1 |
+                (self.triangle.length > 0) << 2 | (self.noise.length > 0) << 3 |
+                (self.dmc.remaining > 0) << 4 | self.frameIrq << 6 | self.dmc.irq << 7)
+        self.frameIrq = False
+        return data
+
+    def clockQuarter(self):
+        self.pulse1.envelope.clock()
+        self.pulse2.envelope.clock()
+        self.noise.envelope.clock()
+        self.triangle.clockQuarter()
+
+    def clockHalf(self):
+        self.pulse1.clockHalf()
+        self.pulse2.clockHalf()
+        self.triangle.clockHalf()
+        self.noise.clockHalf()
+
+    def runUntil(self, cycle):
+        """Run the frame sequencer up to CPU cycle `cycle`."""
+        while self.nextStep <= cycle:
+            at = self.nextStep
+            self.closeSegment(at)
+            steps = FRAME_STEPS[self.fiveStep]
+            quarter, half = steps[self.step][1:]
+            if quarter:
+                self.clockQuarter()
+            if half:
+                self.clockHalf()
+            if self.step == len(steps) - 1:
+                if not self.fiveStep and not self.irqInhibit:
+                    self.frameIrq = True
+                self.step = 0
+                self.nextStep = at + FRAME_PERIODS[self.fiveStep] - steps[-1][0] + steps[0][0]
+            else:
+                self.step += 1
+                self.nextStep = at + steps[self.step][0] - steps[self.step - 1][0]
+        self.cycle = cycle
+
+    def closeSegment(self, cycle):
+        start = self.segmentStart
+        if cycle <= start:
+            return
+        cycles = cycle - start
+        self.dmc.runUntil(cycle, self.read)
+        if np is not None:
+            self.segments.append((start, cycle) + self.pulse1.segment(cycles) + self.pulse2.segment(cycles)
+                                 + self.triangle.segment(cycles) + self.noise.segment(cycles))
+        self.segmentStart = cycle
+
+    def endFrame(self, cycle):
+        """Close the frame at CPU cycle `cycle` and synthesize its samples into self.samples."""
+        self.runUntil(cycle)
+        self.closeSegment(cycle)
+        dmc = self.dmc
+        changes, dmc.changes = dmc.changes, []
+        segments, self.segments = self.segments, []
+        if np is None or not segments:
+            return
+        perSample = CPU_FREQ / self.sampleRate
+        count = max(0, int(-((self.nextSample - cycle) // perSample)))
+        times = self.nextSample + np.arange(count) * perSample
+        self.nextSample += count * perSample
+        rows = np.array(segments, dtype=np.float64)
+        # Segment each sample falls in, and how far into it the sample is
+        index = np.minimum(np.searchsorted(rows[:, 1], times, side="right"), len(rows) - 1)
+        seg = rows[index]
+        elapsed = times - seg[:, 0]
+        # Pulse channels: 8-step duty sequence, stepped every (timer + 1) * 2 cycles
+        pulse = np.zeros(count)
+        for col in (2, 6):
+            steps = (seg[:, col + 3] + elapsed / seg[:, col]).astype(np.int64) & 7
+            pulse += DUTY_WAVES[seg[:, col + 1].astype(np.int64), steps] * seg[:, col + 2]
+        # Triangle: 32-step sequence; period 0 holds the step it stopped on
+        period = seg[:, 10]
+        advance = np.divide(elapsed, period, out=np.zeros(count), where=period > 0)
+        triangle = TRIANGLE_WAVE[(seg[:, 11] + advance).astype(np.int64) & 31]
+        # Noise: index the precomputed LFSR output of the selected mode
+        steps = (seg[:, 15] + elapsed / seg[:, 12]).astype(np.int64)
+        bits = np.where(seg[:, 13] > 0, NOISE_SHORT[steps % len(NOISE_SHORT)],
+                        NOISE_LONG[steps % len(NOISE_LONG)])
+        noise = bits * seg[:, 14]
+        # DMC: the level set by the last change at or before each sample
+        if changes:
+            at, levels = np.array(changes, dtype=np.float64).T
+            pick = np.searchsorted(at, times, side="right") - 1
+            dmcOut = np.where(pick >= 0, levels[np.maximum(pick, 0)], self.dmcStart)
+        else:
+            dmcOut = np.full(count, float(self.dmcStart))
+        self.dmcStart = dmc.level
+        # Non-linear mixer (nesdev approximation)
+        pulseOut = np.divide(95.88, np.divide(8128.0, pulse, out=np.full(count, np.inf), where=pulse > 0) + 100)
+        tnd = triangle / 8227.0 + noise / 12241.0 + dmcOut / 22638.0
+        tndOut = np.divide(159.79, np.divide(1.0, tnd, out=np.full(count, np.inf), where=tnd > 0) + 100)
+        mix = pulseOut + tndOut
+        # Remove the DC offset slowly, as the console's output high-pass filter does
+        if count:
+            self.dcLevel += (mix.mean() - self.dcLevel) * 0.1
+        self.samples = (np.clip(mix - self.dcLevel, -1.0, 1.0) * 24000).astype(np.int16)
+
+    def saveState(self):
+        values = [getattr(self, name) for name in self.FIELDS]
+        for channel in (self.pulse1, self.pulse2, self.triangle, self.noise, self.dmc):
+            values += [getattr(channel, name) for name in channel.FIELDS]
+            if hasattr(channel, "envelope"):
+                values += [getattr(channel.envelope, name) for name in Envelope.FIELDS]
+        values += [self.nextStep - self.cycle, self.dmc.next - self.cycle]
+        return APU_STATE.pack(*values)
+
+    def loadState(self, data, cycle):
+        values = list(APU_STATE.unpack(data))
+        for target, fields in [(self, self.FIELDS)] + [
+                (part, part.FIELDS) for channel in (self.pulse1, self.pulse2, self.triangle, self.noise, self.dmc)
+                for part in ((channel, channel.envelope) if hasattr(channel, "envelope") else (channel,))]:
+            for name in fields:
+                setattr(target, name, values.pop(0))
+        # Timestamps are stored relative to the APU clock and re-based on the CPU's
+        self.cycle = self.segmentStart = cycle
+        self.nextStep = cycle + values[0]
+        self.dmc.next = cycle + values[1]
+        self.dmc.changes = []
+        self.segments = []
+        self.dmcStart = self.dmc.level
+        self.nextSample = float(cycle)
 
 class Controller:
     def __init__(self):
@@ -243,31 +1083,80 @@ class CPU:
         self.P  = 0x24
         self.PC = 0xC000
         self.RAM = [0]*2048
+        self.cycles = 0
+        # Cycles a running block has used so far (CPU.cycles is only updated after it)
+        self.blockCycles = 0
         self.cart = None
         self.ppu  = None
         self.apu  = None
         self.controller = None
+        # Straight-line runs of instructions compiled to Python (see nesblocks.py)
+        self.blockCache = BlockCache(StepTranslator(), self.read, self.write, self.RAM,
+                                     self.blockBank, self.blockBuffer)
+        self.useBlocks = True
+        # Attached nesprofile.Profiler, or None
+        self.profiler = None
+
+    def attachProfiler(self, profiler):
+        """Route step(), interrupts and bus accesses through `profiler` until
+        detachProfiler(); the instrumented versions only shadow the methods on this instance."""
+        self.detachProfiler()
+        profiler.symbols.update(vector_symbols(self.read))
+        self.profiler = profiler
+        self.read, self.write = profiled_bus(profiler, self.read, self.write)
+        self.step = self.stepProfiled
+        self.nmi  = self.nmiProfiled
+        self.irq  = self.irqProfiled
+
+    def detachProfiler(self):
+        if self.profiler is None:
+            return
+        self.profiler = None
+        del self.read, self.write, self.step, self.nmi, self.irq
+
+    def stepProfiled(self):
+        pc = self.PC
+        start = self.cycles
+        # Peek the opcode through the uncounted read (code never runs from I/O space)
+        opcode = CPU.read(self, pc)
+        CPU.step(self)
+        self.profiler.record(pc, opcode, self.cycles - start, self.PC)
+
+    def nmiProfiled(self):
+        self.profiler.interrupt("NMI", 7)
+        CPU.nmi(self)
+
+    def irqProfiled(self):
+        if not self.P & 0x04:
+            self.profiler.interrupt("IRQ", 7)
+        CPU.irq(self)
+
+    def blockBank(self, pc):
+        if pc >= 0x8000:
+            return self.cart.mapper.prg_banks[(pc >> 13) & 3]
+        if pc < 0x2000:
+            return -1
+        return None
+
+    def blockBuffer(self, pc):
+        return self.RAM, pc & 0x07FF
 
     def read(self, addr):
         addr &= 0xFFFF
         if addr < 0x2000:
             return self.RAM[addr & 0x07FF]
         elif addr < 0x4000:
+            self.ppu.runUntil(self.cycles + self.blockCycles)
             return self.ppu.readRegister(addr)
         elif addr == 0x4016:
             return self.controller.read()
         elif addr == 0x4017:
             return 0
-        elif addr < 0x4018:
-            if addr < 0x4014:
-                return self.apu.readRegister(addr)
-            return 0
+        elif addr == 0x4015:
+            self.apu.runUntil(self.cycles + self.blockCycles)
+            return self.apu.readRegister(addr)
         elif addr >= 0x8000:
-            sz = len(self.cart.prgROM)
-            if sz == 16384:
-                return self.cart.prgROM[addr & 0x3FFF]
-            else:
-                return self.cart.prgROM[addr & 0x7FFF]
+            return self.cart.mapper.read_prg(addr)
         return 0
 
     def write(self, addr, val):
@@ -276,17 +1165,26 @@ class CPU:
         if addr < 0x2000:
             self.RAM[addr & 0x07FF] = val
         elif addr < 0x4000:
+            self.ppu.runUntil(self.cycles + self.blockCycles)
             self.ppu.writeRegister(addr, val)
         elif addr == 0x4014:
+            self.ppu.runUntil(self.cycles + self.blockCycles)
             base = val << 8
             for i in range(256):
                 self.ppu.OAM[i] = self.read(base + i)
+            self.cycles += 513
         elif addr == 0x4016:
             self.controller.write(val)
         elif addr < 0x4018:
+            self.apu.runUntil(self.cycles + self.blockCycles)
             self.apu.writeRegister(addr, val)
-        else:
-            pass
+            if addr == 0x4017:
+                # The frame IRQ moved: have NES.runCPU() stop and re-plan
+                self.ppu.reschedule = True
+        elif addr >= 0x8000:
+            # Bank switches change what the PPU draws from here on
+            self.ppu.runUntil(self.cycles + self.blockCycles)
+            self.cart.mapper.write(addr, val)
 
     def setNZ(self, value):
         value &= 0xFF
@@ -317,6 +1215,7 @@ class CPU:
         lo = self.read(0xFFFA)
         hi = self.read(0xFFFB)
         self.PC = makeWord(lo, hi)
+        self.cycles += 7
 
     def irq(self):
         if self.P & 0x04:
@@ -328,6 +1227,7 @@ class CPU:
         lo = self.read(0xFFFE)
         hi = self.read(0xFFFF)
         self.PC = makeWord(lo, hi)
+        self.cycles += 7
 
     def push(self, val):
         self.write(0x0100 + (self.SP & 0xFF), val)
@@ -376,6 +1276,13 @@ class CPU:
         hi = self.read((base+1) & 0xFF)
         return (makeWord(lo, hi) + self.Y) & 0xFFFF
 
+    def branch(self, taken):
+        off = self.imm()
+        if taken:
+            target = (self.PC + off - ((off & 0x80) << 1)) & 0xFFFF
+            self.cycles += 2 if (target ^ self.PC) & 0xFF00 else 1
+            self.PC = target
+
     def opADC(self, val):
         sum_ = self.A + val + (self.P & 1)
         if sum_ > 0xFF:
@@ -413,6 +1320,7 @@ class CPU:
     def step(self):
         opcode = self.read(self.PC)
         self.PC = (self.PC + 1) & 0xFFFF
+        self.cycles += STEP_CYCLES[opcode]
         # Just do a big switch-like structure:
         if opcode == 0xA9:  # LDA imm
             self.A = self.imm(); self.setNZ(self.A)
@@ -620,37 +1528,21 @@ class CPU:
             self.PC = (makeWord(lo, hi) + 1) & 0xFFFF
 
         elif opcode == 0xD0:  # BNE
-            off = struct.unpack('b', bytes([self.imm()]))[0]
-            if not (self.P & 0x02):
-                self.PC = (self.PC + off) & 0xFFFF
+            self.branch(not (self.P & 0x02))
         elif opcode == 0xF0:  # BEQ
-            off = struct.unpack('b', bytes([self.imm()]))[0]
-            if (self.P & 0x02):
-                self.PC = (self.PC + off) & 0xFFFF
+            self.branch(self.P & 0x02)
         elif opcode == 0x90:  # BCC
-            off = struct.unpack('b', bytes([self.imm()]))[0]
-            if not (self.P & 0x01):
-                self.PC = (self.PC + off) & 0xFFFF
+            self.branch(not (self.P & 0x01))
         elif opcode == 0xB0:  # BCS
-            off = struct.unpack('b', bytes([self.imm()]))[0]
-            if (self.P & 0x01):
-                self.PC = (self.PC + off) & 0xFFFF
+            self.branch(self.P & 0x01)
         elif opcode == 0x10:  # BPL
-            off = struct.unpack('b', bytes([self.imm()]))[0]
-            if not (self.P & 0x80):
-                self.PC = (self.PC + off) & 0xFFFF
+            self.branch(not (self.P & 0x80))
         elif opcode == 0x30:  # BMI
-            off = struct.unpack('b', bytes([self.imm()]))[0]
-            if (self.P & 0x80):
-                self.PC = (self.PC + off) & 0xFFFF
+            self.branch(self.P & 0x80)
         elif opcode == 0x50:  # BVC
-            off = struct.unpack('b', bytes([self.imm()]))[0]
-            if not (self.P & 0x40):
-                self.PC = (self.PC + off) & 0xFFFF
+            self.branch(not (self.P & 0x40))
         elif opcode == 0x70:  # BVS
-            off = struct.unpack('b', bytes([self.imm()]))[0]
-            if (self.P & 0x40):
-                self.PC = (self.PC + off) & 0xFFFF
+            self.branch(self.P & 0x40)
 
         elif opcode == 0x24:  # BIT zpg
             val = self.read(self.zpg())
@@ -694,6 +1586,7 @@ class NES:
         self.ppu  = PPU()
         self.apu  = APU()
         self.controller = Controller()
+        self.instructions = 0
 
     def loadROM(self, path):
         if not self.cart.load(path):
@@ -702,26 +1595,136 @@ class NES:
         self.cpu.ppu  = self.ppu
         self.cpu.apu  = self.apu
         self.cpu.controller = self.controller
-        self.ppu.chrROM = self.cart.chrROM
+        self.cpu.blockCache.clear()
+        self.ppu.mapper = self.cart.mapper
+        self.apu.read = self.cart.mapper.read_prg
+        self.ppu.tileCache.clear()
+        self.ppu.tableCache.clear()
         self.reset()
         return True
 
     def reset(self):
         self.cpu.reset()
+        self.apu.reset(self.cpu.cycles)
+
+    def snapshot(self):
+        cpu, ppu, pad = self.cpu, self.ppu, self.controller
+        header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+                                      cpu.A, cpu.X, cpu.Y, cpu.SP, cpu.P & 0xFF, cpu.PC,
+                                      ppu.PPUCTRL, ppu.PPUMASK, ppu.PPUSTATUS, ppu.OAMADDR,
+                                      ppu.vramAddr, ppu.tempAddr, ppu.fineX, ppu.latch,
+                                      pad.shiftReg, pad.strobe,
+                                      cpu.cycles - ppu.frameStart, ppu.scanline, ppu.nmiPending)
+        return b"".join((header, bytes(cpu.RAM), bytes(ppu.nametable), bytes(ppu.OAM),
+                         bytes(ppu.palette), self.apu.saveState(), self.cart.mapper.save_state()))
+
+    def restore(self, data):
+        cpu, ppu, pad = self.cpu, self.ppu, self.controller
+        size = SNAPSHOT_HEADER.size + 2048 + 2048 + 256 + 32 + APU_STATE.size
+        if len(data) != size + self.cart.mapper.state_size():
+            raise ValueError("Snapshot does not match the loaded cartridge")
+        fields = SNAPSHOT_HEADER.unpack_from(data)
+        if fields[0] != SNAPSHOT_MAGIC or fields[1] != SNAPSHOT_VERSION:
+            raise ValueError("Not a version %d emu-x snapshot" % SNAPSHOT_VERSION)
+        (cpu.A, cpu.X, cpu.Y, cpu.SP, cpu.P, cpu.PC,
+         ppu.PPUCTRL, ppu.PPUMASK, ppu.PPUSTATUS, ppu.OAMADDR,
+         ppu.vramAddr, ppu.tempAddr, ppu.fineX, latch,
+         pad.shiftReg, strobe, frameCycle, ppu.scanline, nmiPending) = fields[2:]
+        ppu.latch  = bool(latch)
+        pad.strobe = bool(strobe)
+        # CPU.cycles keeps counting up; the frame is re-based under it
+        ppu.frameStart = cpu.cycles - frameCycle
+        ppu.lineEnd    = ppu.scanlineEnd(ppu.scanline)
+        ppu.nmiPending = bool(nmiPending)
+        offset = SNAPSHOT_HEADER.size
+        cpu.RAM[:]       = data[offset:offset + 2048]
+        ppu.nametable[:] = data[offset + 2048:offset + 4096]
+        ppu.OAM[:]       = data[offset + 4096:offset + 4352]
+        ppu.palette[:]   = data[offset + 4352:offset + 4384]
+        self.apu.loadState(data[offset + 4384:size], cpu.cycles)
+        self.cart.mapper.load_state(data[size:])
+        ppu.updateColors()
+        ppu.sprite0Cycle = ppu.sprite0Hit(ppu.scanline) if ppu.scanline < SCREEN_HEIGHT else NEVER
 
     def runFrame(self):
-        for _ in range(MASTER_CYCLES_PER_FRAME):
-            self.cpu.step()
-            self.apu.step()
-        if self.ppu.PPUCTRL & 0x80:
-            self.cpu.nmi()
-        self.ppu.render()
+        """Run one frame, from the first visible scanline to the end of pre-render."""
+        cpu, ppu, apu = self.cpu, self.ppu, self.apu
+        mapper = self.cart.mapper
+        frameEnd = ppu.frameStart + MASTER_CYCLES_PER_FRAME
+        while cpu.cycles < frameEnd:
+            ppu.reschedule = False
+            self.runCPU(min(ppu.nextEvent(), apu.nextEvent(), frameEnd))
+            ppu.runUntil(cpu.cycles)
+            apu.runUntil(cpu.cycles)
+            if ppu.nmiPending:
+                ppu.nmiPending = False
+                cpu.nmi()
+            elif mapper.irq_pending or apu.irqPending:
+                cpu.irq()
+        # The frame's audio is synthesized in one go (apu.samples)
+        apu.endFrame(cpu.cycles)
+
+    def runCPU(self, target):
+        """Run instructions until CPU.cycles reaches `target`, or until a PPU register
+        write may have changed the next event."""
+        cpu, ppu = self.cpu, self.ppu
+        # Blocks would hide individual instructions from an attached profiler
+        blocks = cpu.blockCache if cpu.useBlocks and cpu.profiler is None else None
+        while cpu.cycles < target and not ppu.reschedule:
+            if blocks is not None:
+                block = blocks.lookup(cpu.PC)
+                # Only run a block whose slowest path stops short of the target
+                if block and cpu.cycles + block.max_cycles < target:
+                    cycles = block.run(cpu)
+                    cpu.cycles += cycles
+                    cpu.blockCycles = 0
+                    self.instructions += block.length
+                    continue
+            cpu.step()
+            self.instructions += 1
+
+class AudioStream:
+    """Feeds each frame's APU samples to a pygame.mixer channel. The emulator never
+    waits on audio: frames are queued behind the playing sound, and when the queue
+    is full they collect in `pending` (dropping the oldest past `maxLatency` seconds)."""
+    def __init__(self, sampleRate=SAMPLE_RATE, maxLatency=0.1):
+        pygame.mixer.init(sampleRate, -16, 1, 512)
+        self.sampleRate, _, self.channels = pygame.mixer.get_init()
+        self.channel = pygame.mixer.Channel(0)
+        self.pending = []
+        self.pendingSamples = 0
+        self.maxSamples = int(self.sampleRate * maxLatency)
+
+    def push(self, samples):
+        if samples is None or not len(samples):
+            return
+        self.pending.append(samples)
+        self.pendingSamples += len(samples)
+        while self.pendingSamples > self.maxSamples and len(self.pending) > 1:
+            self.pendingSamples -= len(self.pending.pop(0))
+        if self.channel.get_queue() is not None:
+            return
+        data = np.concatenate(self.pending)
+        self.pending = []
+        self.pendingSamples = 0
+        if self.channels > 1:
+            data = np.repeat(data, self.channels)
+        sound = pygame.mixer.Sound(buffer=data.tobytes())
+        if self.channel.get_busy():
+            self.channel.queue(sound)
+        else:
+            self.channel.play(sound)
 
 def main():
-    if len(sys.argv) < 2:
-        print(f"Usage: python {sys.argv[0]} romfile.nes")
+    if len(sys.argv) not in (2, 4) or (len(sys.argv) == 4 and sys.argv[2] not in ("--record", "--play")):
+        print(f"Usage: python {sys.argv[0]} romfile.nes [--record movie.nesm | --play movie.nesm]")
+        return
+    if pygame is None:
+        print("pygame is required for the windowed emulator (see nesbench.py for headless runs).")
         return
 
+    # Before pygame.init(), which would otherwise open the mixer with its own defaults
+    pygame.mixer.pre_init(SAMPLE_RATE, -16, 1, 512)
     pygame.init()
     window_scale = 2
     screen = pygame.display.set_mode((SCREEN_WIDTH*window_scale, SCREEN_HEIGHT*window_scale))
@@ -732,7 +1735,45 @@ def main():
         print("Failed to load ROM.")
         return
 
+    # Input movie (see nesmovie.py): both modes start from power-on, which is right now
+    movieMode = sys.argv[2][2:] if len(sys.argv) == 4 else None
+    moviePath = sys.argv[3] if movieMode else None
+    movieFrame = 0
+    if movieMode == "play":
+        try:
+            movie = Movie.load(moviePath)
+            warning = movie.check(sys.argv[1], EMULATOR_VERSION)
+        except (OSError, ValueError) as e:
+            print(f"Failed to load movie: {e}")
+            return
+        if warning:
+            print(f"Warning: {warning}")
+        print(f"[PLAYING MOVIE] {len(movie)} frames")
+    elif movieMode == "record":
+        movie = Movie.for_rom(sys.argv[1], EMULATOR_VERSION)
+        print("[RECORDING MOVIE]")
+
+    # Persistent 32-bit surface; with NumPy the framebuffer is viewed (not copied) as a 240x256 array
+    surf = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), 0, 32)
+    frame = None
+    if np is not None:
+        frame = np.frombuffer(nes.ppu.framebuffer, dtype=np.uint32).reshape(SCREEN_HEIGHT, SCREEN_WIDTH).T
+
+    # Sound needs NumPy for synthesis and a working audio device
+    audio = None
+    if np is not None:
+        try:
+            audio = AudioStream()
+            nes.apu.sampleRate = audio.sampleRate
+        except pygame.error as e:
+            print(f"No audio: {e}")
+    muted = False
+
+    # Buttons held on the keyboard (A in bit 7), latched into the controller once per frame
+    held = 0
     vibeMode = False
+    rewind = RewindBuffer()
+    rewinding = False
     clock = pygame.time.Clock()
     running = True
     while running:
@@ -743,70 +1784,103 @@ def main():
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     running = False
-                if event.key == pygame.K_z:
-                    nes.controller.state |= 0x80
+                if event.key == pygame.K_BACKSPACE:
+                    rewinding = True
+                elif event.key == pygame.K_z:
+                    held |= 0x80
                 elif event.key == pygame.K_x:
-                    nes.controller.state |= 0x40
+                    held |= 0x40
                 elif event.key == pygame.K_SPACE:
-                    nes.controller.state |= 0x20
+                    held |= 0x20
                 elif event.key == pygame.K_RETURN:
-                    nes.controller.state |= 0x10
+                    held |= 0x10
                 elif event.key == pygame.K_UP:
-                    nes.controller.state |= 0x08
+                    held |= 0x08
                 elif event.key == pygame.K_DOWN:
-                    nes.controller.state |= 0x04
+                    held |= 0x04
                 elif event.key == pygame.K_LEFT:
-                    nes.controller.state |= 0x02
+                    held |= 0x02
                 elif event.key == pygame.K_RIGHT:
-                    nes.controller.state |= 0x01
+                    held |= 0x01
                 elif event.key == pygame.K_v:
                     vibeMode = not vibeMode
+                    nes.ppu.setVibe(vibeMode)
                     print("[VIBE MODE ON]" if vibeMode else "[VIBE MODE OFF]")
+                elif event.key == pygame.K_m:
+                    muted = not muted
+                    print("[SOUND OFF]" if muted else "[SOUND ON]")
+                elif event.key == pygame.K_b:
+                    nes.cpu.useBlocks = not nes.cpu.useBlocks
+                    print("[BLOCK CACHE ON]" if nes.cpu.useBlocks else "[BLOCK CACHE OFF]")
+                elif event.key == pygame.K_p:
+                    if nes.cpu.profiler is None:
+                        nes.cpu.attachProfiler(Profiler(OPCODES))
+                        print("[PROFILER ON]")
+                    else:
+                        profiler = nes.cpu.profiler
+                        nes.cpu.detachProfiler()
+                        profiler.write_json("emux-profile.json")
+                        profiler.write_csv("emux-profile.csv")
+                        profiler.write_folded("emux-profile.folded")
+                        print(profiler.report())
+                        print("[PROFILER OFF] wrote emux-profile.json/.csv/.folded")
 
             elif event.type == pygame.KEYUP:
-                if event.key == pygame.K_z:
-                    nes.controller.state &= ~0x80
+                if event.key == pygame.K_BACKSPACE:
+                    rewinding = False
+                elif event.key == pygame.K_z:
+                    held &= ~0x80
                 elif event.key == pygame.K_x:
-                    nes.controller.state &= ~0x40
+                    held &= ~0x40
                 elif event.key == pygame.K_SPACE:
-                    nes.controller.state &= ~0x20
+                    held &= ~0x20
                 elif event.key == pygame.K_RETURN:
-                    nes.controller.state &= ~0x10
+                    held &= ~0x10
                 elif event.key == pygame.K_UP:
-                    nes.controller.state &= ~0x08
+                    held &= ~0x08
                 elif event.key == pygame.K_DOWN:
-                    nes.controller.state &= ~0x04
+                    held &= ~0x04
                 elif event.key == pygame.K_LEFT:
-                    nes.controller.state &= ~0x02
+                    held &= ~0x02
                 elif event.key == pygame.K_RIGHT:
-                    nes.controller.state &= ~0x01
-
-        nes.runFrame()
-
-        if vibeMode:
-            for i in range(SCREEN_WIDTH*SCREEN_HEIGHT):
-                pix = nes.ppu.framebuffer[i] & 0xFFFFFFFF
-                a = (pix >> 24) & 0xFF
-                r = (pix >> 16) & 0xFF
-                g = (pix >> 8)  & 0xFF
-                b = (pix >> 0)  & 0xFF
-                nr, ng, nb = g, b, r
-                nes.ppu.framebuffer[i] = (a << 24) | (nr << 16) | (ng << 8) | nb
-
-        surf = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        surf_lock = pygame.surfarray.pixels2d(surf)
-        for i in range(SCREEN_WIDTH*SCREEN_HEIGHT):
-            surf_lock[i] = nes.ppu.framebuffer[i] & 0xFFFFFFFF
-        del surf_lock
-
-        scaled_surf = pygame.transform.scale(surf, (SCREEN_WIDTH*window_scale, SCREEN_HEIGHT*window_scale))
-        screen.blit(scaled_surf, (0,0))
+                    held &= ~0x01
+
+        if rewinding and movieMode is None:
+            snapshot = rewind.pop()
+            if snapshot is not None:
+                nes.restore(snapshot)
+                nes.ppu.render()
+        else:
+            if movieMode == "play" and movieFrame >= len(movie):
+                print(f"[MOVIE ENDED] {movieFrame} frames")
+                movieMode = None
+            if movieMode == "play":
+                nes.controller.state = reverse_bits(movie[movieFrame])
+            else:
+                nes.controller.state = held
+                if movieMode == "record":
+                    movie.record(reverse_bits(held))
+            movieFrame += 1
+            nes.runFrame()
+            rewind.push(nes.snapshot())
+            if audio is not None and not muted:
+                audio.push(nes.apu.samples)
+
+        if frame is not None:
+            pygame.surfarray.blit_array(surf, frame)
+        else:
+            surf.get_buffer().write(nes.ppu.framebuffer.tobytes())
+        # Scale straight into the window instead of allocating a scaled copy
+        pygame.transform.scale(surf, screen.get_size(), screen)
         pygame.display.flip()
 
         frameTime = pygame.time.get_ticks() - frameStart
         delay = max(0, int((1000/60) - frameTime))
         pygame.time.delay(delay)
 
+    if movieMode == "record":
+        movie.save(moviePath)
+        print(f"[MOVIE SAVED] {len(movie)} frames to {moviePath}")
     pygame.quit()
 
 if __name__ == "__main__":
@@ -1,13 +1,26 @@
+import struct
 import tkinter as tk
+import os
 from tkinter import filedialog, messagebox
 try:
     from PIL import Image, ImageTk
 except ImportError:
     Image = ImageTk = None  # If Pillow is not installed, we will handle later.
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Without NumPy the per-pixel renderer is used.
+from nesmappers import Mapper, create_mapper, mapper_number
+from nesrewind import RewindBuffer
+from nesblocks import BlockCache, BlockTranslator
+from nesprofile import Profiler, profiled_bus, vector_symbols
+from nesmovie import Movie
+from frametelemetry import FrameTelemetry, TelemetryWindow
 
 # --- Global NES Constants ---
 SCREEN_WIDTH = 256
 SCREEN_HEIGHT = 240
+CYCLES_PER_SCANLINE = 113.667  # NTSC: 341 PPU dots / 3
 
 # NES 64-color palette (RGB values for each of the 64 NES color indices).
 # These are hex strings for convenience; we will convert to RGB tuples.
@@ -22,6 +35,7 @@ NES_PALETTE_HEX = [
     "DEE086","C6EC87","B2F29D","A7F0C3","A8E7F0","ACACAC","000000","000000"
 ]
 NES_PALETTE = [(int(c[0:2],16), int(c[2:4],16), int(c[4:6],16)) for c in NES_PALETTE_HEX]
+NES_PALETTE_RGB = np.array(NES_PALETTE, dtype=np.uint8) if np is not None else None
 
 # CPU Flags bit positions
 FLAG_C = 0x01  # Carry
@@ -36,6 +50,15 @@ FLAG_N = 0x80  # Negative
 # Memory
 RAM_SIZE = 0x0800  # 2KB internal RAM
 
+# Save states: fixed header (CPU registers, PPU latches, controller shift state),
+# then RAM, VRAM, palette, OAM, PRG RAM and the mapper state, in that order.
+# Stored in input movies; bump when a change makes old movies play back differently
+EMULATOR_VERSION = "emunesv0 1"
+
+SNAPSHOT_MAGIC = b"NESS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<4sB5BH5BHB3BB")
+
 # Controller bits order: A, B, Select, Start, Up, Down, Left, Right
 BUTTON_A = 0x01
 BUTTON_B = 0x02
@@ -46,6 +69,70 @@ BUTTON_DOWN = 0x20
 BUTTON_LEFT = 0x40
 BUTTON_RIGHT = 0x80
 
+# Official 6502 opcodes: opcode -> (operation, addressing mode, base cycles).
+# Page-cross and branch penalties are added at run time. Anything missing from
+# this table decodes as a 2-cycle NOP.
+OPCODE_SPECS = {
+    0x00: ("brk", "imp", 7),  0x01: ("ora", "izx", 6),  0x05: ("ora", "zp", 3),
+    0x06: ("asl", "zp", 5),   0x08: ("php", "imp", 3),  0x09: ("ora", "imm", 2),
+    0x0A: ("asl", "acc", 2),  0x0D: ("ora", "abs", 4),  0x0E: ("asl", "abs", 6),
+    0x10: ("bpl", "rel", 2),  0x11: ("ora", "izy", 5),  0x15: ("ora", "zpx", 4),
+    0x16: ("asl", "zpx", 6),  0x18: ("clc", "imp", 2),  0x19: ("ora", "aby", 4),
+    0x1D: ("ora", "abx", 4),  0x1E: ("asl", "abx", 7),
+    0x20: ("jsr", "abs", 6),  0x21: ("and", "izx", 6),  0x24: ("bit", "zp", 3),
+    0x25: ("and", "zp", 3),   0x26: ("rol", "zp", 5),   0x28: ("plp", "imp", 4),
+    0x29: ("and", "imm", 2),  0x2A: ("rol", "acc", 2),  0x2C: ("bit", "abs", 4),
+    0x2D: ("and", "abs", 4),  0x2E: ("rol", "abs", 6),
+    0x30: ("bmi", "rel", 2),  0x31: ("and", "izy", 5),  0x35: ("and", "zpx", 4),
+    0x36: ("rol", "zpx", 6),  0x38: ("sec", "imp", 2),  0x39: ("and", "aby", 4),
+    0x3D: ("and", "abx", 4),  0x3E: ("rol", "abx", 7),
+    0x40: ("rti", "imp", 6),  0x41: ("eor", "izx", 6),  0x45: ("eor", "zp", 3),
+    0x46: ("lsr", "zp", 5),   0x48: ("pha", "imp", 3),  0x49: ("eor", "imm", 2),
+    0x4A: ("lsr", "acc", 2),  0x4C: ("jmp", "abs", 3),  0x4D: ("eor", "abs", 4),
+    0x4E: ("lsr", "abs", 6),
+    0x50: ("bvc", "rel", 2),  0x51: ("eor", "izy", 5),  0x55: ("eor", "zpx", 4),
+    0x56: ("lsr", "zpx", 6),  0x58: ("cli", "imp", 2),  0x59: ("eor", "aby", 4),
+    0x5D: ("eor", "abx", 4),  0x5E: ("lsr", "abx", 7),
+    0x60: ("rts", "imp", 6),  0x61: ("adc", "izx", 6),  0x65: ("adc", "zp", 3),
+    0x66: ("ror", "zp", 5),   0x68: ("pla", "imp", 4),  0x69: ("adc", "imm", 2),
+    0x6A: ("ror", "acc", 2),  0x6C: ("jmp", "ind", 5),  0x6D: ("adc", "abs", 4),
+    0x6E: ("ror", "abs", 6),
+    0x70: ("bvs", "rel", 2),  0x71: ("adc", "izy", 5),  0x75: ("adc", "zpx", 4),
+    0x76: ("ror", "zpx", 6),  0x78: ("sei", "imp", 2),  0x79: ("adc", "aby", 4),
+    0x7D: ("adc", "abx", 4),  0x7E: ("ror", "abx", 7),
+    0x81: ("sta", "izx", 6),  0x84: ("sty", "zp", 3),   0x85: ("sta", "zp", 3),
+    0x86: ("stx", "zp", 3),   0x88: ("dey", "imp", 2),  0x8A: ("txa", "imp", 2),
+    0x8C: ("sty", "abs", 4),  0x8D: ("sta", "abs", 4),  0x8E: ("stx", "abs", 4),
+    0x90: ("bcc", "rel", 2),  0x91: ("sta", "izy", 6),  0x94: ("sty", "zpx", 4),
+    0x95: ("sta", "zpx", 4),  0x96: ("stx", "zpy", 4),  0x98: ("tya", "imp", 2),
+    0x99: ("sta", "aby", 5),  0x9A: ("txs", "imp", 2),  0x9D: ("sta", "abx", 5),
+    0xA0: ("ldy", "imm", 2),  0xA1: ("lda", "izx", 6),  0xA2: ("ldx", "imm", 2),
+    0xA4: ("ldy", "zp", 3),   0xA5: ("lda", "zp", 3),   0xA6: ("ldx", "zp", 3),
+    0xA8: ("tay", "imp", 2),  0xA9: ("lda", "imm", 2),  0xAA: ("tax", "imp", 2),
+    0xAC: ("ldy", "abs", 4),  0xAD: ("lda", "abs", 4),  0xAE: ("ldx", "abs", 4),
+    0xB0: ("bcs", "rel", 2),  0xB1: ("lda", "izy", 5),  0xB4: ("ldy", "zpx", 4),
+    0xB5: ("lda", "zpx", 4),  0xB6: ("ldx", "zpy", 4),  0xB8: ("clv", "imp", 2),
+    0xB9: ("lda", "aby", 4),  0xBA: ("tsx", "imp", 2),  0xBC: ("ldy", "abx", 4),
+    0xBD: ("lda", "abx", 4),  0xBE: ("ldx", "aby", 4),
+    0xC0: ("cpy", "imm", 2),  0xC1: ("cmp", "izx", 6),  0xC4: ("cpy", "zp", 3),
+    0xC5: ("cmp", "zp", 3),   0xC6: ("dec", "zp", 5),   0xC8: ("iny", "imp", 2),
+    0xC9: ("cmp", "imm", 2),  0xCA: ("dex", "imp", 2),  0xCC: ("cpy", "abs", 4),
+    0xCD: ("cmp", "abs", 4),  0xCE: ("dec", "abs", 6),
+    0xD0: ("bne", "rel", 2),  0xD1: ("cmp", "izy", 5),  0xD5: ("cmp", "zpx", 4),
+    0xD6: ("dec", "zpx", 6),  0xD8: ("cld", "imp", 2),  0xD9: ("cmp", "aby", 4),
+    0xDD: ("cmp", "abx", 4),  0xDE: ("dec", "abx", 7),
+    0xE0: ("cpx", "imm", 2),  0xE1: ("sbc", "izx", 6),  0xE4: ("cpx", "zp", 3),
+    0xE5: ("sbc", "zp", 3),   0xE6: ("inc", "zp", 5),   0xE8: ("inx", "imp", 2),
+    0xE9: ("sbc", "imm", 2),  0xEA: ("nop", "imp", 2),  0xEC: ("cpx", "abs", 4),
+    0xED: ("sbc", "abs", 4),  0xEE: ("inc", "abs", 6),
+    0xF0: ("beq", "rel", 2),  0xF1: ("sbc", "izy", 5),  0xF5: ("sbc", "zpx", 4),
+    0xF6: ("inc", "zpx", 6),  0xF8: ("sed", "imp", 2),  0xF9: ("sbc", "aby", 4),
+    0xFD: ("sbc", "abx", 4),  0xFE: ("inc", "abx", 7),
+}
+
+# Read instructions pay one extra cycle when an indexed address crosses a page.
+PAGE_CROSS_OPS = {"ora", "and", "eor", "adc", "sbc", "cmp", "lda", "ldx", "ldy"}
+
 # --- NES Emulator Classes ---
 
 class CPU6502:
@@ -59,6 +146,16 @@ class CPU6502:
         self.SP = 0xFD  # Stack Pointer (init to 0xFD as per reset)
         self.PC = 0    # Program Counter
         self.STATUS = 0x24  # Processor status (IRQ disabled by default, FLAG_U set)
+        # Opcode -> (handler, addressing mode, base cycles), decoded once
+        self.dispatch = self.build_dispatch_table()
+        # Straight-line runs translated to Python functions; step_frame uses them while
+        # use_blocks is set, and can be switched back to the plain interpreter at any time
+        self.block_cache = BlockCache(BlockTranslator(OPCODE_SPECS, page_cross_ops=PAGE_CROSS_OPS),
+                                      bus.read, bus.write, bus.ram, self.code_bank, self.code_buffer,
+                                      status="STATUS")
+        self.use_blocks = True
+        # Attached nesprofile.Profiler, or None (the normal, uninstrumented path)
+        self.profiler = None
     
     def reset(self):
         # On reset, read vector at $FFFC to set PC
@@ -72,6 +169,30 @@ class CPU6502:
         self.X = 0
         self.Y = 0
     
+    def code_bank(self, pc):
+        """Block cache key for code at pc: PRG bank number, -1 for RAM, None for I/O."""
+        if pc >= 0x8000:
+            return self.bus.mapper.prg_banks[(pc >> 13) & 3]
+        if pc < 0x2000 or pc >= 0x6000:
+            return -1
+        return None
+    
+    def code_buffer(self, pc):
+        if pc < 0x2000:
+            return self.bus.ram, pc & 0x7FF
+        return self.bus.prg_ram, pc - 0x6000
+    
+    def irq(self):
+        """Service a maskable interrupt (mapper IRQ); ignored while the I flag is set."""
+        if self.STATUS & FLAG_I:
+            return 0
+        self.push((self.PC >> 8) & 0xFF)
+        self.push(self.PC & 0xFF)
+        self.push((self.STATUS | FLAG_U) & ~FLAG_B)
+        self.set_flag(FLAG_I, True)
+        self.PC = self.bus.read(0xFFFE) | (self.bus.read(0xFFFF) << 8)
+        return 7
+    
     def set_flag(self, flag, condition):
         if condition:
             self.STATUS |= flag
@@ -103,6 +224,16 @@ class CPU6502:
         return lo | (hi << 8)
     
     # Addressing mode helpers to get effective address or value
+    def addr_implied(self):
+        return None  # no operand (also used for accumulator mode)
+    def addr_immediate(self):
+        addr = self.PC
+        self.PC = (self.PC + 1) & 0xFFFF
+        return addr
+    def addr_relative(self):
+        # Branch target: signed 8-bit offset from the next instruction
+        offset = self.fetch_byte()
+        return (self.PC + ((offset ^ 0x80) - 0x80)) & 0xFFFF
     def addr_zero_page(self):
         return self.fetch_byte()  # zero-page address (0x00xx)
     def addr_zero_page_x(self):
@@ -259,725 +390,263 @@ class CPU6502:
         self.set_flag(FLAG_N, (value & 0x80) != 0)
         self.set_flag(FLAG_V, (value & 0x40) != 0)
     
+    def build_dispatch_table(self):
+        """Decode OPCODE_SPECS once into a 256-entry (handler, addressing, cycles) table."""
+        modes = {
+            "imp": self.addr_implied,
+            "acc": self.addr_implied,
+            "imm": self.addr_immediate,
+            "zp": self.addr_zero_page,
+            "zpx": self.addr_zero_page_x,
+            "zpy": self.addr_zero_page_y,
+            "abs": self.addr_absolute,
+            "abx": self.addr_absolute_x,
+            "aby": self.addr_absolute_y,
+            "ind": self.addr_indirect,
+            "izx": self.addr_indirect_x,
+            "izy": self.addr_indirect_y,
+            "rel": self.addr_relative,
+        }
+        # Page-crossing variants, only used by read instructions
+        crossing = {
+            "abx": lambda: self.addr_absolute_x(True),
+            "aby": lambda: self.addr_absolute_y(True),
+            "izy": lambda: self.addr_indirect_y(True),
+        }
+        table = [(self.op_nop, self.addr_implied, 2)] * 256
+        for opcode, (name, mode, cycles) in OPCODE_SPECS.items():
+            if name in PAGE_CROSS_OPS and mode in crossing:
+                addressing = crossing[mode]
+            else:
+                addressing = modes[mode]
+            table[opcode] = (getattr(self, "op_" + name), addressing, cycles)
+        return table
+
     def execute_instruction(self):
         """Fetch and execute one CPU instruction, return number of cycles used."""
+        handler, addressing, cycles = self.dispatch[self.fetch_byte()]
+        # Handlers return None, or the extra cycles of a taken branch
+        extra = handler(addressing)
+        return cycles + extra if extra else cycles
+
+    def attach_profiler(self, profiler):
+        """Run instructions, IRQs and bus accesses through `profiler` until detach_profiler().
+        The instrumented versions shadow the methods on the instances only."""
+        self.detach_profiler()
+        profiler.symbols.update(vector_symbols(self.bus.read))
+        self.profiler = profiler
+        self.bus.read, self.bus.write = profiled_bus(profiler, self.bus.read, self.bus.write)
+        self.execute_instruction = self.execute_profiled
+        self.irq = self.irq_profiled
+    
+    def detach_profiler(self):
+        if self.profiler is None:
+            return
+        self.profiler = None
+        del self.bus.read, self.bus.write, self.execute_instruction, self.irq
+    
+    def execute_profiled(self):
+        """execute_instruction() that also records the instruction in self.profiler."""
+        pc = self.PC
         opcode = self.fetch_byte()
-        # Base cycle counts for each opcode (without page-cross penalties)
-        # A partial list for demonstration (complete list should cover all 256 opcodes or at least all official ones).
-        # For brevity, not all opcodes are enumerated in comments; our logic covers main ones.
-        # We will handle branch and page-cross cycle additions in code.
-        cycles_base = {
-            0x00: 7,  # BRK
-            0x01: 6,  # ORA (ind,X)
-            0x05: 3,  # ORA zpg
-            0x06: 5,  # ASL zpg
-            0x08: 3,  # PHP
-            0x09: 2,  # ORA #imm
-            0x0A: 2,  # ASL A
-            0x0D: 4,  # ORA abs
-            0x0E: 6,  # ASL abs
-            0x10: 2,  # BPL (branch - may add 1 or 2 cycles)
-            0x11: 5,  # ORA (ind),Y (+1 if page crossed)
-            0x15: 4,  # ORA zpg,X
-            0x16: 6,  # ASL zpg,X
-            0x18: 2,  # CLC
-            0x19: 4,  # ORA abs,Y (+1 if page crossed)
-            0x1D: 4,  # ORA abs,X (+1 if page crossed)
-            0x1E: 7,  # ASL abs,X
-            0x20: 6,  # JSR abs
-            0x21: 6,  # AND (ind,X)
-            0x24: 3,  # BIT zpg
-            0x25: 3,  # AND zpg
-            0x26: 5,  # ROL zpg
-            0x28: 4,  # PLP
-            0x29: 2,  # AND #imm
-            0x2A: 2,  # ROL A
-            0x2C: 4,  # BIT abs
-            0x2D: 4,  # AND abs
-            0x2E: 6,  # ROL abs
-            0x30: 2,  # BMI
-            0x31: 5,  # AND (ind),Y (+1 if page crossed)
-            0x35: 4,  # AND zpg,X
-            0x36: 6,  # ROL zpg,X
-            0x38: 2,  # SEC
-            0x39: 4,  # AND abs,Y (+1 if page crossed)
-            0x3D: 4,  # AND abs,X (+1 if page crossed)
-            0x3E: 7,  # ROL abs,X
-            0x40: 6,  # RTI
-            0x41: 6,  # EOR (ind,X)
-            0x45: 3,  # EOR zpg
-            0x46: 5,  # LSR zpg
-            0x48: 3,  # PHA
-            0x49: 2,  # EOR #imm
-            0x4A: 2,  # LSR A
-            0x4C: 3,  # JMP abs
-            0x4D: 4,  # EOR abs
-            0x4E: 6,  # LSR abs
-            0x50: 2,  # BVC
-            0x51: 5,  # EOR (ind),Y (+1 if page crossed)
-            0x55: 4,  # EOR zpg,X
-            0x56: 6,  # LSR zpg,X
-            0x58: 2,  # CLI
-            0x59: 4,  # EOR abs,Y (+1 if page crossed)
-            0x5D: 4,  # EOR abs,X (+1 if page crossed)
-            0x5E: 7,  # LSR abs,X
-            0x60: 6,  # RTS
-            0x61: 6,  # ADC (ind,X)
-            0x65: 3,  # ADC zpg
-            0x66: 5,  # ROR zpg
-            0x68: 4,  # PLA
-            0x69: 2,  # ADC #imm
-            0x6A: 2,  # ROR A
-            0x6C: 5,  # JMP (ind)
-            0x6D: 4,  # ADC abs
-            0x6E: 6,  # ROR abs
-            0x70: 2,  # BVS
-            0x71: 5,  # ADC (ind),Y (+1 if page crossed)
-            0x75: 4,  # ADC zpg,X
-            0x76: 6,  # ROR zpg,X
-            0x78: 2,  # SEI
-            0x79: 4,  # ADC abs,Y (+1 if page crossed)
-            0x7D: 4,  # ADC abs,X (+1 if page crossed)
-            0x7E: 7,  # ROR abs,X
-            0x81: 6,  # STA (ind,X)
-            0x84: 3,  # STY zpg
-            0x85: 3,  # STA zpg
-            0x86: 3,  # STX zpg
-            0x88: 2,  # DEY
-            0x8A: 2,  # TXA
-            0x8C: 4,  # STY abs
-            0x8D: 4,  # STA abs
-            0x8E: 4,  # STX abs
-            0x90: 2,  # BCC
-            0x91: 6,  # STA (ind),Y
-            0x94: 4,  # STY zpg,X
-            0x95: 4,  # STA zpg,X
-            0x96: 4,  # STX zpg,Y
-            0x98: 2,  # TYA
-            0x99: 5,  # STA abs,Y
-            0x9A: 2,  # TXS
-            0x9D: 5,  # STA abs,X
-            0xA0: 2,  # LDY #imm
-            0xA1: 6,  # LDA (ind,X)
-            0xA2: 2,  # LDX #imm
-            0xA4: 3,  # LDY zpg
-            0xA5: 3,  # LDA zpg
-            0xA6: 3,  # LDX zpg
-            0xA8: 2,  # TAY
-            0xA9: 2,  # LDA #imm
-            0xAA: 2,  # TAX
-            0xAC: 4,  # LDY abs
-            0xAD: 4,  # LDA abs
-            0xAE: 4,  # LDX abs
-            0xB0: 2,  # BCS
-            0xB1: 5,  # LDA (ind),Y (+1 if page crossed)
-            0xB4: 4,  # LDY zpg,X
-            0xB5: 4,  # LDA zpg,X
-            0xB6: 4,  # LDX zpg,Y
-            0xB8: 2,  # CLV
-            0xB9: 4,  # LDA abs,Y (+1 if page crossed)
-            0xBA: 2,  # TSX
-            0xBC: 4,  # LDY abs,X (+1 if page crossed)
-            0xBD: 4,  # LDA abs,X (+1 if page crossed)
-            0xBE: 4,  # LDX abs,Y (+1 if page crossed)
-            0xC0: 2,  # CPY #imm
-            0xC1: 6,  # CMP (ind,X)
-            0xC4: 3,  # CPY zpg
-            0xC5: 3,  # CMP zpg
-            0xC6: 5,  # DEC zpg
-            0xC8: 2,  # INY
-            0xC9: 2,  # CMP #imm
-            0xCA: 2,  # DEX
-            0xCC: 4,  # CPY abs
-            0xCD: 4,  # CMP abs
-            0xCE: 6,  # DEC abs
-            0xD0: 2,  # BNE
-            0xD1: 5,  # CMP (ind),Y (+1 if page crossed)
-            0xD5: 4,  # CMP zpg,X
-            0xD6: 6,  # DEC zpg,X
-            0xD8: 2,  # CLD
-            0xD9: 4,  # CMP abs,Y (+1 if page crossed)
-            0xDD: 4,  # CMP abs,X (+1 if page crossed)
-            0xDE: 7,  # DEC abs,X
-            0xE0: 2,  # CPX #imm
-            0xE1: 6,  # SBC (ind,X)
-            0xE4: 3,  # CPX zpg
-            0xE5: 3,  # SBC zpg
-            0xE6: 5,  # INC zpg
-            0xE8: 2,  # INX
-            0xE9: 2,  # SBC #imm
-            0xEA: 2,  # NOP
-            0xEC: 4,  # CPX abs
-            0xED: 4,  # SBC abs
-            0xEE: 6,  # INC abs
-            0xF0: 2,  # BEQ
-            0xF1: 5,  # SBC (ind),Y (+1 if page crossed)
-            0xF5: 4,  # SBC zpg,X
-            0xF6: 6,  # INC zpg,X
-            0xF8: 2,  # SED
-            0xF9: 4,  # SBC abs,Y (+1 if page crossed)
-            0xFD: 4,  # SBC abs,X (+1 if page crossed)
-            0xFE: 7,  # INC abs,X
-        }
-        # Set base cycles for this opcode, will add extras later if needed
-        cycles = cycles_base.get(opcode, 2)
-        
-        # Decode and execute the opcode
-        if opcode == 0x00:  # BRK - Force Interrupt
-            self.fetch_byte()  # BRK has an unused padding byte after opcode
-            self.set_flag(FLAG_B, True)
-            self.push((self.PC >> 8) & 0xFF)
-            self.push(self.PC & 0xFF)
-            self.push(self.STATUS)
-            self.set_flag(FLAG_I, True)
-            self.PC = self.bus.read(0xFFFE) | (self.bus.read(0xFFFF) << 8)
-        elif opcode == 0x01:  # ORA (Indirect,X)
-            addr = self.addr_indirect_x()
-            self.ora(self.bus.read(addr))
-        elif opcode == 0x05:  # ORA Zero Page
-            addr = self.addr_zero_page()
-            self.ora(self.bus.read(addr))
-        elif opcode == 0x06:  # ASL Zero Page
-            addr = self.addr_zero_page()
-            self.asl(addr)
-        elif opcode == 0x08:  # PHP
-            # Push SR with B flag and U flag set
-            flags = self.STATUS | FLAG_B | FLAG_U
-            self.push(flags)
-        elif opcode == 0x09:  # ORA Immediate
-            value = self.fetch_byte()
-            self.ora(value)
-        elif opcode == 0x0A:  # ASL A
-            self.asl()
-        elif opcode == 0x0D:  # ORA Absolute
-            addr = self.addr_absolute()
-            self.ora(self.bus.read(addr))
-        elif opcode == 0x0E:  # ASL Absolute
-            addr = self.addr_absolute()
-            self.asl(addr)
-        elif opcode == 0x10:  # BPL (Branch if Positive)
-            offset = self.fetch_byte()
-            if not self.get_flag(FLAG_N):  # Negative flag clear => positive
-                # branch taken
-                cycles += 1
-                new_pc = (self.PC + ((offset ^ 0x80) - 0x80)) & 0xFFFF  # sign-extend offset
-                if (new_pc & 0xFF00) != (self.PC & 0xFF00):
-                    cycles += 1  # page boundary crossed
-                self.PC = new_pc
-        elif opcode == 0x11:  # ORA (Indirect),Y
-            addr = self.addr_indirect_y(check_page_cross=True)
-            self.ora(self.bus.read(addr))
-        elif opcode == 0x15:  # ORA Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.ora(self.bus.read(addr))
-        elif opcode == 0x16:  # ASL Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.asl(addr)
-        elif opcode == 0x18:  # CLC
-            self.set_flag(FLAG_C, False)
-        elif opcode == 0x19:  # ORA Absolute,Y
-            addr = self.addr_absolute_y(check_page_cross=True)
-            self.ora(self.bus.read(addr))
-        elif opcode == 0x1D:  # ORA Absolute,X
-            addr = self.addr_absolute_x(check_page_cross=True)
-            self.ora(self.bus.read(addr))
-        elif opcode == 0x1E:  # ASL Absolute,X
-            addr = self.addr_absolute_x()  # ASL abs,X ignores page penalty
-            self.asl(addr)
-        elif opcode == 0x20:  # JSR Absolute
-            addr = self.addr_absolute()  # get target address
-            # Push address of last byte of JSR (PC-1) onto stack
-            return_addr = (self.PC - 1) & 0xFFFF
-            self.push((return_addr >> 8) & 0xFF)
-            self.push(return_addr & 0xFF)
-            self.PC = addr
-        elif opcode == 0x21:  # AND (Indirect,X)
-            addr = self.addr_indirect_x()
-            self.and_(self.bus.read(addr))
-        elif opcode == 0x24:  # BIT Zero Page
-            addr = self.addr_zero_page()
-            self.bit_test(self.bus.read(addr))
-        elif opcode == 0x25:  # AND Zero Page
-            addr = self.addr_zero_page()
-            self.and_(self.bus.read(addr))
-        elif opcode == 0x26:  # ROL Zero Page
-            addr = self.addr_zero_page()
-            self.rol(addr)
-        elif opcode == 0x28:  # PLP
-            self.STATUS = self.pop()
-            # The B flag and unused flag bits 4 and 5 in the status are not actual flags, ensure proper state:
-            self.STATUS |= FLAG_U
-            self.STATUS &= ~FLAG_B
-        elif opcode == 0x29:  # AND Immediate
-            val = self.fetch_byte()
-            self.and_(val)
-        elif opcode == 0x2A:  # ROL A
-            self.rol()
-        elif opcode == 0x2C:  # BIT Absolute
-            addr = self.addr_absolute()
-            self.bit_test(self.bus.read(addr))
-        elif opcode == 0x2D:  # AND Absolute
-            addr = self.addr_absolute()
-            self.and_(self.bus.read(addr))
-        elif opcode == 0x2E:  # ROL Absolute
-            addr = self.addr_absolute()
-            self.rol(addr)
-        elif opcode == 0x30:  # BMI (Branch if Minus)
-            offset = self.fetch_byte()
-            if self.get_flag(FLAG_N):
-                cycles += 1
-                new_pc = (self.PC + ((offset ^ 0x80) - 0x80)) & 0xFFFF
-                if (new_pc & 0xFF00) != (self.PC & 0xFF00):
-                    cycles += 1
-                self.PC = new_pc
-        elif opcode == 0x31:  # AND (Indirect),Y
-            addr = self.addr_indirect_y(check_page_cross=True)
-            self.and_(self.bus.read(addr))
-        elif opcode == 0x35:  # AND Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.and_(self.bus.read(addr))
-        elif opcode == 0x36:  # ROL Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.rol(addr)
-        elif opcode == 0x38:  # SEC
-            self.set_flag(FLAG_C, True)
-        elif opcode == 0x39:  # AND Absolute,Y
-            addr = self.addr_absolute_y(check_page_cross=True)
-            self.and_(self.bus.read(addr))
-        elif opcode == 0x3D:  # AND Absolute,X
-            addr = self.addr_absolute_x(check_page_cross=True)
-            self.and_(self.bus.read(addr))
-        elif opcode == 0x3E:  # ROL Absolute,X
-            addr = self.addr_absolute_x()
-            self.rol(addr)
-        elif opcode == 0x40:  # RTI
-            # Pull flags, then PC from stack
-            self.STATUS = self.pop()
-            self.STATUS |= FLAG_U
-            self.STATUS &= ~FLAG_B
-            lo = self.pop()
-            hi = self.pop()
-            self.PC = lo | (hi << 8)
-        elif opcode == 0x41:  # EOR (Indirect,X)
-            addr = self.addr_indirect_x()
-            self.eor(self.bus.read(addr))
-        elif opcode == 0x45:  # EOR Zero Page
-            addr = self.addr_zero_page()
-            self.eor(self.bus.read(addr))
-        elif opcode == 0x46:  # LSR Zero Page
-            addr = self.addr_zero_page()
-            self.lsr(addr)
-        elif opcode == 0x48:  # PHA
-            self.push(self.A)
-        elif opcode == 0x49:  # EOR Immediate
-            val = self.fetch_byte()
-            self.eor(val)
-        elif opcode == 0x4A:  # LSR A
-            self.lsr()
-        elif opcode == 0x4C:  # JMP Absolute
-            addr = self.addr_absolute()
-            self.PC = addr
-        elif opcode == 0x4D:  # EOR Absolute
-            addr = self.addr_absolute()
-            self.eor(self.bus.read(addr))
-        elif opcode == 0x4E:  # LSR Absolute
-            addr = self.addr_absolute()
-            self.lsr(addr)
-        elif opcode == 0x50:  # BVC (Branch if Overflow Clear)
-            offset = self.fetch_byte()
-            if not self.get_flag(FLAG_V):
-                cycles += 1
-                new_pc = (self.PC + ((offset ^ 0x80) - 0x80)) & 0xFFFF
-                if (new_pc & 0xFF00) != (self.PC & 0xFF00):
-                    cycles += 1
-                self.PC = new_pc
-        elif opcode == 0x51:  # EOR (Indirect),Y
-            addr = self.addr_indirect_y(check_page_cross=True)
-            self.eor(self.bus.read(addr))
-        elif opcode == 0x55:  # EOR Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.eor(self.bus.read(addr))
-        elif opcode == 0x56:  # LSR Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.lsr(addr)
-        elif opcode == 0x58:  # CLI
-            self.set_flag(FLAG_I, False)
-        elif opcode == 0x59:  # EOR Absolute,Y
-            addr = self.addr_absolute_y(check_page_cross=True)
-            self.eor(self.bus.read(addr))
-        elif opcode == 0x5D:  # EOR Absolute,X
-            addr = self.addr_absolute_x(check_page_cross=True)
-            self.eor(self.bus.read(addr))
-        elif opcode == 0x5E:  # LSR Absolute,X
-            addr = self.addr_absolute_x()
-            self.lsr(addr)
-        elif opcode == 0x60:  # RTS
-            lo = self.pop()
-            hi = self.pop()
-            self.PC = (lo | (hi << 8)) + 1
-            self.PC &= 0xFFFF
-        elif opcode == 0x61:  # ADC (Indirect,X)
-            addr = self.addr_indirect_x()
-            self.adc(self.bus.read(addr))
-        elif opcode == 0x65:  # ADC Zero Page
-            addr = self.addr_zero_page()
-            self.adc(self.bus.read(addr))
-        elif opcode == 0x66:  # ROR Zero Page
-            addr = self.addr_zero_page()
-            self.ror(addr)
-        elif opcode == 0x68:  # PLA
-            self.A = self.pop()
-            self.update_zn(self.A)
-        elif opcode == 0x69:  # ADC Immediate
-            val = self.fetch_byte()
-            self.adc(val)
-        elif opcode == 0x6A:  # ROR A
-            self.ror()
-        elif opcode == 0x6C:  # JMP (Indirect)
-            addr = self.addr_indirect()
-            self.PC = addr
-        elif opcode == 0x6D:  # ADC Absolute
-            addr = self.addr_absolute()
-            self.adc(self.bus.read(addr))
-        elif opcode == 0x6E:  # ROR Absolute
-            addr = self.addr_absolute()
-            self.ror(addr)
-        elif opcode == 0x70:  # BVS (Branch if Overflow Set)
-            offset = self.fetch_byte()
-            if self.get_flag(FLAG_V):
-                cycles += 1
-                new_pc = (self.PC + ((offset ^ 0x80) - 0x80)) & 0xFFFF
-                if (new_pc & 0xFF00) != (self.PC & 0xFF00):
-                    cycles += 1
-                self.PC = new_pc
-        elif opcode == 0x71:  # ADC (Indirect),Y
-            addr = self.addr_indirect_y(check_page_cross=True)
-            self.adc(self.bus.read(addr))
-        elif opcode == 0x75:  # ADC Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.adc(self.bus.read(addr))
-        elif opcode == 0x76:  # ROR Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.ror(addr)
-        elif opcode == 0x78:  # SEI
-            self.set_flag(FLAG_I, True)
-        elif opcode == 0x79:  # ADC Absolute,Y
-            addr = self.addr_absolute_y(check_page_cross=True)
-            self.adc(self.bus.read(addr))
-        elif opcode == 0x7D:  # ADC Absolute,X
-            addr = self.addr_absolute_x(check_page_cross=True)
-            self.adc(self.bus.read(addr))
-        elif opcode == 0x7E:  # ROR Absolute,X
-            addr = self.addr_absolute_x()
-            self.ror(addr)
-        elif opcode == 0x81:  # STA (Indirect,X)
-            addr = self.addr_indirect_x()
-            self.bus.write(addr, self.A)
-        elif opcode == 0x84:  # STY Zero Page
-            addr = self.addr_zero_page()
-            self.bus.write(addr, self.Y)
-        elif opcode == 0x85:  # STA Zero Page
-            addr = self.addr_zero_page()
-            self.bus.write(addr, self.A)
-        elif opcode == 0x86:  # STX Zero Page
-            addr = self.addr_zero_page()
-            self.bus.write(addr, self.X)
-        elif opcode == 0x88:  # DEY
-            self.Y = (self.Y - 1) & 0xFF
-            self.update_zn(self.Y)
-        elif opcode == 0x8A:  # TXA
-            self.A = self.X
-            self.update_zn(self.A)
-        elif opcode == 0x8C:  # STY Absolute
-            addr = self.addr_absolute()
-            self.bus.write(addr, self.Y)
-        elif opcode == 0x8D:  # STA Absolute
-            addr = self.addr_absolute()
-            self.bus.write(addr, self.A)
-        elif opcode == 0x8E:  # STX Absolute
-            addr = self.addr_absolute()
-            self.bus.write(addr, self.X)
-        elif opcode == 0x90:  # BCC
-            offset = self.fetch_byte()
-            if not self.get_flag(FLAG_C):
-                cycles += 1
-                new_pc = (self.PC + ((offset ^ 0x80) - 0x80)) & 0xFFFF
-                if (new_pc & 0xFF00) != (self.PC & 0xFF00):
-                    cycles += 1
-                self.PC = new_pc
-        elif opcode == 0x91:  # STA (Indirect),Y
-            addr = self.addr_indirect_y()
-            self.bus.write(addr, self.A)
-        elif opcode == 0x94:  # STY Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.bus.write(addr, self.Y)
-        elif opcode == 0x95:  # STA Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.bus.write(addr, self.A)
-        elif opcode == 0x96:  # STX Zero Page,Y
-            addr = self.addr_zero_page_y()
-            self.bus.write(addr, self.X)
-        elif opcode == 0x98:  # TYA
-            self.A = self.Y
-            self.update_zn(self.A)
-        elif opcode == 0x99:  # STA Absolute,Y
-            addr = self.addr_absolute_y()
-            self.bus.write(addr, self.A)
-        elif opcode == 0x9A:  # TXS
-            self.SP = self.X
-        elif opcode == 0x9D:  # STA Absolute,X
-            addr = self.addr_absolute_x()
-            self.bus.write(addr, self.A)
-        elif opcode == 0xA0:  # LDY Immediate
-            self.Y = self.fetch_byte()
-            self.update_zn(self.Y)
-        elif opcode == 0xA1:  # LDA (Indirect,X)
-            addr = self.addr_indirect_x()
-            self.A = self.bus.read(addr)
-            self.update_zn(self.A)
-        elif opcode == 0xA2:  # LDX Immediate
-            self.X = self.fetch_byte()
-            self.update_zn(self.X)
-        elif opcode == 0xA4:  # LDY Zero Page
-            addr = self.addr_zero_page()
-            self.Y = self.bus.read(addr)
-            self.update_zn(self.Y)
-        elif opcode == 0xA5:  # LDA Zero Page
-            addr = self.addr_zero_page()
-            self.A = self.bus.read(addr)
-            self.update_zn(self.A)
-        elif opcode == 0xA6:  # LDX Zero Page
-            addr = self.addr_zero_page()
-            self.X = self.bus.read(addr)
-            self.update_zn(self.X)
-        elif opcode == 0xA8:  # TAY
-            self.Y = self.A
-            self.update_zn(self.Y)
-        elif opcode == 0xA9:  # LDA Immediate
-            self.A = self.fetch_byte()
-            self.update_zn(self.A)
-        elif opcode == 0xAA:  # TAX
-            self.X = self.A
-            self.update_zn(self.X)
-        elif opcode == 0xAC:  # LDY Absolute
-            addr = self.addr_absolute()
-            self.Y = self.bus.read(addr)
-            self.update_zn(self.Y)
-        elif opcode == 0xAD:  # LDA Absolute
-            addr = self.addr_absolute()
-            self.A = self.bus.read(addr)
-            self.update_zn(self.A)
-        elif opcode == 0xAE:  # LDX Absolute
-            addr = self.addr_absolute()
-            self.X = self.bus.read(addr)
-            self.update_zn(self.X)
-        elif opcode == 0xB0:  # BCS
-            offset = self.fetch_byte()
-            if self.get_flag(FLAG_C):
-                cycles += 1
-                new_pc = (self.PC + ((offset ^ 0x80) - 0x80)) & 0xFFFF
-                if (new_pc & 0xFF00) != (self.PC & 0xFF00):
-                    cycles += 1
-                self.PC = new_pc
-        elif opcode == 0xB1:  # LDA (Indirect),Y
-            addr = self.addr_indirect_y(check_page_cross=True)
-            self.A = self.bus.read(addr)
-            self.update_zn(self.A)
-        elif opcode == 0xB4:  # LDY Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.Y = self.bus.read(addr)
-            self.update_zn(self.Y)
-        elif opcode == 0xB5:  # LDA Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.A = self.bus.read(addr)
-            self.update_zn(self.A)
-        elif opcode == 0xB6:  # LDX Zero Page,Y
-            addr = self.addr_zero_page_y()
-            self.X = self.bus.read(addr)
-            self.update_zn(self.X)
-        elif opcode == 0xB8:  # CLV
-            self.set_flag(FLAG_V, False)
-        elif opcode == 0xB9:  # LDA Absolute,Y
-            addr = self.addr_absolute_y(check_page_cross=True)
-            self.A = self.bus.read(addr)
-            self.update_zn(self.A)
-        elif opcode == 0xBA:  # TSX
-            self.X = self.SP
-            self.update_zn(self.X)
-        elif opcode == 0xBC:  # LDY Absolute,X
-            addr = self.addr_absolute_x(check_page_cross=True)
-            self.Y = self.bus.read(addr)
-            self.update_zn(self.Y)
-        elif opcode == 0xBD:  # LDA Absolute,X
-            addr = self.addr_absolute_x(check_page_cross=True)
-            self.A = self.bus.read(addr)
-            self.update_zn(self.A)
-        elif opcode == 0xBE:  # LDX Absolute,Y
-            addr = self.addr_absolute_y(check_page_cross=True)
-            self.X = self.bus.read(addr)
-            self.update_zn(self.X)
-        elif opcode == 0xC0:  # CPY Immediate
-            value = self.fetch_byte()
-            self.cmp(self.Y, value)
-        elif opcode == 0xC1:  # CMP (Indirect,X)
-            addr = self.addr_indirect_x()
-            self.cmp(self.A, self.bus.read(addr))
-        elif opcode == 0xC4:  # CPY Zero Page
-            addr = self.addr_zero_page()
-            self.cmp(self.Y, self.bus.read(addr))
-        elif opcode == 0xC5:  # CMP Zero Page
-            addr = self.addr_zero_page()
-            self.cmp(self.A, self.bus.read(addr))
-        elif opcode == 0xC6:  # DEC Zero Page
-            addr = self.addr_zero_page()
-            val = (self.bus.read(addr) - 1) & 0xFF
-            self.bus.write(addr, val)
-            self.update_zn(val)
-        elif opcode == 0xC8:  # INY
-            self.Y = (self.Y + 1) & 0xFF
-            self.update_zn(self.Y)
-        elif opcode == 0xC9:  # CMP Immediate
-            value = self.fetch_byte()
-            self.cmp(self.A, value)
-        elif opcode == 0xCA:  # DEX
-            self.X = (self.X - 1) & 0xFF
-            self.update_zn(self.X)
-        elif opcode == 0xCC:  # CPY Absolute
-            addr = self.addr_absolute()
-            self.cmp(self.Y, self.bus.read(addr))
-        elif opcode == 0xCD:  # CMP Absolute
-            addr = self.addr_absolute()
-            self.cmp(self.A, self.bus.read(addr))
-        elif opcode == 0xCE:  # DEC Absolute
-            addr = self.addr_absolute()
-            val = (self.bus.read(addr) - 1) & 0xFF
-            self.bus.write(addr, val)
-            self.update_zn(val)
-        elif opcode == 0xD0:  # BNE
-            offset = self.fetch_byte()
-            if not self.get_flag(FLAG_Z):
-                cycles += 1
-                new_pc = (self.PC + ((offset ^ 0x80) - 0x80)) & 0xFFFF
-                if (new_pc & 0xFF00) != (self.PC & 0xFF00):
-                    cycles += 1
-                self.PC = new_pc
-        elif opcode == 0xD1:  # CMP (Indirect),Y
-            addr = self.addr_indirect_y(check_page_cross=True)
-            self.cmp(self.A, self.bus.read(addr))
-        elif opcode == 0xD5:  # CMP Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.cmp(self.A, self.bus.read(addr))
-        elif opcode == 0xD6:  # DEC Zero Page,X
-            addr = self.addr_zero_page_x()
-            val = (self.bus.read(addr) - 1) & 0xFF
-            self.bus.write(addr, val)
-            self.update_zn(val)
-        elif opcode == 0xD8:  # CLD
-            self.set_flag(FLAG_D, False)
-        elif opcode == 0xD9:  # CMP Absolute,Y
-            addr = self.addr_absolute_y(check_page_cross=True)
-            self.cmp(self.A, self.bus.read(addr))
-        elif opcode == 0xDD:  # CMP Absolute,X
-            addr = self.addr_absolute_x(check_page_cross=True)
-            self.cmp(self.A, self.bus.read(addr))
-        elif opcode == 0xDE:  # DEC Absolute,X
-            addr = self.addr_absolute_x()
-            val = (self.bus.read(addr) - 1) & 0xFF
-            self.bus.write(addr, val)
-            self.update_zn(val)
-        elif opcode == 0xE0:  # CPX Immediate
-            value = self.fetch_byte()
-            self.cmp(self.X, value)
-        elif opcode == 0xE1:  # SBC (Indirect,X)
-            addr = self.addr_indirect_x()
-            self.sbc(self.bus.read(addr))
-        elif opcode == 0xE4:  # CPX Zero Page
-            addr = self.addr_zero_page()
-            self.cmp(self.X, self.bus.read(addr))
-        elif opcode == 0xE5:  # SBC Zero Page
-            addr = self.addr_zero_page()
-            self.sbc(self.bus.read(addr))
-        elif opcode == 0xE6:  # INC Zero Page
-            addr = self.addr_zero_page()
-            val = (self.bus.read(addr) + 1) & 0xFF
-            self.bus.write(addr, val)
-            self.update_zn(val)
-        elif opcode == 0xE8:  # INX
-            self.X = (self.X + 1) & 0xFF
-            self.update_zn(self.X)
-        elif opcode == 0xE9:  # SBC Immediate
-            val = self.fetch_byte()
-            self.sbc(val)
-        elif opcode == 0xEA:  # NOP
-            pass  # do nothing
-        elif opcode == 0xEC:  # CPX Absolute
-            addr = self.addr_absolute()
-            self.cmp(self.X, self.bus.read(addr))
-        elif opcode == 0xED:  # SBC Absolute
-            addr = self.addr_absolute()
-            self.sbc(self.bus.read(addr))
-        elif opcode == 0xEE:  # INC Absolute
-            addr = self.addr_absolute()
-            val = (self.bus.read(addr) + 1) & 0xFF
-            self.bus.write(addr, val)
-            self.update_zn(val)
-        elif opcode == 0xF0:  # BEQ
-            offset = self.fetch_byte()
-            if self.get_flag(FLAG_Z):
-                cycles += 1
-                new_pc = (self.PC + ((offset ^ 0x80) - 0x80)) & 0xFFFF
-                if (new_pc & 0xFF00) != (self.PC & 0xFF00):
-                    cycles += 1
-                self.PC = new_pc
-        elif opcode == 0xF1:  # SBC (Indirect),Y
-            addr = self.addr_indirect_y(check_page_cross=True)
-            self.sbc(self.bus.read(addr))
-        elif opcode == 0xF5:  # SBC Zero Page,X
-            addr = self.addr_zero_page_x()
-            self.sbc(self.bus.read(addr))
-        elif opcode == 0xF6:  # INC Zero Page,X
-            addr = self.addr_zero_page_x()
-            val = (self.bus.read(addr) + 1) & 0xFF
-            self.bus.write(addr, val)
-            self.update_zn(val)
-        elif opcode == 0xF8:  # SED
-            self.set_flag(FLAG_D, True)
-        elif opcode == 0xF9:  # SBC Absolute,Y
-            addr = self.addr_absolute_y(check_page_cross=True)
-            self.sbc(self.bus.read(addr))
-        elif opcode == 0xFD:  # SBC Absolute,X
-            addr = self.addr_absolute_x(check_page_cross=True)
-            self.sbc(self.bus.read(addr))
-        elif opcode == 0xFE:  # INC Absolute,X
-            addr = self.addr_absolute_x()
-            val = (self.bus.read(addr) + 1) & 0xFF
-            self.bus.write(addr, val)
-            self.update_zn(val)
-        else:
-            # Unsupported/illegal opcode
-            # For simplicity, we'll treat any unknown opcode as NOP
-            # In a full emulator, you might implement unofficial opcodes or handle gracefully.
-            pass
-        
+        handler, addressing, cycles = self.dispatch[opcode]
+        extra = handler(addressing)
+        if extra:
+            cycles += extra
+        self.profiler.record(pc, opcode, cycles, self.PC)
         return cycles
+    
+    def irq_profiled(self):
+        cycles = CPU6502.irq(self)
+        if cycles:
+            self.profiler.interrupt("IRQ", cycles)
+        return cycles
+
+    # Opcode handlers. Each takes the addressing-mode function from the
+    # dispatch table and calls it (at most once) to fetch its operand address.
+    def branch(self, target, condition):
+        if not condition:
+            return 0
+        extra = 2 if (target & 0xFF00) != (self.PC & 0xFF00) else 1
+        self.PC = target
+        return extra
+
+    def op_bpl(self, addressing):
+        return self.branch(addressing(), not (self.STATUS & FLAG_N))
+    def op_bmi(self, addressing):
+        return self.branch(addressing(), self.STATUS & FLAG_N)
+    def op_bvc(self, addressing):
+        return self.branch(addressing(), not (self.STATUS & FLAG_V))
+    def op_bvs(self, addressing):
+        return self.branch(addressing(), self.STATUS & FLAG_V)
+    def op_bcc(self, addressing):
+        return self.branch(addressing(), not (self.STATUS & FLAG_C))
+    def op_bcs(self, addressing):
+        return self.branch(addressing(), self.STATUS & FLAG_C)
+    def op_bne(self, addressing):
+        return self.branch(addressing(), not (self.STATUS & FLAG_Z))
+    def op_beq(self, addressing):
+        return self.branch(addressing(), self.STATUS & FLAG_Z)
+
+    def op_ora(self, addressing):
+        self.ora(self.bus.read(addressing()))
+    def op_and(self, addressing):
+        self.and_(self.bus.read(addressing()))
+    def op_eor(self, addressing):
+        self.eor(self.bus.read(addressing()))
+    def op_adc(self, addressing):
+        self.adc(self.bus.read(addressing()))
+    def op_sbc(self, addressing):
+        self.sbc(self.bus.read(addressing()))
+    def op_cmp(self, addressing):
+        self.cmp(self.A, self.bus.read(addressing()))
+    def op_cpx(self, addressing):
+        self.cmp(self.X, self.bus.read(addressing()))
+    def op_cpy(self, addressing):
+        self.cmp(self.Y, self.bus.read(addressing()))
+    def op_bit(self, addressing):
+        self.bit_test(self.bus.read(addressing()))
+
+    def op_lda(self, addressing):
+        self.A = self.bus.read(addressing())
+        self.update_zn(self.A)
+    def op_ldx(self, addressing):
+        self.X = self.bus.read(addressing())
+        self.update_zn(self.X)
+    def op_ldy(self, addressing):
+        self.Y = self.bus.read(addressing())
+        self.update_zn(self.Y)
+    def op_sta(self, addressing):
+        self.bus.write(addressing(), self.A)
+    def op_stx(self, addressing):
+        self.bus.write(addressing(), self.X)
+    def op_sty(self, addressing):
+        self.bus.write(addressing(), self.Y)
+
+    # Shifts and rotates: the accumulator mode resolves to None
+    def op_asl(self, addressing):
+        self.asl(addressing())
+    def op_lsr(self, addressing):
+        self.lsr(addressing())
+    def op_rol(self, addressing):
+        self.rol(addressing())
+    def op_ror(self, addressing):
+        self.ror(addressing())
+
+    def op_inc(self, addressing):
+        addr = addressing()
+        val = (self.bus.read(addr) + 1) & 0xFF
+        self.bus.write(addr, val)
+        self.update_zn(val)
+    def op_dec(self, addressing):
+        addr = addressing()
+        val = (self.bus.read(addr) - 1) & 0xFF
+        self.bus.write(addr, val)
+        self.update_zn(val)
+    def op_inx(self, addressing):
+        self.X = (self.X + 1) & 0xFF
+        self.update_zn(self.X)
+    def op_iny(self, addressing):
+        self.Y = (self.Y + 1) & 0xFF
+        self.update_zn(self.Y)
+    def op_dex(self, addressing):
+        self.X = (self.X - 1) & 0xFF
+        self.update_zn(self.X)
+    def op_dey(self, addressing):
+        self.Y = (self.Y - 1) & 0xFF
+        self.update_zn(self.Y)
+
+    def op_tax(self, addressing):
+        self.X = self.A
+        self.update_zn(self.X)
+    def op_tay(self, addressing):
+        self.Y = self.A
+        self.update_zn(self.Y)
+    def op_txa(self, addressing):
+        self.A = self.X
+        self.update_zn(self.A)
+    def op_tya(self, addressing):
+        self.A = self.Y
+        self.update_zn(self.A)
+    def op_tsx(self, addressing):
+        self.X = self.SP
+        self.update_zn(self.X)
+    def op_txs(self, addressing):
+        self.SP = self.X
+
+    def op_clc(self, addressing):
+        self.STATUS &= ~FLAG_C
+    def op_sec(self, addressing):
+        self.STATUS |= FLAG_C
+    def op_cli(self, addressing):
+        self.STATUS &= ~FLAG_I
+    def op_sei(self, addressing):
+        self.STATUS |= FLAG_I
+    def op_clv(self, addressing):
+        self.STATUS &= ~FLAG_V
+    def op_cld(self, addressing):
+        self.STATUS &= ~FLAG_D
+    def op_sed(self, addressing):
+        self.STATUS |= FLAG_D
+
+    def op_pha(self, addressing):
+        self.push(self.A)
+    def op_pla(self, addressing):
+        self.A = self.pop()
+        self.update_zn(self.A)
+    def op_php(self, addressing):
+        # Push SR with B flag and U flag set
+        self.push(self.STATUS | FLAG_B | FLAG_U)
+    def op_plp(self, addressing):
+        # The B flag and unused bit are not real flags, ensure proper state
+        self.STATUS = (self.pop() | FLAG_U) & ~FLAG_B
+
+    def op_jmp(self, addressing):
+        self.PC = addressing()
+    def op_jsr(self, addressing):
+        addr = addressing()
+        # Push address of last byte of JSR (PC-1) onto stack
+        return_addr = (self.PC - 1) & 0xFFFF
+        self.push((return_addr >> 8) & 0xFF)
+        self.push(return_addr & 0xFF)
+        self.PC = addr
+    def op_rts(self, addressing):
+        lo = self.pop()
+        hi = self.pop()
+        self.PC = ((lo | (hi << 8)) + 1) & 0xFFFF
+    def op_rti(self, addressing):
+        # Pull flags, then PC from stack
+        self.STATUS = (self.pop() | FLAG_U) & ~FLAG_B
+        lo = self.pop()
+        hi = self.pop()
+        self.PC = lo | (hi << 8)
+    def op_brk(self, addressing):
+        self.fetch_byte()  # BRK has an unused padding byte after opcode
+        self.set_flag(FLAG_B, True)
+        self.push((self.PC >> 8) & 0xFF)
+        self.push(self.PC & 0xFF)
+        self.push(self.STATUS)
+        self.set_flag(FLAG_I, True)
+        self.PC = self.bus.read(0xFFFE) | (self.bus.read(0xFFFF) << 8)
+
+    def op_nop(self, addressing):
+        # Also used for unsupported/illegal opcodes
+        pass
 
 class Bus:
     """Memory bus connecting CPU, PPU, and Cartridge."""
     def __init__(self):
         # 2KB internal RAM
-        self.ram = [0x00] * RAM_SIZE
+        self.ram = bytearray(RAM_SIZE)
         # PPU memory: 2KB nametable VRAM and 32-byte palette
-        self.vram = [0x00] * 0x800  # will mirror based on cart mirroring type
-        self.palette = [0x00] * 0x20
+        self.vram = bytearray(0x800)  # will mirror based on cart mirroring type
+        self.palette = bytearray(0x20)
         # OAM (sprite memory)
-        self.oam = [0x00] * 256
-        # Cartridge ROM/RAM
-        self.prg_rom = []   # PRG ROM bytes
-        self.prg_ram = [0x00] * 0x2000  # 8KB PRG RAM (if used by cart)
-        self.chr_rom = []   # CHR ROM bytes (pattern tables)
-        self.chr_ram = []   # if CHR RAM is needed (for carts with 0 CHR ROM)
-        # Mirroring type from cartridge ('H' or 'V')
-        self.mirroring = 'H'
+        self.oam = bytearray(256)
+        # Cartridge: 8KB PRG RAM plus the mapper, which owns the PRG/CHR images,
+        # the bank windows and the nametable mirroring ('H', 'V', '4', or '0'/'1' single-screen)
+        self.prg_ram = bytearray(0x2000)  # 8KB PRG RAM (if used by cart)
+        self.mapper = Mapper(b"", b"", 'H')  # empty NROM until a cartridge is loaded
         # Controller state and shift registers
         self.controller_state = 0x00
         self.controller_shift = 0x00
@@ -995,6 +664,50 @@ class Bus:
         self.cpu = CPU6502(self)
         # Cycle counter (not real time, just for managing frames)
         self.cycles = 0
+        # 256-entry page tables (one entry per 256-byte CPU page). A page is either
+        # served straight from a memoryview slice, or (if the slice is None) by its handler.
+        self.read_pages = [None] * 256
+        self.write_pages = [None] * 256
+        self.read_handlers = [self.read_open_bus] * 256
+        self.write_handlers = [self.write_ignore] * 256
+        self.build_memory_map()
+    
+    def build_memory_map(self):
+        """(Re)build the page tables; called whenever a backing buffer is replaced."""
+        ram = memoryview(self.ram)
+        prg_ram = memoryview(self.prg_ram)
+        for page in range(0x80):
+            read_page = write_page = None
+            read_handler, write_handler = self.read_open_bus, self.write_ignore
+            if page < 0x20:
+                # Internal RAM, mirrored every 0x800 bytes
+                start = (page << 8) % RAM_SIZE
+                read_page = write_page = ram[start:start + 0x100]
+            elif page < 0x60:
+                # PPU registers, APU/IO and expansion area
+                read_handler, write_handler = self.read_io, self.write_io
+            elif page < 0x80:
+                start = (page - 0x60) << 8
+                read_page = write_page = prg_ram[start:start + 0x100]
+            self.read_pages[page] = read_page
+            self.write_pages[page] = write_page
+            self.read_handlers[page] = read_handler
+            self.write_handlers[page] = write_handler
+        # $8000-$FFFF follows the mapper's PRG windows; writes there are mapper registers
+        self.mapper.on_prg_change = self.map_prg_window
+        for window in range(4):
+            self.map_prg_window(window)
+    
+    def map_prg_window(self, window):
+        """Point the 32 pages of 8KB PRG window 0-3 at the mapper's current bank (no copying)."""
+        bank = self.mapper.prg_windows[window]
+        first = 0x80 + window * 0x20
+        for page in range(first, first + 0x20):
+            start = (page - first) << 8
+            self.read_pages[page] = bank[start:start + 0x100] if bank is not None else None
+            self.write_pages[page] = None
+            self.read_handlers[page] = self.read_open_bus
+            self.write_handlers[page] = self.write_mapper
     
     def load_cartridge(self, filepath):
         """Load an iNES format ROM file into memory."""
@@ -1009,35 +722,40 @@ class Bus:
         # flag6 bits: mirroring in bit0, battery in bit1, trainer in bit2, four-screen in bit3
         if flag6 & 0x08:
             # Four-screen mode (rare, e.g. Gauntlet). We will treat it as special mirroring.
-            self.mirroring = '4'
+            mirroring = '4'
         else:
-            self.mirroring = 'V' if (flag6 & 0x01) else 'H'
+            mirroring = 'V' if (flag6 & 0x01) else 'H'
         # Skip trainer if present (512 bytes after header)
         offset = 16
         if flag6 & 0x04:
             offset += 512
         # Load PRG ROM
         prg_size = prg_banks * 16384
-        self.prg_rom = list(data[offset: offset + prg_size])
+        prg_rom = data[offset: offset + prg_size]
         offset += prg_size
-        # Load CHR ROM (if size is 0, that means the cart uses CHR RAM instead)
+        # Load CHR ROM (if size is 0, that means the cart uses 8KB of CHR RAM instead)
         chr_size = chr_banks * 8192
-        if chr_size == 0:
-            # allocate 8KB CHR RAM
-            self.chr_ram = [0x00] * 8192
-            self.chr_rom = []
-        else:
-            self.chr_rom = list(data[offset: offset + chr_size])
-        # If only one PRG bank (16KB), mirror it into 0xC000-0xFFFF
-        if prg_banks == 1:
-            self.prg_rom = self.prg_rom * 2
-        # Reset CPU and clear memory
-        self.ram = [0x00] * RAM_SIZE
-        self.vram = [0x00] * 0x800
-        self.palette = [0x00] * 0x20
-        self.oam = [0x00] * 256
+        chr_rom = data[offset: offset + chr_size]
+        # Raises ValueError for mappers we don't implement
+        self.mapper = create_mapper(mapper_number(data), prg_rom, chr_rom, mirroring)
+        # Reset CPU and clear memory (in place, the page tables hold views into RAM)
+        self.ram[:] = bytes(RAM_SIZE)
+        self.prg_ram[:] = bytes(len(self.prg_ram))
+        self.vram[:] = bytes(0x800)
+        self.palette[:] = bytes(0x20)
+        self.oam[:] = bytes(256)
+        # Page tables now point at the new mapper's PRG windows
+        self.build_memory_map()
+        self.cpu.block_cache.clear()
         self.cpu.reset()
-        # Clear PPU scroll/addr toggles
+        # PPU registers back to their power-on state, so a reloaded ROM runs exactly
+        # like a freshly started one (input movies depend on it)
+        self.ppu_ctrl = 0x00
+        self.ppu_mask = 0x00
+        self.ppu_status = 0x00
+        self.ppu_scroll_x = 0
+        self.ppu_scroll_y = 0
+        self.ppu_addr_temp = 0x0000
         self.ppu_addr_latch = False
         # Clear controller
         self.controller_state = 0x00
@@ -1048,10 +766,47 @@ class Bus:
     # Memory read/write methods
     def read(self, addr):
         addr &= 0xFFFF
-        if addr < 0x2000:
-            # Internal RAM (2KB mirrored each 0x800 bytes)
-            return self.ram[addr % RAM_SIZE]
-        elif addr < 0x4000:
+        page = self.read_pages[addr >> 8]
+        if page is not None:
+            return page[addr & 0xFF]
+        return self.read_handlers[addr >> 8](addr)
+    
+    def write(self, addr, data):
+        addr &= 0xFFFF
+        page = self.write_pages[addr >> 8]
+        if page is not None:
+            page[addr & 0xFF] = data & 0xFF
+        else:
+            self.write_handlers[addr >> 8](addr, data & 0xFF)
+    
+    def read_open_bus(self, addr):
+        # Unmapped (no cartridge loaded)
+        return 0
+    
+    def write_ignore(self, addr, data):
+        # Unmapped (no cartridge loaded)
+        pass
+    
+    def write_mapper(self, addr, data):
+        # PRG ROM is read-only; writes to $8000-$FFFF program the mapper's bank registers
+        self.mapper.write(addr, data)
+    
+    def nametable_index(self, addr):
+        """Index into the 2KB of nametable VRAM for PPU address $2000-$3EFF."""
+        mirroring = self.mapper.mirroring
+        if mirroring == 'H':
+            # Horizontal: $2000=$2400 and $2800=$2C00
+            return ((addr >> 1) & 0x0400) | (addr & 0x03FF)
+        elif mirroring == '0':
+            return addr & 0x03FF
+        elif mirroring == '1':
+            return 0x0400 | (addr & 0x03FF)
+        # Vertical: $2000=$2800 and $2400=$2C00 (four-screen has no extra VRAM here, so it falls back to this)
+        return addr & 0x07FF
+    
+    def read_io(self, addr):
+        """Read handler for the register pages ($2000-$5FFF)."""
+        if addr < 0x4000:
             # PPU registers (mirrored every 8 bytes)
             reg = addr & 0x2007
             if reg == 0x2002:  # PPUSTATUS
@@ -1082,25 +837,11 @@ class Bus:
                 else:
                     # Nametable or CHR memory:
                     if addr < 0x2000:
-                        # Pattern table (CHR ROM/RAM)
-                        if self.chr_rom:
-                            data = self.chr_rom[addr]
-                        else:
-                            data = self.chr_ram[addr]
+                        # Pattern table (CHR ROM/RAM through the mapper's CHR windows)
+                        data = self.mapper.read_chr(addr)
                     else:
                         # Nametable VRAM (2KB mirrored)
-                        # Apply mirroring:
-                        if self.mirroring == 'H':
-                            # horizontal mirroring: mirror vertical, i.e., if addr >= 0x2800 subtract 0x0800
-                            if addr & 0x0800:
-                                addr = addr - 0x0800
-                        elif self.mirroring == 'V':
-                            # vertical mirroring: mirror horizontal, if addr in right half subtract 0x0400
-                            if addr & 0x0400:
-                                addr = addr - 0x0400
-                        # else if '4' (four-screen), we would not mirror (but we didn't implement separate 4-screen memory)
-                        addr_index = addr & 0x07FF
-                        data = self.vram[addr_index]
+                        data = self.vram[self.nametable_index(addr)]
                     # (For true accuracy, PPU reads have a buffered behavior, but we skip that.)
                 # Increment VRAM address after read by 1 or 32 depending on $2000 setting
                 if self.ppu_ctrl & 0x04:
@@ -1130,23 +871,13 @@ class Bus:
                 return bit
             # Unused or unimplemented registers (sound, expansion) return 0
             return 0
-        elif addr < 0x6000:
+        else:
             # Normally cartridge expansion ROM or other hardware (uncommon)
             return 0
-        elif addr < 0x8000:
-            # Cartridge PRG RAM (if present)
-            return self.prg_ram[addr - 0x6000]
-        else:
-            # Cartridge PRG ROM
-            return self.prg_rom[addr - 0x8000]
     
-    def write(self, addr, data):
-        addr &= 0xFFFF
-        data &= 0xFF
-        if addr < 0x2000:
-            # Internal RAM
-            self.ram[addr % RAM_SIZE] = data
-        elif addr < 0x4000:
+    def write_io(self, addr, data):
+        """Write handler for the register pages ($2000-$5FFF)."""
+        if addr < 0x4000:
             reg = addr & 0x2007
             if reg == 0x2000:  # PPUCTRL
                 self.ppu_ctrl = data
@@ -1202,22 +933,11 @@ class Bus:
                         self.palette[index] = data
                 else:
                     if addr < 0x2000:
-                        # CHR ROM/RAM write (usually CHR ROM is read-only; CHR RAM can be written)
-                        if self.chr_rom:
-                            # Typically CHR ROM is not writable; ignoring or could write to CHR RAM if used
-                            pass
-                        else:
-                            self.chr_ram[addr] = data
+                        # CHR write: CHR ROM ignores it, CHR RAM stores it and marks its bank dirty
+                        self.mapper.write_chr(addr, data)
                     else:
                         # Nametable VRAM write (with mirroring)
-                        if self.mirroring == 'H':
-                            if addr & 0x0800:
-                                addr = addr - 0x0800
-                        elif self.mirroring == 'V':
-                            if addr & 0x0400:
-                                addr = addr - 0x0400
-                        index = addr & 0x07FF
-                        self.vram[index] = data
+                        self.vram[self.nametable_index(addr)] = data
                 # Auto-increment VRAM address after write
                 if self.ppu_ctrl & 0x04:
                     self.ppu_addr_temp = (self.ppu_addr_temp + 32) & 0xFFFF
@@ -1229,8 +949,12 @@ class Bus:
                 page = data
                 start_addr = page * 0x100
                 # Read 256 bytes from start_addr and write to OAM (starting at index 0)
-                for i in range(256):
-                    self.oam[i] = self.read((start_addr + i) & 0xFFFF)
+                source = self.read_pages[page]
+                if source is not None:
+                    self.oam[:] = source
+                else:
+                    for i in range(256):
+                        self.oam[i] = self.read((start_addr + i) & 0xFFFF)
                 # During DMA, 513 or 514 CPU cycles occur (depending on alignment). For simplicity, ignore timing.
             elif addr == 0x4016:
                 # Controller strobe
@@ -1244,14 +968,8 @@ class Bus:
                     self.controller_shift = self.controller_state
                     self.controller_index = 0
             # Note: Sound registers ($4000-$4013, $4015, $4017) are not implemented.
-        elif addr < 0x6000:
-            # Expansion or other I/O, not used
-            pass
-        elif addr < 0x8000:
-            # PRG RAM
-            self.prg_ram[addr - 0x6000] = data
         else:
-            # PRG ROM is typically read-only; writes might go to battery RAM on some carts (not in mapper0)
+            # Expansion or other I/O, not used
             pass
 
 # NES Emulator main class tying it all together
@@ -1260,9 +978,18 @@ class NESEmulator:
         self.bus = Bus()
         self.cpu = self.bus.cpu
         # Initialize variables for rendering and vibe mode
-        self.framebuffer = [0] * (SCREEN_WIDTH * SCREEN_HEIGHT)  # will hold pixel colors (RGB or palette index)
+        # Pixel colors: a persistent (240, 256, 3) RGB array with NumPy, else a list of RGB tuples
+        if np is not None:
+            self.framebuffer = np.zeros((SCREEN_HEIGHT, SCREEN_WIDTH, 3), dtype=np.uint8)
+        else:
+            self.framebuffer = [0] * (SCREEN_WIDTH * SCREEN_HEIGHT)
+        # Decoded CHR: 64 tiles of 8x8 2-bit pixel indices per 1KB bank (NumPy renderer only)
+        self.tile_cache = None
+        self.tile_cache_mapper = None
         self.vibe_mode = False
         self.vibe_offset = 0
+        # Running count of CPU instructions, used by the headless benchmark
+        self.instructions_executed = 0
     
     def load_rom(self, filepath):
         self.bus.load_cartridge(filepath)
@@ -1276,13 +1003,41 @@ class NESEmulator:
         """Run the CPU until one frame's worth of CPU cycles have been executed, then render the frame."""
         cycles_per_frame = 29780  # ~29780 CPU cycles per frame for NTSC (approximation)
         self.bus.cycles = 0
+        instructions = 0
+        mapper = self.bus.mapper
+        # IRQ mappers (MMC3) need the frame split into scanlines; the rest run it in one go
+        scanline = 0
+        scanline_end = CYCLES_PER_SCANLINE if mapper.has_irq else cycles_per_frame
+        # Blocks would hide individual instructions from an attached profiler
+        blocks = self.cpu.block_cache if self.cpu.use_blocks and self.cpu.profiler is None else None
+        # Only run a block if even its slowest path stops short of the next boundary,
+        # so frame and scanline timing match the plain interpreter exactly
+        block_limit = min(scanline_end, cycles_per_frame)
         # Run CPU until we've simulated enough cycles for one frame
         while self.bus.cycles < cycles_per_frame:
+            if blocks is not None:
+                block = blocks.lookup(self.cpu.PC)
+                if block is not None and self.bus.cycles + block.max_cycles < block_limit:
+                    cycles = block.run(self.cpu)
+                    self.bus.cycles += cycles
+                    instructions += block.length
+                    continue
             # Execute one CPU instruction
             cycles = self.cpu.execute_instruction()
             self.bus.cycles += cycles
+            instructions += 1
             # PPU would normally run ~3 cycles per CPU, updating vblank, sprite hit, etc.
             # We simplify and handle vblank flag when frame completes.
+            if self.bus.cycles >= scanline_end:
+                # Visible scanlines clock the mapper's counter while rendering is enabled
+                if scanline < SCREEN_HEIGHT and self.bus.ppu_mask & 0x18:
+                    mapper.clock_scanline()
+                if mapper.irq_pending:
+                    self.bus.cycles += self.cpu.irq()
+                scanline += 1
+                scanline_end = (scanline + 1) * CYCLES_PER_SCANLINE
+                block_limit = min(scanline_end, cycles_per_frame)
+        self.instructions_executed += instructions
         # At this point, we've simulated one frame of CPU time. Now produce the video output.
         self.render_frame()
         # Set the VBlank flag (PPUSTATUS bit 7) to indicate the frame has been drawn
@@ -1291,6 +1046,53 @@ class NESEmulator:
         if self.vibe_mode:
             self.vibe_offset = (self.vibe_offset + 1) % 64
     
+    def nametable_offset(self, nt_index):
+        """VRAM offset of logical nametable 0-3 after cartridge mirroring."""
+        return self.bus.nametable_index(0x2000 + nt_index * 0x400)
+    
+    def decode_tiles(self):
+        """Decode the CHR banks marked dirty by the mapper into the (banks * 64, 8, 8) tile cache."""
+        mapper = self.bus.mapper
+        if self.tile_cache_mapper is not mapper:
+            # New cartridge: every bank of the new mapper starts out dirty
+            self.tile_cache = np.zeros((mapper.chr_bank_count * 64, 8, 8), dtype=np.uint8)
+            self.tile_cache_mapper = mapper
+        chr_data = np.frombuffer(mapper.chr, dtype=np.uint8)
+        for bank in mapper.chr_dirty:
+            planes = chr_data[bank * 0x400:(bank + 1) * 0x400].reshape(64, 2, 8)
+            # unpackbits yields MSB first, which is pixel x=0
+            lo = np.unpackbits(planes[:, 0, :], axis=1).reshape(64, 8, 8)
+            hi = np.unpackbits(planes[:, 1, :], axis=1).reshape(64, 8, 8)
+            self.tile_cache[bank * 64:(bank + 1) * 64] = lo | (hi << 1)
+        mapper.chr_dirty.clear()
+    
+    def render_frame_vectorized(self, scroll_x, scroll_y, base_table):
+        """NumPy version of render_frame: whole-frame gathers instead of a per-pixel loop."""
+        mapper = self.bus.mapper
+        if self.tile_cache_mapper is not mapper or mapper.chr_dirty:
+            self.decode_tiles()
+        # Pattern table tile 0-511 -> tile in the cache, through the current 1KB CHR windows
+        chr_tiles = (np.array(mapper.chr_banks, dtype=np.intp) * 64)[:, None] + np.arange(64)
+        vram = np.frombuffer(self.bus.vram, dtype=np.uint8)
+        # Tile numbers for the 2x2 logical nametables (30 rows x 32 columns each)
+        tables = [vram[offset:offset + 960].reshape(30, 32)
+                  for offset in (self.nametable_offset(i) for i in range(4))]
+        tile_map = np.block([[tables[0], tables[1]], [tables[2], tables[3]]])
+        # Only the 31x33 tiles under the 256x240 window are expanded to pixels
+        tile_y0, fine_y = divmod(scroll_y % 480, 8)
+        tile_x0, fine_x = divmod(scroll_x % 512, 8)
+        rows = np.arange(tile_y0, tile_y0 + 31) % 60
+        cols = np.arange(tile_x0, tile_x0 + 33) % 64
+        tiles = tile_map[rows[:, None], cols].astype(np.intp) + (base_table >> 4)
+        pixels = self.tile_cache[chr_tiles.ravel()[tiles]].transpose(0, 2, 1, 3).reshape(31 * 8, 33 * 8)
+        window = pixels[fine_y:fine_y + SCREEN_HEIGHT, fine_x:fine_x + SCREEN_WIDTH]
+        # Color 0 is the universal background, 1-3 come from background palette 0
+        lut = np.array(self.bus.palette[0:4], dtype=np.intp)
+        if self.vibe_mode:
+            lut += self.vibe_offset
+        # Written into the persistent framebuffer, which the GUI's image reads from
+        np.take(NES_PALETTE_RGB[lut & 0x3F], window, axis=0, out=self.framebuffer)
+    
     def render_frame(self):
         """Render the background and sprites into the framebuffer for the current PPU memory state."""
         # Determine base pattern table for background from PPUCTRL bit 4
@@ -1307,6 +1109,9 @@ class NESEmulator:
         # bit0 -> add 256 to scrollX if 1, bit1 -> add 240 to scrollY if 1
         scroll_x = coarse_scroll_x * 8 + fine_scroll_x + ((nt_select & 0x01) * 256)
         scroll_y = coarse_scroll_y * 8 + fine_scroll_y + ((nt_select & 0x02) * 240)
+        if np is not None:
+            self.render_frame_vectorized(scroll_x, scroll_y, base_table)
+            return
         # Iterate over each pixel of the 256x240 frame
         for py in range(SCREEN_HEIGHT):
             for px in range(SCREEN_WIDTH):
@@ -1316,18 +1121,6 @@ class NESEmulator:
                 eff_y = (scroll_y + py) % 480
                 # Determine which nametable (0-3) these coords fall in (each nametable is 256x240)
                 nt_index = (0 if eff_x < 256 else 1) + (0 if eff_y < 240 else 2)
-                # Apply mirroring to map to physical nametable memory
-                if self.bus.mirroring == 'H':
-                    # Horizontal: nametables 0 and 1 are on top, 2 mirrors 0, 3 mirrors 1
-                    if nt_index == 2: nt_index = 0
-                    if nt_index == 3: nt_index = 1
-                elif self.bus.mirroring == 'V':
-                    # Vertical: nametables 0 and 2 are left, 1 mirrors 0, 3 mirrors 2
-                    if nt_index == 1: nt_index = 0
-                    if nt_index == 3: nt_index = 2
-                elif self.bus.mirroring == '4':
-                    # Four-screen (not fully implemented, treat as no mirroring)
-                    pass
                 # Compute indices within the nametable
                 nx = eff_x % 256
                 ny = eff_y % 240
@@ -1346,27 +1139,12 @@ class NESEmulator:
                 # Nametable memory index of the tile number
                 nametable_addr = nt_base + (tile_row * 32) + tile_col
                 # Apply mirroring logic to fetch the correct nametable data from VRAM
-                addr = nametable_addr
-                if self.bus.mirroring == 'H':
-                    if addr & 0x0800: addr -= 0x0800
-                elif self.bus.mirroring == 'V':
-                    if addr & 0x0400: addr -= 0x0400
-                tile_index = self.bus.vram[addr & 0x07FF]
+                tile_index = self.bus.vram[self.bus.nametable_index(nametable_addr)]
                 # Pattern table address for this tile's graphics
                 pattern_addr = base_table + tile_index * 16
-                # Fetch the pattern table bytes for this tile row
-                if pattern_addr < len(self.bus.chr_rom):
-                    byte1 = self.bus.chr_rom[pattern_addr + fine_y]
-                    byte2 = self.bus.chr_rom[pattern_addr + fine_y + 8]
-                else:
-                    # If CHR RAM or out-of-range, handle accordingly
-                    if self.bus.chr_rom:
-                        # If out-of-range CHR ROM address (shouldn't happen with correct tile_index)
-                        byte1 = byte2 = 0
-                    else:
-                        # CHR RAM case
-                        byte1 = self.bus.chr_ram[pattern_addr + fine_y]
-                        byte2 = self.bus.chr_ram[pattern_addr + fine_y + 8]
+                # Fetch the pattern table bytes for this tile row (through the mapper's CHR banks)
+                byte1 = self.bus.mapper.read_chr(pattern_addr + fine_y)
+                byte2 = self.bus.mapper.read_chr(pattern_addr + fine_y + 8)
                 # Extract the bit corresponding to fine_x (bit7 = x=0)
                 bit0 = (byte1 >> (7 - fine_x)) & 1
                 bit1 = (byte2 >> (7 - fine_x)) & 1
@@ -1391,25 +1169,58 @@ class NESEmulator:
                 pos = py * SCREEN_WIDTH + px
                 self.framebuffer[pos] = rgb
     
+    def snapshot(self):
+        """Serialize the machine state into a fixed-layout binary blob."""
+        bus, cpu = self.bus, self.cpu
+        header = SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+            cpu.A, cpu.X, cpu.Y, cpu.SP, cpu.STATUS, cpu.PC,
+            bus.ppu_ctrl, bus.ppu_mask, bus.ppu_status, bus.ppu_scroll_x, bus.ppu_scroll_y,
+            bus.ppu_addr_temp, bus.ppu_addr_latch,
+            bus.controller_shift, bus.controller_strobe, bus.controller_index,
+            self.vibe_offset)
+        return b"".join((header, bus.ram, bus.vram, bus.palette, bus.oam, bus.prg_ram,
+                         bus.mapper.save_state()))
+    
+    def restore(self, data):
+        """Load a blob produced by snapshot() for the currently loaded ROM."""
+        bus, cpu = self.bus, self.cpu
+        sizes = (len(bus.ram), len(bus.vram), len(bus.palette), len(bus.oam), len(bus.prg_ram))
+        if len(data) != SNAPSHOT_HEADER.size + sum(sizes) + bus.mapper.state_size():
+            raise ValueError("Snapshot does not match the loaded cartridge")
+        fields = SNAPSHOT_HEADER.unpack_from(data)
+        if fields[0] != SNAPSHOT_MAGIC or fields[1] != SNAPSHOT_VERSION:
+            raise ValueError("Not a version %d NES snapshot" % SNAPSHOT_VERSION)
+        (cpu.A, cpu.X, cpu.Y, cpu.SP, cpu.STATUS, cpu.PC,
+         bus.ppu_ctrl, bus.ppu_mask, bus.ppu_status, bus.ppu_scroll_x, bus.ppu_scroll_y,
+         bus.ppu_addr_temp, latch,
+         bus.controller_shift, strobe, bus.controller_index,
+         self.vibe_offset) = fields[2:]
+        bus.ppu_addr_latch = bool(latch)
+        bus.controller_strobe = bool(strobe)
+        # Copy in place: the page tables hold views into these buffers
+        offset = SNAPSHOT_HEADER.size
+        for buffer, size in zip((bus.ram, bus.vram, bus.palette, bus.oam, bus.prg_ram), sizes):
+            buffer[:] = data[offset:offset + size]
+            offset += size
+        bus.mapper.load_state(data[offset:])
+    
+    def framebuffer_bytes(self):
+        """Return the current frame as packed RGB bytes (for hashing and headless output)."""
+        if np is not None and isinstance(self.framebuffer, np.ndarray):
+            return self.framebuffer.tobytes()
+        return bytes([channel for rgb in self.framebuffer for channel in rgb])
+    
     def get_frame_image(self):
-        """Return a Pillow Image for the current framebuffer."""
-        # Create an RGB image from the framebuffer pixel data
-        if Image is None:
-            # If Pillow is not available, create a Tk PhotoImage with a color string (less efficient)
-            # We'll build a color string per line for demonstration if needed.
-            photo = tk.PhotoImage(width=SCREEN_WIDTH, height=SCREEN_HEIGHT)
-            for y in range(SCREEN_HEIGHT):
-                line = ""
-                for x in range(SCREEN_WIDTH):
-                    r, g, b = self.framebuffer[y*SCREEN_WIDTH + x]
-                    line += "#%02x%02x%02x " % (r, g, b)
-                photo.put(line, to=(0, y))
-            return photo
-        else:
-            # Use Pillow to create image from data
-            img = Image.new("RGB", (SCREEN_WIDTH, SCREEN_HEIGHT))
-            img.putdata(self.framebuffer)
-            return ImageTk.PhotoImage(img)
+        """Return a Pillow Image for the current framebuffer (sharing its memory when it is a NumPy array)."""
+        size = (SCREEN_WIDTH, SCREEN_HEIGHT)
+        if np is not None and isinstance(self.framebuffer, np.ndarray):
+            return Image.frombuffer("RGB", size, self.framebuffer, "raw", "RGB", 0, 1)
+        return Image.frombytes("RGB", size, self.framebuffer_bytes())
+    
+    def frame_ppm(self):
+        """Return the current frame as a binary PPM, which Tk can load without Pillow."""
+        return b"P6 %d %d 255\n" % (SCREEN_WIDTH, SCREEN_HEIGHT) + self.framebuffer_bytes()
 
 
 # --- Tkinter GUI Setup ---
@@ -1424,6 +1235,17 @@ class NESGUI:
         self.emulator = NESEmulator()
         # Flag to indicate if a ROM is loaded
         self.rom_loaded = False
+        # Rewind history (one snapshot per frame) and whether BackSpace is held
+        self.rewind = RewindBuffer()
+        self.rewinding = False
+        # Buttons currently held on the keyboard; latched into the controller once per frame
+        self.held = 0x00
+        # Input movie being recorded or played back (nesmovie.Movie), and the frame within it
+        self.rom_path = None
+        self.movie_path = None
+        self.movie = None
+        self.movie_mode = None  # "record", "play" or None
+        self.movie_frame = 0
         
         # Set up menu
         menubar = tk.Menu(root)
@@ -1431,6 +1253,10 @@ class NESGUI:
         file_menu = tk.Menu(menubar, tearoff=0)
         file_menu.add_command(label="Open ROM...", command=self.open_rom)
         file_menu.add_separator()
+        file_menu.add_command(label="Record Movie...", command=self.record_movie)
+        file_menu.add_command(label="Play Movie...", command=self.play_movie)
+        file_menu.add_command(label="Stop Movie", command=self.stop_movie)
+        file_menu.add_separator()
         file_menu.add_command(label="Exit", command=root.quit)
         menubar.add_cascade(label="File", menu=file_menu)
         # Emulation menu
@@ -1438,10 +1264,16 @@ class NESGUI:
         emu_menu.add_command(label="Reset", command=self.reset_emulator)
         self.vibe_var = tk.BooleanVar(value=False)
         emu_menu.add_checkbutton(label="Vibe Mode", variable=self.vibe_var, command=self.toggle_vibe)
+        self.blocks_var = tk.BooleanVar(value=True)
+        emu_menu.add_checkbutton(label="Block Cache", variable=self.blocks_var, command=self.toggle_blocks)
         menubar.add_cascade(label="Emulation", menu=emu_menu)
         # Debug menu
         debug_menu = tk.Menu(menubar, tearoff=0)
         debug_menu.add_command(label="CPU State", command=self.show_cpu_state)
+        self.profile_var = tk.BooleanVar(value=False)
+        debug_menu.add_checkbutton(label="Profile CPU", variable=self.profile_var, command=self.toggle_profiler)
+        debug_menu.add_command(label="Export Profile...", command=self.export_profile)
+        debug_menu.add_command(label="Frame Timing", command=self.show_frame_timing)
         menubar.add_cascade(label="Debug", menu=debug_menu)
         # Help menu
         help_menu = tk.Menu(menubar, tearoff=0)
@@ -1453,6 +1285,12 @@ class NESGUI:
         self.canvas = tk.Canvas(root, width=SCREEN_WIDTH, height=SCREEN_HEIGHT, bg="black")
         # We'll place the canvas at the center of window 600x400
         self.canvas.place(x= (600-SCREEN_WIDTH)//2, y=(400-SCREEN_HEIGHT)//2)
+        # A single image item for the life of the window; present() rewrites its pixels in place
+        if ImageTk is not None:
+            self.photo = ImageTk.PhotoImage("RGB", (SCREEN_WIDTH, SCREEN_HEIGHT))
+        else:
+            self.photo = tk.PhotoImage(width=SCREEN_WIDTH, height=SCREEN_HEIGHT)
+        self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo)
         
         # Bind keyboard events for controller input
         root.bind("<KeyPress>", self.on_key_press)
@@ -1464,6 +1302,12 @@ class NESGUI:
         
         # Debug window handle
         self.cpu_window = None
+        # Profile collected through the Debug menu (kept after profiling stops, for export)
+        self.profiler = None
+        self.frames_run = 0
+        # Per-frame emulate/present/sleep times, shown by Debug > Frame Timing
+        self.telemetry = FrameTelemetry()
+        self.timing_window = None
     
     def open_rom(self):
         # Open file dialog to choose ROM
@@ -1476,6 +1320,12 @@ class NESGUI:
             messagebox.showerror("Error", f"Failed to load ROM:\n{e}")
             return
         self.rom_loaded = True
+        self.rom_path = filepath
+        self.rewind.clear()
+        self.stop_movie()
+        if self.profile_var.get():
+            # Start a fresh profile named from the new ROM's vectors
+            self.toggle_profiler()
         self.status_label.config(text=f"Loaded ROM: {filepath.split('/')[-1]}")
         # Reset any debug windows
         if self.cpu_window:
@@ -1487,7 +1337,9 @@ class NESGUI:
     def reset_emulator(self):
         if not self.rom_loaded:
             return
+        self.stop_movie()
         self.emulator.reset()
+        self.rewind.clear()
         # Also reset vibe effect and update UI
         self.vibe_var.set(False)
         self.emulator.vibe_mode = False
@@ -1496,10 +1348,118 @@ class NESGUI:
         # Continue running frames
         self.run_frame()
     
+    def record_movie(self):
+        # Movies start from power-on, so the ROM is reloaded before the first recorded frame
+        if not self.rom_loaded:
+            return
+        filepath = filedialog.asksaveasfilename(defaultextension=".nesm",
+                                                filetypes=[("NES movies", "*.nesm")])
+        if not filepath:
+            return
+        self.stop_movie()
+        self.emulator.load_rom(self.rom_path)
+        self.rewind.clear()
+        self.movie = Movie.for_rom(self.rom_path, EMULATOR_VERSION)
+        self.movie_path = filepath
+        self.movie_mode = "record"
+        self.movie_frame = 0
+        self.status_label.config(text=f"Recording movie: {filepath.split('/')[-1]}")
+    
+    def play_movie(self):
+        if not self.rom_loaded:
+            return
+        filepath = filedialog.askopenfilename(filetypes=[("NES movies", "*.nesm"), ("All Files", "*.*")])
+        if not filepath:
+            return
+        try:
+            movie = Movie.load(filepath)
+            warning = movie.check(self.rom_path, EMULATOR_VERSION)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to load movie:\n{e}")
+            return
+        if warning:
+            messagebox.showwarning("Play Movie", warning)
+        self.stop_movie()
+        self.emulator.load_rom(self.rom_path)
+        self.rewind.clear()
+        self.movie = movie
+        self.movie_mode = "play"
+        self.movie_frame = 0
+        self.status_label.config(text=f"Playing movie: {filepath.split('/')[-1]} ({len(movie)} frames)")
+    
+    def stop_movie(self):
+        # A recording is written out when it stops; playback just hands control back to the keyboard
+        if self.movie_mode == "record":
+            try:
+                self.movie.save(self.movie_path)
+            except OSError as e:
+                messagebox.showerror("Error", f"Failed to save movie:\n{e}")
+            self.status_label.config(text=f"Saved movie: {len(self.movie)} frames")
+        elif self.movie_mode == "play":
+            self.status_label.config(text=f"Movie stopped at frame {self.movie_frame}")
+        self.movie = None
+        self.movie_mode = None
+    
+    def latch_input(self):
+        """Controller state for the next frame: the movie's during playback, else the keyboard's."""
+        if self.movie_mode == "play":
+            if self.movie_frame >= len(self.movie):
+                self.stop_movie()
+                return self.held
+            state = self.movie[self.movie_frame]
+        else:
+            state = self.held
+            if self.movie_mode == "record":
+                self.movie.record(state)
+        self.movie_frame += 1
+        return state
+    
     def toggle_vibe(self):
         # Toggle vibe mode on/off
         self.emulator.vibe_mode = self.vibe_var.get()
     
+    def toggle_blocks(self):
+        # Switch between translated blocks and the plain interpreter
+        self.emulator.cpu.use_blocks = self.blocks_var.get()
+    
+    def toggle_profiler(self):
+        cpu = self.emulator.cpu
+        if self.profile_var.get():
+            self.profiler = Profiler(OPCODE_SPECS)
+            cpu.attach_profiler(self.profiler)
+        else:
+            cpu.detach_profiler()
+        if self.cpu_window:
+            self.profile_label.config(text=self.profile_summary())
+    
+    def export_profile(self):
+        if self.profiler is None:
+            messagebox.showinfo("Export Profile", "Enable Debug > Profile CPU first.")
+            return
+        filepath = filedialog.asksaveasfilename(
+            defaultextension=".txt",
+            filetypes=[("Text report", "*.txt"), ("JSON", "*.json"), ("CSV", "*.csv"),
+                       ("Folded stacks (flamegraph.pl)", "*.folded")])
+        if not filepath:
+            return
+        extension = os.path.splitext(filepath)[1].lower()
+        if extension == ".json":
+            self.profiler.write_json(filepath)
+        elif extension == ".csv":
+            self.profiler.write_csv(filepath)
+        elif extension == ".folded":
+            self.profiler.write_folded(filepath)
+        else:
+            with open(filepath, "w") as f:
+                f.write(self.profiler.report() + "\n")
+    
+    def show_frame_timing(self):
+        if self.timing_window and tk.Toplevel.winfo_exists(self.timing_window):
+            self.timing_window.deiconify()
+            self.timing_window.lift()
+            return
+        self.timing_window = TelemetryWindow(self.root, self.telemetry, title="Frame Timing")
+    
     def show_cpu_state(self):
         # Create or focus a window showing CPU registers
         if self.cpu_window and tk.Toplevel.winfo_exists(self.cpu_window):
@@ -1509,12 +1469,16 @@ class NESGUI:
             return
         self.cpu_window = tk.Toplevel(self.root)
         self.cpu_window.title("CPU State")
-        self.cpu_window.geometry("200x150")
+        self.cpu_window.geometry("420x420")
         # Labels to display registers
         self.cpu_state_label = tk.Label(self.cpu_window, justify="left", font=("Courier", 10))
         self.cpu_state_label.pack(padx=10, pady=10)
+        # Hottest opcodes and PCs while Debug > Profile CPU is on
+        self.profile_label = tk.Label(self.cpu_window, justify="left", anchor="nw", font=("Courier", 9))
+        self.profile_label.pack(padx=10, fill="both", expand=True)
         # Update once to show initial state
         self.update_cpu_window()
+        self.profile_label.config(text=self.profile_summary())
     
     def update_cpu_window(self):
         if not self.rom_loaded or not self.cpu_window:
@@ -1535,67 +1499,104 @@ class NESGUI:
                 f"SP: {c.SP:02X}\n"
                 f"STATUS: {c.STATUS:02X} ({status_flags})")
         self.cpu_state_label.config(text=text)
+        # Sorting 64K PC counters every frame would cost more than the frame, so twice a second
+        if self.frames_run % 30 == 0:
+            self.profile_label.config(text=self.profile_summary())
+    
+    def profile_summary(self, top=8):
+        profiler = self.profiler
+        if profiler is None:
+            return "Debug > Profile CPU to record hot spots"
+        total = profiler.cycles or 1
+        lines = [f"{profiler.instructions} instructions, {profiler.cycles} cycles"
+                 + ("" if self.emulator.cpu.profiler else " (stopped)"), "", "Hot opcodes"]
+        for op in profiler.top_opcodes(top):
+            lines.append(f"  {op:02X} {profiler.names[op]:<8} {100.0 * profiler.opcode_cycles[op] / total:5.1f}%")
+        lines += ["", "Hot PCs"]
+        for pc in profiler.top_pcs(top):
+            lines.append(f"  {pc:04X} {profiler.symbolize(pc):<18} {100.0 * profiler.pc_cycles[pc] / total:5.1f}%")
+        return "\n".join(lines)
     
     def show_about(self):
-        messagebox.showinfo("About", "NES Emulator in Python\nInspired by NESticle\n\nKeys: Arrows = D-Pad, Z = A, X = B, Enter = Start, Shift = Select")
+        messagebox.showinfo("About", "NES Emulator in Python\nInspired by NESticle\n\nKeys: Arrows = D-Pad, Z = A, X = B, Enter = Start, Shift = Select\nHold BackSpace to rewind (not while a movie records or plays)")
     
     def on_key_press(self, event):
-        # Set controller bits on key press
+        # Set held-button bits on key press (run_frame latches them into the controller)
         if not self.rom_loaded:
             return
         # Map keys to controller bits
-        if event.keysym == 'z' or event.keysym == 'Z':
-            self.emulator.bus.controller_state |= BUTTON_A
+        if event.keysym == 'BackSpace':
+            self.rewinding = True
+        elif event.keysym == 'z' or event.keysym == 'Z':
+            self.held |= BUTTON_A
         elif event.keysym == 'x' or event.keysym == 'X':
-            self.emulator.bus.controller_state |= BUTTON_B
+            self.held |= BUTTON_B
         elif event.keysym == 'Shift_R' or event.keysym == 'Shift_L':
             # Use Right Shift or Left Shift for Select
-            self.emulator.bus.controller_state |= BUTTON_SELECT
+            self.held |= BUTTON_SELECT
         elif event.keysym == 'Return':
-            self.emulator.bus.controller_state |= BUTTON_START
+            self.held |= BUTTON_START
         elif event.keysym == 'Up':
-            self.emulator.bus.controller_state |= BUTTON_UP
+            self.held |= BUTTON_UP
         elif event.keysym == 'Down':
-            self.emulator.bus.controller_state |= BUTTON_DOWN
+            self.held |= BUTTON_DOWN
         elif event.keysym == 'Left':
-            self.emulator.bus.controller_state |= BUTTON_LEFT
+            self.held |= BUTTON_LEFT
         elif event.keysym == 'Right':
-            self.emulator.bus.controller_state |= BUTTON_RIGHT
+            self.held |= BUTTON_RIGHT
     
     def on_key_release(self, event):
-        # Clear controller bits on key release
+        # Clear held-button bits on key release
         if not self.rom_loaded:
             return
-        if event.keysym == 'z' or event.keysym == 'Z':
-            self.emulator.bus.controller_state &= ~BUTTON_A
+        if event.keysym == 'BackSpace':
+            self.rewinding = False
+        elif event.keysym == 'z' or event.keysym == 'Z':
+            self.held &= ~BUTTON_A
         elif event.keysym == 'x' or event.keysym == 'X':
-            self.emulator.bus.controller_state &= ~BUTTON_B
+            self.held &= ~BUTTON_B
         elif event.keysym == 'Shift_R' or event.keysym == 'Shift_L':
-            self.emulator.bus.controller_state &= ~BUTTON_SELECT
+            self.held &= ~BUTTON_SELECT
         elif event.keysym == 'Return':
-            self.emulator.bus.controller_state &= ~BUTTON_START
+            self.held &= ~BUTTON_START
         elif event.keysym == 'Up':
-            self.emulator.bus.controller_state &= ~BUTTON_UP
+            self.held &= ~BUTTON_UP
         elif event.keysym == 'Down':
-            self.emulator.bus.controller_state &= ~BUTTON_DOWN
+            self.held &= ~BUTTON_DOWN
         elif event.keysym == 'Left':
-            self.emulator.bus.controller_state &= ~BUTTON_LEFT
+            self.held &= ~BUTTON_LEFT
         elif event.keysym == 'Right':
-            self.emulator.bus.controller_state &= ~BUTTON_RIGHT
+            self.held &= ~BUTTON_RIGHT
+    
+    def present(self):
+        # Copy the frame into the canvas image (one C-level copy, no new Tk objects)
+        if ImageTk is not None:
+            self.photo.paste(self.emulator.get_frame_image())
+        else:
+            self.photo.configure(data=self.emulator.frame_ppm(), format="PPM")
     
     def run_frame(self):
         # Run one frame of emulation and schedule the next
         if not self.rom_loaded:
             return
-        self.emulator.step_frame()
-        # Update canvas with new frame
-        frame_image = self.emulator.get_frame_image()
-        # Keep a reference to avoid garbage collection of image
-        self.canvas.image = frame_image
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=frame_image)
+        self.telemetry.start_frame()
+        if self.rewinding and self.movie_mode is None:
+            # Step back one frame and redraw it (holds on the oldest frame once history runs out)
+            snapshot = self.rewind.pop()
+            if snapshot is not None:
+                self.emulator.restore(snapshot)
+                self.emulator.render_frame()
+        else:
+            self.emulator.bus.controller_state = self.latch_input()
+            self.emulator.step_frame()
+            self.rewind.push(self.emulator.snapshot())
+        self.telemetry.emulated()
+        self.present()
+        self.frames_run += 1
         # Update debug window if open
         if self.cpu_window:
             self.update_cpu_window()
+        self.telemetry.end_frame()
         # Schedule next frame (we'll use a small delay to allow UI events)
         self.root.after(1, self.run_frame)
 
@@ -5,8 +5,11 @@ import struct
 from typing import Dict, List, Optional
 import json
 import threading
+import time
 from pathlib import Path
 
+from frametelemetry import FrameTelemetry, TelemetryPanel
+
 class ShaDPS4:
     def __init__(self, root):
         self.root = root
@@ -35,9 +38,10 @@ class ShaDPS4:
         # Emulation state
         self.loaded_pkg = None
         self.emulation_running = False
+        self.emulation_thread = None
         self.fps_target = 60
-        self.current_fps = 0.0
-        self.frame_time = 0.0
+        # Written by the emulation thread, read by the performance panel on the Tk thread
+        self.telemetry = FrameTelemetry()
         
         # Setup GUI with modern dark theme
         self.setup_modern_gui()
@@ -198,21 +202,17 @@ class ShaDPS4:
         )
         perf_frame.pack(fill=tk.X, pady=(10, 0))
         
-        # FPS Counter
-        self.fps_label = ttk.Label(
+        # FPS, frame-time percentiles and a live frame-time graph (polls the telemetry via after())
+        self.perf_panel = TelemetryPanel(
             perf_frame,
-            text="FPS: 0.0",
-            style='Info.TLabel'
-        )
-        self.fps_label.pack(side=tk.LEFT, padx=5)
-        
-        # Frame Time
-        self.frametime_label = ttk.Label(
-            perf_frame,
-            text="Frame Time: 0.0 ms",
-            style='Info.TLabel'
+            self.telemetry,
+            target_fps=self.fps_target,
+            width=600,
+            bg=self.colors['secondary'],
+            fg=self.colors['fg'],
+            emulate_color=self.colors['highlight']
         )
-        self.frametime_label.pack(side=tk.LEFT, padx=5)
+        self.perf_panel.pack(fill=tk.X, padx=5, pady=5)
 
     # --- Emulator Functions ---
     
@@ -250,46 +250,56 @@ class ShaDPS4:
             
         self.emulation_running = not self.emulation_running
         if self.emulation_running:
-            threading.Thread(target=self.emulation_loop, daemon=True).start()
+            # A quick stop/start can find the previous loop still running; it simply carries on
+            if self.emulation_thread is None or not self.emulation_thread.is_alive():
+                self.telemetry.reset()
+                self.emulation_thread = threading.Thread(target=self.emulation_loop, daemon=True)
+                self.emulation_thread.start()
             self.update_status("Emulation started")
         else:
             self.update_status("Emulation stopped")
 
+    def stop_emulation(self):
+        if self.emulation_running:
+            self.emulation_running = False
+            self.update_status("Emulation stopped")
+
+    def show_settings(self):
+        self.update_status("No settings available yet")
+
+    def toggle_debug_view(self):
+        if self.debug_frame.winfo_ismapped():
+            self.debug_frame.pack_forget()
+        else:
+            self.debug_frame.pack(fill=tk.BOTH, expand=True, pady=(10, 0))
+
     def emulation_loop(self):
-        """Main emulation loop with performance monitoring"""
-        import time
-        last_time = time.time()
-        frames = 0
+        """Main emulation loop (runs in a worker thread; must not touch any widget)"""
+        frame_period = 1 / self.fps_target
         
         while self.emulation_running:
-            start_frame = time.time()
+            start = self.telemetry.start_frame()
             
             # Execute one frame of emulation
             self.execute_frame()
+            self.telemetry.emulated()
             
-            # Update FPS counter
-            frames += 1
-            if time.time() - last_time > 1.0:
-                self.current_fps = frames
-                self.frame_time = (time.time() - last_time) / frames * 1000
-                self.update_performance_display()
-                frames = 0
-                last_time = time.time()
+            # Present the frame
+            self.present_frame()
+            self.telemetry.end_frame()
             
-            # Frame timing
-            frame_end = time.time()
-            frame_duration = frame_end - start_frame
-            if frame_duration < 1/self.fps_target:
-                time.sleep(1/self.fps_target - frame_duration)
+            # Frame timing (the time slept shows up as the next frame's sleep phase)
+            frame_duration = time.perf_counter() - start
+            if frame_duration < frame_period:
+                time.sleep(frame_period - frame_duration)
 
     def execute_frame(self):
         """Execute one frame worth of instructions"""
         pass  # Implement actual PS4 CPU/GPU emulation here
 
-    def update_performance_display(self):
-        """Update performance monitors"""
-        self.fps_label.configure(text=f"FPS: {self.current_fps:.1f}")
-        self.frametime_label.configure(text=f"Frame Time: {self.frame_time:.1f} ms")
+    def present_frame(self):
+        """Hand the finished frame to the display"""
+        pass  # Implement GPU output here (via root.after(), never directly from this thread)
 
     def show_error(self, message: str):
         """Show error in modern style"""
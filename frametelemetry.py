@@ -0,0 +1,203 @@
+"""
+Frame-time telemetry for the Tk frontends (emups4.py, emunesv0.py,
+qwen3emu-chip1.0a.py and emuchipv8-.py).
+
+Each frame is timed in three phases: emulate (running the core), present
+(drawing) and sleep (the idle gap before the next frame starts: time.sleep in
+a worker-thread loop, the wait for the next after() callback in a Tk-driven
+one). The loop brackets its work with start_frame(), emulated() and
+end_frame().
+
+Timings go into a fixed-size ring buffer of preallocated arrays. There is one
+writer (the emulation loop) and the buffer needs no lock: the writer fills a
+slot and only then advances `count`, and readers copy the arrays and use the
+last `count` slots. A reader racing the writer can at worst see the oldest
+sample half overwritten.
+
+stats() summarizes the buffer (FPS, p50/p95/p99 frame time, jitter, mean time
+per phase). TelemetryPanel shows the summary and a live frame-time graph. It
+polls with after() on the Tk thread, so the emulation loop never touches a
+widget, which matters when that loop runs in its own thread (Tk is not
+thread-safe).
+"""
+
+import time
+import tkinter as tk
+from array import array
+from collections import namedtuple
+
+DEFAULT_CAPACITY = 600          # 10 seconds at 60 FPS
+REFRESH_MS = 250
+
+FrameStats = namedtuple("FrameStats", "frames fps p50 p95 p99 jitter emulate present sleep")
+FrameStats.__doc__ = """Summary of the buffered frames; times are in milliseconds."""
+
+EMPTY_STATS = FrameStats(0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted, non-empty sequence."""
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+class FrameTelemetry:
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.emulate = array("d", bytes(8 * capacity))
+        self.present = array("d", bytes(8 * capacity))
+        self.sleep = array("d", bytes(8 * capacity))
+        self.count = 0
+        # Writer-side state for start_frame/emulated/end_frame
+        self.frame_start = None
+        self.emulate_end = None
+        self.last_end = None
+
+    def reset(self):
+        """Forget all samples, e.g. after a pause, so the idle time is not counted as a frame."""
+        self.count = 0
+        self.frame_start = self.emulate_end = self.last_end = None
+
+    # --- Writer side (the emulation loop) ---
+
+    def start_frame(self):
+        """Mark the start of a frame; returns the perf_counter() timestamp."""
+        self.frame_start = self.emulate_end = time.perf_counter()
+        return self.frame_start
+
+    def emulated(self):
+        """Mark the end of the emulate phase; the rest of the frame counts as present."""
+        self.emulate_end = time.perf_counter()
+
+    def end_frame(self):
+        """Record the frame; does nothing if start_frame() was not called since the last one."""
+        now = time.perf_counter()
+        start = self.frame_start
+        if start is None:
+            return
+        sleep = start - self.last_end if self.last_end is not None else 0.0
+        self.record(self.emulate_end - start, now - self.emulate_end, sleep)
+        self.frame_start = None
+        self.last_end = now
+
+    def record(self, emulate, present, sleep):
+        """Store one frame's phase durations in seconds."""
+        slot = self.count % self.capacity
+        self.emulate[slot] = emulate
+        self.present[slot] = present
+        self.sleep[slot] = sleep
+        # Publish only once the slot is complete
+        self.count += 1
+
+    # --- Reader side (the UI) ---
+
+    def samples(self):
+        """(emulate, present, sleep) lists in seconds, oldest frame first."""
+        count = self.count
+        emulate, present, sleep = self.emulate[:], self.present[:], self.sleep[:]
+        if count <= self.capacity:
+            return emulate[:count].tolist(), present[:count].tolist(), sleep[:count].tolist()
+        split = count % self.capacity
+        return ((emulate[split:] + emulate[:split]).tolist(),
+                (present[split:] + present[:split]).tolist(),
+                (sleep[split:] + sleep[:split]).tolist())
+
+    def stats(self, samples=None):
+        """FrameStats for `samples` (as returned by samples(); taken now if omitted)."""
+        emulate, present, sleep = self.samples() if samples is None else samples
+        frames = len(emulate)
+        if not frames:
+            return EMPTY_STATS
+        totals = [e + p + s for e, p, s in zip(emulate, present, sleep)]
+        elapsed = sum(totals)
+        ordered = sorted(totals)
+        # Jitter: mean change in frame time from one frame to the next
+        jitter = (sum(abs(b - a) for a, b in zip(totals, totals[1:])) / (frames - 1)) if frames > 1 else 0.0
+        return FrameStats(
+            frames=frames,
+            fps=frames / elapsed if elapsed > 0 else 0.0,
+            p50=percentile(ordered, 0.50) * 1000,
+            p95=percentile(ordered, 0.95) * 1000,
+            p99=percentile(ordered, 0.99) * 1000,
+            jitter=jitter * 1000,
+            emulate=sum(emulate) / frames * 1000,
+            present=sum(present) / frames * 1000,
+            sleep=sum(sleep) / frames * 1000,
+        )
+
+
+def format_stats(stats):
+    return ("FPS: %.1f   Frame Time: p50 %.1f / p95 %.1f / p99 %.1f ms   Jitter: %.2f ms\n"
+            "Emulate %.1f ms   Present %.1f ms   Sleep %.1f ms"
+            % (stats.fps, stats.p50, stats.p95, stats.p99, stats.jitter,
+               stats.emulate, stats.present, stats.sleep))
+
+
+class TelemetryPanel(tk.Frame):
+    """Stats line plus a frame-time graph, refreshed from the Tk thread every REFRESH_MS.
+
+    The graph plots the last `width` frames: total frame time and the emulate
+    phase as two polylines, against the target frame time (dashed) on a scale
+    of 0 to twice the target.
+    """
+
+    def __init__(self, master, telemetry, target_fps=60, width=300, height=80,
+                 bg="black", fg="white", frame_color="#00c853", emulate_color="#2979ff",
+                 refresh_ms=REFRESH_MS, **kwargs):
+        super().__init__(master, bg=bg, **kwargs)
+        self.telemetry = telemetry
+        self.target = 1.0 / target_fps
+        self.width = width
+        self.height = height
+        self.refresh_ms = refresh_ms
+        self.label = tk.Label(self, text=format_stats(EMPTY_STATS), justify=tk.LEFT, anchor=tk.W,
+                              bg=bg, fg=fg, font=("Consolas", 9))
+        self.label.pack(fill=tk.X)
+        self.canvas = tk.Canvas(self, width=width, height=height, bg=bg, highlightthickness=0)
+        self.canvas.pack(fill=tk.X, pady=(2, 0))
+        target_y = height // 2
+        self.canvas.create_line(0, target_y, width, target_y, fill=fg, dash=(2, 4))
+        # Polylines need two points; their coords are replaced on every refresh
+        self.frame_line = self.canvas.create_line(0, height, 0, height, fill=frame_color)
+        self.emulate_line = self.canvas.create_line(0, height, 0, height, fill=emulate_color)
+        self.after_id = None
+        self.refresh()
+
+    def graph_points(self, values):
+        """Canvas coordinates for the most recent `width` values (seconds)."""
+        values = values[-self.width:]
+        height = self.height
+        scale = height / (2 * self.target)
+        offset = self.width - len(values)
+        points = []
+        for x, value in enumerate(values, offset):
+            points.append(x)
+            points.append(max(0.0, height - value * scale))
+        if len(points) < 4:
+            points = [0, height, 0, height]
+        return points
+
+    def refresh(self):
+        samples = self.telemetry.samples()
+        self.label.configure(text=format_stats(self.telemetry.stats(samples)))
+        emulate, present, sleep = samples
+        self.canvas.coords(self.frame_line, self.graph_points([e + p + s for e, p, s in zip(emulate, present, sleep)]))
+        self.canvas.coords(self.emulate_line, self.graph_points(emulate))
+        self.after_id = self.after(self.refresh_ms, self.refresh)
+
+    def destroy(self):
+        if self.after_id is not None:
+            self.after_cancel(self.after_id)
+            self.after_id = None
+        super().destroy()
+
+
+class TelemetryWindow(tk.Toplevel):
+    """A TelemetryPanel in its own window, for frontends without a performance panel."""
+
+    def __init__(self, master, telemetry, title="Frame Timing", **panel_options):
+        super().__init__(master)
+        self.title(title)
+        self.resizable(False, False)
+        self.panel = TelemetryPanel(self, telemetry, **panel_options)
+        self.panel.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
@@ -0,0 +1,1126 @@
+"""
+ARM7TDMI interpreter shared by the Python GBA emulators (EMUGROKV0.py and GR1KGPT.py).
+
+Decoding is table-driven. ARM_TABLE holds 4096 handlers indexed by bits 27-20
+and 7-4 of an ARM instruction, THUMB_TABLE 1024 indexed by bits 15-6 of a Thumb
+one. Both are built once at import, and each entry is a closure specialized for
+the fields its index fixes (ALU opcode, S bit, shift type, addressing mode,
+load/store...), so running an instruction is a condition lookup, a table lookup
+and a call. Conditions are checked against COND_PASSES, a 16x16 table of
+condition code x NZCV flags (flattened, indexed by cond << 4 | cpsr >> 28).
+
+While an instruction runs, R15 holds its address + 8 (ARM) or + 4 (Thumb), the
+value the pipeline shows programs. Handlers that branch leave R15 at the target
++ 4 (ARM) or + 2 (Thumb) and run() takes the instruction size off again, so the
+fall-through path never has to ask whether a branch happened.
+
+Without a BIOS image the CPU starts in System mode at the cartridge entry point
+with the stack pointers the BIOS would have set, and SWIs and undefined
+instructions are reported (once each) and skipped instead of trapping into an
+empty vector table.
+"""
+
+from functools import lru_cache
+
+from gbamemory import ROM_START
+
+M32 = 0xFFFFFFFF
+
+FLAG_N = 1 << 31
+FLAG_Z = 1 << 30
+FLAG_C = 1 << 29
+FLAG_V = 1 << 28
+FLAG_I = 1 << 7
+FLAG_F = 1 << 6
+FLAG_T = 1 << 5
+
+MODE_USR = 0x10
+MODE_FIQ = 0x11
+MODE_IRQ = 0x12
+MODE_SVC = 0x13
+MODE_ABT = 0x17
+MODE_UND = 0x1B
+MODE_SYS = 0x1F
+
+# Register bank per mode: R13, R14 and the SPSR are banked for every mode but
+# User/System, R8-R12 only for FIQ
+BANK_USR, BANK_FIQ, BANK_IRQ, BANK_SVC, BANK_ABT, BANK_UND = range(6)
+BANKS = {MODE_USR: BANK_USR, MODE_SYS: BANK_USR, MODE_FIQ: BANK_FIQ, MODE_IRQ: BANK_IRQ,
+         MODE_SVC: BANK_SVC, MODE_ABT: BANK_ABT, MODE_UND: BANK_UND}
+
+# Stack pointers the BIOS sets up before jumping to the cartridge
+BOOT_STACKS = {BANK_USR: 0x03007F00, BANK_IRQ: 0x03007FA0, BANK_SVC: 0x03007FE0}
+
+VECTOR_UNDEFINED = 0x04
+VECTOR_SWI = 0x08
+VECTOR_IRQ = 0x18
+
+
+def _condition_passes(cond, flags):
+    n, z, c, v = (flags >> 3) & 1, (flags >> 2) & 1, (flags >> 1) & 1, flags & 1
+    return (z, not z, c, not c, n, not n, v, not v,
+            c and not z, not c or z, n == v, n != v,
+            not z and n == v, z or n != v, True, False)[cond]
+
+
+COND_PASSES = [bool(_condition_passes(cond, flags)) for cond in range(16) for flags in range(16)]
+
+
+# --- Barrel shifter ---
+#
+# Each shift takes (value, amount, carry in) and returns (result, carry out),
+# for a register-specified amount (0-255).
+
+def _lsl(value, amount, carry):
+    if amount == 0:
+        return value, carry
+    if amount < 32:
+        return (value << amount) & M32, (value >> (32 - amount)) & 1
+    return 0, value & 1 if amount == 32 else 0
+
+
+def _lsr(value, amount, carry):
+    if amount == 0:
+        return value, carry
+    if amount < 32:
+        return value >> amount, (value >> (amount - 1)) & 1
+    return 0, value >> 31 if amount == 32 else 0
+
+
+def _asr(value, amount, carry):
+    if amount == 0:
+        return value, carry
+    if value & 0x80000000:
+        value -= 1 << 32
+    if amount < 32:
+        return (value >> amount) & M32, (value >> (amount - 1)) & 1
+    return value >> 31 & M32, value >> 31 & 1
+
+
+def _ror(value, amount, carry):
+    if amount == 0:
+        return value, carry
+    amount &= 31
+    if amount == 0:
+        return value, value >> 31
+    return ((value >> amount) | (value << (32 - amount))) & M32, (value >> (amount - 1)) & 1
+
+
+SHIFTS = (_lsl, _lsr, _asr, _ror)
+
+
+def _rotate_read(value, addr):
+    """Misaligned word loads rotate the aligned word so the addressed byte is lowest."""
+    rotate = (addr & 3) << 3
+    if rotate:
+        return ((value >> rotate) | (value << (32 - rotate))) & M32
+    return value
+
+
+@lru_cache(maxsize=None)
+def register_list(bits):
+    return tuple(r for r in range(16) if bits >> r & 1)
+
+
+# --- ARM shifter operands: (cpu, instr) -> (value, carry out) ---
+
+def _operand_imm(cpu, instr):
+    rotate = (instr >> 7) & 0x1E
+    value = instr & 0xFF
+    if rotate:
+        value = ((value >> rotate) | (value << (32 - rotate))) & M32
+        return value, value >> 31
+    return value, (cpu.cpsr >> 29) & 1
+
+
+def _operand_lsl_imm(cpu, instr):
+    value = cpu.regs[instr & 15]
+    amount = (instr >> 7) & 31
+    if amount:
+        return (value << amount) & M32, (value >> (32 - amount)) & 1
+    return value, (cpu.cpsr >> 29) & 1
+
+
+def _operand_lsr_imm(cpu, instr):
+    value = cpu.regs[instr & 15]
+    amount = (instr >> 7) & 31
+    if amount:
+        return value >> amount, (value >> (amount - 1)) & 1
+    # LSR #0 encodes LSR #32
+    return 0, value >> 31
+
+
+def _operand_asr_imm(cpu, instr):
+    value = cpu.regs[instr & 15]
+    # ASR #0 encodes ASR #32
+    amount = (instr >> 7) & 31 or 32
+    if value & 0x80000000:
+        value -= 1 << 32
+    return (value >> amount) & M32, (value >> (amount - 1)) & 1
+
+
+def _operand_ror_imm(cpu, instr):
+    value = cpu.regs[instr & 15]
+    amount = (instr >> 7) & 31
+    if amount:
+        return ((value >> amount) | (value << (32 - amount))) & M32, (value >> (amount - 1)) & 1
+    # ROR #0 encodes RRX
+    return (((cpu.cpsr >> 29) & 1) << 31) | (value >> 1), value & 1
+
+
+IMM_SHIFT_OPERANDS = (_operand_lsl_imm, _operand_lsr_imm, _operand_asr_imm, _operand_ror_imm)
+
+
+def _register_shift_operand(shift):
+    def operand(cpu, instr):
+        regs = cpu.regs
+        rm = instr & 15
+        # The extra cycle to read Rs lets the pipeline move on: PC reads 12 ahead
+        value = regs[15] + 4 if rm == 15 else regs[rm]
+        return shift(value, regs[(instr >> 8) & 15] & 0xFF, (cpu.cpsr >> 29) & 1)
+    return operand
+
+
+REG_SHIFT_OPERANDS = tuple(_register_shift_operand(shift) for shift in SHIFTS)
+
+
+# --- ALU ---
+
+def _add(a, b, carry):
+    """a + b + carry -> (result, carry out, overflow)."""
+    total = a + b + carry
+    result = total & M32
+    return result, total >> 32, ((a ^ result) & (b ^ result)) >> 31
+
+
+def _subtract(a, b, carry):
+    """a - b - (1 - carry) -> (result, carry out (no borrow), overflow)."""
+    total = a - b - 1 + carry
+    result = total & M32
+    return result, 1 if total >= 0 else 0, ((a ^ b) & (a ^ result)) >> 31
+
+
+LOGICAL_OPS = {
+    0x0: lambda a, b: a & b,         # AND
+    0x1: lambda a, b: a ^ b,         # EOR
+    0x8: lambda a, b: a & b,         # TST
+    0x9: lambda a, b: a ^ b,         # TEQ
+    0xC: lambda a, b: a | b,         # ORR
+    0xD: lambda a, b: b,             # MOV
+    0xE: lambda a, b: a & ~b & M32,  # BIC
+    0xF: lambda a, b: ~b & M32,      # MVN
+}
+
+ARITHMETIC_OPS = {
+    0x2: lambda a, b, c: _subtract(a, b, 1),  # SUB
+    0x3: lambda a, b, c: _subtract(b, a, 1),  # RSB
+    0x4: lambda a, b, c: _add(a, b, 0),       # ADD
+    0x5: _add,                                # ADC
+    0x6: _subtract,                           # SBC
+    0x7: lambda a, b, c: _subtract(b, a, c),  # RSC
+    0xA: lambda a, b, c: _subtract(a, b, 1),  # CMP
+    0xB: lambda a, b, c: _add(a, b, 0),       # CMN
+}
+
+TEST_OPS = (0x8, 0x9, 0xA, 0xB)
+
+
+def _arm_data_processing(op, s, operand):
+    test = op in TEST_OPS
+    if op in LOGICAL_OPS:
+        compute = LOGICAL_OPS[op]
+        if test:
+            def handler(cpu, instr):
+                b, carry = operand(cpu, instr)
+                result = compute(cpu.regs[(instr >> 16) & 15], b)
+                cpu.cpsr = (cpu.cpsr & 0x1FFFFFFF) | (result & FLAG_N) | (0 if result else FLAG_Z) | (carry << 29)
+        elif s:
+            def handler(cpu, instr):
+                regs = cpu.regs
+                b, carry = operand(cpu, instr)
+                result = compute(regs[(instr >> 16) & 15], b)
+                rd = (instr >> 12) & 15
+                if rd == 15:
+                    cpu.alu_write_pc(result, True)
+                    return
+                regs[rd] = result
+                cpu.cpsr = (cpu.cpsr & 0x1FFFFFFF) | (result & FLAG_N) | (0 if result else FLAG_Z) | (carry << 29)
+        else:
+            def handler(cpu, instr):
+                regs = cpu.regs
+                result = compute(regs[(instr >> 16) & 15], operand(cpu, instr)[0])
+                rd = (instr >> 12) & 15
+                if rd == 15:
+                    cpu.alu_write_pc(result, False)
+                else:
+                    regs[rd] = result
+        return handler
+
+    compute = ARITHMETIC_OPS[op]
+    if test:
+        def handler(cpu, instr):
+            result, carry, overflow = compute(cpu.regs[(instr >> 16) & 15], operand(cpu, instr)[0],
+                                              (cpu.cpsr >> 29) & 1)
+            cpu.cpsr = ((cpu.cpsr & 0x0FFFFFFF) | (result & FLAG_N) | (0 if result else FLAG_Z)
+                        | (carry << 29) | (overflow << 28))
+    elif s:
+        def handler(cpu, instr):
+            regs = cpu.regs
+            result, carry, overflow = compute(regs[(instr >> 16) & 15], operand(cpu, instr)[0],
+                                              (cpu.cpsr >> 29) & 1)
+            rd = (instr >> 12) & 15
+            if rd == 15:
+                cpu.alu_write_pc(result, True)
+                return
+            regs[rd] = result
+            cpu.cpsr = ((cpu.cpsr & 0x0FFFFFFF) | (result & FLAG_N) | (0 if result else FLAG_Z)
+                        | (carry << 29) | (overflow << 28))
+    else:
+        def handler(cpu, instr):
+            regs = cpu.regs
+            result = compute(regs[(instr >> 16) & 15], operand(cpu, instr)[0], (cpu.cpsr >> 29) & 1)[0]
+            rd = (instr >> 12) & 15
+            if rd == 15:
+                cpu.alu_write_pc(result, False)
+            else:
+                regs[rd] = result
+    return handler
+
+
+# --- ARM handlers ---
+
+def _arm_mrs(to_spsr):
+    def handler(cpu, instr):
+        cpu.regs[(instr >> 12) & 15] = cpu.spsr if to_spsr else cpu.cpsr
+    return handler
+
+
+def _arm_msr(to_spsr, immediate):
+    def handler(cpu, instr):
+        value = _operand_imm(cpu, instr)[0] if immediate else cpu.regs[instr & 15]
+        mask = 0xFF000000 if instr & 0x80000 else 0
+        if (cpu.cpsr & 0x1F) != MODE_USR:
+            if instr & 0x40000:
+                mask |= 0x00FF0000
+            if instr & 0x20000:
+                mask |= 0x0000FF00
+            if instr & 0x10000:
+                mask |= 0x000000FF
+        if to_spsr:
+            if BANKS.get(cpu.cpsr & 0x1F, BANK_USR) != BANK_USR:
+                cpu.spsr = (cpu.spsr & ~mask) | (value & mask)
+        else:
+            cpu.set_cpsr((cpu.cpsr & ~mask) | (value & mask))
+    return handler
+
+
+def _arm_bx(cpu, instr):
+    target = cpu.regs[instr & 15]
+    if target & 1:
+        cpu.cpsr |= FLAG_T
+        cpu.regs[15] = (target & ~1) + 4
+    else:
+        cpu.regs[15] = (target & ~3) + 4
+
+
+def _arm_multiply(accumulate, s):
+    def handler(cpu, instr):
+        regs = cpu.regs
+        result = regs[instr & 15] * regs[(instr >> 8) & 15]
+        if accumulate:
+            result += regs[(instr >> 12) & 15]
+        result &= M32
+        regs[(instr >> 16) & 15] = result
+        if s:
+            cpu.cpsr = (cpu.cpsr & 0x3FFFFFFF) | (result & FLAG_N) | (0 if result else FLAG_Z)
+    return handler
+
+
+def _arm_multiply_long(signed, accumulate, s):
+    def handler(cpu, instr):
+        regs = cpu.regs
+        a = regs[instr & 15]
+        b = regs[(instr >> 8) & 15]
+        if signed:
+            a -= (a & 0x80000000) << 1
+            b -= (b & 0x80000000) << 1
+        lo = (instr >> 12) & 15
+        hi = (instr >> 16) & 15
+        result = a * b
+        if accumulate:
+            result += (regs[hi] << 32) | regs[lo]
+        result &= 0xFFFFFFFFFFFFFFFF
+        regs[lo] = result & M32
+        regs[hi] = result >> 32
+        if s:
+            cpu.cpsr = (cpu.cpsr & 0x3FFFFFFF) | ((result >> 32) & FLAG_N) | (0 if result else FLAG_Z)
+    return handler
+
+
+def _arm_swap(byte):
+    def handler(cpu, instr):
+        regs = cpu.regs
+        addr = regs[(instr >> 16) & 15]
+        source = regs[instr & 15]
+        if byte:
+            value = cpu.read8(addr)
+            cpu.write8(addr, source)
+        else:
+            value = _rotate_read(cpu.read32(addr), addr)
+            cpu.write32(addr, source)
+        regs[(instr >> 12) & 15] = value
+    return handler
+
+
+def _arm_single_transfer(high, offset):
+    pre, up, byte, writeback, load = (high >> 4) & 1, (high >> 3) & 1, (high >> 2) & 1, (high >> 1) & 1, high & 1
+    # Post-indexed transfers always write the base back
+    writeback = writeback or not pre
+    if load:
+        def handler(cpu, instr):
+            regs = cpu.regs
+            rn = (instr >> 16) & 15
+            base = regs[rn]
+            moved = (base + offset(cpu, instr) if up else base - offset(cpu, instr)) & M32
+            addr = moved if pre else base
+            value = cpu.read8(addr) if byte else _rotate_read(cpu.read32(addr), addr)
+            if writeback:
+                regs[rn] = moved
+            rd = (instr >> 12) & 15
+            if rd == 15:
+                regs[15] = (value & ~3) + 4
+            else:
+                regs[rd] = value
+    else:
+        def handler(cpu, instr):
+            regs = cpu.regs
+            rn = (instr >> 16) & 15
+            base = regs[rn]
+            moved = (base + offset(cpu, instr) if up else base - offset(cpu, instr)) & M32
+            addr = moved if pre else base
+            rd = (instr >> 12) & 15
+            # STR PC stores the instruction's address + 12
+            value = regs[15] + 4 if rd == 15 else regs[rd]
+            if byte:
+                cpu.write8(addr, value)
+            else:
+                cpu.write32(addr, value)
+            if writeback:
+                regs[rn] = moved
+    return handler
+
+
+def _offset_imm12(cpu, instr):
+    return instr & 0xFFF
+
+
+def _offset_register(shift):
+    operand = IMM_SHIFT_OPERANDS[shift]
+    return lambda cpu, instr: operand(cpu, instr)[0]
+
+
+def _arm_halfword_transfer(high, kind):
+    """LDRH/STRH/LDRSB/LDRSH; kind is bits 6-5 (1 unsigned halfword, 2 signed byte, 3 signed halfword)."""
+    pre, up, immediate, writeback, load = (high >> 4) & 1, (high >> 3) & 1, (high >> 2) & 1, (high >> 1) & 1, high & 1
+    writeback = writeback or not pre
+    if not load and kind != 1:
+        return _arm_undefined
+
+    def handler(cpu, instr):
+        regs = cpu.regs
+        rn = (instr >> 16) & 15
+        base = regs[rn]
+        offset = ((instr >> 4) & 0xF0) | (instr & 0xF) if immediate else regs[instr & 15]
+        moved = (base + offset if up else base - offset) & M32
+        addr = moved if pre else base
+        rd = (instr >> 12) & 15
+        if not load:
+            cpu.write16(addr, regs[15] + 4 if rd == 15 else regs[rd])
+            if writeback:
+                regs[rn] = moved
+            return
+        value = _load_halfword(cpu, addr, kind)
+        if writeback:
+            regs[rn] = moved
+        if rd == 15:
+            regs[15] = (value & ~3) + 4
+        else:
+            regs[rd] = value
+    return handler
+
+
+def _load_halfword(cpu, addr, kind):
+    if kind == 1:
+        value = cpu.read16(addr)
+        # A misaligned LDRH rotates the halfword by a byte
+        return ((value >> 8) | (value << 24)) & M32 if addr & 1 else value
+    if kind == 2 or addr & 1:
+        # LDRSB, and misaligned LDRSH, which loads the addressed byte sign-extended
+        value = cpu.read8(addr)
+        return value | 0xFFFFFF00 if value & 0x80 else value
+    value = cpu.read16(addr)
+    return value | 0xFFFF0000 if value & 0x8000 else value
+
+
+def _arm_block_transfer(high):
+    pre, up, user, writeback, load = (high >> 4) & 1, (high >> 3) & 1, (high >> 2) & 1, (high >> 1) & 1, high & 1
+
+    def handler(cpu, instr):
+        regs = cpu.regs
+        rn = (instr >> 16) & 15
+        registers = register_list(instr & 0xFFFF)
+        count = len(registers)
+        if not count:
+            # An empty list transfers PC and moves the base as if all 16 were listed
+            registers = (15,)
+            count = 16
+        base = regs[rn]
+        if up:
+            addr = base + 4 if pre else base
+            new_base = (base + 4 * count) & M32
+        else:
+            addr = base - 4 * count + (0 if pre else 4)
+            new_base = (base - 4 * count) & M32
+        # S bit: User-mode registers, unless it's an LDM with PC (then it restores CPSR)
+        user_bank = user and not (load and registers[-1] == 15)
+        if load:
+            # The loaded value wins if the base is in the list
+            if writeback:
+                regs[rn] = new_base
+            read32 = cpu.read32
+            for r in registers:
+                value = read32(addr & M32)
+                addr += 4
+                if r == 15:
+                    if user:
+                        cpu.restore_spsr()
+                    regs[15] = (value & (~1 if cpu.cpsr & FLAG_T else ~3)) + 4
+                elif user_bank:
+                    cpu.set_user_register(r, value)
+                else:
+                    regs[r] = value
+        else:
+            write32 = cpu.write32
+            first = registers[0]
+            for r in registers:
+                if r == 15:
+                    value = regs[15] + 4
+                elif r == rn and writeback and r != first:
+                    # The base is stored as written back unless it's the lowest register
+                    value = new_base
+                elif user_bank:
+                    value = cpu.user_register(r)
+                else:
+                    value = regs[r]
+                write32(addr & M32, value)
+                addr += 4
+            if writeback:
+                regs[rn] = new_base
+    return handler
+
+
+def _arm_branch(link):
+    def handler(cpu, instr):
+        regs = cpu.regs
+        offset = (instr & 0xFFFFFF) << 2
+        if offset & 0x2000000:
+            offset -= 0x4000000
+        if link:
+            regs[14] = regs[15] - 4
+        regs[15] = ((regs[15] + offset) & M32) + 4
+    return handler
+
+
+def _arm_swi(cpu, instr):
+    cpu.software_interrupt((instr >> 16) & 0xFF, cpu.regs[15] - 4, 4)
+
+
+def _arm_undefined(cpu, instr):
+    cpu.undefined_instruction(instr, cpu.regs[15] - 4, 4)
+
+
+def _decode_arm(high, low):
+    """Handler for instructions with bits 27-20 = high and bits 7-4 = low."""
+    kind = high >> 5
+    if kind == 0:
+        if low == 0b1001:
+            if high & 0b11111100 == 0:
+                return _arm_multiply(high & 2, high & 1)
+            if high & 0b11111000 == 0b00001000:
+                return _arm_multiply_long(high & 4, high & 2, high & 1)
+            if high & 0b11111011 == 0b00010000:
+                return _arm_swap(high & 4)
+            return _arm_undefined
+        if low & 0b1001 == 0b1001:
+            return _arm_halfword_transfer(high, (low >> 1) & 3)
+        if high & 0b00011001 == 0b00010000:
+            # TST/TEQ/CMP/CMN without S: PSR transfers and BX
+            if high == 0x12 and low == 0b0001:
+                return _arm_bx
+            if low == 0:
+                return _arm_msr(high & 4, False) if high & 2 else _arm_mrs(high & 4)
+            return _arm_undefined
+        shift = (low >> 1) & 3
+        operand = REG_SHIFT_OPERANDS[shift] if low & 1 else IMM_SHIFT_OPERANDS[shift]
+        return _arm_data_processing((high >> 1) & 15, high & 1, operand)
+    if kind == 1:
+        if high & 0b00011011 == 0b00010000:
+            return _arm_undefined
+        if high & 0b00011011 == 0b00010010:
+            return _arm_msr(high & 4, True)
+        return _arm_data_processing((high >> 1) & 15, high & 1, _operand_imm)
+    if kind == 2:
+        return _arm_single_transfer(high, _offset_imm12)
+    if kind == 3:
+        if low & 1:
+            return _arm_undefined
+        return _arm_single_transfer(high, _offset_register((low >> 1) & 3))
+    if kind == 4:
+        return _arm_block_transfer(high)
+    if kind == 5:
+        return _arm_branch(high & 0x10)
+    if kind == 7 and high & 0x10:
+        return _arm_swi
+    # Coprocessor instructions: the GBA has no coprocessors
+    return _arm_undefined
+
+
+ARM_TABLE = [_decode_arm(index >> 4, index & 0xF) for index in range(4096)]
+
+
+# --- Thumb handlers ---
+
+def _set_nz(cpu, result):
+    cpu.cpsr = (cpu.cpsr & 0x3FFFFFFF) | (result & FLAG_N) | (0 if result else FLAG_Z)
+
+
+def _set_nzc(cpu, result, carry):
+    cpu.cpsr = (cpu.cpsr & 0x1FFFFFFF) | (result & FLAG_N) | (0 if result else FLAG_Z) | (carry << 29)
+
+
+def _set_nzcv(cpu, result, carry, overflow):
+    cpu.cpsr = ((cpu.cpsr & 0x0FFFFFFF) | (result & FLAG_N) | (0 if result else FLAG_Z)
+                | (carry << 29) | (overflow << 28))
+
+
+def _thumb_shift(kind):
+    shift = SHIFTS[kind]
+
+    def handler(cpu, instr):
+        regs = cpu.regs
+        # LSR/ASR #0 encode a shift by 32
+        amount = (instr >> 6) & 31 or (32 if kind else 0)
+        result, carry = shift(regs[(instr >> 3) & 7], amount, (cpu.cpsr >> 29) & 1)
+        regs[instr & 7] = result
+        _set_nzc(cpu, result, carry)
+    return handler
+
+
+def _thumb_add_subtract(immediate, subtract):
+    def handler(cpu, instr):
+        regs = cpu.regs
+        field = (instr >> 6) & 7
+        b = field if immediate else regs[field]
+        a = regs[(instr >> 3) & 7]
+        result, carry, overflow = _subtract(a, b, 1) if subtract else _add(a, b, 0)
+        regs[instr & 7] = result
+        _set_nzcv(cpu, result, carry, overflow)
+    return handler
+
+
+def _thumb_immediate(op):
+    def handler(cpu, instr):
+        regs = cpu.regs
+        rd = (instr >> 8) & 7
+        imm = instr & 0xFF
+        if op == 0:  # MOV
+            regs[rd] = imm
+            _set_nz(cpu, imm)
+            return
+        result, carry, overflow = _add(regs[rd], imm, 0) if op == 2 else _subtract(regs[rd], imm, 1)
+        if op != 1:  # CMP only sets flags
+            regs[rd] = result
+        _set_nzcv(cpu, result, carry, overflow)
+    return handler
+
+
+def _thumb_alu(op):
+    """Format 4: Rd = Rd op Rs, always setting flags."""
+    def logical(compute):
+        def handler(cpu, instr):
+            regs = cpu.regs
+            rd = instr & 7
+            result = compute(regs[rd], regs[(instr >> 3) & 7])
+            regs[rd] = result
+            _set_nz(cpu, result)
+        return handler
+
+    def shift(function):
+        def handler(cpu, instr):
+            regs = cpu.regs
+            rd = instr & 7
+            result, carry = function(regs[rd], regs[(instr >> 3) & 7] & 0xFF, (cpu.cpsr >> 29) & 1)
+            regs[rd] = result
+            _set_nzc(cpu, result, carry)
+        return handler
+
+    def arithmetic(compute, store=True):
+        def handler(cpu, instr):
+            regs = cpu.regs
+            rd = instr & 7
+            result, carry, overflow = compute(regs[rd], regs[(instr >> 3) & 7], (cpu.cpsr >> 29) & 1)
+            if store:
+                regs[rd] = result
+            _set_nzcv(cpu, result, carry, overflow)
+        return handler
+
+    def tst(cpu, instr):
+        _set_nz(cpu, cpu.regs[instr & 7] & cpu.regs[(instr >> 3) & 7])
+
+    def neg(cpu, instr):
+        regs = cpu.regs
+        result, carry, overflow = _subtract(0, regs[(instr >> 3) & 7], 1)
+        regs[instr & 7] = result
+        _set_nzcv(cpu, result, carry, overflow)
+
+    def mul(cpu, instr):
+        regs = cpu.regs
+        rd = instr & 7
+        result = (regs[rd] * regs[(instr >> 3) & 7]) & M32
+        regs[rd] = result
+        _set_nz(cpu, result)
+
+    return (logical(LOGICAL_OPS[0x0]), logical(LOGICAL_OPS[0x1]), shift(_lsl), shift(_lsr),
+            shift(_asr), arithmetic(_add), arithmetic(_subtract), shift(_ror),
+            tst, neg, arithmetic(ARITHMETIC_OPS[0xA], False), arithmetic(ARITHMETIC_OPS[0xB], False),
+            logical(LOGICAL_OPS[0xC]), mul, logical(LOGICAL_OPS[0xE]), logical(LOGICAL_OPS[0xF]))[op]
+
+
+def _thumb_hi_register(op):
+    """Format 5: ADD/CMP/MOV on any registers, and BX."""
+    if op == 3:
+        def handler(cpu, instr):
+            target = cpu.regs[(instr >> 3) & 15]
+            if target & 1:
+                cpu.regs[15] = (target & ~1) + 2
+            else:
+                cpu.cpsr &= ~FLAG_T
+                cpu.regs[15] = (target & ~3) + 2
+        return handler
+
+    def handler(cpu, instr):
+        regs = cpu.regs
+        rd = (instr & 7) | ((instr >> 4) & 8)
+        value = regs[(instr >> 3) & 15]
+        if op == 1:
+            _set_nzcv(cpu, *_subtract(regs[rd], value, 1))
+            return
+        if op == 0:
+            value = (regs[rd] + value) & M32
+        if rd == 15:
+            regs[15] = (value & ~1) + 2
+        else:
+            regs[rd] = value
+    return handler
+
+
+def _thumb_load_pc_relative(cpu, instr):
+    regs = cpu.regs
+    regs[(instr >> 8) & 7] = cpu.read32((regs[15] & ~2) + ((instr & 0xFF) << 2))
+
+
+def _thumb_transfer_register(load, byte):
+    def handler(cpu, instr):
+        regs = cpu.regs
+        addr = (regs[(instr >> 3) & 7] + regs[(instr >> 6) & 7]) & M32
+        rd = instr & 7
+        if load:
+            regs[rd] = cpu.read8(addr) if byte else _rotate_read(cpu.read32(addr), addr)
+        elif byte:
+            cpu.write8(addr, regs[rd])
+        else:
+            cpu.write32(addr, regs[rd])
+    return handler
+
+
+def _thumb_transfer_signed(kind):
+    """Format 8: kind is bits 11-10 (0 STRH, 1 LDSB, 2 LDRH, 3 LDSH)."""
+    load_kind = (None, 2, 1, 3)[kind]
+
+    def handler(cpu, instr):
+        regs = cpu.regs
+        addr = (regs[(instr >> 3) & 7] + regs[(instr >> 6) & 7]) & M32
+        if load_kind is None:
+            cpu.write16(addr, regs[instr & 7])
+        else:
+            regs[instr & 7] = _load_halfword(cpu, addr, load_kind)
+    return handler
+
+
+def _thumb_transfer_immediate(byte, load):
+    scale = 0 if byte else 2
+
+    def handler(cpu, instr):
+        regs = cpu.regs
+        addr = (regs[(instr >> 3) & 7] + (((instr >> 6) & 31) << scale)) & M32
+        rd = instr & 7
+        if load:
+            regs[rd] = cpu.read8(addr) if byte else _rotate_read(cpu.read32(addr), addr)
+        elif byte:
+            cpu.write8(addr, regs[rd])
+        else:
+            cpu.write32(addr, regs[rd])
+    return handler
+
+
+def _thumb_transfer_halfword(load):
+    def handler(cpu, instr):
+        regs = cpu.regs
+        addr = (regs[(instr >> 3) & 7] + (((instr >> 6) & 31) << 1)) & M32
+        if load:
+            regs[instr & 7] = _load_halfword(cpu, addr, 1)
+        else:
+            cpu.write16(addr, regs[instr & 7])
+    return handler
+
+
+def _thumb_transfer_sp(load):
+    def handler(cpu, instr):
+        regs = cpu.regs
+        addr = (regs[13] + ((instr & 0xFF) << 2)) & M32
+        rd = (instr >> 8) & 7
+        if load:
+            regs[rd] = _rotate_read(cpu.read32(addr), addr)
+        else:
+            cpu.write32(addr, regs[rd])
+    return handler
+
+
+def _thumb_load_address(sp):
+    def handler(cpu, instr):
+        regs = cpu.regs
+        base = regs[13] if sp else regs[15] & ~2
+        regs[(instr >> 8) & 7] = (base + ((instr & 0xFF) << 2)) & M32
+    return handler
+
+
+def _thumb_adjust_sp(cpu, instr):
+    offset = (instr & 0x7F) << 2
+    regs = cpu.regs
+    regs[13] = (regs[13] - offset if instr & 0x80 else regs[13] + offset) & M32
+
+
+def _thumb_push_pop(load):
+    if load:
+        def handler(cpu, instr):
+            regs = cpu.regs
+            addr = regs[13]
+            read32 = cpu.read32
+            for r in register_list(instr & 0xFF):
+                regs[r] = read32(addr)
+                addr += 4
+            if instr & 0x100:
+                # POP {PC} does not change state on ARMv4T
+                regs[15] = (read32(addr) & ~1) + 2
+                addr += 4
+            regs[13] = addr & M32
+    else:
+        def handler(cpu, instr):
+            regs = cpu.regs
+            registers = register_list(instr & 0xFF)
+            count = len(registers) + ((instr >> 8) & 1)
+            addr = (regs[13] - 4 * count) & M32
+            regs[13] = addr
+            write32 = cpu.write32
+            for r in registers:
+                write32(addr, regs[r])
+                addr += 4
+            if instr & 0x100:
+                write32(addr, regs[14])
+    return handler
+
+
+def _thumb_block_transfer(load):
+    def handler(cpu, instr):
+        regs = cpu.regs
+        rb = (instr >> 8) & 7
+        registers = register_list(instr & 0xFF)
+        addr = regs[rb]
+        if not registers:
+            # An empty list transfers PC and moves the base by 0x40
+            if load:
+                regs[15] = (cpu.read32(addr) & ~1) + 2
+            else:
+                cpu.write32(addr, regs[15] + 2)
+            regs[rb] = (addr + 0x40) & M32
+            return
+        new_base = (addr + 4 * len(registers)) & M32
+        if load:
+            regs[rb] = new_base
+            read32 = cpu.read32
+            for r in registers:
+                regs[r] = read32(addr)
+                addr += 4
+        else:
+            write32 = cpu.write32
+            first = registers[0]
+            for r in registers:
+                write32(addr, new_base if r == rb and r != first else regs[r])
+                addr += 4
+            regs[rb] = new_base
+    return handler
+
+
+def _thumb_conditional_branch(cond):
+    def handler(cpu, instr):
+        if COND_PASSES[(cond << 4) | (cpu.cpsr >> 28)]:
+            offset = instr & 0xFF
+            if offset & 0x80:
+                offset -= 0x100
+            regs = cpu.regs
+            regs[15] = ((regs[15] + (offset << 1)) & M32) + 2
+    return handler
+
+
+def _thumb_branch(cpu, instr):
+    offset = instr & 0x7FF
+    if offset & 0x400:
+        offset -= 0x800
+    regs = cpu.regs
+    regs[15] = ((regs[15] + (offset << 1)) & M32) + 2
+
+
+def _thumb_branch_link_high(cpu, instr):
+    offset = instr & 0x7FF
+    if offset & 0x400:
+        offset -= 0x800
+    regs = cpu.regs
+    regs[14] = (regs[15] + (offset << 12)) & M32
+
+
+def _thumb_branch_link_low(cpu, instr):
+    regs = cpu.regs
+    target = (regs[14] + ((instr & 0x7FF) << 1)) & M32
+    regs[14] = (regs[15] - 2) | 1
+    regs[15] = (target & ~1) + 2
+
+
+def _thumb_swi(cpu, instr):
+    cpu.software_interrupt(instr & 0xFF, cpu.regs[15] - 2, 2)
+
+
+def _thumb_undefined(cpu, instr):
+    cpu.undefined_instruction(instr, cpu.regs[15] - 2, 2)
+
+
+def _decode_thumb(index):
+    """Handler for Thumb instructions with bits 15-6 = index."""
+    instr = index << 6
+    group = instr >> 13
+    if group == 0:
+        op = (instr >> 11) & 3
+        if op != 3:
+            return _thumb_shift(op)
+        return _thumb_add_subtract(instr & 0x400, instr & 0x200)
+    if group == 1:
+        return _thumb_immediate((instr >> 11) & 3)
+    if group == 2:
+        if instr & 0xFC00 == 0x4000:
+            return _thumb_alu((instr >> 6) & 15)
+        if instr & 0xFC00 == 0x4400:
+            return _thumb_hi_register((instr >> 8) & 3)
+        if instr & 0xF800 == 0x4800:
+            return _thumb_load_pc_relative
+        if instr & 0x0200 == 0:
+            return _thumb_transfer_register(instr & 0x800, instr & 0x400)
+        return _thumb_transfer_signed((instr >> 10) & 3)
+    if group == 3:
+        return _thumb_transfer_immediate(instr & 0x1000, instr & 0x800)
+    if group == 4:
+        if instr & 0x1000 == 0:
+            return _thumb_transfer_halfword(instr & 0x800)
+        return _thumb_transfer_sp(instr & 0x800)
+    if group == 5:
+        if instr & 0x1000 == 0:
+            return _thumb_load_address(instr & 0x800)
+        if instr & 0x0F00 == 0x0000:
+            return _thumb_adjust_sp
+        if instr & 0x0600 == 0x0400:
+            return _thumb_push_pop(instr & 0x800)
+        return _thumb_undefined
+    if group == 6:
+        if instr & 0x1000 == 0:
+            return _thumb_block_transfer(instr & 0x800)
+        cond = (instr >> 8) & 15
+        if cond == 15:
+            return _thumb_swi
+        if cond == 14:
+            return _thumb_undefined
+        return _thumb_conditional_branch(cond)
+    op = (instr >> 11) & 3
+    if op == 0:
+        return _thumb_branch
+    if op == 2:
+        return _thumb_branch_link_high
+    if op == 3:
+        return _thumb_branch_link_low
+    return _thumb_undefined
+
+
+THUMB_TABLE = [_decode_thumb(index) for index in range(1024)]
+
+
+class CPU:
+    def __init__(self, memory):
+        self.memory = memory
+        self.read8 = memory.read8
+        self.read16 = memory.read16
+        self.read32 = memory.read32
+        self.write8 = memory.write8
+        self.write16 = memory.write16
+        self.write32 = memory.write32
+        self.reset()
+
+    def reset(self):
+        self.regs = [0] * 16  # R0-R15 (R15 = PC)
+        self.spsr = 0
+        # Banked R13/R14/SPSR per bank (the current bank's live in regs/spsr),
+        # and R8-R12 of FIQ mode and of every other mode
+        self.banked_sp = [0] * 6
+        self.banked_lr = [0] * 6
+        self.banked_spsr = [0] * 6
+        self.banked_fiq = [0] * 5
+        self.banked_user = [0] * 5
+        self.instructions = 0
+        self.reported = set()
+        if self.memory.bios_loaded:
+            self.cpsr = MODE_SVC | FLAG_I | FLAG_F
+            self.regs[15] = 0
+        else:
+            # Skip the BIOS: System mode at the cartridge entry point
+            for bank, sp in BOOT_STACKS.items():
+                self.banked_sp[bank] = sp
+            self.cpsr = MODE_SYS
+            self.regs[13] = BOOT_STACKS[BANK_USR]
+            self.regs[15] = ROM_START
+
+    def run(self, count):
+        """Execute `count` instructions."""
+        regs = self.regs
+        read16 = self.read16
+        read32 = self.read32
+        arm_table = ARM_TABLE
+        thumb_table = THUMB_TABLE
+        cond_passes = COND_PASSES
+        for _ in range(count):
+            pc = regs[15]
+            if self.cpsr & FLAG_T:
+                instr = read16(pc)
+                regs[15] = pc + 4
+                thumb_table[instr >> 6](self, instr)
+                regs[15] -= 2
+            else:
+                instr = read32(pc)
+                regs[15] = pc + 8
+                if cond_passes[((instr >> 24) & 0xF0) | (self.cpsr >> 28)]:
+                    arm_table[((instr >> 16) & 0xFF0) | ((instr >> 4) & 0xF)](self, instr)
+                regs[15] -= 4
+        self.instructions += count
+
+    def step(self):
+        self.run(1)
+
+    # --- Modes and exceptions ---
+
+    def switch_mode(self, mode):
+        """Swap in the banked registers of `mode` (the caller updates the CPSR)."""
+        old = BANKS.get(self.cpsr & 0x1F, BANK_USR)
+        new = BANKS.get(mode, BANK_USR)
+        if old == new:
+            return
+        regs = self.regs
+        self.banked_sp[old] = regs[13]
+        self.banked_lr[old] = regs[14]
+        self.banked_spsr[old] = self.spsr
+        if old == BANK_FIQ:
+            self.banked_fiq[:] = regs[8:13]
+            regs[8:13] = self.banked_user
+        elif new == BANK_FIQ:
+            self.banked_user[:] = regs[8:13]
+            regs[8:13] = self.banked_fiq
+        regs[13] = self.banked_sp[new]
+        regs[14] = self.banked_lr[new]
+        self.spsr = self.banked_spsr[new]
+
+    def set_cpsr(self, value):
+        if (value ^ self.cpsr) & 0x1F:
+            self.switch_mode(value & 0x1F)
+        self.cpsr = value
+
+    def restore_spsr(self):
+        """CPSR = SPSR, for returns from exceptions (no-op in User/System mode)."""
+        if BANKS.get(self.cpsr & 0x1F, BANK_USR) != BANK_USR:
+            self.set_cpsr(self.spsr)
+
+    def alu_write_pc(self, value, restore):
+        """An ARM data-processing result written to PC; with S it also returns from an exception."""
+        if restore:
+            self.restore_spsr()
+        self.regs[15] = (value & (~1 if self.cpsr & FLAG_T else ~3)) + 4
+
+    def user_register(self, r):
+        """R8-R14 as User mode sees them, for LDM/STM with the S bit."""
+        bank = BANKS.get(self.cpsr & 0x1F, BANK_USR)
+        if r >= 13 and bank != BANK_USR:
+            return self.banked_sp[BANK_USR] if r == 13 else self.banked_lr[BANK_USR]
+        if 8 <= r <= 12 and bank == BANK_FIQ:
+            return self.banked_user[r - 8]
+        return self.regs[r]
+
+    def set_user_register(self, r, value):
+        bank = BANKS.get(self.cpsr & 0x1F, BANK_USR)
+        if r >= 13 and bank != BANK_USR:
+            if r == 13:
+                self.banked_sp[BANK_USR] = value
+            else:
+                self.banked_lr[BANK_USR] = value
+        elif 8 <= r <= 12 and bank == BANK_FIQ:
+            self.banked_user[r - 8] = value
+        else:
+            self.regs[r] = value
+
+    def exception(self, mode, vector, return_address):
+        """Enter `mode` at `vector` in ARM state with IRQs disabled."""
+        cpsr = self.cpsr
+        self.switch_mode(mode)
+        self.spsr = cpsr
+        self.cpsr = (cpsr & ~(0x1F | FLAG_T)) | mode | FLAG_I
+        self.regs[14] = return_address
+        self.regs[15] = vector
+
+    def interrupt(self):
+        """Take an IRQ between instructions, if the CPSR allows it."""
+        if self.cpsr & FLAG_I:
+            return
+        # LR is the next instruction + 4, whatever the state
+        self.exception(MODE_IRQ, VECTOR_IRQ, self.regs[15] + 4)
+
+    def software_interrupt(self, comment, return_address, size):
+        if not self.memory.bios_loaded:
+            self._report(("swi", comment), f"SWI {comment:#04x} called without a BIOS, skipped")
+            return
+        self.exception(MODE_SVC, VECTOR_SWI, return_address)
+        # Leave R15 where run() expects a branching handler to
+        self.regs[15] += size
+
+    def undefined_instruction(self, instr, address, size):
+        if not self.memory.bios_loaded:
+            self._report(("undefined", instr), f"Undefined instruction {instr:#010x} at {address:#010x}, skipped")
+            return
+        self.exception(MODE_UND, VECTOR_UNDEFINED, address + size)
+        self.regs[15] += size
+
+    def _report(self, key, message):
+        if key not in self.reported:
+            self.reported.add(key)
+            print(message)
@@ -0,0 +1,259 @@
+"""
+GBA memory map shared by the Python GBA emulators (EMUGROKV0.py and GR1KGPT.py).
+
+The bus dispatches on the top byte of the address (addr >> 24) through a
+256-entry table of regions:
+
+    0x00 BIOS (16KB, read-only)    0x05 palette RAM (1KB)
+    0x02 EWRAM (256KB)             0x06 VRAM (96KB)
+    0x03 IWRAM (32KB)              0x07 OAM (1KB)
+    0x04 I/O registers (1KB)       0x08-0x0D cartridge ROM (three wait-state mirrors)
+                                   0x0E SRAM (64KB)
+
+Anything else is unmapped: reads return 0 and writes are dropped.
+
+Each region is a bytearray (the ROM is the file itself, mmap'd read-only) read
+and written a whole 16/32-bit little-endian word at a time with precompiled
+struct.Struct unpack_from/pack_into, instead of being assembled byte by byte.
+Word and halfword accesses are force-aligned, and each region wraps through
+its whole window (the RAM mirrors the hardware has; I/O simply repeats every
+1KB here), so an offset never leaves the buffer.
+
+Byte writes follow the hardware: to palette RAM and VRAM they store the byte in
+both halves of the halfword, to OAM, BIOS and ROM they are ignored.
+"""
+
+import mmap
+import os
+import struct
+
+U16 = struct.Struct("<H")
+U32 = struct.Struct("<I")
+
+BIOS_SIZE = 0x4000
+EWRAM_SIZE = 0x40000
+IWRAM_SIZE = 0x8000
+IO_SIZE = 0x400
+PALETTE_SIZE = 0x400
+VRAM_SIZE = 0x18000
+OAM_SIZE = 0x400
+SRAM_SIZE = 0x10000
+ROM_MAX_SIZE = 0x2000000
+
+ROM_START = 0x08000000
+
+
+class Region:
+    """A RAM region of `size` bytes (a power of two), mirrored through its window."""
+
+    def __init__(self, size, data=None):
+        self.data = bytearray(size) if data is None else data
+        self.mask = size - 1
+        self._read16 = U16.unpack_from
+        self._read32 = U32.unpack_from
+        self._write16 = U16.pack_into
+        self._write32 = U32.pack_into
+
+    def read8(self, addr):
+        return self.data[addr & self.mask]
+
+    def read16(self, addr):
+        return self._read16(self.data, addr & self.mask & ~1)[0]
+
+    def read32(self, addr):
+        return self._read32(self.data, addr & self.mask & ~3)[0]
+
+    def write8(self, addr, value):
+        self.data[addr & self.mask] = value & 0xFF
+
+    def write16(self, addr, value):
+        self._write16(self.data, addr & self.mask & ~1, value & 0xFFFF)
+
+    def write32(self, addr, value):
+        self._write32(self.data, addr & self.mask & ~3, value & 0xFFFFFFFF)
+
+
+class ReadOnlyRegion(Region):
+    """BIOS: readable, writes ignored."""
+
+    def write8(self, addr, value):
+        pass
+
+    def write16(self, addr, value):
+        pass
+
+    def write32(self, addr, value):
+        pass
+
+
+class VideoRegion(Region):
+    """Palette RAM: a byte write lands in both bytes of its halfword."""
+
+    def write8(self, addr, value):
+        self._write16(self.data, addr & self.mask & ~1, (value & 0xFF) * 0x0101)
+
+
+class VRAMRegion(VideoRegion):
+    """VRAM is 96KB in a 128KB mirror: the last 32KB repeats 0x10000-0x17FFF."""
+
+    def __init__(self):
+        super().__init__(VRAM_SIZE)
+
+    @staticmethod
+    def offset(addr):
+        offset = addr & 0x1FFFF
+        return offset - 0x8000 if offset >= VRAM_SIZE else offset
+
+    def read8(self, addr):
+        return self.data[self.offset(addr)]
+
+    def read16(self, addr):
+        return self._read16(self.data, self.offset(addr & ~1))[0]
+
+    def read32(self, addr):
+        return self._read32(self.data, self.offset(addr & ~3))[0]
+
+    def write8(self, addr, value):
+        self._write16(self.data, self.offset(addr & ~1), (value & 0xFF) * 0x0101)
+
+    def write16(self, addr, value):
+        self._write16(self.data, self.offset(addr & ~1), value & 0xFFFF)
+
+    def write32(self, addr, value):
+        self._write32(self.data, self.offset(addr & ~3), value & 0xFFFFFFFF)
+
+
+class OAMRegion(Region):
+    """OAM ignores byte writes."""
+
+    def write8(self, addr, value):
+        pass
+
+
+class SRAMRegion(Region):
+    """Cartridge SRAM sits on an 8-bit bus: wider reads see the byte repeated."""
+
+    def read16(self, addr):
+        return self.data[addr & self.mask] * 0x0101
+
+    def read32(self, addr):
+        return self.data[addr & self.mask] * 0x01010101
+
+    def write16(self, addr, value):
+        self.data[addr & self.mask] = (value >> (8 * (addr & 1))) & 0xFF
+
+    def write32(self, addr, value):
+        self.data[addr & self.mask] = (value >> (8 * (addr & 3))) & 0xFF
+
+
+class ROMRegion(ReadOnlyRegion):
+    """The cartridge ROM, mapped straight from the file.
+
+    Past the end of the ROM the bus reads back the low 16 bits of the halfword
+    address (open bus), which is what size probes expect.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError(f"ROM file {path} is empty")
+            self.file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        super().__init__(ROM_MAX_SIZE, data=self.file)
+        self.size = min(len(self.file), ROM_MAX_SIZE)
+
+    def read8(self, addr):
+        offset = addr & self.mask
+        if offset < self.size:
+            return self.data[offset]
+        return (offset >> 1 >> (8 * (offset & 1))) & 0xFF
+
+    def read16(self, addr):
+        offset = addr & self.mask & ~1
+        if offset + 2 <= self.size:
+            return self._read16(self.data, offset)[0]
+        return (offset >> 1) & 0xFFFF
+
+    def read32(self, addr):
+        offset = addr & self.mask & ~3
+        if offset + 4 <= self.size:
+            return self._read32(self.data, offset)[0]
+        low = (offset >> 1) & 0xFFFF
+        return low | (((low + 1) & 0xFFFF) << 16)
+
+    def close(self):
+        self.data = b""
+        self.file.close()
+
+
+class Unmapped:
+    def read8(self, addr):
+        return 0
+
+    def read16(self, addr):
+        return 0
+
+    def read32(self, addr):
+        return 0
+
+    def write8(self, addr, value):
+        pass
+
+    def write16(self, addr, value):
+        pass
+
+    def write32(self, addr, value):
+        pass
+
+
+class Memory:
+    def __init__(self, rom_path, bios_path=None):
+        if not os.path.exists(rom_path):
+            raise FileNotFoundError(f"ROM file {rom_path} not found")
+        self.bios = ReadOnlyRegion(BIOS_SIZE)
+        self.bios_loaded = bool(bios_path)
+        if bios_path:
+            with open(bios_path, "rb") as f:
+                bios = f.read(BIOS_SIZE)
+            self.bios.data[:len(bios)] = bios
+        self.ewram = Region(EWRAM_SIZE)
+        self.iwram = Region(IWRAM_SIZE)
+        self.io = Region(IO_SIZE)
+        self.palette = VideoRegion(PALETTE_SIZE)
+        self.vram = VRAMRegion()
+        self.oam = OAMRegion(OAM_SIZE)
+        self.rom = ROMRegion(rom_path)
+        self.sram = SRAMRegion(SRAM_SIZE)
+
+        unmapped = Unmapped()
+        self.regions = [unmapped] * 256
+        self.regions[0x00] = self.bios
+        self.regions[0x02] = self.ewram
+        self.regions[0x03] = self.iwram
+        self.regions[0x04] = self.io
+        self.regions[0x05] = self.palette
+        self.regions[0x06] = self.vram
+        self.regions[0x07] = self.oam
+        for page in range(0x08, 0x0E):
+            self.regions[page] = self.rom
+        self.regions[0x0E] = self.sram
+
+    def read8(self, addr):
+        return self.regions[(addr >> 24) & 0xFF].read8(addr)
+
+    def read16(self, addr):
+        return self.regions[(addr >> 24) & 0xFF].read16(addr)
+
+    def read32(self, addr):
+        return self.regions[(addr >> 24) & 0xFF].read32(addr)
+
+    def write8(self, addr, value):
+        self.regions[(addr >> 24) & 0xFF].write8(addr, value)
+
+    def write16(self, addr, value):
+        self.regions[(addr >> 24) & 0xFF].write16(addr, value)
+
+    def write32(self, addr, value):
+        self.regions[(addr >> 24) & 0xFF].write32(addr, value)
+
+    def close(self):
+        self.rom.close()
@@ -0,0 +1,79 @@
+"""
+GBA display renderer shared by the Python GBA emulators (EMUGROKV0.py and GR1KGPT.py).
+
+VRAM and palette RAM are viewed in place as NumPy arrays (np.frombuffer over
+the memory regions' bytearrays, so there is no copy and no per-frame setup),
+and a whole frame is produced with array operations: a BGR555 colour is split
+with vectorized shifts and each 5-bit channel expanded to 8 bits through a
+32-entry lookup table. render() returns the frame in pygame.surfarray's (x, y)
+layout, ready for one blit_array and one scale.
+
+Bitmap modes are supported:
+ - mode 3: 240x160 direct colour
+ - mode 4: 240x160 8-bit palette indices, two pages (DISPCNT bit 4)
+ - mode 5: 160x128 direct colour, two pages, in the top-left corner
+Tile modes (0-2) show the backdrop colour for now, as does a disabled BG2.
+Forced blank (DISPCNT bit 7) shows white, as on hardware.
+"""
+
+import numpy as np
+
+SCREEN_WIDTH = 240
+SCREEN_HEIGHT = 160
+MODE5_WIDTH = 160
+MODE5_HEIGHT = 128
+
+REG_DISPCNT = 0x000
+DISPCNT_PAGE = 0x0010
+DISPCNT_FORCED_BLANK = 0x0080
+DISPCNT_BG2 = 0x0400
+
+# Byte offset of the second bitmap page (modes 4 and 5)
+PAGE_OFFSET = 0xA000
+
+# 5-bit channel -> 8 bits, replicating the top bits so 31 maps to 255
+CHANNEL_LUT = np.array([(c << 3) | (c >> 2) for c in range(32)], dtype=np.uint8)
+
+WHITE = 0x7FFF
+
+
+def bgr555_to_rgb(colors, out):
+    """Expand an array of BGR555 colours into `out` (same shape + (3,), uint8)."""
+    out[..., 0] = CHANNEL_LUT[colors & 0x1F]
+    out[..., 1] = CHANNEL_LUT[(colors >> 5) & 0x1F]
+    out[..., 2] = CHANNEL_LUT[(colors >> 10) & 0x1F]
+    return out
+
+
+class Renderer:
+    def __init__(self, memory):
+        self.io = memory.io
+        vram = memory.vram.data
+        self.vram16 = np.frombuffer(vram, dtype="<u2")
+        self.vram8 = np.frombuffer(vram, dtype=np.uint8)
+        self.palette = np.frombuffer(memory.palette.data, dtype="<u2")
+        # BGR555 per pixel, indexed [x, y] like a pygame surface
+        self.colors = np.zeros((SCREEN_WIDTH, SCREEN_HEIGHT), dtype=np.uint16)
+        self.frame = np.zeros((SCREEN_WIDTH, SCREEN_HEIGHT, 3), dtype=np.uint8)
+
+    def render(self):
+        """Return the current frame as a (240, 160, 3) uint8 RGB array."""
+        dispcnt = self.io.read16(REG_DISPCNT)
+        mode = dispcnt & 7
+        page = PAGE_OFFSET if dispcnt & DISPCNT_PAGE else 0
+        colors = self.colors
+        if dispcnt & DISPCNT_FORCED_BLANK:
+            colors.fill(WHITE)
+        elif not dispcnt & DISPCNT_BG2 or mode not in (3, 4, 5):
+            colors.fill(self.palette[0])
+        elif mode == 3:
+            colors[:] = self.vram16[:SCREEN_WIDTH * SCREEN_HEIGHT].reshape(SCREEN_HEIGHT, SCREEN_WIDTH).T
+        elif mode == 4:
+            indices = self.vram8[page:page + SCREEN_WIDTH * SCREEN_HEIGHT].reshape(SCREEN_HEIGHT, SCREEN_WIDTH)
+            colors[:] = self.palette[indices].T
+        else:
+            start = page // 2
+            bitmap = self.vram16[start:start + MODE5_WIDTH * MODE5_HEIGHT].reshape(MODE5_HEIGHT, MODE5_WIDTH)
+            colors.fill(self.palette[0])
+            colors[:MODE5_WIDTH, :MODE5_HEIGHT] = bitmap.T
+        return bgr555_to_rgb(colors, self.frame)
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Headless benchmark / regression runner for the Python NES cores.
+
+Runs a ROM for a fixed number of frames on either core without opening a
+Tk or pygame window, and reports:
+ - instructions/sec and frames/sec
+ - per-frame emulation time percentiles (p50/p90/p99/max)
+ - a framebuffer hash for every frame
+
+Cores:
+ - emunes : NESEmulator from emunesv0.py
+ - emux   : NES from emu-x.x.x.py
+
+Controller input script (plain text, one change per line):
+
+    # frame  buttons...
+    0        -
+    60       START
+    61       -
+    120      RIGHT A
+
+The buttons listed on a line are held from that frame until the next line.
+Button names: A B SELECT START UP DOWN LEFT RIGHT, or '-' for none.
+
+Usage:
+    python nesbench.py test.nes --frames 300
+    python nesbench.py test.nes --core emux --input run.txt --json out.json
+    python nesbench.py test.nes --compare out.json
+    python nesbench.py test.nes --no-blocks --compare out.json
+    python nesbench.py test.nes --profile prof
+    python nesbench.py test.nes --movie run.nesm --core emux
+
+--movie plays back an input movie recorded in emunesv0.py or emu-x (see
+nesmovie.py) at uncapped speed; --frames defaults to the movie's length.
+
+--profile PREFIX runs the core under the opcode/hot-PC profiler (nesprofile.py),
+prints its report and writes PREFIX.json, PREFIX.csv and PREFIX.folded.
+Profiling slows the core down, so its timings are not comparable to plain runs.
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import struct
+import sys
+import time
+
+from nesmovie import BUTTONS, Movie, reverse_bits
+from nesprofile import Profiler
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def load_module(name, filename):
+    """Import one of the emulator scripts by path (their filenames are not valid module names)."""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(HERE, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class EmunesCore:
+    """Adapter for emunesv0.NESEmulator."""
+    name = "emunes"
+
+    def __init__(self, blocks=True):
+        self.module = load_module("emunesv0", "emunesv0.py")
+        self.emu = self.module.NESEmulator()
+        self.emu.cpu.use_blocks = blocks
+
+    def version(self):
+        return self.module.EMULATOR_VERSION
+
+    def profile(self):
+        """Attach a fresh profiler to the CPU (call after load) and return it."""
+        profiler = Profiler(self.module.OPCODE_SPECS)
+        self.emu.cpu.attach_profiler(profiler)
+        return profiler
+
+    def load(self, path):
+        self.emu.load_rom(path)
+
+    def set_buttons(self, state):
+        self.emu.bus.controller_state = state
+
+    def run_frame(self):
+        self.emu.step_frame()
+
+    def instructions(self):
+        return self.emu.instructions_executed
+
+    def frame_bytes(self):
+        return self.emu.framebuffer_bytes()
+
+
+class EmuxCore:
+    """Adapter for the NES class in emu-x.x.x.py."""
+    name = "emux"
+
+    def __init__(self, blocks=True):
+        self.module = load_module("emux", "emu-x.x.x.py")
+        self.emu = self.module.NES()
+        self.emu.cpu.useBlocks = blocks
+
+    def version(self):
+        return self.module.EMULATOR_VERSION
+
+    def profile(self):
+        profiler = Profiler(self.module.OPCODES)
+        self.emu.cpu.attachProfiler(profiler)
+        return profiler
+
+    def load(self, path):
+        if not self.emu.loadROM(path):
+            raise ValueError("Failed to load ROM")
+
+    def set_buttons(self, state):
+        self.emu.controller.state = reverse_bits(state)
+
+    def run_frame(self):
+        self.emu.runFrame()
+
+    def instructions(self):
+        return self.emu.instructions
+
+    def frame_bytes(self):
+        fb = self.emu.ppu.framebuffer
+        return struct.pack("<%dI" % len(fb), *[pixel & 0xFFFFFFFF for pixel in fb])
+
+
+CORES = {"emunes": EmunesCore, "emux": EmuxCore}
+
+
+def load_input_script(path, frames):
+    """Expand an input script into a per-frame list of controller states."""
+    states = [0] * frames
+    changes = []
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            fields = line.split()
+            try:
+                frame = int(fields[0])
+                state = 0
+                for button in fields[1:]:
+                    if button != "-":
+                        state |= BUTTONS[button.upper()]
+            except (ValueError, KeyError):
+                raise ValueError(f"{path}:{lineno}: bad input line {line!r}")
+            changes.append((frame, state))
+    changes.sort()
+    for i, (start, state) in enumerate(changes):
+        end = changes[i + 1][0] if i + 1 < len(changes) else frames
+        for frame in range(max(start, 0), min(end, frames)):
+            states[frame] = state
+    return states
+
+
+def load_movie(path, rom_path, frames, core):
+    """Per-frame controller states from a .nesm movie; frames past its end press nothing."""
+    movie = Movie.load(path)
+    warning = movie.check(rom_path, core.version())
+    if warning:
+        print(f"  warning: {warning}")
+    return [movie[frame] if frame < len(movie) else 0 for frame in range(frames)]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def frame_hash(data):
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def run_benchmark(core, rom_path, frames, inputs=None, profiler_out=None):
+    """Run `frames` frames of `rom_path` on `core` and return a report dict.
+    With profiler_out (a list), the core is profiled and the Profiler appended to it."""
+    core.load(rom_path)
+    if profiler_out is not None:
+        profiler_out.append(core.profile())
+    start_instructions = core.instructions()
+    frame_times = []
+    hashes = []
+    total = 0.0
+    for frame in range(frames):
+        if inputs is not None:
+            core.set_buttons(inputs[frame])
+        t0 = time.perf_counter()
+        core.run_frame()
+        elapsed = time.perf_counter() - t0
+        total += elapsed
+        frame_times.append(elapsed * 1000.0)
+        # Hashing is kept out of the timed region
+        hashes.append(frame_hash(core.frame_bytes()))
+    instructions = core.instructions() - start_instructions
+    ordered = sorted(frame_times)
+    return {
+        "core": core.name,
+        "rom": os.path.basename(rom_path),
+        "frames": frames,
+        "instructions": instructions,
+        "seconds": total,
+        "instructions_per_sec": instructions / total if total else 0.0,
+        "frames_per_sec": frames / total if total else 0.0,
+        "frame_ms": {
+            "p50": percentile(ordered, 50),
+            "p90": percentile(ordered, 90),
+            "p99": percentile(ordered, 99),
+            "max": ordered[-1] if ordered else 0.0,
+        },
+        "hashes": hashes,
+    }
+
+
+def compare_hashes(report, reference):
+    """Return the first frame whose hash differs from `reference`, or None."""
+    for frame, (got, want) in enumerate(zip(report["hashes"], reference["hashes"])):
+        if got != want:
+            return frame
+    if len(report["hashes"]) != len(reference["hashes"]):
+        return min(len(report["hashes"]), len(reference["hashes"]))
+    return None
+
+
+def print_report(report):
+    ms = report["frame_ms"]
+    print(f"{report['core']} {report['rom']}: {report['frames']} frames in {report['seconds']:.3f}s")
+    print(f"  {report['instructions_per_sec']:,.0f} instructions/sec, {report['frames_per_sec']:.2f} frames/sec")
+    print(f"  frame ms: p50 {ms['p50']:.2f}  p90 {ms['p90']:.2f}  p99 {ms['p99']:.2f}  max {ms['max']:.2f}")
+    if report["hashes"]:
+        print(f"  last frame hash: {report['hashes'][-1]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless NES benchmark runner")
+    parser.add_argument("rom", help="iNES ROM to run")
+    parser.add_argument("--core", choices=sorted(CORES), default="emunes")
+    parser.add_argument("--frames", type=int, help="frames to run (default 300, or the movie's length)")
+    inputs = parser.add_mutually_exclusive_group()
+    inputs.add_argument("--input", help="controller input script")
+    inputs.add_argument("--movie", help="input movie (.nesm) to play back")
+    parser.add_argument("--json", help="write the full report (including hashes) to this file")
+    parser.add_argument("--compare", help="previous JSON report to check frame hashes against")
+    parser.add_argument("--no-blocks", action="store_true",
+                        help="run the plain interpreter instead of the block translation cache")
+    parser.add_argument("--profile", metavar="PREFIX",
+                        help="profile opcodes/hot PCs and write PREFIX.json, PREFIX.csv, PREFIX.folded")
+    args = parser.parse_args(argv)
+
+    core = CORES[args.core](blocks=not args.no_blocks)
+    profilers = [] if args.profile else None
+    try:
+        if args.frames is None:
+            args.frames = len(Movie.load(args.movie)) if args.movie else 300
+        inputs = None
+        if args.input:
+            inputs = load_input_script(args.input, args.frames)
+        elif args.movie:
+            inputs = load_movie(args.movie, args.rom, args.frames, core)
+        report = run_benchmark(core, args.rom, args.frames, inputs, profilers)
+    except Exception as e:
+        print(f"{args.core} {os.path.basename(args.rom)}: failed: {e}")
+        return 2
+    print_report(report)
+    if profilers:
+        profiler = profilers[0]
+        print(profiler.report())
+        profiler.write_json(args.profile + ".json")
+        profiler.write_csv(args.profile + ".csv")
+        profiler.write_folded(args.profile + ".folded")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            reference = json.load(f)
+        frame = compare_hashes(report, reference)
+        if frame is not None:
+            print(f"  MISMATCH: first differing frame {frame}")
+            return 1
+        print("  frame hashes match reference")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,429 @@
+"""
+Basic-block translation cache for the Python 6502 cores (emunesv0.py and emu-x.x.x.py).
+
+A block is a straight-line run of instructions starting at some PC and ending
+at the first branch, jump, JSR/RTS/RTI or BRK (or after at most MAX_LENGTH
+instructions). Each block is translated once into a generated Python function
+that keeps A/X/Y/SP/P in locals, has immediate and absolute operands baked in
+as constants, and touches zero page and the stack directly in RAM. Calling it
+runs the whole block and returns the cycles it used.
+
+Blocks are cached by PC and by the PRG bank mapped at that PC, so bank
+switching never runs stale code. Blocks translated from RAM keep a copy of
+their bytes and are retranslated when the RAM no longer matches, which catches
+writes through any mirror.
+
+A block also ends after any store that could reach the mapper or PRG RAM
+(indexed/indirect stores and absolute stores at $6000 and up), so a bank
+switch takes effect at the next instruction. Blocks running from RAM end after
+every write, so code that patches the instructions right after it still works.
+
+Cores that catch their PPU up lazily can pass cycle_attr: blocks then store
+the cycles elapsed so far in cpu.<cycle_attr> before each write and each
+computed-address read, so an I/O handler can add it to the cycle counter.
+
+max_cycles is the most a block can take (every page-cross penalty and a taken
+branch to another page), which lets a frame loop run blocks only while they
+cannot overshoot a frame or scanline boundary. That keeps results identical to
+the plain interpreter.
+"""
+
+from collections import namedtuple
+
+MAX_LENGTH = 48
+
+SIZES = {
+    "imp": 1, "acc": 1, "imm": 2, "zp": 2, "zpx": 2, "zpy": 2, "izx": 2, "izy": 2,
+    "rel": 2, "abs": 3, "abx": 3, "aby": 3, "ind": 3,
+}
+
+# Branch opcodes -> condition (on the local p) under which the branch is taken
+BRANCHES = {
+    "bpl": "not (p & 0x80)", "bmi": "p & 0x80",
+    "bvc": "not (p & 0x40)", "bvs": "p & 0x40",
+    "bcc": "not (p & 0x01)", "bcs": "p & 0x01",
+    "bne": "not (p & 0x02)", "beq": "p & 0x02",
+}
+TERMINATORS = {"jmp", "jsr", "rts", "rti", "brk"} | set(BRANCHES)
+
+# N and Z flags for every byte value
+NZ = bytes((v & 0x80) | (0 if v else 0x02) for v in range(256))
+
+Block = namedtuple("Block", "run length max_cycles code")
+
+PUSH = ["ram[0x100 | sp] = {}", "sp = (sp - 1) & 0xFF"]
+POP = ["sp = (sp + 1) & 0xFF", "{} = ram[0x100 | sp]"]
+
+
+def push(value):
+    return [PUSH[0].format(value), PUSH[1]]
+
+
+def pop(target):
+    return [POP[0], POP[1].format(target)]
+
+
+class BlockTranslator:
+    """Generates Python source for one block; subclass and override op_* for core quirks."""
+    def __init__(self, specs, nop_cycles=2, page_cross_ops=(), branch_penalty=True, cycle_attr=None):
+        self.specs = specs
+        self.nop_cycles = nop_cycles
+        self.page_cross_ops = set(page_cross_ops)
+        self.branch_penalty = branch_penalty
+        self.cycle_attr = cycle_attr
+        # Set by address() when the instruction may pay a page-cross cycle
+        self.crossed = False
+        # Base cycles up to the end of the instruction being translated
+        self.elapsed = 0
+
+    def translate(self, start, fetch, in_ram=False):
+        """Return (function name, body lines, end PC expression, instruction count,
+        base cycles, max cycles, code bytes), or None if no instruction fits."""
+        pc = start
+        lines = []
+        code = bytearray()
+        count = 0
+        base_cycles = max_cycles = 0
+        end_pc = None
+        while count < MAX_LENGTH:
+            name, mode, cycles = self.specs.get(fetch(pc), ("nop", "imp", self.nop_cycles))
+            size = SIZES[mode]
+            last = pc + size - 1
+            # Stay inside one 2KB region, so a block never spans two banks or RAM mirrors
+            if last > 0xFFFF or (last ^ start) & 0xF800:
+                break
+            operand = 0
+            for i in range(1, size):
+                operand |= fetch(pc + i) << (8 * (i - 1))
+            if self.stops_before(name, mode, operand):
+                break
+            code += bytes(fetch(a) for a in range(pc, pc + size))
+            next_pc = (pc + size) & 0xFFFF
+            lines.append("# $%04X %s %s" % (pc, name.upper(), mode))
+            self.crossed = False
+            self.elapsed = base_cycles + cycles
+            emitted = getattr(self, "op_" + name)(mode, operand, next_pc)
+            lines.extend(emitted)
+            count += 1
+            base_cycles += cycles
+            max_cycles += cycles + (1 if self.crossed else 0)
+            pc = next_pc
+            if name in TERMINATORS:
+                if name in BRANCHES and self.branch_penalty:
+                    max_cycles += 2
+                end_pc = "pc"
+                break
+            if self.ends_block(name, mode, operand, in_ram):
+                break
+        if count == 0:
+            return None
+        if end_pc is None:
+            end_pc = "0x%04X" % pc
+        func = "block_%04X" % start
+        return func, lines, end_pc, count, base_cycles, max_cycles, bytes(code)
+
+    def stops_before(self, name, mode, operand):
+        """True if this instruction must be left to the interpreter (it ends the block
+        before it, or makes the block untranslatable if it comes first)."""
+        return False
+
+    def ends_block(self, name, mode, operand, in_ram=False):
+        if in_ram and name in ("pha", "php"):
+            return True
+        if name not in ("sta", "stx", "sty", "inc", "dec", "asl", "lsr", "rol", "ror") or mode == "acc":
+            return False
+        if in_ram or mode in ("abx", "aby", "izx", "izy"):
+            return True
+        return mode == "abs" and operand >= 0x6000
+
+    # --- Operands ---
+    def address(self, mode, operand, name):
+        """Return (setup lines, kind, address expression); kind is 'ram' or 'bus'."""
+        if mode == "zp":
+            return [], "ram", "0x%02X" % operand
+        if mode in ("zpx", "zpy"):
+            return [], "ram", "(0x%02X + %s) & 0xFF" % (operand, mode[-1])
+        if mode == "abs":
+            if operand < 0x2000:
+                return [], "ram", "0x%03X" % (operand & 0x7FF)
+            return [], "bus", "0x%04X" % operand
+        lines = []
+        if mode in ("abx", "aby"):
+            reg = mode[-1]
+            lines.append("ea = (0x%04X + %s) & 0xFFFF" % (operand, reg))
+            if name in self.page_cross_ops:
+                lines.append("if 0x%02X + %s > 0xFF: c += 1" % (operand & 0xFF, reg))
+                self.crossed = True
+        elif mode == "izx":
+            lines.append("t = (0x%02X + x) & 0xFF" % operand)
+            lines.append("ea = ram[t] | (ram[(t + 1) & 0xFF] << 8)")
+        elif mode == "izy":
+            lines.append("t = ram[0x%02X] | (ram[0x%02X] << 8)" % (operand, (operand + 1) & 0xFF))
+            lines.append("ea = (t + y) & 0xFFFF")
+            if name in self.page_cross_ops:
+                lines.append("if (t & 0xFF) + y > 0xFF: c += 1")
+                self.crossed = True
+        return lines, "bus", "ea"
+
+    def load(self, mode, operand, name):
+        """Return (setup lines, value expression)."""
+        if mode == "imm":
+            return [], "0x%02X" % operand
+        lines, kind, addr = self.address(mode, operand, name)
+        if kind == "bus" and addr == "ea":
+            lines.extend(self.sync())
+        return lines, ("ram[%s]" if kind == "ram" else "read(%s)") % addr
+
+    def modify(self, mode, operand, name, body):
+        """Read-modify-write: `body` turns v into the new value nv (and sets flags)."""
+        lines, kind, addr = self.address(mode, operand, name)
+        if addr != "ea" and not addr.startswith("0x"):
+            lines.append("ea = %s" % addr)
+            addr = "ea"
+        if kind == "ram":
+            lines.append("v = ram[%s]" % addr)
+            lines.extend(body)
+            lines.append("ram[%s] = nv" % addr)
+        else:
+            lines.extend(self.sync())
+            lines.append("v = read(%s)" % addr)
+            lines.extend(body)
+            lines.append("write(%s, nv)" % addr)
+        return lines
+
+    def store(self, mode, operand, name, value):
+        lines, kind, addr = self.address(mode, operand, name)
+        if kind == "ram":
+            lines.append("ram[%s] = %s" % (addr, value))
+        else:
+            lines.extend(self.sync())
+            lines.append("write(%s, %s)" % (addr, value))
+        return lines
+
+    def sync(self):
+        if self.cycle_attr is None:
+            return []
+        return ["cpu.%s = %d + c" % (self.cycle_attr, self.elapsed)]
+
+    # --- Loads, stores and ALU ---
+    def op_lda(self, mode, operand, next_pc):
+        lines, value = self.load(mode, operand, "lda")
+        return lines + ["a = %s" % value, "p = (p & 0x7D) | NZ[a]"]
+    def op_ldx(self, mode, operand, next_pc):
+        lines, value = self.load(mode, operand, "ldx")
+        return lines + ["x = %s" % value, "p = (p & 0x7D) | NZ[x]"]
+    def op_ldy(self, mode, operand, next_pc):
+        lines, value = self.load(mode, operand, "ldy")
+        return lines + ["y = %s" % value, "p = (p & 0x7D) | NZ[y]"]
+    def op_sta(self, mode, operand, next_pc):
+        return self.store(mode, operand, "sta", "a")
+    def op_stx(self, mode, operand, next_pc):
+        return self.store(mode, operand, "stx", "x")
+    def op_sty(self, mode, operand, next_pc):
+        return self.store(mode, operand, "sty", "y")
+
+    def logic(self, mode, operand, name, op):
+        lines, value = self.load(mode, operand, name)
+        return lines + ["a %s= %s" % (op, value), "p = (p & 0x7D) | NZ[a]"]
+    def op_ora(self, mode, operand, next_pc):
+        return self.logic(mode, operand, "ora", "|")
+    def op_and(self, mode, operand, next_pc):
+        return self.logic(mode, operand, "and", "&")
+    def op_eor(self, mode, operand, next_pc):
+        return self.logic(mode, operand, "eor", "^")
+
+    def add(self, lines, value):
+        return lines + [
+            "v = %s" % value,
+            "s = a + v + (p & 1)",
+            "p = (p & 0x3C) | (s >> 8) | (((a ^ s) & ~(a ^ v) & 0x80) >> 1)",
+            "a = s & 0xFF",
+            "p |= NZ[a]",
+        ]
+    def op_adc(self, mode, operand, next_pc):
+        return self.add(*self.load(mode, operand, "adc"))
+    def op_sbc(self, mode, operand, next_pc):
+        lines, value = self.load(mode, operand, "sbc")
+        return self.add(lines, "%s ^ 0xFF" % value)
+
+    def compare(self, mode, operand, name, reg):
+        lines, value = self.load(mode, operand, name)
+        return lines + ["r = %s - %s" % (reg, value), "p = (p & 0x7C) | (r >= 0) | NZ[r & 0xFF]"]
+    def op_cmp(self, mode, operand, next_pc):
+        return self.compare(mode, operand, "cmp", "a")
+    def op_cpx(self, mode, operand, next_pc):
+        return self.compare(mode, operand, "cpx", "x")
+    def op_cpy(self, mode, operand, next_pc):
+        return self.compare(mode, operand, "cpy", "y")
+    def op_bit(self, mode, operand, next_pc):
+        lines, value = self.load(mode, operand, "bit")
+        return lines + ["v = %s" % value, "p = (p & 0x3D) | (v & 0xC0) | (0 if a & v else 2)"]
+
+    # --- Shifts, rotates, increments ---
+    def shift(self, mode, operand, name, carry, result):
+        if mode == "acc":
+            return ["v = a", "p = (p & 0x7C) | (%s)" % carry, "a = %s" % result, "p |= NZ[a]"]
+        body = ["p = (p & 0x7C) | (%s)" % carry, "nv = %s" % result, "p |= NZ[nv]"]
+        return self.modify(mode, operand, name, body)
+    def op_asl(self, mode, operand, next_pc):
+        return self.shift(mode, operand, "asl", "v >> 7", "(v << 1) & 0xFF")
+    def op_lsr(self, mode, operand, next_pc):
+        return self.shift(mode, operand, "lsr", "v & 1", "v >> 1")
+    def op_rol(self, mode, operand, next_pc):
+        # The carry-in is read before p is rewritten
+        return ["ci = p & 1"] + self.shift(mode, operand, "rol", "v >> 7", "((v << 1) & 0xFF) | ci")
+    def op_ror(self, mode, operand, next_pc):
+        return ["ci = (p & 1) << 7"] + self.shift(mode, operand, "ror", "v & 1", "ci | (v >> 1)")
+    def op_inc(self, mode, operand, next_pc):
+        return self.modify(mode, operand, "inc", ["nv = (v + 1) & 0xFF", "p = (p & 0x7D) | NZ[nv]"])
+    def op_dec(self, mode, operand, next_pc):
+        return self.modify(mode, operand, "dec", ["nv = (v - 1) & 0xFF", "p = (p & 0x7D) | NZ[nv]"])
+
+    def op_inx(self, mode, operand, next_pc):
+        return ["x = (x + 1) & 0xFF", "p = (p & 0x7D) | NZ[x]"]
+    def op_iny(self, mode, operand, next_pc):
+        return ["y = (y + 1) & 0xFF", "p = (p & 0x7D) | NZ[y]"]
+    def op_dex(self, mode, operand, next_pc):
+        return ["x = (x - 1) & 0xFF", "p = (p & 0x7D) | NZ[x]"]
+    def op_dey(self, mode, operand, next_pc):
+        return ["y = (y - 1) & 0xFF", "p = (p & 0x7D) | NZ[y]"]
+
+    # --- Transfers, flags and stack ---
+    def op_tax(self, mode, operand, next_pc):
+        return ["x = a", "p = (p & 0x7D) | NZ[x]"]
+    def op_tay(self, mode, operand, next_pc):
+        return ["y = a", "p = (p & 0x7D) | NZ[y]"]
+    def op_txa(self, mode, operand, next_pc):
+        return ["a = x", "p = (p & 0x7D) | NZ[a]"]
+    def op_tya(self, mode, operand, next_pc):
+        return ["a = y", "p = (p & 0x7D) | NZ[a]"]
+    def op_tsx(self, mode, operand, next_pc):
+        return ["x = sp", "p = (p & 0x7D) | NZ[x]"]
+    def op_txs(self, mode, operand, next_pc):
+        return ["sp = x"]
+
+    def op_clc(self, mode, operand, next_pc):
+        return ["p &= 0xFE"]
+    def op_sec(self, mode, operand, next_pc):
+        return ["p |= 0x01"]
+    def op_cli(self, mode, operand, next_pc):
+        return ["p &= 0xFB"]
+    def op_sei(self, mode, operand, next_pc):
+        return ["p |= 0x04"]
+    def op_clv(self, mode, operand, next_pc):
+        return ["p &= 0xBF"]
+    def op_cld(self, mode, operand, next_pc):
+        return ["p &= 0xF7"]
+    def op_sed(self, mode, operand, next_pc):
+        return ["p |= 0x08"]
+
+    def op_pha(self, mode, operand, next_pc):
+        return push("a")
+    def op_pla(self, mode, operand, next_pc):
+        return pop("a") + ["p = (p & 0x7D) | NZ[a]"]
+    def op_php(self, mode, operand, next_pc):
+        return push("p | 0x30")
+    def op_plp(self, mode, operand, next_pc):
+        return pop("p") + ["p = (p | 0x20) & 0xEF"]
+
+    def op_nop(self, mode, operand, next_pc):
+        return []
+
+    # --- Control flow (always the last instruction of a block) ---
+    def branch(self, condition, operand, next_pc):
+        target = (next_pc + ((operand ^ 0x80) - 0x80)) & 0xFFFF
+        lines = ["if %s:" % condition, "    pc = 0x%04X" % target]
+        if self.branch_penalty:
+            lines.append("    c += %d" % (2 if (target & 0xFF00) != (next_pc & 0xFF00) else 1))
+        return lines + ["else:", "    pc = 0x%04X" % next_pc]
+
+    def op_bpl(self, mode, operand, next_pc):
+        return self.branch(BRANCHES["bpl"], operand, next_pc)
+    def op_bmi(self, mode, operand, next_pc):
+        return self.branch(BRANCHES["bmi"], operand, next_pc)
+    def op_bvc(self, mode, operand, next_pc):
+        return self.branch(BRANCHES["bvc"], operand, next_pc)
+    def op_bvs(self, mode, operand, next_pc):
+        return self.branch(BRANCHES["bvs"], operand, next_pc)
+    def op_bcc(self, mode, operand, next_pc):
+        return self.branch(BRANCHES["bcc"], operand, next_pc)
+    def op_bcs(self, mode, operand, next_pc):
+        return self.branch(BRANCHES["bcs"], operand, next_pc)
+    def op_bne(self, mode, operand, next_pc):
+        return self.branch(BRANCHES["bne"], operand, next_pc)
+    def op_beq(self, mode, operand, next_pc):
+        return self.branch(BRANCHES["beq"], operand, next_pc)
+
+    def op_jmp(self, mode, operand, next_pc):
+        if mode == "ind":
+            # 6502 bug: the pointer's high byte is fetched without carrying into the next page
+            hi = (operand & 0xFF00) | ((operand + 1) & 0xFF)
+            return ["pc = read(0x%04X) | (read(0x%04X) << 8)" % (operand, hi)]
+        return ["pc = 0x%04X" % operand]
+    def op_jsr(self, mode, operand, next_pc):
+        ret = (next_pc - 1) & 0xFFFF
+        return push("0x%02X" % (ret >> 8)) + push("0x%02X" % (ret & 0xFF)) + ["pc = 0x%04X" % operand]
+    def op_rts(self, mode, operand, next_pc):
+        return pop("t") + pop("pc") + ["pc = (((pc << 8) | t) + 1) & 0xFFFF"]
+    def op_rti(self, mode, operand, next_pc):
+        return pop("p") + ["p = (p | 0x20) & 0xEF"] + pop("t") + pop("pc") + ["pc = (pc << 8) | t"]
+    def op_brk(self, mode, operand, next_pc):
+        # BRK skips a padding byte and leaves B set in the status register
+        ret = (next_pc + 1) & 0xFFFF
+        return (["p |= 0x10"] + push("0x%02X" % (ret >> 8)) + push("0x%02X" % (ret & 0xFF))
+                + push("p") + ["p |= 0x04", "pc = read(0xFFFE) | (read(0xFFFF) << 8)"])
+
+
+class BlockCache:
+    """Translated blocks for one CPU, keyed by PC and the PRG bank mapped there.
+
+    bank_of(pc) returns the bank number for ROM, -1 for RAM, or None where
+    code must not be cached (I/O). code_buffer(pc) returns (buffer, offset) of
+    the RAM backing a RAM address, for checking that a block is still current.
+    """
+    def __init__(self, translator, read, write, ram, bank_of, code_buffer, status="P"):
+        self.translator = translator
+        self.read = read
+        self.bank_of = bank_of
+        self.code_buffer = code_buffer
+        self.status = status
+        self.namespace = {"read": read, "write": write, "ram": ram, "NZ": NZ}
+        self.blocks = {}
+        self.translations = 0
+
+    def clear(self):
+        self.blocks.clear()
+
+    def lookup(self, pc):
+        """Return the Block starting at pc (translating it if needed), or None."""
+        bank = self.bank_of(pc)
+        if bank is None:
+            return None
+        key = pc | ((bank + 1) << 16)
+        block = self.blocks.get(key)
+        if block is None:
+            block = self.blocks[key] = self.translate(pc, bank < 0)
+        elif block and bank < 0:
+            buffer, offset = self.code_buffer(pc)
+            if bytes(buffer[offset:offset + len(block.code)]) != block.code:
+                block = self.blocks[key] = self.translate(pc, True)
+        return block or None
+
+    def translate(self, pc, in_ram=False):
+        """Compile the block at pc; returns False if not even one instruction fits."""
+        result = self.translator.translate(pc, self.read, in_ram)
+        if result is None:
+            return False
+        func, lines, end_pc, count, base_cycles, max_cycles, code = result
+        status = self.status
+        source = "\n    ".join(
+            ["def %s(cpu):" % func,
+             "a = cpu.A; x = cpu.X; y = cpu.Y; sp = cpu.SP; p = cpu.%s" % status,
+             "c = 0"]
+            + lines
+            + ["cpu.A = a; cpu.X = x; cpu.Y = y; cpu.SP = sp; cpu.%s = p" % status,
+               "cpu.PC = %s" % end_pc,
+               "return %d + c" % base_cycles])
+        exec(compile(source, "<6502 block $%04X>" % pc, "exec"), self.namespace)
+        self.translations += 1
+        return Block(self.namespace.pop(func), count, max_cycles, code)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Batch ROM regression farm for the Python NES cores.
+
+Runs every .nes file in a directory (paired with its input movies) headless on
+a pool of worker processes, and collects per-run frame hashes, throughput and
+crash tracebacks into one JSON report. Each run is the same as a nesbench.py
+run, so a single failing pair can be replayed there.
+
+Movies are recorded .nesm movies (nesmovie.py) or nesbench.py input scripts,
+found next to the ROM (or in --movies): for foo.nes, each of foo.nesm,
+foo.<anything>.nesm, foo.txt and foo.<anything>.txt is run as a separate job.
+A ROM without a movie is run once with no buttons pressed.
+
+Usage:
+    python nesfarm.py roms/ --frames 600 --json farm.json
+    python nesfarm.py roms/ --core all --jobs 8 --compare farm.json
+    python nesfarm.py roms/ --movies movies/ --no-blocks --compare farm.json
+
+Exit status is 1 if any run crashed or its hashes differ from --compare.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import nesbench
+
+
+def find_jobs(rom_dir, movie_dir, cores):
+    """List (core, rom, movie) triples; movie is None for ROMs without one."""
+    jobs = []
+    for rom in sorted(glob.glob(os.path.join(rom_dir, "*.nes"))):
+        stem = os.path.splitext(os.path.basename(rom))[0]
+        movies = []
+        for pattern in (".nesm", ".*.nesm", ".txt", ".*.txt"):
+            movies += glob.glob(os.path.join(movie_dir, glob.escape(stem) + pattern))
+        movies.sort()
+        for core in cores:
+            for movie in movies or [None]:
+                jobs.append((core, rom, movie))
+    return jobs
+
+
+def job_key(core, rom, movie):
+    """Key used to match runs across reports (paths are relative to their directories)."""
+    return "%s:%s:%s" % (core, os.path.basename(rom), os.path.basename(movie) if movie else "-")
+
+
+def run_job(core_name, rom, movie, frames, blocks):
+    """Worker entry point: one ROM/movie pair on one core. Never raises."""
+    result = {"key": job_key(core_name, rom, movie), "core": core_name,
+              "rom": os.path.basename(rom), "movie": os.path.basename(movie) if movie else None}
+    started = time.perf_counter()
+    try:
+        core = nesbench.CORES[core_name](blocks=blocks)
+        if movie is None:
+            inputs = None
+        elif movie.endswith(".nesm"):
+            inputs = nesbench.load_movie(movie, rom, frames, core)
+        else:
+            inputs = nesbench.load_input_script(movie, frames)
+        report = nesbench.run_benchmark(core, rom, frames, inputs)
+    except Exception as e:
+        result.update(status="crash", error="%s: %s" % (type(e).__name__, e),
+                      traceback=traceback.format_exc())
+    else:
+        result.update(status="ok", frames=report["frames"], instructions=report["instructions"],
+                      instructions_per_sec=report["instructions_per_sec"],
+                      frames_per_sec=report["frames_per_sec"], frame_ms=report["frame_ms"],
+                      hashes=report["hashes"])
+    result["wall_seconds"] = time.perf_counter() - started
+    return result
+
+
+def compare_reports(results, reference):
+    """Return {key: message} for runs that crashed, changed or are new versus `reference`."""
+    previous = {run["key"]: run for run in reference["runs"]}
+    problems = {}
+    for run in results:
+        want = previous.get(run["key"])
+        if run["status"] != "ok":
+            problems[run["key"]] = run["error"]
+        elif want is None:
+            problems[run["key"]] = "not in reference"
+        elif want["status"] != "ok":
+            problems[run["key"]] = "reference run crashed (%s)" % want["error"]
+        else:
+            frame = nesbench.compare_hashes(run, want)
+            if frame is not None:
+                problems[run["key"]] = "first differing frame %d" % frame
+    return problems
+
+
+def print_result(run):
+    if run["status"] == "ok":
+        print(f"  ok     {run['key']}: {run['frames_per_sec']:.1f} frames/sec, "
+              f"{run['instructions_per_sec']:,.0f} instructions/sec")
+    else:
+        print(f"  CRASH  {run['key']}: {run['error']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a directory of NES ROMs headless across processes")
+    parser.add_argument("roms", help="directory of .nes files")
+    parser.add_argument("--movies", help="directory of input movies (default: the ROM directory)")
+    parser.add_argument("--core", choices=sorted(nesbench.CORES) + ["all"], default="emunes")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--json", help="write the full report (including hashes) to this file")
+    parser.add_argument("--compare", help="previous farm report to check frame hashes against")
+    parser.add_argument("--no-blocks", action="store_true",
+                        help="run the plain interpreter instead of the block translation cache")
+    args = parser.parse_args(argv)
+
+    cores = sorted(nesbench.CORES) if args.core == "all" else [args.core]
+    jobs = find_jobs(args.roms, args.movies or args.roms, cores)
+    if not jobs:
+        print(f"No .nes files in {args.roms}")
+        return 2
+    print(f"{len(jobs)} runs of {args.frames} frames on {args.jobs} processes")
+
+    started = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(run_job, core, rom, movie, args.frames, not args.no_blocks)
+                   for core, rom, movie in jobs]
+        for future in as_completed(futures):
+            run = future.result()
+            print_result(run)
+            results.append(run)
+    elapsed = time.perf_counter() - started
+    results.sort(key=lambda run: run["key"])
+
+    crashed = [run for run in results if run["status"] != "ok"]
+    frames = sum(run["frames"] for run in results if run["status"] == "ok")
+    print(f"{len(results)} runs in {elapsed:.1f}s ({frames / elapsed:.1f} frames/sec overall), "
+          f"{len(crashed)} crashed")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"frames": args.frames, "cores": cores, "seconds": elapsed,
+                       "crashed": len(crashed), "runs": results}, f, indent=1)
+    failed = bool(crashed)
+    if args.compare:
+        with open(args.compare) as f:
+            reference = json.load(f)
+        problems = compare_reports(results, reference)
+        for key, message in sorted(problems.items()):
+            print(f"  FAIL {key}: {message}")
+        if problems:
+            failed = True
+        else:
+            print("  all frame hashes match reference")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+"""
+Cartridge mappers shared by the Python NES cores (emunesv0.py and emu-x.x.x.py).
+
+A mapper exposes the cartridge as fixed-size windows into the ROM image:
+ - PRG: four 8KB windows at $8000, $A000, $C000 and $E000
+ - CHR: eight 1KB windows covering the $0000-$1FFF pattern tables
+
+Each window is a memoryview slice of the PRG/CHR image, so a bank switch only
+retargets a view and never copies bytes. Cores read through the windows (or via
+read_prg/read_chr) and forward $8000-$FFFF writes to write().
+
+chr_dirty is the set of 1KB CHR banks (indices into the whole CHR image) whose
+contents changed since the renderer last decoded them. Every bank starts dirty;
+afterwards only CHR-RAM writes add to it, so switching banks never forces a
+re-decode. chr_banks lists which bank each window shows, for building the
+pattern table view.
+
+save_state()/load_state() pack the bank windows, mirroring, mapper registers
+and (for CHR-RAM carts) the CHR contents into a fixed-layout blob, used by the
+cores' snapshot()/restore().
+
+Supported: NROM (0), MMC1 (1), UxROM (2), CNROM (3), MMC3 (4).
+"""
+
+import struct
+
+PRG_WINDOW = 0x2000
+CHR_WINDOW = 0x0400
+
+# Nametable mirroring codes, as used by emunesv0.Bus.mirroring
+MIRROR_HORIZONTAL = 'H'
+MIRROR_VERTICAL = 'V'
+MIRROR_FOUR_SCREEN = '4'
+MIRROR_SINGLE_LOW = '0'
+MIRROR_SINGLE_HIGH = '1'
+MIRROR_CODES = (MIRROR_HORIZONTAL, MIRROR_VERTICAL, MIRROR_FOUR_SCREEN,
+                MIRROR_SINGLE_LOW, MIRROR_SINGLE_HIGH)
+
+# PRG bank per window, CHR bank per window, mirroring code
+BANK_STATE = struct.Struct("<4H8HB")
+
+
+class Mapper:
+    """Mapper 0 (NROM) and the base class for the bank-switching mappers."""
+    number = 0
+    name = "NROM"
+    has_irq = False
+    # Layout of the mapper-specific registers in save_state()
+    register_state = struct.Struct("<")
+
+    def __init__(self, prg_rom, chr_rom, mirroring):
+        self.prg = memoryview(prg_rom)
+        self.chr_is_ram = not chr_rom
+        # Carts without CHR ROM have 8KB of CHR RAM instead
+        self.chr = memoryview(bytearray(0x2000) if self.chr_is_ram else chr_rom)
+        self.prg_bank_count = max(1, len(self.prg) // PRG_WINDOW)
+        self.chr_bank_count = max(1, len(self.chr) // CHR_WINDOW)
+        self.mirroring = mirroring
+        self.four_screen = mirroring == MIRROR_FOUR_SCREEN
+        self.prg_banks = [None] * 4
+        self.prg_windows = [None] * 4
+        self.chr_banks = [None] * 8
+        self.chr_windows = [None] * 8
+        self.chr_dirty = set(range(self.chr_bank_count))
+        self.irq_pending = False
+        # Called with the window index whenever a PRG window is retargeted
+        self.on_prg_change = None
+        self.reset()
+
+    def reset(self):
+        for window in range(4):
+            self.map_prg(window, window)
+        for window in range(8):
+            self.map_chr(window, window)
+
+    # --- Bank windows ---
+    def map_prg(self, window, bank):
+        """Point 8KB PRG window 0-3 at 8KB bank `bank` (wrapped to the ROM size)."""
+        if not len(self.prg):
+            return
+        bank %= self.prg_bank_count
+        if self.prg_banks[window] == bank:
+            return
+        self.prg_banks[window] = bank
+        start = bank * PRG_WINDOW
+        self.prg_windows[window] = self.prg[start:start + PRG_WINDOW]
+        if self.on_prg_change is not None:
+            self.on_prg_change(window)
+
+    def map_prg_16k(self, window, bank):
+        """Map a 16KB bank into windows (window, window + 1)."""
+        self.map_prg(window, bank * 2)
+        self.map_prg(window + 1, bank * 2 + 1)
+
+    def map_chr(self, window, bank):
+        """Point 1KB CHR window 0-7 at 1KB bank `bank` (wrapped to the CHR size)."""
+        bank %= self.chr_bank_count
+        if self.chr_banks[window] == bank:
+            return
+        self.chr_banks[window] = bank
+        start = bank * CHR_WINDOW
+        self.chr_windows[window] = self.chr[start:start + CHR_WINDOW]
+
+    def set_mirroring(self, mirroring):
+        # Four-screen carts have extra VRAM and ignore mirroring control
+        if not self.four_screen:
+            self.mirroring = mirroring
+
+    # --- CPU side ---
+    def read_prg(self, addr):
+        window = self.prg_windows[(addr >> 13) & 3]
+        return window[addr & 0x1FFF] if window is not None else 0
+
+    def write(self, addr, value):
+        """Register write to $8000-$FFFF (NROM has no registers)."""
+        pass
+
+    # --- PPU side ---
+    def read_chr(self, addr):
+        return self.chr_windows[(addr >> 10) & 7][addr & 0x3FF]
+
+    def write_chr(self, addr, value):
+        if self.chr_is_ram:
+            window = (addr >> 10) & 7
+            self.chr_windows[window][addr & 0x3FF] = value
+            self.chr_dirty.add(self.chr_banks[window])
+
+    def clock_scanline(self):
+        """Called once per rendered scanline (only used by IRQ-capable mappers)."""
+        pass
+
+    # --- Save states ---
+    def state_size(self):
+        size = BANK_STATE.size + self.register_state.size
+        return size + len(self.chr) if self.chr_is_ram else size
+
+    def save_state(self):
+        """Bank windows, mirroring, registers and CHR RAM as one fixed-size blob."""
+        prg_banks = [bank or 0 for bank in self.prg_banks]
+        parts = [BANK_STATE.pack(*prg_banks, *self.chr_banks, MIRROR_CODES.index(self.mirroring)),
+                 self.register_state.pack(*self.get_registers())]
+        if self.chr_is_ram:
+            parts.append(self.chr)
+        return b"".join(parts)
+
+    def load_state(self, data):
+        state = BANK_STATE.unpack_from(data)
+        offset = BANK_STATE.size
+        self.set_registers(self.register_state.unpack_from(data, offset))
+        offset += self.register_state.size
+        self.mirroring = MIRROR_CODES[state[12]]
+        # Clear the cached bank numbers so every window is retargeted
+        self.prg_banks = [None] * 4
+        self.chr_banks = [None] * 8
+        for window in range(4):
+            self.map_prg(window, state[window])
+        for window in range(8):
+            self.map_chr(window, state[4 + window])
+        if self.chr_is_ram:
+            self.chr[:] = data[offset:offset + len(self.chr)]
+            self.chr_dirty.update(range(self.chr_bank_count))
+
+    def get_registers(self):
+        return ()
+
+    def set_registers(self, values):
+        pass
+
+
+class MMC1(Mapper):
+    """Mapper 1: serial shift-register writes, 16/32KB PRG and 4/8KB CHR banking."""
+    number = 1
+    name = "MMC1"
+    register_state = struct.Struct("<5B")
+
+    def reset(self):
+        self.shift = 0x10
+        self.control = 0x0C  # PRG mode 3: $C000 fixed to the last bank
+        self.chr_bank0 = 0
+        self.chr_bank1 = 0
+        self.prg_bank = 0
+        self.update_banks()
+
+    def write(self, addr, value):
+        if value & 0x80:
+            self.shift = 0x10
+            self.control |= 0x0C
+            self.update_banks()
+            return
+        # A 1 reaching bit 0 marks the fifth write
+        complete = self.shift & 1
+        self.shift = (self.shift >> 1) | ((value & 1) << 4)
+        if not complete:
+            return
+        data = self.shift
+        self.shift = 0x10
+        register = (addr >> 13) & 3
+        if register == 0:
+            self.control = data
+            self.set_mirroring((MIRROR_SINGLE_LOW, MIRROR_SINGLE_HIGH,
+                                MIRROR_VERTICAL, MIRROR_HORIZONTAL)[data & 3])
+        elif register == 1:
+            self.chr_bank0 = data
+        elif register == 2:
+            self.chr_bank1 = data
+        else:
+            self.prg_bank = data & 0x0F
+        self.update_banks()
+
+    def update_banks(self):
+        prg_mode = (self.control >> 2) & 3
+        last = self.prg_bank_count // 2 - 1
+        if prg_mode < 2:
+            # 32KB mode ignores the low bit of the bank number
+            self.map_prg_16k(0, self.prg_bank & 0x0E)
+            self.map_prg_16k(2, (self.prg_bank & 0x0E) + 1)
+        elif prg_mode == 2:
+            self.map_prg_16k(0, 0)
+            self.map_prg_16k(2, self.prg_bank)
+        else:
+            self.map_prg_16k(0, self.prg_bank)
+            self.map_prg_16k(2, last)
+        if self.control & 0x10:
+            # Two independent 4KB CHR banks
+            for i in range(4):
+                self.map_chr(i, self.chr_bank0 * 4 + i)
+                self.map_chr(4 + i, self.chr_bank1 * 4 + i)
+        else:
+            base = (self.chr_bank0 & 0x1E) * 4
+            for i in range(8):
+                self.map_chr(i, base + i)
+
+    def get_registers(self):
+        return (self.shift, self.control, self.chr_bank0, self.chr_bank1, self.prg_bank)
+
+    def set_registers(self, values):
+        self.shift, self.control, self.chr_bank0, self.chr_bank1, self.prg_bank = values
+
+
+class UxROM(Mapper):
+    """Mapper 2: switchable 16KB bank at $8000, last bank fixed at $C000."""
+    number = 2
+    name = "UxROM"
+
+    def reset(self):
+        self.map_prg_16k(0, 0)
+        self.map_prg_16k(2, self.prg_bank_count // 2 - 1)
+        for window in range(8):
+            self.map_chr(window, window)
+
+    def write(self, addr, value):
+        self.map_prg_16k(0, value)
+
+
+class CNROM(Mapper):
+    """Mapper 3: fixed PRG, switchable 8KB CHR bank."""
+    number = 3
+    name = "CNROM"
+
+    def write(self, addr, value):
+        for window in range(8):
+            self.map_chr(window, (value & 0x03) * 8 + window)
+
+
+class MMC3(Mapper):
+    """Mapper 4: 8KB PRG / 1-2KB CHR banking and a scanline IRQ counter."""
+    number = 4
+    name = "MMC3"
+    has_irq = True
+    register_state = struct.Struct("<11B3?")
+
+    def reset(self):
+        self.bank_select = 0
+        self.registers = [0, 2, 4, 5, 6, 7, 0, 1]
+        self.irq_latch = 0
+        self.irq_counter = 0
+        self.irq_reload = False
+        self.irq_enabled = False
+        self.irq_pending = False
+        self.update_banks()
+
+    def write(self, addr, value):
+        even = not (addr & 1)
+        region = addr & 0xE000
+        if region == 0x8000:
+            if even:
+                self.bank_select = value
+            else:
+                self.registers[self.bank_select & 7] = value
+            self.update_banks()
+        elif region == 0xA000:
+            if even:
+                self.set_mirroring(MIRROR_HORIZONTAL if value & 1 else MIRROR_VERTICAL)
+            # Odd: PRG RAM protect, not emulated
+        elif region == 0xC000:
+            if even:
+                self.irq_latch = value
+            else:
+                self.irq_counter = 0
+                self.irq_reload = True
+        else:
+            if even:
+                self.irq_enabled = False
+                self.irq_pending = False
+            else:
+                self.irq_enabled = True
+
+    def update_banks(self):
+        r = self.registers
+        second_last = self.prg_bank_count - 2
+        if self.bank_select & 0x40:
+            self.map_prg(0, second_last)
+            self.map_prg(2, r[6])
+        else:
+            self.map_prg(0, r[6])
+            self.map_prg(2, second_last)
+        self.map_prg(1, r[7])
+        self.map_prg(3, self.prg_bank_count - 1)
+        # R0/R1 are 2KB banks, R2-R5 are 1KB banks; bit 7 swaps the two halves
+        chr_map = [r[0] & 0xFE, r[0] | 1, r[1] & 0xFE, r[1] | 1, r[2], r[3], r[4], r[5]]
+        if self.bank_select & 0x80:
+            chr_map = chr_map[4:] + chr_map[:4]
+        for window, bank in enumerate(chr_map):
+            self.map_chr(window, bank)
+
+    def clock_scanline(self):
+        if self.irq_counter == 0 or self.irq_reload:
+            self.irq_counter = self.irq_latch
+            self.irq_reload = False
+        else:
+            self.irq_counter -= 1
+        if self.irq_counter == 0 and self.irq_enabled:
+            self.irq_pending = True
+
+    def get_registers(self):
+        return (self.bank_select, *self.registers, self.irq_latch, self.irq_counter,
+                self.irq_reload, self.irq_enabled, self.irq_pending)
+
+    def set_registers(self, values):
+        self.bank_select = values[0]
+        self.registers = list(values[1:9])
+        self.irq_latch, self.irq_counter = values[9:11]
+        self.irq_reload, self.irq_enabled, self.irq_pending = values[11:14]
+
+
+MAPPERS = {cls.number: cls for cls in (Mapper, MMC1, UxROM, CNROM, MMC3)}
+
+
+def mapper_number(header):
+    """Mapper number from a 16-byte iNES header."""
+    return (header[6] >> 4) | (header[7] & 0xF0)
+
+
+def create_mapper(number, prg_rom, chr_rom, mirroring):
+    """Build the mapper for an iNES mapper number; raises ValueError if unsupported."""
+    if number not in MAPPERS:
+        raise ValueError(f"Unsupported mapper {number}")
+    return MAPPERS[number](prg_rom, chr_rom, mirroring)
@@ -0,0 +1,89 @@
+"""
+Input movies for the Python NES cores (emunesv0.py and emu-x.x.x.py).
+
+A movie is the controller state latched at the start of every frame since
+power-on, so replaying it into the same core and ROM reproduces the run frame
+for frame. The frontends latch their keyboard state once per frame (never
+mid-frame), record it here, and on playback feed it back instead.
+
+File layout (.nesm):
+    header  MOVIE_HEADER: magic, format version, emulator version string,
+            SHA-1 of the ROM file, frame count
+    body    zlib-compressed, one byte per frame
+
+Button bits are those of emunesv0.py (A is bit 0, RIGHT bit 7); emu-x keeps
+A in bit 7, so its frontend stores reverse_bits() of its controller state.
+"""
+
+import hashlib
+import struct
+import zlib
+
+MOVIE_MAGIC = b"NESM"
+MOVIE_VERSION = 1
+MOVIE_HEADER = struct.Struct("<4sB16s20sI")
+
+BUTTONS = {
+    "A": 0x01, "B": 0x02, "SELECT": 0x04, "START": 0x08,
+    "UP": 0x10, "DOWN": 0x20, "LEFT": 0x40, "RIGHT": 0x80,
+}
+
+
+def reverse_bits(value):
+    """Mirror an 8-bit value (emu-x stores A in bit 7 rather than bit 0)."""
+    return int("{:08b}".format(value & 0xFF)[::-1], 2)
+
+
+def rom_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).digest()
+
+
+class Movie:
+    def __init__(self, rom_sha1=bytes(20), emulator="", inputs=b""):
+        self.rom_sha1 = rom_sha1
+        self.emulator = emulator
+        self.inputs = bytearray(inputs)
+
+    @classmethod
+    def for_rom(cls, rom_path, emulator):
+        """Start an empty recording for the ROM at rom_path."""
+        return cls(rom_hash(rom_path), emulator)
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def __getitem__(self, frame):
+        return self.inputs[frame]
+
+    def record(self, state):
+        self.inputs.append(state & 0xFF)
+
+    def save(self, path):
+        header = MOVIE_HEADER.pack(MOVIE_MAGIC, MOVIE_VERSION, self.emulator.encode("ascii")[:16],
+                                   self.rom_sha1, len(self.inputs))
+        with open(path, "wb") as f:
+            f.write(header + zlib.compress(bytes(self.inputs), 9))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < MOVIE_HEADER.size:
+            raise ValueError("Not a NES movie file")
+        magic, version, emulator, rom_sha1, frames = MOVIE_HEADER.unpack_from(data)
+        if magic != MOVIE_MAGIC or version != MOVIE_VERSION:
+            raise ValueError("Not a version %d NES movie" % MOVIE_VERSION)
+        inputs = zlib.decompress(data[MOVIE_HEADER.size:])
+        if len(inputs) != frames:
+            raise ValueError("Movie is truncated (%d of %d frames)" % (len(inputs), frames))
+        return cls(rom_sha1, emulator.rstrip(b"\0").decode("ascii"), inputs)
+
+    def check(self, rom_path, emulator):
+        """Raise ValueError if the movie was not recorded on this ROM. Returns a warning
+        string if it was recorded by another emulator version (it may desync), else None."""
+        if rom_hash(rom_path) != self.rom_sha1:
+            raise ValueError("Movie was recorded on a different ROM")
+        if self.emulator != emulator:
+            return "Movie was recorded with %s, playing on %s" % (self.emulator or "unknown", emulator)
+        return None
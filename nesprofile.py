@@ -0,0 +1,245 @@
+"""
+Opcode / hot-PC profiler shared by the Python NES cores (emunesv0.py and emu-x.x.x.py).
+
+A core only pays for profiling while a Profiler is attached: attaching swaps
+the core's instruction step and bus read/write for instrumented versions
+(instance attributes shadowing the class methods), and detaching deletes them
+again, so the normal dispatch path is untouched when profiling is off. The
+block cache is bypassed while attached, since it would hide the individual
+instructions.
+
+Recorded per run:
+ - execution count and cycles per opcode
+ - execution count and cycles per PC
+ - instruction cycles per bus region the code ran from, and bus reads/writes per region
+ - cycles per call stack, followed through JSR/RTS and NMI/IRQ/RTI
+
+Exports are JSON, CSV, folded stacks (one "A;B;C cycles" line per stack, the
+input format of flamegraph.pl) and a plain text report. Addresses are named
+from the ROM's NMI/RESET/IRQ vectors and the JSR targets seen while running.
+"""
+
+import csv
+import json
+from bisect import bisect_right
+
+REGIONS = ("RAM", "PPU", "APU/IO", "Expansion", "PRG-RAM", "PRG-ROM")
+
+
+def region_of_page(page):
+    if page < 0x20:
+        return 0
+    if page < 0x40:
+        return 1
+    if page == 0x40:
+        return 2
+    if page < 0x60:
+        return 3
+    if page < 0x80:
+        return 4
+    return 5
+
+
+# CPU page (addr >> 8) -> index into REGIONS
+PAGE_REGIONS = [region_of_page(page) for page in range(256)]
+
+# Opcodes that move the shadow call stack
+JSR, RTS, RTI, BRK = 0x20, 0x60, 0x40, 0x00
+
+# Calls deeper than this are counted but not named (games that pop return
+# addresses off the stack would otherwise grow it forever)
+MAX_DEPTH = 32
+
+
+def vector_symbols(read):
+    """Name the targets of the NMI/RESET/IRQ vectors, using the core's bus read."""
+    symbols = {}
+    for addr, name in ((0xFFFE, "IRQ"), (0xFFFA, "NMI"), (0xFFFC, "RESET")):
+        symbols[read(addr) | (read(addr + 1) << 8)] = name
+    return symbols
+
+
+def profiled_bus(profiler, read, write):
+    """Wrap a core's bus read/write so every access is counted by region."""
+    def profiled_read(addr):
+        profiler.read(addr)
+        return read(addr)
+
+    def profiled_write(addr, val):
+        profiler.write(addr)
+        write(addr, val)
+    return profiled_read, profiled_write
+
+
+class Profiler:
+    def __init__(self, specs=None, symbols=None):
+        # specs: opcode -> (name, mode, cycles), only used to label opcodes
+        self.names = ["???"] * 256
+        for opcode, spec in (specs or {}).items():
+            self.names[opcode] = "%s %s" % (spec[0], spec[1])
+        self.symbols = dict(symbols or {})
+        self.symbol_addrs = []
+        self.clear()
+
+    def clear(self):
+        self.opcode_counts = [0] * 256
+        self.opcode_cycles = [0] * 256
+        self.pc_counts = [0] * 0x10000
+        self.pc_cycles = [0] * 0x10000
+        self.region_cycles = [0] * len(REGIONS)
+        self.region_reads = [0] * len(REGIONS)
+        self.region_writes = [0] * len(REGIONS)
+        self.instructions = 0
+        self.cycles = 0
+        self.stack = ["RESET"]
+        self.overflow = 0
+        self.stack_key = self.stack[0]
+        self.stacks = {}
+
+    # --- Recording (called by the instrumented core) ---
+
+    def record(self, pc, opcode, cycles, next_pc):
+        """One executed instruction: fetched from pc, continued at next_pc."""
+        self.instructions += 1
+        self.cycles += cycles
+        self.opcode_counts[opcode] += 1
+        self.opcode_cycles[opcode] += cycles
+        self.pc_counts[pc] += 1
+        self.pc_cycles[pc] += cycles
+        self.region_cycles[PAGE_REGIONS[pc >> 8]] += cycles
+        stacks = self.stacks
+        stacks[self.stack_key] = stacks.get(self.stack_key, 0) + cycles
+        if opcode == JSR:
+            self.enter(self.symbols.setdefault(next_pc, "sub_%04X" % next_pc))
+        elif opcode == RTS or opcode == RTI:
+            self.leave()
+        elif opcode == BRK:
+            self.enter(self.symbols.get(next_pc, "BRK"))
+
+    def interrupt(self, name, cycles):
+        """An NMI or IRQ was taken; its entry cycles are charged to the new frame."""
+        self.cycles += cycles
+        self.enter(name)
+        self.stacks[self.stack_key] = self.stacks.get(self.stack_key, 0) + cycles
+
+    def read(self, addr):
+        self.region_reads[PAGE_REGIONS[(addr >> 8) & 0xFF]] += 1
+
+    def write(self, addr):
+        self.region_writes[PAGE_REGIONS[(addr >> 8) & 0xFF]] += 1
+
+    def enter(self, name):
+        if len(self.stack) >= MAX_DEPTH:
+            self.overflow += 1
+            return
+        self.stack.append(name)
+        self.stack_key = ";".join(self.stack)
+
+    def leave(self):
+        if self.overflow:
+            self.overflow -= 1
+        elif len(self.stack) > 1:
+            self.stack.pop()
+            self.stack_key = ";".join(self.stack)
+
+    # --- Reporting ---
+
+    def symbolize(self, addr):
+        """Name an address as the closest symbol at or below it, e.g. NMI+0x1A."""
+        addrs = self.symbol_addrs
+        if len(addrs) != len(self.symbols):
+            # Symbols are only ever added, so a length change means the list is stale
+            addrs = self.symbol_addrs = sorted(self.symbols)
+        i = bisect_right(addrs, addr) - 1
+        if i < 0 or addr - addrs[i] > 0x400:
+            return "$%04X" % addr
+        base = addrs[i]
+        name = self.symbols[base]
+        return name if base == addr else "%s+0x%X" % (name, addr - base)
+
+    def top_opcodes(self, count=None):
+        ops = [op for op in range(256) if self.opcode_counts[op]]
+        ops.sort(key=lambda op: self.opcode_cycles[op], reverse=True)
+        return ops[:count]
+
+    def top_pcs(self, count=None):
+        pcs = [pc for pc in range(0x10000) if self.pc_counts[pc]]
+        pcs.sort(key=lambda pc: self.pc_cycles[pc], reverse=True)
+        return pcs[:count]
+
+    def to_dict(self):
+        return {
+            "instructions": self.instructions,
+            "cycles": self.cycles,
+            "opcodes": [{"opcode": op, "name": self.names[op], "count": self.opcode_counts[op],
+                         "cycles": self.opcode_cycles[op]} for op in self.top_opcodes()],
+            "pcs": [{"pc": pc, "symbol": self.symbolize(pc), "count": self.pc_counts[pc],
+                     "cycles": self.pc_cycles[pc]} for pc in self.top_pcs()],
+            "regions": [{"region": name, "cycles": self.region_cycles[i],
+                         "reads": self.region_reads[i], "writes": self.region_writes[i]}
+                        for i, name in enumerate(REGIONS)],
+            "stacks": dict(sorted(self.stacks.items(), key=lambda item: -item[1])),
+        }
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    def write_csv(self, path):
+        """One row per opcode, PC and region: kind, key, name, count, cycles, reads, writes."""
+        with open(path, "w", newline="") as f:
+            out = csv.writer(f)
+            out.writerow(["kind", "key", "name", "count", "cycles", "reads", "writes"])
+            for op in self.top_opcodes():
+                out.writerow(["opcode", "%02X" % op, self.names[op],
+                              self.opcode_counts[op], self.opcode_cycles[op], "", ""])
+            for pc in self.top_pcs():
+                out.writerow(["pc", "%04X" % pc, self.symbolize(pc),
+                              self.pc_counts[pc], self.pc_cycles[pc], "", ""])
+            for i, name in enumerate(REGIONS):
+                out.writerow(["region", name, name, "", self.region_cycles[i],
+                              self.region_reads[i], self.region_writes[i]])
+
+    def write_folded(self, path):
+        with open(path, "w") as f:
+            for key, cycles in sorted(self.stacks.items()):
+                f.write("%s %d\n" % (key, cycles))
+
+    def report(self, top=15):
+        """Text report: hottest opcodes and PCs, bus regions, and a call tree by cycles."""
+        total = self.cycles or 1
+        lines = ["%d instructions, %d cycles" % (self.instructions, self.cycles), "",
+                 "Opcodes           count      cycles      %"]
+        for op in self.top_opcodes(top):
+            lines.append("  %02X %-9s %10d %11d %6.2f" % (
+                op, self.names[op], self.opcode_counts[op], self.opcode_cycles[op],
+                100.0 * self.opcode_cycles[op] / total))
+        lines += ["", "Hot PCs                         count      cycles      %"]
+        for pc in self.top_pcs(top):
+            lines.append("  %04X %-22s %10d %11d %6.2f" % (
+                pc, self.symbolize(pc), self.pc_counts[pc], self.pc_cycles[pc],
+                100.0 * self.pc_cycles[pc] / total))
+        lines += ["", "Regions      code cycles       reads      writes"]
+        for i, name in enumerate(REGIONS):
+            lines.append("  %-9s %12d %11d %11d" % (
+                name, self.region_cycles[i], self.region_reads[i], self.region_writes[i]))
+        lines += ["", "Call tree (inclusive cycles)"]
+        lines += self.flame_lines(total)
+        return "\n".join(lines)
+
+    def flame_lines(self, total, min_share=0.005):
+        """Indented call tree with a bar per frame; frames under min_share are left out."""
+        inclusive = {}
+        for key, cycles in self.stacks.items():
+            frames = key.split(";")
+            for depth in range(1, len(frames) + 1):
+                path = tuple(frames[:depth])
+                inclusive[path] = inclusive.get(path, 0) + cycles
+        lines = []
+        for path in sorted(inclusive):
+            share = inclusive[path] / total
+            if share < min_share:
+                continue
+            lines.append("  %6.2f%% %-20s %s%s" % (
+                100.0 * share, "#" * max(1, int(share * 20)), "  " * (len(path) - 1), path[-1]))
+        return lines
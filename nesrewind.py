@@ -0,0 +1,89 @@
+"""
+Rewind buffer shared by the Python NES cores (emunesv0.py and emu-x.x.x.py),
+also used for the CHIP-8 core's save states in qwen3emu-chip1.0a.py.
+
+Frames are pushed as the raw snapshot() blobs of a core. Every
+keyframe_interval frames a full keyframe is stored; the frames in between are
+stored as the XOR of their snapshot against that keyframe. Consecutive frames
+change only a few hundred bytes of RAM/VRAM, so the XOR is almost all zeros
+and zlib (level 1) shrinks it to a few hundred bytes.
+
+The buffer keeps at most `seconds` of history and at most `budget_bytes` of
+compressed data. Eviction drops whole keyframe groups from the oldest end, so
+after trimming it can hold up to keyframe_interval - 1 frames less than the
+limit allows.
+pop() hands the snapshots back newest first, one frame per call.
+"""
+
+import zlib
+from collections import deque
+
+
+def xor_bytes(a, b):
+    """XOR two equal-length byte strings (big-int XOR runs in C)."""
+    n = len(a)
+    return (int.from_bytes(a, "little") ^ int.from_bytes(b, "little")).to_bytes(n, "little")
+
+
+class RewindBuffer:
+    def __init__(self, seconds=10, fps=60, budget_bytes=16 * 1024 * 1024, keyframe_interval=30):
+        self.max_frames = int(seconds * fps)
+        self.budget_bytes = budget_bytes
+        self.keyframe_interval = keyframe_interval
+        # Each group is [compressed keyframe, [compressed deltas...]]
+        self.groups = deque()
+        # Uncompressed keyframe of the newest group (what new deltas are XORed against)
+        self.key = None
+        self.frames = 0
+        self.bytes_used = 0
+
+    def __len__(self):
+        return self.frames
+
+    def clear(self):
+        self.groups.clear()
+        self.key = None
+        self.frames = 0
+        self.bytes_used = 0
+
+    def push(self, snapshot):
+        """Record one frame's snapshot."""
+        snapshot = bytes(snapshot)
+        if (self.key is None or len(snapshot) != len(self.key)
+                or len(self.groups[-1][1]) + 1 >= self.keyframe_interval):
+            packed = zlib.compress(snapshot, 1)
+            self.groups.append([packed, []])
+            self.key = snapshot
+        else:
+            packed = zlib.compress(xor_bytes(snapshot, self.key), 1)
+            self.groups[-1][1].append(packed)
+        self.frames += 1
+        self.bytes_used += len(packed)
+        self.evict()
+
+    def pop(self):
+        """Remove and return the newest snapshot, or None when the buffer is empty."""
+        if not self.groups:
+            return None
+        keyframe, deltas = self.groups[-1]
+        self.frames -= 1
+        if deltas:
+            packed = deltas.pop()
+            self.bytes_used -= len(packed)
+            return xor_bytes(zlib.decompress(packed), self.key)
+        self.groups.pop()
+        self.bytes_used -= len(keyframe)
+        snapshot = self.key
+        self.key = zlib.decompress(self.groups[-1][0]) if self.groups else None
+        return snapshot
+
+    def evict(self):
+        # Always keep the newest group, even if it alone exceeds the limits
+        while len(self.groups) > 1:
+            keyframe, deltas = self.groups[0]
+            group_frames = 1 + len(deltas)
+            if self.bytes_used <= self.budget_bytes and self.frames <= self.max_frames:
+                break
+            self.groups.popleft()
+            self.frames -= group_frames
+            self.bytes_used -= len(keyframe) + sum(len(d) for d in deltas)
@@ -1,36 +1,37 @@
 import sys
 import tkinter as tk
 from tkinter import filedialog, Menu, Label
-import random
-import pickle
 import os
-import time
-import threading
+from chip8core import Chip8Core, FrameClock
+from chip8beeper import Beeper
+from chip8canvas import CanvasRenderer
+from nesrewind import RewindBuffer
+from frametelemetry import FrameTelemetry, TelemetryWindow
 
 # CHIP-8 Emulator - Inspired by mGBA look/style using Tkinter
 # Modified to use a file dialog for ROM selection and have a more standard keyboard layout
 
-class Chip8:
+class Chip8(Chip8Core):
     def __init__(self, rom_path=None):
-        # Core registers and memory
-        self.memory = [0] * 4096
-        self.V = [0] * 16
-        self.I = 0
-        self.pc = 0x200
-        self.stack = []
-        self.delay_timer = 0
-        self.sound_timer = 0
+        # Registers, memory, display and timers live in the shared core (chip8core.py)
+        super().__init__()
         self.paused = False
-        self.step_mode = False
-        self.frame_skip = 2  # Adjust for performance
+        self.frame_skip = 1  # Redraw every N ticks (drawing only touches changed pixels)
         self.skip_count = 0
         self.rom_path = rom_path
         self.rom_name = "No ROM Loaded"
-
-        # Display
-        self.width = 64
-        self.height = 32
-        self.display = [[0]*self.width for _ in range(self.height)]
+        # Runs the core at 60 frames per second whatever after() actually delivers
+        self.clock = FrameClock()
+        # Emulate/draw/idle time per loop tick that ran frames (Emulation > Frame Timing)
+        self.telemetry = FrameTelemetry()
+        self.timing_window = None
+        # Ten in-memory quick save slots (F1-F10 load, Shift+F1-F10 save), and
+        # up to the last 30 seconds, one snapshot per frame (hold BackSpace to rewind)
+        self.slots = [None] * 10
+        self.rewind = RewindBuffer(seconds=30)
+        self.rewinding = False
+        # Looping tone while the sound timer runs (silent without pygame)
+        self.beeper = Beeper()
 
         # Window size
         self.window_width = 640
@@ -43,7 +44,8 @@ class Chip8:
         #           4 5 6 D       Q W E R
         #           7 8 9 E       A S D F
         #           A 0 B F       Z X C V
-        self.keys = [0]*16
+        # Keys held on the keyboard; latched into the core once per frame
+        self.pressed = [0]*16
         self.keymap = {
             # Row 1: 1 2 3 C
             '1': 0x1, '2': 0x2, '3': 0x3, '4': 0xC,
@@ -57,27 +59,6 @@ class Chip8:
         # Create reverse map for status display
         self.reverse_keymap = {v: k.upper() for k, v in self.keymap.items()}
 
-        # Fontset
-        fontset = [
-            0xF0,0x90,0x90,0x90,0xF0,
-            0x20,0x60,0x20,0x20,0x70,
-            0xF0,0x10,0xF0,0x80,0xF0,
-            0xF0,0x10,0xF0,0x10,0xF0,
-            0x90,0x90,0xF0,0x10,0x10,
-            0xF0,0x80,0xF0,0x10,0xF0,
-            0xF0,0x80,0xF0,0x90,0xF0,
-            0xF0,0x10,0x20,0x40,0x40,
-            0xF0,0x90,0xF0,0x90,0xF0,
-            0xF0,0x90,0xF0,0x10,0xF0,
-            0xF0,0x90,0xF0,0x90,0x90,
-            0xE0,0x90,0xE0,0x90,0xE0,
-            0xF0,0x80,0x80,0x80,0xF0,
-            0xE0,0x90,0x90,0x90,0xE0,
-            0xF0,0x80,0xF0,0x80,0xF0,
-            0xF0,0x80,0xF0,0x80,0x80
-        ]
-        for i, b in enumerate(fontset):
-            self.memory[i] = b
         if self.rom_path:
             self.load_rom(self.rom_path)
 
@@ -85,8 +66,9 @@ class Chip8:
         try:
             with open(path, 'rb') as f:
                 rom = f.read()
-            for i, b in enumerate(rom):
-                self.memory[0x200 + i] = b
+            self.load(rom)
+            self.slots = [None] * 10
+            self.rewind.clear()
             self.rom_path = path # Store path for save states
             self.rom_name = os.path.basename(path)
             if hasattr(self, 'status_label'):
@@ -128,24 +110,23 @@ class Chip8:
                  self.status_label.config(text="No ROM Loaded")
             # Don't exit if GUI is running, just don't load a ROM
 
+    def _report(self, msg):
+        print(msg)
+        if hasattr(self, 'status_label'):
+             self.status_label.config(text=msg)
+
     def save_state(self):
         if not self.rom_path:
             print("No ROM loaded, cannot save state.")
             return
-        state = dict(memory=self.memory, V=self.V, I=self.I, pc=self.pc,
-                     stack=self.stack, delay_timer=self.delay_timer,
-                     sound_timer=self.sound_timer, display=self.display, keys=self.keys)
         try:
             with open(self.rom_path + '.state', 'wb') as f:
-                pickle.dump(state, f)
+                f.write(self.snapshot())
             print('State saved.')
             if hasattr(self, 'status_label'):
                  self.status_label.config(text=f"State saved for {self.rom_name}")
-        except Exception as e:
-            error_msg = f'Error saving state: {e}'
-            print(error_msg)
-            if hasattr(self, 'status_label'):
-                 self.status_label.config(text=error_msg)
+        except OSError as e:
+            self._report(f'Error saving state: {e}')
 
     def load_state(self):
         if not self.rom_path:
@@ -155,162 +136,38 @@ class Chip8:
         if os.path.exists(fname):
             try:
                 with open(fname, 'rb') as f:
-                    st = pickle.load(f)
-                    self.__dict__.update(st)
+                    self.restore(f.read())
+                self.rewind.clear()
                 print('State loaded.')
                 if hasattr(self, 'status_label'):
                      self.status_label.config(text=f"State loaded for {self.rom_name}")
-            except Exception as e:
-                 error_msg = f'Error loading state: {e}'
-                 print(error_msg)
-                 if hasattr(self, 'status_label'):
-                     self.status_label.config(text=error_msg)
+            except (OSError, ValueError) as e:
+                 self._report(f'Error loading state: {e}')
         else:
-            msg = 'No saved state found.'
-            print(msg)
-            if hasattr(self, 'status_label'):
-                 self.status_label.config(text=msg)
+            self._report('No saved state found.')
 
-    def cycle(self):
-        if self.paused or not self.rom_path: # Don't cycle if no ROM
+    def save_slot(self, slot):
+        if not self.rom_path:
+            return
+        self.slots[slot] = self.snapshot()
+        self._report(f"Saved slot {slot + 1}")
+
+    def load_slot(self, slot):
+        if self.slots[slot] is None:
+            self._report(f"Slot {slot + 1} is empty")
             return
-        if self.step_mode:
-            self.paused = True
-            self.step_mode = False
-        opcode = (self.memory[self.pc] << 8) | self.memory[self.pc + 1]
-        self.pc += 2
-        x = (opcode & 0x0F00) >> 8
-        y = (opcode & 0x00F0) >> 4
-        n = opcode & 0x000F
-        nn = opcode & 0x00FF
-        nnn = opcode & 0x0FFF
-
-        # Opcode handling
-        if opcode == 0x00E0:  # Clear screen
-            self.display = [[0]*self.width for _ in range(self.height)]
-        elif opcode == 0x00EE:  # Return from subroutine
-            self.pc = self.stack.pop()
-        elif (opcode & 0xF000) == 0x1000:  # JP addr
-            self.pc = nnn
-        elif (opcode & 0xF000) == 0x2000:  # CALL addr
-            self.stack.append(self.pc)
-            self.pc = nnn
-        elif (opcode & 0xF000) == 0x3000:  # SE Vx, byte
-            if self.V[x] == nn:
-                self.pc += 2
-        elif (opcode & 0xF000) == 0x4000:  # SNE Vx, byte
-            if self.V[x] != nn:
-                self.pc += 2
-        elif (opcode & 0xF000) == 0x5000:  # SE Vx, Vy
-            if self.V[x] == self.V[y]:
-                self.pc += 2
-        elif (opcode & 0xF000) == 0x6000:  # LD Vx, byte
-            self.V[x] = nn
-        elif (opcode & 0xF000) == 0x7000:  # ADD Vx, byte
-            self.V[x] = (self.V[x] + nn) & 0xFF
-        elif (opcode & 0xF00F) == 0x8000:  # LD Vx, Vy
-            self.V[x] = self.V[y]
-        elif (opcode & 0xF00F) == 0x8001:  # OR Vx, Vy
-            self.V[x] |= self.V[y]
-        elif (opcode & 0xF00F) == 0x8002:  # AND Vx, Vy
-            self.V[x] &= self.V[y]
-        elif (opcode & 0xF00F) == 0x8003:  # XOR Vx, Vy
-            self.V[x] ^= self.V[y]
-        elif (opcode & 0xF00F) == 0x8004:  # ADD Vx, Vy
-            result = self.V[x] + self.V[y]
-            self.V[0xF] = 1 if result > 0xFF else 0
-            self.V[x] = result & 0xFF
-        elif (opcode & 0xF00F) == 0x8005:  # SUB Vx, Vy
-            self.V[0xF] = 1 if self.V[x] > self.V[y] else 0
-            self.V[x] = (self.V[x] - self.V[y]) & 0xFF
-        elif (opcode & 0xF00F) == 0x8006:  # SHR Vx {, Vy}
-            self.V[0xF] = self.V[x] & 0x1
-            self.V[x] >>= 1
-        elif (opcode & 0xF00F) == 0x8007:  # SUBN Vx, Vy
-            self.V[0xF] = 1 if self.V[y] > self.V[x] else 0
-            self.V[x] = (self.V[y] - self.V[x]) & 0xFF
-        elif (opcode & 0xF00F) == 0x800E:  # SHL Vx {, Vy}
-            self.V[0xF] = (self.V[x] & 0x80) >> 7
-            self.V[x] = (self.V[x] << 1) & 0xFF
-        elif (opcode & 0xF000) == 0x9000:  # SNE Vx, Vy
-            if self.V[x] != self.V[y]:
-                self.pc += 2
-        elif (opcode & 0xF000) == 0xA000:  # LD I, addr
-            self.I = nnn
-        elif (opcode & 0xF000) == 0xB000:  # JP V0, addr
-            self.pc = nnn + self.V[0]
-        elif (opcode & 0xF000) == 0xC000:  # RND Vx, byte
-            self.V[x] = random.randint(0, 255) & nn
-        elif (opcode & 0xF000) == 0xD000:  # DRW Vx, Vy, nibble
-            self.V[0xF] = 0
-            for i in range(n):
-                sprite_byte = self.memory[self.I + i]
-                for j in range(8):
-                    if sprite_byte & (0x80 >> j):
-                        pixel_x = (self.V[x] + j) % self.width
-                        pixel_y = (self.V[y] + i) % self.height
-                        if self.display[pixel_y][pixel_x] == 1:
-                            self.V[0xF] = 1
-                        self.display[pixel_y][pixel_x] ^= 1
-        elif (opcode & 0xF0FF) == 0xE09E:  # SKP Vx
-            if self.keys[self.V[x]] == 1:
-                self.pc += 2
-        elif (opcode & 0xF0FF) == 0xE0A1:  # SKNP Vx
-            if self.keys[self.V[x]] == 0:
-                self.pc += 2
-        elif (opcode & 0xF0FF) == 0xF007:  # LD Vx, DT
-            self.V[x] = self.delay_timer
-        elif (opcode & 0xF0FF) == 0xF00A:  # LD Vx, K
-            key_pressed = False
-            for i, key in enumerate(self.keys):
-                if key == 1:
-                    self.V[x] = i
-                    key_pressed = True
-                    break
-            if not key_pressed:
-                self.pc -= 2  # Wait for key press
-        elif (opcode & 0xF0FF) == 0xF015:  # LD DT, Vx
-            self.delay_timer = self.V[x]
-        elif (opcode & 0xF0FF) == 0xF018:  # LD ST, Vx
-            self.sound_timer = self.V[x]
-        elif (opcode & 0xF0FF) == 0xF01E:  # ADD I, Vx
-            result = self.I + self.V[x]
-            self.V[0xF] = 1 if result > 0xFFF else 0
-            self.I = result & 0xFFF
-        elif (opcode & 0xF0FF) == 0xF029:  # LD F, Vx
-            self.I = self.V[x] * 5
-        elif (opcode & 0xF0FF) == 0xF033:  # LD B, Vx
-            self.memory[self.I] = self.V[x] // 100
-            self.memory[self.I + 1] = (self.V[x] // 10) % 10
-            self.memory[self.I + 2] = self.V[x] % 10
-        elif (opcode & 0xF0FF) == 0xF055:  # LD [I], Vx
-            for i in range(x + 1):
-                self.memory[self.I + i] = self.V[i]
-        elif (opcode & 0xF0FF) == 0xF065:  # LD Vx, [I]
-            for i in range(x + 1):
-                self.V[i] = self.memory[self.I + i]
-
-        if self.delay_timer > 0:
-            self.delay_timer -= 1
-        if self.sound_timer > 0:
-            self.sound_timer -= 1
-            # Play sound in a separate thread to avoid blocking
-            if not hasattr(self, '_sound_thread') or not self._sound_thread.is_alive():
-                self._sound_thread = threading.Thread(target=lambda: os.system('afplay /System/Library/Sounds/Pop.aiff &'))
-                self._sound_thread.start()
+        self.restore(self.slots[slot])
+        self.draw()
+        self._report(f"Loaded slot {slot + 1}")
+
+    def _update_sound(self):
+        # The beeper only starts or stops its channel when this changes
+        self.beeper.update(not self.paused and self.sound_timer > 0)
 
     def draw(self):
-        if not hasattr(self, 'canvas'):
+        if not hasattr(self, 'renderer'):
              return # Canvas not created yet
-        self.canvas.delete('pixel')
-        for y in range(self.height):
-            for x in range(self.width):
-                if self.display[y][x]:
-                    x0 = x * self.pixel_width
-                    y0 = y * self.pixel_height
-                    x1 = x0 + self.pixel_width
-                    y1 = y0 + self.pixel_height
-                    self.canvas.create_rectangle(x0, y0, x1, y1, fill='white', outline='', tag='pixel')
+        self.renderer.update()
 
     def create_menu(self):
         menubar = Menu(self.root)
@@ -319,6 +176,15 @@ class Chip8:
         filemenu.add_separator()
         filemenu.add_command(label="Save State", command=self.save_state)
         filemenu.add_command(label="Load State", command=self.load_state)
+        savemenu = Menu(filemenu, tearoff=0)
+        loadmenu = Menu(filemenu, tearoff=0)
+        for slot in range(10):
+            savemenu.add_command(label=f"Slot {slot + 1}", accelerator=f"Shift+F{slot + 1}",
+                                 command=lambda slot=slot: self.save_slot(slot))
+            loadmenu.add_command(label=f"Slot {slot + 1}", accelerator=f"F{slot + 1}",
+                                 command=lambda slot=slot: self.load_slot(slot))
+        filemenu.add_cascade(label="Quick Save", menu=savemenu)
+        filemenu.add_cascade(label="Quick Load", menu=loadmenu)
         filemenu.add_separator()
         filemenu.add_command(label="Exit", command=self.root.destroy)
         menubar.add_cascade(label="File", menu=filemenu)
@@ -326,6 +192,16 @@ class Chip8:
         emumenu = Menu(menubar, tearoff=0)
         emumenu.add_command(label="Pause/Resume", command=self._toggle_pause)
         emumenu.add_command(label="Step", command=self._step)
+        emumenu.add_separator()
+        # Instructions per 60 Hz frame (the timers always tick at 60 Hz)
+        self.speed_var = tk.IntVar(value=self.instructions_per_frame)
+        speedmenu = Menu(emumenu, tearoff=0)
+        for ipf in (5, 10, 15, 20, 30):
+            speedmenu.add_radiobutton(label=f"{ipf * 60} Hz ({ipf}/frame)", variable=self.speed_var,
+                                      value=ipf, command=self._set_speed)
+        emumenu.add_cascade(label="Speed", menu=speedmenu)
+        emumenu.add_separator()
+        emumenu.add_command(label="Frame Timing", command=self._show_frame_timing)
         menubar.add_cascade(label="Emulation", menu=emumenu)
 
         self.root.config(menu=menubar)
@@ -348,6 +224,7 @@ class Chip8:
         # Main Canvas for Emulation
         self.canvas = tk.Canvas(self.root, width=self.window_width, height=self.window_height, bg='black', highlightthickness=0)
         self.canvas.pack()
+        self.renderer = CanvasRenderer(self.canvas, self, self.pixel_width, self.pixel_height)
 
         # Status Bar (mGBA style)
         self.status_label = Label(self.root, text=f"ROM: {self.rom_name}", bd=1, relief=tk.SUNKEN, anchor=tk.W)
@@ -363,11 +240,18 @@ class Chip8:
                 self.root.bind(f'<KeyPress-{upper_k}>', lambda e, k=k: self._set_key(k, 1)) # Map uppercase key press to lowercase key
                 self.root.bind(f'<KeyRelease-{upper_k}>', lambda e, k=k: self._set_key(k, 0)) # Map uppercase key release to lowercase key
 
+        # Quick save slots and rewind
+        for slot in range(10):
+            self.root.bind(f'<F{slot + 1}>', lambda e, slot=slot: self.load_slot(slot))
+            self.root.bind(f'<Shift-F{slot + 1}>', lambda e, slot=slot: self.save_slot(slot))
+        self.root.bind('<KeyPress-BackSpace>', lambda e: self._set_rewinding(True))
+        self.root.bind('<KeyRelease-BackSpace>', lambda e: self._set_rewinding(False))
+
         # Also bind Escape to exit
         self.root.bind('<Escape>', lambda e: self.root.destroy())
 
         # Emulation loop
-        self.last_time = time.perf_counter()
+        self.clock.reset()
         self.root.after(16, self._loop)
 
         # If ROM path was given, load it now
@@ -379,27 +263,52 @@ class Chip8:
             self.status_label.config(text="No ROM Loaded. Use File -> Open ROM.")
 
         self.root.mainloop()
+        self.beeper.stop()
 
     def _loop(self):
-        if not self.paused:
-            self.cycle()
+        if not self.paused and self.rom_path: # Don't run if no ROM
+            # Every frame that is due: instructions_per_frame instructions, then one timer
+            # tick, recorded for rewind; or while rewinding, step back a frame instead
+            frames = self.clock.due()
+            if frames:
+                self.telemetry.start_frame()
+            for _ in range(frames):
+                if self.rewinding:
+                    snapshot = self.rewind.pop()
+                    if snapshot is not None:
+                        self.restore(snapshot)
+                else:
+                    self.run_frame(self.pressed)
+                    self.rewind.push(self.snapshot())
+            self.telemetry.emulated()
             self.skip_count += 1
             if self.skip_count >= self.frame_skip:
                 self.draw()
                 self.skip_count = 0
-        self.root.after(16, self._loop)  # ~60 FPS
+            self.telemetry.end_frame()
+        self._update_sound()
+        self.root.after(self.clock.delay_ms(), self._loop)  # 60 FPS
 
     def _set_key(self, k, val):
         # Handle both upper and lower case keys
         lower_k = k.lower()
         if lower_k in self.keymap:
-             self.keys[self.keymap[lower_k]] = val
+             self.pressed[self.keymap[lower_k]] = val
              # Optionally update status to show key pressed (for debugging)
              # if val == 1:
              #     self.status_label.config(text=f"Key Pressed: {self.reverse_keymap.get(self.keymap[lower_k], 'Unknown')} ({lower_k.upper()})")
 
+    def _set_rewinding(self, rewinding):
+        self.rewinding = rewinding
+
+    def _set_speed(self):
+        self.instructions_per_frame = self.speed_var.get()
+
     def _toggle_pause(self):
         self.paused = not self.paused
+        # Don't try to catch up on the time spent paused (or count it as frame time)
+        self.clock.reset()
+        self.telemetry.reset()
         state = "Paused" if self.paused else "Running"
         print(f"Emulation {state}")
         if hasattr(self, 'status_label'):
@@ -412,9 +321,20 @@ class Chip8:
                  new_text = f"{current_text} ({state})"
              self.status_label.config(text=new_text)
 
+    def _show_frame_timing(self):
+        if self.timing_window is not None and self.timing_window.winfo_exists():
+            self.timing_window.lift()
+            return
+        self.timing_window = TelemetryWindow(self.root, self.telemetry, title="Frame Timing")
+
     def _step(self):
-        self.step_mode = True
-        self.paused = False # Need to unpause to execute one step
+        if not self.rom_path:
+            return
+        # Execute exactly one instruction and stay paused
+        self.paused = True
+        self.keys[:] = self.pressed
+        self.step()
+        self.draw()
         print("Stepping...")
         if hasattr(self, 'status_label'):
              self.status_label.config(text=f"Stepping... ROM: {self.rom_name}")
@@ -428,4 +348,5 @@ if __name__ == '__main__':
     emulator = Chip8(rom_path=rom_path)
 
     # Start the emulator
-    emulator.run()qw
+    emulator.run()
+
@@ -1,5 +1,8 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
+import array
+import math
+import mmap
 import os
 import struct
 try:
@@ -10,29 +13,1174 @@ except ImportError:
 SCREEN_WIDTH = 256
 SCREEN_HEIGHT = 240
 
-# Emulator core classes and logic
+M32 = 0xFFFFFFFF
+M64 = 0xFFFFFFFFFFFFFFFF
+
+RDRAM_SIZE = 4 * 1024 * 1024            # 8 MB with the Expansion Pak
+PAGE_SHIFT = 12                         # 4 KB pages for the ROM byte-swapping and the decode cache
+PAGE_SIZE = 1 << PAGE_SHIFT
+
+# Instructions run per 60 Hz frame. The real CPU manages about 1.5 million; this
+# is what the interpreter can fit in a frame's time.
+INSTRUCTIONS_PER_FRAME = 20000
+
+# Physical memory map
+SP_MEM_START, SP_MEM_END = 0x04000000, 0x04002000    # RSP DMEM + IMEM
+CART_START, CART_END = 0x10000000, 0x1FC00000
+PIF_RAM_START, PIF_RAM_END = 0x1FC007C0, 0x1FC00800
+
+SP_STATUS = 0x04040010
+VI_CURRENT = 0x04400010
+PI_DRAM_ADDR = 0x04600000
+PI_CART_ADDR = 0x04600004
+PI_WR_LEN = 0x0460000C
+PI_STATUS = 0x04600010
+
+# First word of the ROM in each byte order
+ROM_MAGIC_Z64 = b"\x80\x37\x12\x40"     # big-endian, as the N64 sees it
+ROM_MAGIC_V64 = b"\x37\x80\x40\x12"     # 16-bit words byte-swapped
+ROM_MAGIC_N64 = b"\x40\x12\x37\x80"     # 32-bit words little-endian
+
+U16 = struct.Struct(">H")
+U32 = struct.Struct(">I")
+U64 = struct.Struct(">Q")
+F32 = struct.Struct(">f")
+F64 = struct.Struct(">d")
+
+
+def sign_extend32(value):
+    """Low 32 bits of `value` sign-extended to a 64-bit register value."""
+    value &= M32
+    return value | 0xFFFFFFFF00000000 if value & 0x80000000 else value
+
+
+def signed32(value):
+    value &= M32
+    return value - 0x100000000 if value & 0x80000000 else value
+
+
+def signed64(value):
+    return value - (1 << 64) if value & (1 << 63) else value
+
+
+class CartridgeROM:
+    """The ROM file mapped with mmap, presented big-endian whatever its byte order.
+
+    .z64 images are already big-endian and are read straight from the mapping.
+    .v64 and .n64 images are converted one 4 KB page at a time, the first time
+    something reads from that page, so a 64 MB ROM costs nothing up front.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < 0x1000:
+                raise ValueError("File is too small to be an N64 ROM.")
+            self.file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self.file)
+        magic = self.file[:4]
+        if magic == ROM_MAGIC_Z64:
+            self.swap = None
+        elif magic == ROM_MAGIC_V64:
+            self.swap = "H"
+        elif magic == ROM_MAGIC_N64:
+            self.swap = "I"
+        else:
+            self.file.close()
+            raise ValueError("Unknown ROM byte order (not a .z64, .v64 or .n64 image).")
+        self.pages = {}
+
+    def page(self, number):
+        """Big-endian bytes of one 4 KB page."""
+        if self.swap is None:
+            return self.file[number << PAGE_SHIFT:(number + 1) << PAGE_SHIFT]
+        data = self.pages.get(number)
+        if data is None:
+            words = array.array(self.swap, self.file[number << PAGE_SHIFT:(number + 1) << PAGE_SHIFT])
+            words.byteswap()
+            data = self.pages[number] = words.tobytes()
+        return data
+
+    def read(self, offset, length):
+        """`length` big-endian bytes from `offset` (zeros past the end of the ROM)."""
+        if self.swap is None:
+            data = self.file[offset:offset + length]
+        else:
+            chunks = []
+            end = min(offset + length, self.size)
+            while offset < end:
+                number = offset >> PAGE_SHIFT
+                start = offset & (PAGE_SIZE - 1)
+                chunk = self.page(number)[start:start + end - offset]
+                chunks.append(chunk)
+                offset += len(chunk)
+            data = b"".join(chunks)
+        return data.ljust(length, b"\0")
+
+    def read32(self, offset):
+        if offset + 4 > self.size:
+            return 0
+        if self.swap is None:
+            return U32.unpack_from(self.file, offset)[0]
+        return U32.unpack_from(self.page(offset >> PAGE_SHIFT), offset & (PAGE_SIZE - 1))[0]
+
+    def close(self):
+        self.pages.clear()
+        self.file.close()
+
+
+class Memory:
+    """The N64 physical address space: RDRAM, RSP memory, cartridge ROM and the MMIO registers.
+
+    Only KSEG0/KSEG1 addresses are translated (by dropping the top three bits);
+    there is no TLB.
+
+    code_pages holds the CPU's decoded instructions per 4 KB RDRAM page; any
+    write to a page (from the CPU or a PI DMA) drops that page's entry.
+    """
+
+    def __init__(self, rom, rdram_size=RDRAM_SIZE):
+        self.rom = rom
+        self.rdram = bytearray(rdram_size)
+        self.rdram_size = rdram_size
+        self.sp_mem = bytearray(SP_MEM_END - SP_MEM_START)
+        self.pif_ram = bytearray(PIF_RAM_END - PIF_RAM_START)
+        self.registers = {}
+        self.code_pages = {}
+        self.vi_line = 0
+
+    def invalidate(self, phys, length):
+        pages = self.code_pages
+        for number in range(phys >> PAGE_SHIFT, ((phys + length - 1) >> PAGE_SHIFT) + 1):
+            pages.pop(number, None)
+
+    # --- Reads ---
+
+    def read8(self, addr):
+        phys = addr & 0x1FFFFFFF
+        if phys < self.rdram_size:
+            return self.rdram[phys]
+        return (self.read_slow32(phys & ~3) >> ((3 - (phys & 3)) << 3)) & 0xFF
+
+    def read16(self, addr):
+        phys = addr & 0x1FFFFFFE
+        if phys < self.rdram_size:
+            return U16.unpack_from(self.rdram, phys)[0]
+        return (self.read_slow32(phys & ~3) >> ((2 - (phys & 2)) << 3)) & 0xFFFF
+
+    def read32(self, addr):
+        phys = addr & 0x1FFFFFFC
+        if phys < self.rdram_size:
+            return U32.unpack_from(self.rdram, phys)[0]
+        return self.read_slow32(phys)
+
+    def read64(self, addr):
+        phys = addr & 0x1FFFFFF8
+        if phys < self.rdram_size:
+            return U64.unpack_from(self.rdram, phys)[0]
+        return (self.read_slow32(phys) << 32) | self.read_slow32(phys + 4)
+
+    def read_slow32(self, phys):
+        if CART_START <= phys < CART_END:
+            return self.rom.read32(phys - CART_START)
+        if SP_MEM_START <= phys < SP_MEM_END:
+            return U32.unpack_from(self.sp_mem, phys - SP_MEM_START)[0]
+        if PIF_RAM_START <= phys < PIF_RAM_END:
+            return U32.unpack_from(self.pif_ram, phys - PIF_RAM_START)[0]
+        if phys == SP_STATUS:
+            return 1  # RSP halted
+        if phys == PI_STATUS:
+            return 0  # DMA finished
+        if phys == VI_CURRENT:
+            # Nothing draws lines yet: keep the beam moving for code that waits on it
+            self.vi_line = (self.vi_line + 2) % 525
+            return self.vi_line
+        return self.registers.get(phys, 0)
+
+    # --- Writes ---
+
+    def write8(self, addr, value):
+        phys = addr & 0x1FFFFFFF
+        if phys < self.rdram_size:
+            self.rdram[phys] = value & 0xFF
+            if phys >> PAGE_SHIFT in self.code_pages:
+                del self.code_pages[phys >> PAGE_SHIFT]
+        elif SP_MEM_START <= phys < SP_MEM_END:
+            self.sp_mem[phys - SP_MEM_START] = value & 0xFF
+
+    def write16(self, addr, value):
+        phys = addr & 0x1FFFFFFE
+        if phys < self.rdram_size:
+            U16.pack_into(self.rdram, phys, value & 0xFFFF)
+            if phys >> PAGE_SHIFT in self.code_pages:
+                del self.code_pages[phys >> PAGE_SHIFT]
+        elif SP_MEM_START <= phys < SP_MEM_END:
+            U16.pack_into(self.sp_mem, phys - SP_MEM_START, value & 0xFFFF)
+
+    def write32(self, addr, value):
+        phys = addr & 0x1FFFFFFC
+        if phys < self.rdram_size:
+            U32.pack_into(self.rdram, phys, value & M32)
+            if phys >> PAGE_SHIFT in self.code_pages:
+                del self.code_pages[phys >> PAGE_SHIFT]
+        else:
+            self.write_slow32(phys, value & M32)
+
+    def write64(self, addr, value):
+        phys = addr & 0x1FFFFFF8
+        if phys < self.rdram_size:
+            U64.pack_into(self.rdram, phys, value & M64)
+            if phys >> PAGE_SHIFT in self.code_pages:
+                del self.code_pages[phys >> PAGE_SHIFT]
+        else:
+            self.write_slow32(phys, (value >> 32) & M32)
+            self.write_slow32(phys + 4, value & M32)
+
+    def write_slow32(self, phys, value):
+        if SP_MEM_START <= phys < SP_MEM_END:
+            U32.pack_into(self.sp_mem, phys - SP_MEM_START, value)
+        elif PIF_RAM_START <= phys < PIF_RAM_END:
+            U32.pack_into(self.pif_ram, phys - PIF_RAM_START, value)
+        elif phys == PI_WR_LEN:
+            self.pi_dma_to_rdram(value + 1)
+        elif not CART_START <= phys < CART_END:
+            self.registers[phys] = value
+
+    def pi_dma_to_rdram(self, length):
+        """PI DMA: copy `length` bytes of cartridge ROM into RDRAM (finishes instantly)."""
+        dram = self.registers.get(PI_DRAM_ADDR, 0) & 0x00FFFFFE
+        cart = self.registers.get(PI_CART_ADDR, 0) & 0x1FFFFFFE
+        length = min(length, self.rdram_size - dram)
+        if length <= 0:
+            return
+        if CART_START <= cart < CART_END:
+            self.rdram[dram:dram + length] = self.rom.read(cart - CART_START, length)
+            self.invalidate(dram, length)
+
+
 class MIPSCPU:
-    """Simulates the MIPS CPU"""
-    def __init__(self):
+    """VR4300 interpreter: integer unit, COP0 (without TLB) and the COP1 FPU.
+
+    Instructions are decoded through a primary table (bits 31-26) and secondary
+    tables for SPECIAL (function field), REGIMM (rt) and the coprocessors (rs,
+    then the function field) into a bound handler and its pre-extracted operand
+    fields. The decoded pairs are cached per 4 KB physical page
+    (Memory.code_pages), so a loop decodes once and afterwards costs a page
+    lookup, a list index and a call per instruction. Instructions whose only
+    effect is writing $zero are decoded as op_nop.
+
+    pc is the instruction about to run and next_pc the one after it; a taken
+    branch only changes next_pc, which gives MIPS's branch delay slot. GPRs,
+    HI and LO hold 64-bit values as unsigned Python ints.
+    """
+
+    # opcode -> (handler, operand format, writes only its first operand)
+    PRIMARY = {
+        0x02: ("op_j", "j", False), 0x03: ("op_jal", "j", False),
+        0x04: ("op_beq", "stb", False), 0x05: ("op_bne", "stb", False),
+        0x06: ("op_blez", "sb", False), 0x07: ("op_bgtz", "sb", False),
+        0x08: ("op_addi", "tsi", False), 0x09: ("op_addiu", "tsi", True),
+        0x0A: ("op_slti", "tsi", True), 0x0B: ("op_sltiu", "tsi", True),
+        0x0C: ("op_andi", "tsu", True), 0x0D: ("op_ori", "tsu", True),
+        0x0E: ("op_xori", "tsu", True), 0x0F: ("op_lui", "tu", True),
+        0x14: ("op_beql", "stb", False), 0x15: ("op_bnel", "stb", False),
+        0x16: ("op_blezl", "sb", False), 0x17: ("op_bgtzl", "sb", False),
+        0x18: ("op_daddi", "tsi", False), 0x19: ("op_daddiu", "tsi", True),
+        0x1A: ("op_ldl", "tsi", False), 0x1B: ("op_ldr", "tsi", False),
+        0x20: ("op_lb", "tsi", False), 0x21: ("op_lh", "tsi", False),
+        0x22: ("op_lwl", "tsi", False), 0x23: ("op_lw", "tsi", False),
+        0x24: ("op_lbu", "tsi", False), 0x25: ("op_lhu", "tsi", False),
+        0x26: ("op_lwr", "tsi", False), 0x27: ("op_lwu", "tsi", False),
+        0x28: ("op_sb", "tsi", False), 0x29: ("op_sh", "tsi", False),
+        0x2A: ("op_swl", "tsi", False), 0x2B: ("op_sw", "tsi", False),
+        0x2C: ("op_sdl", "tsi", False), 0x2D: ("op_sdr", "tsi", False),
+        0x2E: ("op_swr", "tsi", False), 0x2F: ("op_nop", "", False),  # CACHE
+        0x30: ("op_lw", "tsi", False), 0x31: ("op_lwc1", "tsi", False),  # LL as LW
+        0x34: ("op_ld", "tsi", False), 0x35: ("op_ldc1", "tsi", False),  # LLD as LD
+        0x37: ("op_ld", "tsi", False),
+        0x38: ("op_sc", "tsi", False), 0x39: ("op_swc1", "tsi", False),
+        0x3C: ("op_scd", "tsi", False), 0x3D: ("op_sdc1", "tsi", False),
+        0x3F: ("op_sd", "tsi", False),
+    }
+
+    # SPECIAL function field -> (handler, operand format, writes only its first operand)
+    SPECIAL = {
+        0x00: ("op_sll", "dta", True), 0x02: ("op_srl", "dta", True), 0x03: ("op_sra", "dta", True),
+        0x04: ("op_sllv", "dts", True), 0x06: ("op_srlv", "dts", True), 0x07: ("op_srav", "dts", True),
+        0x08: ("op_jr", "s", False), 0x09: ("op_jalr", "ds", False),
+        0x0C: ("op_syscall", "", False), 0x0D: ("op_break", "", False), 0x0F: ("op_nop", "", False),  # SYNC
+        0x10: ("op_mfhi", "d", True), 0x11: ("op_mthi", "s", False),
+        0x12: ("op_mflo", "d", True), 0x13: ("op_mtlo", "s", False),
+        0x14: ("op_dsllv", "dts", True), 0x16: ("op_dsrlv", "dts", True), 0x17: ("op_dsrav", "dts", True),
+        0x18: ("op_mult", "st", False), 0x19: ("op_multu", "st", False),
+        0x1A: ("op_div", "st", False), 0x1B: ("op_divu", "st", False),
+        0x1C: ("op_dmult", "st", False), 0x1D: ("op_dmultu", "st", False),
+        0x1E: ("op_ddiv", "st", False), 0x1F: ("op_ddivu", "st", False),
+        0x20: ("op_add", "dst", False), 0x21: ("op_addu", "dst", True),
+        0x22: ("op_sub", "dst", False), 0x23: ("op_subu", "dst", True),
+        0x24: ("op_and", "dst", True), 0x25: ("op_or", "dst", True),
+        0x26: ("op_xor", "dst", True), 0x27: ("op_nor", "dst", True),
+        0x2A: ("op_slt", "dst", True), 0x2B: ("op_sltu", "dst", True),
+        0x2C: ("op_dadd", "dst", False), 0x2D: ("op_daddu", "dst", True),
+        0x2E: ("op_dsub", "dst", False), 0x2F: ("op_dsubu", "dst", True),
+        0x38: ("op_dsll", "dta", True), 0x3A: ("op_dsrl", "dta", True), 0x3B: ("op_dsra", "dta", True),
+        0x3C: ("op_dsll32", "dta", True), 0x3E: ("op_dsrl32", "dta", True), 0x3F: ("op_dsra32", "dta", True),
+    }
+
+    # REGIMM rt field -> (handler, and-link)
+    REGIMM = {
+        0x00: ("op_bltz", False), 0x01: ("op_bgez", False),
+        0x02: ("op_bltzl", False), 0x03: ("op_bgezl", False),
+        0x10: ("op_bltz", True), 0x11: ("op_bgez", True),
+        0x12: ("op_bltzl", True), 0x13: ("op_bgezl", True),
+    }
+
+    # COP1 S/D function field -> handler; C.cond.fmt (0x30-0x3F) is handled separately
+    FPU_OPS = {
+        0x00: "op_fadd", 0x01: "op_fsub", 0x02: "op_fmul", 0x03: "op_fdiv",
+        0x04: "op_fsqrt", 0x05: "op_fabs", 0x06: "op_fmov", 0x07: "op_fneg",
+        0x08: "op_fround_l", 0x09: "op_ftrunc_l", 0x0A: "op_fceil_l", 0x0B: "op_ffloor_l",
+        0x0C: "op_fround_w", 0x0D: "op_ftrunc_w", 0x0E: "op_fceil_w", 0x0F: "op_ffloor_w",
+        0x20: "op_fcvt_s", 0x21: "op_fcvt_d", 0x24: "op_fcvt_w", 0x25: "op_fcvt_l",
+    }
+
+    FMT_S, FMT_D, FMT_W, FMT_L = 16, 17, 20, 21
+
+    def __init__(self, memory=None):
+        self.memory = memory
+        self.reset()
+
+    def reset(self):
         self.registers = [0] * 32  # 32 registers in the MIPS CPU
+        self.hi = 0
+        self.lo = 0
         self.pc = 0  # Program Counter
-        self.memory = bytearray(64 * 1024 * 1024)  # 64 MB of memory for the ROM
+        self.next_pc = 4
+        self.cop0 = [0] * 32
+        self.fpr = [0] * 32  # raw 64-bit FPU registers
+        self.fcr31 = 0
+        self.instructions = 0
+
+    # --- Boot ---
 
-    def load_program(self, program_data):
-        """Load the program into memory."""
-        self.memory[:len(program_data)] = program_data
-        self.pc = 0x1000  # Start from some default address
+    def boot(self, rdram_size):
+        """Start the game the way the PIF and the boot code (IPL3) leave it.
 
-    def execute_instruction(self):
-        """A basic MIPS instruction fetch-execute cycle."""
-        instruction = struct.unpack(">I", self.memory[self.pc:self.pc + 4])[0]  # Fetch instruction (32-bit)
-        self.pc += 4
-        # Placeholder: Implement actual instruction decoding here.
-        print(f"Executing instruction at PC={self.pc:08X}: {instruction:08X}")
+        Copies the first megabyte of game code from ROM 0x1000 to the entry
+        point in the header, sets up the registers the boot code hands over
+        and records the RDRAM size where libultra looks for it.
+        """
+        memory = self.memory
+        self.reset()
+        entry = memory.rom.read32(0x08)
+        memory.sp_mem[:0x1000] = memory.rom.read(0, 0x1000)
+        phys = entry & 0x1FFFFFFF
+        length = min(0x100000, memory.rom.size - 0x1000, memory.rdram_size - phys)
+        memory.rdram[phys:phys + length] = memory.rom.read(0x1000, length)
+        memory.code_pages.clear()
+        U32.pack_into(memory.rdram, 0x318, rdram_size)
+        regs = self.registers
+        regs[11] = 0xFFFFFFFFA4000040  # t3: IPL3 in DMEM
+        regs[20] = 1                   # s4: NTSC
+        regs[22] = 0x3F                # s6: CIC seed
+        regs[29] = 0xFFFFFFFFA4001FF0  # sp
+        regs[31] = 0xFFFFFFFFA4001550  # ra
+        self.cop0[12] = 0x34000000     # Status: COP0/COP1 usable, FR
+        self.cop0[15] = 0x00000B00     # PRId
+        self.cop0[16] = 0x0006E463     # Config
+        self.pc = entry
+        self.next_pc = entry + 4
+
+    # --- Execution ---
+
+    def run(self, count):
+        """Execute `count` instructions (no output, no I/O besides memory-mapped registers)."""
+        pages = self.memory.code_pages
+        read32 = self.memory.read32
+        decode = self.decode
+        for _ in range(count):
+            pc = self.pc
+            phys = pc & 0x1FFFFFFF
+            page = pages.get(phys >> PAGE_SHIFT)
+            if page is None:
+                page = pages[phys >> PAGE_SHIFT] = [None] * (PAGE_SIZE // 4)
+            entry = page[(phys >> 2) & 0x3FF]
+            if entry is None:
+                entry = page[(phys >> 2) & 0x3FF] = decode(read32(pc))
+            self.pc = self.next_pc
+            self.next_pc += 4
+            entry[0](*entry[1])
+        self.instructions += count
+        # Count runs at half the CPU clock
+        self.cop0[9] = (self.cop0[9] + (count >> 1)) & M32
 
     def step(self):
         """Execute a single instruction."""
-        self.execute_instruction()
+        self.run(1)
+
+    def decode(self, instr):
+        """Return (bound handler, operand tuple) for one instruction word."""
+        opcode = instr >> 26
+        rs = (instr >> 21) & 31
+        rt = (instr >> 16) & 31
+        rd = (instr >> 11) & 31
+        sa = (instr >> 6) & 31
+        if opcode == 0x00:
+            spec = self.SPECIAL.get(instr & 0x3F)
+        elif opcode == 0x01:
+            branch = self.REGIMM.get(rt)
+            if branch is None:
+                return self.op_nop, ()
+            name, link = branch
+            return getattr(self, name), (rs, self.branch_offset(instr), link)
+        elif opcode == 0x10:
+            return self.decode_cop0(instr, rs, rt, rd)
+        elif opcode == 0x11:
+            return self.decode_cop1(instr, rs, rt, rd, sa)
+        else:
+            spec = self.PRIMARY.get(opcode)
+        if spec is None:
+            return self.op_reserved, (instr,)
+        name, fmt, pure = spec
+        imm = instr & 0xFFFF
+        operands = {
+            "": (),
+            "j": ((instr & 0x03FFFFFF) << 2,),
+            "stb": (rs, rt, self.branch_offset(instr)),
+            "sb": (rs, self.branch_offset(instr)),
+            "tsi": (rt, rs, imm - 0x10000 if imm & 0x8000 else imm),
+            "tsu": (rt, rs, imm),
+            "tu": (rt, imm),
+            "dta": (rd, rt, sa),
+            "dts": (rd, rt, rs),
+            "dst": (rd, rs, rt),
+            "st": (rs, rt),
+            "s": (rs,),
+            "d": (rd,),
+            "ds": (rd, rs),
+        }[fmt]
+        if pure and operands[0] == 0:
+            return self.op_nop, ()
+        return getattr(self, name), operands
+
+    @staticmethod
+    def branch_offset(instr):
+        offset = instr & 0xFFFF
+        return (offset - 0x10000 if offset & 0x8000 else offset) << 2
+
+    def decode_cop0(self, instr, rs, rt, rd):
+        if rs == 0x00:
+            return self.op_mfc0, (rt, rd)
+        if rs == 0x01:
+            return self.op_dmfc0, (rt, rd)
+        if rs in (0x04, 0x05):
+            return self.op_mtc0, (rt, rd)
+        if rs & 0x10 and instr & 0x3F == 0x18:
+            return self.op_eret, ()
+        # TLBR/TLBWI/TLBWR/TLBP: there is no TLB
+        return self.op_nop, ()
+
+    def decode_cop1(self, instr, rs, rt, fs, fd):
+        ft = rt
+        if rs == 0x00:
+            return self.op_mfc1, (rt, fs)
+        if rs == 0x01:
+            return self.op_dmfc1, (rt, fs)
+        if rs == 0x02:
+            return self.op_cfc1, (rt, fs)
+        if rs == 0x04:
+            return self.op_mtc1, (rt, fs)
+        if rs == 0x05:
+            return self.op_dmtc1, (rt, fs)
+        if rs == 0x06:
+            return self.op_ctc1, (fs, rt)
+        if rs == 0x08:
+            return self.op_bc1, (self.branch_offset(instr), rt & 1, rt & 2)
+        funct = instr & 0x3F
+        if rs in (self.FMT_S, self.FMT_D):
+            if funct >= 0x30:
+                return self.op_fcompare, (rs, fs, ft, funct & 0xF)
+            name = self.FPU_OPS.get(funct)
+            if name is not None:
+                return getattr(self, name), (rs, fd, fs, ft)
+        elif rs in (self.FMT_W, self.FMT_L) and funct in (0x20, 0x21):
+            return getattr(self, self.FPU_OPS[funct]), (rs, fd, fs, ft)
+        return self.op_reserved, (instr,)
+
+    # --- Exceptions ---
+
+    def exception(self, code):
+        """Enter the general exception vector with ExcCode `code` (EPC = the faulting instruction)."""
+        cop0 = self.cop0
+        cop0[14] = (self.pc - 4) & M32
+        cop0[13] = (cop0[13] & ~0x7C) | (code << 2)
+        cop0[12] |= 0x2  # EXL
+        self.pc = 0x80000180
+        self.next_pc = 0x80000184
+
+    def op_eret(self):
+        cop0 = self.cop0
+        if cop0[12] & 0x4:  # ERL
+            target = cop0[30]
+            cop0[12] &= ~0x4
+        else:
+            target = cop0[14]
+            cop0[12] &= ~0x2
+        # ERET has no delay slot
+        self.pc = target & M32
+        self.next_pc = self.pc + 4
+
+    def op_syscall(self):
+        self.exception(8)
+
+    def op_break(self):
+        self.exception(9)
+
+    def op_reserved(self, instr):
+        self.exception(10)
+
+    def op_nop(self):
+        pass
+
+    # --- Jumps and branches ---
+    #
+    # self.pc already points at the delay slot; a taken branch sets next_pc.
+
+    def op_j(self, target):
+        self.next_pc = (self.pc & 0xF0000000) | target
+
+    def op_jal(self, target):
+        self.registers[31] = sign_extend32(self.pc + 4)
+        self.next_pc = (self.pc & 0xF0000000) | target
+
+    def op_jr(self, rs):
+        self.next_pc = self.registers[rs] & M32
+
+    def op_jalr(self, rd, rs):
+        target = self.registers[rs] & M32
+        if rd:
+            self.registers[rd] = sign_extend32(self.pc + 4)
+        self.next_pc = target
+
+    def branch(self, taken, offset):
+        if taken:
+            self.next_pc = (self.pc + offset) & M32
+
+    def branch_likely(self, taken, offset):
+        if taken:
+            self.next_pc = (self.pc + offset) & M32
+        else:
+            # Not taken: the delay slot is skipped
+            self.pc = self.next_pc
+            self.next_pc += 4
+
+    def op_beq(self, rs, rt, offset):
+        self.branch(self.registers[rs] == self.registers[rt], offset)
+
+    def op_bne(self, rs, rt, offset):
+        self.branch(self.registers[rs] != self.registers[rt], offset)
+
+    def op_blez(self, rs, offset):
+        self.branch(signed64(self.registers[rs]) <= 0, offset)
+
+    def op_bgtz(self, rs, offset):
+        self.branch(signed64(self.registers[rs]) > 0, offset)
+
+    def op_beql(self, rs, rt, offset):
+        self.branch_likely(self.registers[rs] == self.registers[rt], offset)
+
+    def op_bnel(self, rs, rt, offset):
+        self.branch_likely(self.registers[rs] != self.registers[rt], offset)
+
+    def op_blezl(self, rs, offset):
+        self.branch_likely(signed64(self.registers[rs]) <= 0, offset)
+
+    def op_bgtzl(self, rs, offset):
+        self.branch_likely(signed64(self.registers[rs]) > 0, offset)
+
+    def op_bltz(self, rs, offset, link):
+        taken = self.registers[rs] >> 63
+        if link:
+            self.registers[31] = sign_extend32(self.pc + 4)
+        self.branch(taken, offset)
+
+    def op_bgez(self, rs, offset, link):
+        taken = not self.registers[rs] >> 63
+        if link:
+            self.registers[31] = sign_extend32(self.pc + 4)
+        self.branch(taken, offset)
+
+    def op_bltzl(self, rs, offset, link):
+        taken = self.registers[rs] >> 63
+        if link:
+            self.registers[31] = sign_extend32(self.pc + 4)
+        self.branch_likely(taken, offset)
+
+    def op_bgezl(self, rs, offset, link):
+        taken = not self.registers[rs] >> 63
+        if link:
+            self.registers[31] = sign_extend32(self.pc + 4)
+        self.branch_likely(taken, offset)
+
+    # --- Immediate ALU ---
+
+    def op_addi(self, rt, rs, imm):
+        result = signed32(self.registers[rs]) + imm
+        if not -0x80000000 <= result <= 0x7FFFFFFF:
+            self.exception(12)  # Integer overflow
+        elif rt:
+            self.registers[rt] = sign_extend32(result)
+
+    def op_addiu(self, rt, rs, imm):
+        self.registers[rt] = sign_extend32(self.registers[rs] + imm)
+
+    def op_daddi(self, rt, rs, imm):
+        result = signed64(self.registers[rs]) + imm
+        if not -(1 << 63) <= result < (1 << 63):
+            self.exception(12)
+        elif rt:
+            self.registers[rt] = result & M64
+
+    def op_daddiu(self, rt, rs, imm):
+        self.registers[rt] = (self.registers[rs] + imm) & M64
+
+    def op_slti(self, rt, rs, imm):
+        self.registers[rt] = 1 if signed64(self.registers[rs]) < imm else 0
+
+    def op_sltiu(self, rt, rs, imm):
+        self.registers[rt] = 1 if self.registers[rs] < (imm & M64) else 0
+
+    def op_andi(self, rt, rs, imm):
+        self.registers[rt] = self.registers[rs] & imm
+
+    def op_ori(self, rt, rs, imm):
+        self.registers[rt] = self.registers[rs] | imm
+
+    def op_xori(self, rt, rs, imm):
+        self.registers[rt] = self.registers[rs] ^ imm
+
+    def op_lui(self, rt, imm):
+        self.registers[rt] = sign_extend32(imm << 16)
+
+    # --- Register ALU ---
+
+    def op_add(self, rd, rs, rt):
+        regs = self.registers
+        result = signed32(regs[rs]) + signed32(regs[rt])
+        if not -0x80000000 <= result <= 0x7FFFFFFF:
+            self.exception(12)
+        elif rd:
+            regs[rd] = sign_extend32(result)
+
+    def op_addu(self, rd, rs, rt):
+        regs = self.registers
+        regs[rd] = sign_extend32(regs[rs] + regs[rt])
+
+    def op_sub(self, rd, rs, rt):
+        regs = self.registers
+        result = signed32(regs[rs]) - signed32(regs[rt])
+        if not -0x80000000 <= result <= 0x7FFFFFFF:
+            self.exception(12)
+        elif rd:
+            regs[rd] = sign_extend32(result)
+
+    def op_subu(self, rd, rs, rt):
+        regs = self.registers
+        regs[rd] = sign_extend32(regs[rs] - regs[rt])
+
+    def op_dadd(self, rd, rs, rt):
+        regs = self.registers
+        result = signed64(regs[rs]) + signed64(regs[rt])
+        if not -(1 << 63) <= result < (1 << 63):
+            self.exception(12)
+        elif rd:
+            regs[rd] = result & M64
+
+    def op_daddu(self, rd, rs, rt):
+        regs = self.registers
+        regs[rd] = (regs[rs] + regs[rt]) & M64
+
+    def op_dsub(self, rd, rs, rt):
+        regs = self.registers
+        result = signed64(regs[rs]) - signed64(regs[rt])
+        if not -(1 << 63) <= result < (1 << 63):
+            self.exception(12)
+        elif rd:
+            regs[rd] = result & M64
+
+    def op_dsubu(self, rd, rs, rt):
+        regs = self.registers
+        regs[rd] = (regs[rs] - regs[rt]) & M64
+
+    def op_and(self, rd, rs, rt):
+        regs = self.registers
+        regs[rd] = regs[rs] & regs[rt]
+
+    def op_or(self, rd, rs, rt):
+        regs = self.registers
+        regs[rd] = regs[rs] | regs[rt]
+
+    def op_xor(self, rd, rs, rt):
+        regs = self.registers
+        regs[rd] = regs[rs] ^ regs[rt]
+
+    def op_nor(self, rd, rs, rt):
+        regs = self.registers
+        regs[rd] = ~(regs[rs] | regs[rt]) & M64
+
+    def op_slt(self, rd, rs, rt):
+        regs = self.registers
+        regs[rd] = 1 if signed64(regs[rs]) < signed64(regs[rt]) else 0
+
+    def op_sltu(self, rd, rs, rt):
+        regs = self.registers
+        regs[rd] = 1 if regs[rs] < regs[rt] else 0
+
+    # --- Shifts ---
+
+    def op_sll(self, rd, rt, sa):
+        self.registers[rd] = sign_extend32(self.registers[rt] << sa)
+
+    def op_srl(self, rd, rt, sa):
+        self.registers[rd] = sign_extend32((self.registers[rt] & M32) >> sa)
+
+    def op_sra(self, rd, rt, sa):
+        self.registers[rd] = sign_extend32(signed64(self.registers[rt]) >> sa)
+
+    def op_sllv(self, rd, rt, rs):
+        self.registers[rd] = sign_extend32(self.registers[rt] << (self.registers[rs] & 31))
+
+    def op_srlv(self, rd, rt, rs):
+        self.registers[rd] = sign_extend32((self.registers[rt] & M32) >> (self.registers[rs] & 31))
+
+    def op_srav(self, rd, rt, rs):
+        self.registers[rd] = sign_extend32(signed64(self.registers[rt]) >> (self.registers[rs] & 31))
+
+    def op_dsll(self, rd, rt, sa):
+        self.registers[rd] = (self.registers[rt] << sa) & M64
+
+    def op_dsrl(self, rd, rt, sa):
+        self.registers[rd] = self.registers[rt] >> sa
+
+    def op_dsra(self, rd, rt, sa):
+        self.registers[rd] = (signed64(self.registers[rt]) >> sa) & M64
+
+    def op_dsll32(self, rd, rt, sa):
+        self.registers[rd] = (self.registers[rt] << (sa + 32)) & M64
+
+    def op_dsrl32(self, rd, rt, sa):
+        self.registers[rd] = self.registers[rt] >> (sa + 32)
+
+    def op_dsra32(self, rd, rt, sa):
+        self.registers[rd] = (signed64(self.registers[rt]) >> (sa + 32)) & M64
+
+    def op_dsllv(self, rd, rt, rs):
+        self.registers[rd] = (self.registers[rt] << (self.registers[rs] & 63)) & M64
+
+    def op_dsrlv(self, rd, rt, rs):
+        self.registers[rd] = self.registers[rt] >> (self.registers[rs] & 63)
+
+    def op_dsrav(self, rd, rt, rs):
+        self.registers[rd] = (signed64(self.registers[rt]) >> (self.registers[rs] & 63)) & M64
+
+    # --- Multiply and divide ---
+
+    def op_mfhi(self, rd):
+        self.registers[rd] = self.hi
+
+    def op_mflo(self, rd):
+        self.registers[rd] = self.lo
+
+    def op_mthi(self, rs):
+        self.hi = self.registers[rs]
+
+    def op_mtlo(self, rs):
+        self.lo = self.registers[rs]
+
+    def op_mult(self, rs, rt):
+        product = signed32(self.registers[rs]) * signed32(self.registers[rt])
+        self.lo = sign_extend32(product)
+        self.hi = sign_extend32(product >> 32)
+
+    def op_multu(self, rs, rt):
+        product = (self.registers[rs] & M32) * (self.registers[rt] & M32)
+        self.lo = sign_extend32(product)
+        self.hi = sign_extend32(product >> 32)
+
+    def op_div(self, rs, rt):
+        n = signed32(self.registers[rs])
+        d = signed32(self.registers[rt])
+        if d == 0:
+            self.lo = M64 if n >= 0 else 1
+            self.hi = sign_extend32(n)
+            return
+        quotient = abs(n) // abs(d)
+        if (n < 0) != (d < 0):
+            quotient = -quotient
+        self.lo = sign_extend32(quotient)
+        self.hi = sign_extend32(n - quotient * d)
+
+    def op_divu(self, rs, rt):
+        n = self.registers[rs] & M32
+        d = self.registers[rt] & M32
+        if d == 0:
+            self.lo = M64
+            self.hi = sign_extend32(n)
+            return
+        self.lo = sign_extend32(n // d)
+        self.hi = sign_extend32(n % d)
+
+    def op_dmult(self, rs, rt):
+        product = signed64(self.registers[rs]) * signed64(self.registers[rt])
+        self.lo = product & M64
+        self.hi = (product >> 64) & M64
+
+    def op_dmultu(self, rs, rt):
+        product = self.registers[rs] * self.registers[rt]
+        self.lo = product & M64
+        self.hi = product >> 64
+
+    def op_ddiv(self, rs, rt):
+        n = signed64(self.registers[rs])
+        d = signed64(self.registers[rt])
+        if d == 0:
+            self.lo = M64 if n >= 0 else 1
+            self.hi = n & M64
+            return
+        quotient = abs(n) // abs(d)
+        if (n < 0) != (d < 0):
+            quotient = -quotient
+        self.lo = quotient & M64
+        self.hi = (n - quotient * d) & M64
+
+    def op_ddivu(self, rs, rt):
+        n = self.registers[rs]
+        d = self.registers[rt]
+        if d == 0:
+            self.lo = M64
+            self.hi = n
+            return
+        self.lo = n // d
+        self.hi = n % d
+
+    # --- Loads and stores ---
+
+    def op_lb(self, rt, rs, imm):
+        value = self.memory.read8(self.registers[rs] + imm)
+        if rt:
+            self.registers[rt] = value | 0xFFFFFFFFFFFFFF00 if value & 0x80 else value
+
+    def op_lbu(self, rt, rs, imm):
+        value = self.memory.read8(self.registers[rs] + imm)
+        if rt:
+            self.registers[rt] = value
+
+    def op_lh(self, rt, rs, imm):
+        value = self.memory.read16(self.registers[rs] + imm)
+        if rt:
+            self.registers[rt] = value | 0xFFFFFFFFFFFF0000 if value & 0x8000 else value
+
+    def op_lhu(self, rt, rs, imm):
+        value = self.memory.read16(self.registers[rs] + imm)
+        if rt:
+            self.registers[rt] = value
+
+    def op_lw(self, rt, rs, imm):
+        value = self.memory.read32(self.registers[rs] + imm)
+        if rt:
+            self.registers[rt] = sign_extend32(value)
+
+    def op_lwu(self, rt, rs, imm):
+        value = self.memory.read32(self.registers[rs] + imm)
+        if rt:
+            self.registers[rt] = value
+
+    def op_ld(self, rt, rs, imm):
+        value = self.memory.read64(self.registers[rs] + imm)
+        if rt:
+            self.registers[rt] = value
+
+    def op_lwl(self, rt, rs, imm):
+        addr = (self.registers[rs] + imm) & M32
+        shift = (addr & 3) << 3
+        word = self.memory.read32(addr)
+        if rt:
+            keep = (1 << shift) - 1
+            self.registers[rt] = sign_extend32(((word << shift) & M32) | (self.registers[rt] & keep))
+
+    def op_lwr(self, rt, rs, imm):
+        addr = (self.registers[rs] + imm) & M32
+        shift = (3 - (addr & 3)) << 3
+        word = self.memory.read32(addr)
+        if rt:
+            keep = ~(M32 >> shift) & M32
+            value = (word >> shift) | (self.registers[rt] & keep)
+            # Only a whole-word LWR (shift 0) sign-extends; partial ones keep the upper half
+            self.registers[rt] = sign_extend32(value) if not shift else (self.registers[rt] & ~M32) | value
+
+    def op_ldl(self, rt, rs, imm):
+        addr = (self.registers[rs] + imm) & M32
+        shift = (addr & 7) << 3
+        dword = self.memory.read64(addr)
+        if rt:
+            keep = (1 << shift) - 1
+            self.registers[rt] = ((dword << shift) & M64) | (self.registers[rt] & keep)
+
+    def op_ldr(self, rt, rs, imm):
+        addr = (self.registers[rs] + imm) & M32
+        shift = (7 - (addr & 7)) << 3
+        dword = self.memory.read64(addr)
+        if rt:
+            keep = ~(M64 >> shift) & M64
+            self.registers[rt] = (dword >> shift) | (self.registers[rt] & keep)
+
+    def op_sb(self, rt, rs, imm):
+        self.memory.write8(self.registers[rs] + imm, self.registers[rt])
+
+    def op_sh(self, rt, rs, imm):
+        self.memory.write16(self.registers[rs] + imm, self.registers[rt])
+
+    def op_sw(self, rt, rs, imm):
+        self.memory.write32(self.registers[rs] + imm, self.registers[rt])
+
+    def op_sd(self, rt, rs, imm):
+        self.memory.write64(self.registers[rs] + imm, self.registers[rt])
+
+    def op_swl(self, rt, rs, imm):
+        addr = (self.registers[rs] + imm) & M32
+        shift = (addr & 3) << 3
+        word = self.memory.read32(addr)
+        value = (word & ~(M32 >> shift) & M32) | ((self.registers[rt] & M32) >> shift)
+        self.memory.write32(addr, value)
+
+    def op_swr(self, rt, rs, imm):
+        addr = (self.registers[rs] + imm) & M32
+        shift = (3 - (addr & 3)) << 3
+        word = self.memory.read32(addr)
+        value = (word & ((1 << shift) - 1)) | ((self.registers[rt] << shift) & M32)
+        self.memory.write32(addr, value)
+
+    def op_sdl(self, rt, rs, imm):
+        addr = (self.registers[rs] + imm) & M32
+        shift = (addr & 7) << 3
+        dword = self.memory.read64(addr)
+        value = (dword & ~(M64 >> shift) & M64) | (self.registers[rt] >> shift)
+        self.memory.write64(addr, value)
+
+    def op_sdr(self, rt, rs, imm):
+        addr = (self.registers[rs] + imm) & M32
+        shift = (7 - (addr & 7)) << 3
+        dword = self.memory.read64(addr)
+        value = (dword & ((1 << shift) - 1)) | ((self.registers[rt] << shift) & M64)
+        self.memory.write64(addr, value)
+
+    def op_sc(self, rt, rs, imm):
+        # Single CPU with no other bus masters: a store-conditional always succeeds
+        self.memory.write32(self.registers[rs] + imm, self.registers[rt])
+        if rt:
+            self.registers[rt] = 1
+
+    def op_scd(self, rt, rs, imm):
+        self.memory.write64(self.registers[rs] + imm, self.registers[rt])
+        if rt:
+            self.registers[rt] = 1
+
+    # --- COP0 ---
+
+    def op_mfc0(self, rt, rd):
+        if rt:
+            self.registers[rt] = sign_extend32(self.cop0[rd])
+
+    def op_dmfc0(self, rt, rd):
+        if rt:
+            self.registers[rt] = self.cop0[rd]
+
+    def op_mtc0(self, rt, rd):
+        self.cop0[rd] = self.registers[rt] & M32
+        if rd == 11:
+            # Writing Compare acknowledges the timer interrupt
+            self.cop0[13] &= ~0x8000
+
+    # --- COP1 (FPU) ---
+    #
+    # fpr holds raw 64-bit register contents. With Status.FR clear (the
+    # default), a double lives in an even/odd pair and odd singles are the
+    # upper half of the even register.
+
+    def fpr32(self, n):
+        if self.cop0[12] & 0x04000000 or not n & 1:
+            return self.fpr[n] & M32
+        return self.fpr[n & ~1] >> 32
+
+    def set_fpr32(self, n, value):
+        fpr = self.fpr
+        if self.cop0[12] & 0x04000000 or not n & 1:
+            fpr[n] = (fpr[n] & ~M32 & M64) | (value & M32)
+        else:
+            fpr[n & ~1] = (fpr[n & ~1] & M32) | ((value & M32) << 32)
+
+    def fpr64(self, n):
+        return self.fpr[n if self.cop0[12] & 0x04000000 else n & ~1]
+
+    def set_fpr64(self, n, value):
+        self.fpr[n if self.cop0[12] & 0x04000000 else n & ~1] = value & M64
+
+    def float_value(self, fmt, n):
+        if fmt == self.FMT_S:
+            return F32.unpack(U32.pack(self.fpr32(n)))[0]
+        if fmt == self.FMT_D:
+            return F64.unpack(U64.pack(self.fpr64(n)))[0]
+        if fmt == self.FMT_W:
+            return float(signed32(self.fpr32(n)))
+        return float(signed64(self.fpr64(n)))
+
+    def set_float(self, fmt, n, value):
+        if fmt == self.FMT_S:
+            try:
+                bits = U32.unpack(F32.pack(value))[0]
+            except OverflowError:
+                bits = 0xFF800000 if value < 0 else 0x7F800000
+            self.set_fpr32(n, bits)
+        else:
+            self.set_fpr64(n, U64.unpack(F64.pack(value))[0])
+
+    def op_mfc1(self, rt, fs):
+        if rt:
+            self.registers[rt] = sign_extend32(self.fpr32(fs))
+
+    def op_dmfc1(self, rt, fs):
+        if rt:
+            self.registers[rt] = self.fpr64(fs)
+
+    def op_mtc1(self, rt, fs):
+        self.set_fpr32(fs, self.registers[rt])
+
+    def op_dmtc1(self, rt, fs):
+        self.set_fpr64(fs, self.registers[rt])
+
+    def op_cfc1(self, rt, fs):
+        if rt:
+            self.registers[rt] = sign_extend32(self.fcr31 if fs == 31 else 0x00000A00 if fs == 0 else 0)
+
+    def op_ctc1(self, fs, rt):
+        if fs == 31:
+            self.fcr31 = self.registers[rt] & M32
+
+    def op_lwc1(self, ft, rs, imm):
+        self.set_fpr32(ft, self.memory.read32(self.registers[rs] + imm))
+
+    def op_swc1(self, ft, rs, imm):
+        self.memory.write32(self.registers[rs] + imm, self.fpr32(ft))
+
+    def op_ldc1(self, ft, rs, imm):
+        self.set_fpr64(ft, self.memory.read64(self.registers[rs] + imm))
+
+    def op_sdc1(self, ft, rs, imm):
+        self.memory.write64(self.registers[rs] + imm, self.fpr64(ft))
+
+    def op_bc1(self, offset, true, likely):
+        taken = bool(self.fcr31 & 0x00800000) == bool(true)
+        if likely:
+            self.branch_likely(taken, offset)
+        else:
+            self.branch(taken, offset)
+
+    def op_fadd(self, fmt, fd, fs, ft):
+        self.set_float(fmt, fd, self.float_value(fmt, fs) + self.float_value(fmt, ft))
+
+    def op_fsub(self, fmt, fd, fs, ft):
+        self.set_float(fmt, fd, self.float_value(fmt, fs) - self.float_value(fmt, ft))
+
+    def op_fmul(self, fmt, fd, fs, ft):
+        self.set_float(fmt, fd, self.float_value(fmt, fs) * self.float_value(fmt, ft))
+
+    def op_fdiv(self, fmt, fd, fs, ft):
+        a = self.float_value(fmt, fs)
+        b = self.float_value(fmt, ft)
+        if b:
+            result = a / b
+        elif a and not math.isnan(a):
+            result = math.copysign(math.inf, a) * math.copysign(1.0, b)
+        else:
+            result = math.nan
+        self.set_float(fmt, fd, result)
+
+    def op_fsqrt(self, fmt, fd, fs, ft):
+        a = self.float_value(fmt, fs)
+        self.set_float(fmt, fd, math.sqrt(a) if a >= 0 else math.nan)
+
+    def op_fabs(self, fmt, fd, fs, ft):
+        self.set_float(fmt, fd, abs(self.float_value(fmt, fs)))
+
+    def op_fmov(self, fmt, fd, fs, ft):
+        if fmt == self.FMT_S:
+            self.set_fpr32(fd, self.fpr32(fs))
+        else:
+            self.set_fpr64(fd, self.fpr64(fs))
+
+    def op_fneg(self, fmt, fd, fs, ft):
+        self.set_float(fmt, fd, -self.float_value(fmt, fs))
+
+    @staticmethod
+    def to_integer(value, rounding, bits):
+        """Round a float per `rounding` (0 nearest-even, 1 toward zero, 2 up, 3 down)
+        to a `bits`-bit integer; NaN, infinities and overflow give the invalid result."""
+        if math.isnan(value) or math.isinf(value):
+            return (1 << (bits - 1)) - 1
+        result = (round, math.trunc, math.ceil, math.floor)[rounding](value)
+        if not -(1 << (bits - 1)) <= result < (1 << (bits - 1)):
+            return (1 << (bits - 1)) - 1
+        return result
+
+    def op_fround_w(self, fmt, fd, fs, ft):
+        self.set_fpr32(fd, self.to_integer(self.float_value(fmt, fs), 0, 32))
+
+    def op_ftrunc_w(self, fmt, fd, fs, ft):
+        self.set_fpr32(fd, self.to_integer(self.float_value(fmt, fs), 1, 32))
+
+    def op_fceil_w(self, fmt, fd, fs, ft):
+        self.set_fpr32(fd, self.to_integer(self.float_value(fmt, fs), 2, 32))
+
+    def op_ffloor_w(self, fmt, fd, fs, ft):
+        self.set_fpr32(fd, self.to_integer(self.float_value(fmt, fs), 3, 32))
+
+    def op_fround_l(self, fmt, fd, fs, ft):
+        self.set_fpr64(fd, self.to_integer(self.float_value(fmt, fs), 0, 64))
+
+    def op_ftrunc_l(self, fmt, fd, fs, ft):
+        self.set_fpr64(fd, self.to_integer(self.float_value(fmt, fs), 1, 64))
+
+    def op_fceil_l(self, fmt, fd, fs, ft):
+        self.set_fpr64(fd, self.to_integer(self.float_value(fmt, fs), 2, 64))
+
+    def op_ffloor_l(self, fmt, fd, fs, ft):
+        self.set_fpr64(fd, self.to_integer(self.float_value(fmt, fs), 3, 64))
+
+    def op_fcvt_s(self, fmt, fd, fs, ft):
+        self.set_float(self.FMT_S, fd, self.float_value(fmt, fs))
+
+    def op_fcvt_d(self, fmt, fd, fs, ft):
+        self.set_float(self.FMT_D, fd, self.float_value(fmt, fs))
+
+    def op_fcvt_w(self, fmt, fd, fs, ft):
+        # Rounded per FCR31's rounding mode
+        self.set_fpr32(fd, self.to_integer(self.float_value(fmt, fs), self.fcr31 & 3, 32))
+
+    def op_fcvt_l(self, fmt, fd, fs, ft):
+        self.set_fpr64(fd, self.to_integer(self.float_value(fmt, fs), self.fcr31 & 3, 64))
+
+    def op_fcompare(self, fmt, fs, ft, cond):
+        """C.cond.fmt: bit 0 of cond accepts unordered, bit 1 equal, bit 2 less than."""
+        a = self.float_value(fmt, fs)
+        b = self.float_value(fmt, ft)
+        if math.isnan(a) or math.isnan(b):
+            result = cond & 1
+        else:
+            result = (cond & 2 and a == b) or (cond & 4 and a < b)
+        if result:
+            self.fcr31 |= 0x00800000
+        else:
+            self.fcr31 &= ~0x00800000
+
 
 class N64Emulator:
     """The N64 Emulator class that ties everything together"""
@@ -40,27 +1188,31 @@ class N64Emulator:
         self.loaded_rom = None
         self.vibe_mode = False  # Controls the "vibe" effect for color cycling
         self.framebuffer = [0] * (SCREEN_WIDTH * SCREEN_HEIGHT)  # Placeholder framebuffer (black screen)
+        self.rom = None
+        self.memory = None  # RDRAM and the mapped ROM, once a ROM is loaded
         self.cpu = MIPSCPU()  # MIPS CPU instance
-        self.ram = bytearray(64 * 1024 * 1024)  # VRAM/Memory space
         self.gpu = None  # Placeholder for RCP (Reality Coprocessor)
+        self.instructions_per_frame = INSTRUCTIONS_PER_FRAME
 
-    def load_rom(self, filename):
+    def load_rom(self, filename, rdram_size=RDRAM_SIZE):
         try:
-            # Load ROM data into memory
-            with open(filename, 'rb') as f:
-                rom_data = f.read()
-            self.loaded_rom = filename
-            if not self.loaded_rom.lower().endswith(('.n64', '.z64')):
-                raise ValueError("Unsupported ROM format. Only .n64 and .z64 supported.")
-            self.cpu.load_program(rom_data)  # Load the program (ROM) into memory
-            print(f"Loaded ROM: {filename}")
+            # Map the ROM (its byte order is detected from the header, not the extension)
+            rom = CartridgeROM(filename)
         except Exception as e:
             raise ValueError(f"Failed to load ROM: {str(e)}")
+        if self.rom is not None:
+            self.rom.close()
+        self.rom = rom
+        self.memory = Memory(rom, rdram_size)
+        self.cpu.memory = self.memory
+        self.cpu.boot(rdram_size)
+        self.loaded_rom = filename
+        print(f"Loaded ROM: {filename}")
 
     def step_frame(self):
         """Simulate one frame of the emulator."""
-        # Execute a single MIPS instruction
-        self.cpu.step()
+        # Run this frame's instruction budget
+        self.cpu.run(self.instructions_per_frame)
 
         # Placeholder: Fill framebuffer with random data (simulating a rendered frame)
         # For now, let's fill the framebuffer with mock data (blue screen for example)
@@ -125,7 +1277,7 @@ class N64EmulatorApp:
     def open_rom(self):
         filename = filedialog.askopenfilename(
             title="Open N64 ROM",
-            filetypes=[("N64 ROMs", "*.n64;*.z64"), ("All files", "*.*")]
+            filetypes=[("N64 ROMs", "*.n64;*.z64;*.v64"), ("All files", "*.*")]
         )
         if filename:
             try: